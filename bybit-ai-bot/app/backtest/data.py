@@ -0,0 +1,87 @@
+"""
+Historial OHLCV del backtester. La fuente principal es el store local
+(`OHLCVStore`, columnas mapeadas en memoria que alimentan el stream en vivo y
+el backfill); como alternativa, un archivo .npy (array `KLINE_DTYPE`) por
+(símbolo, intervalo) en storage/history, también leído con mmap.
+
+Si solo hay velas del marco base, los marcos superiores que piden las
+estrategias (15m y 1h) se agregan a partir de ellas (`resample`).
+"""
+import os
+import numpy as np
+from app.constants import STORAGE_PATH
+from app.exchange.kline_cache import KLINE_DTYPE, empty_klines, interval_to_ms
+from app.exchange.ohlcv_store import ohlcv_store
+from app.logger import logger
+
+HISTORY_DIR = os.path.join(STORAGE_PATH, "history")
+
+
+def history_path(symbol: str, interval: str, directory: str = HISTORY_DIR) -> str:
+    return os.path.join(directory, f"{symbol.upper()}_{interval.replace('m', '')}.npy")
+
+
+def save_series(symbol: str, interval: str, klines: np.ndarray, directory: str = HISTORY_DIR) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = history_path(symbol, interval, directory)
+    tmp = path + ".tmp.npy"
+    np.save(tmp, np.ascontiguousarray(klines, dtype=KLINE_DTYPE))
+    os.replace(tmp, path)
+    return path
+
+
+def load_series(symbol: str, interval: str, directory: str = HISTORY_DIR):
+    """Array `KLINE_DTYPE` mapeado en memoria, o None si no hay historial guardado."""
+    path = history_path(symbol, interval, directory)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def resample(klines: np.ndarray, interval: str) -> np.ndarray:
+    """
+    Agrega velas a un marco superior alineado a epoch (como Bybit). La última
+    vela agregada puede estar incompleta; el backtester solo usa velas cerradas
+    según su hora de cierre, así que no adelanta información.
+    """
+    step = interval_to_ms(interval)
+    if not len(klines) or not step:
+        return empty_klines()
+    times = klines["time"]
+    buckets = times - times % step
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(klines)])) - 1
+    out = np.empty(len(starts), dtype=KLINE_DTYPE)
+    out["time"] = buckets[starts]
+    out["open"] = klines["open"][starts]
+    out["high"] = np.maximum.reduceat(klines["high"], starts)
+    out["low"] = np.minimum.reduceat(klines["low"], starts)
+    out["close"] = klines["close"][ends]
+    out["volume"] = np.add.reduceat(klines["volume"], starts)
+    return out
+
+
+def _load(symbol: str, interval: str, directory: str, store):
+    if store is not None:
+        candles = store.read(symbol, interval)
+        if len(candles):
+            return candles
+    return load_series(symbol, interval, directory)
+
+
+def load_symbol(symbol: str, intervals, directory: str = HISTORY_DIR, store=ohlcv_store) -> dict:
+    """
+    {intervalo: velas} para los intervalos pedidos, del store o, si no tiene
+    la serie, del .npy de `directory`. El primero es el marco base y los que
+    falten se agregan desde él. Diccionario vacío si no hay marco base.
+    """
+    base, *others = [iv.replace("m", "") for iv in intervals]
+    base_klines = _load(symbol, base, directory, store)
+    if base_klines is None or not len(base_klines):
+        logger.warning(f"[BACKTEST] Sin historial {symbol} {base}m (store ni {directory}).")
+        return {}
+    series = {base: base_klines}
+    for iv in others:
+        stored = _load(symbol, iv, directory, store)
+        series[iv] = stored if stored is not None and len(stored) else resample(base_klines, iv)
+    return series
@@ -0,0 +1,142 @@
+"""
+Backtester vectorizado: AntigravityV13 (5m) + SuperTrendRegimeMTF (15m/1h)
+con la gestión de salidas del Engine.
+
+Por símbolo: indicadores una sola vez sobre todo el historial (`PreparedSymbol`),
+señales de todas las velas en una pasada NumPy y el simulador de salidas
+(compilado con numba si está disponible) recorriendo el marco base. Cada
+`run()` con otros umbrales reutiliza las columnas ya calculadas.
+Cada símbolo se simula por separado: no se aplica MAX_OPEN_TRADES entre símbolos.
+"""
+import time
+import numpy as np
+from app.backtest.signals import (
+    asof_index, supertrend_features, supertrend_signals, v13_features, v13_signals,
+)
+from app.backtest.simulator import EXIT_NAMES, STRATEGY_NAMES, TRADE_DTYPE, simulate
+from app.exchange.kline_cache import interval_to_ms
+from app.logger import logger
+
+BASE_INTERVAL = "5"
+SUPERTREND_INTERVAL = "15"
+HTF_INTERVAL = "60"
+INTERVALS = (BASE_INTERVAL, SUPERTREND_INTERVAL, HTF_INTERVAL)
+
+
+class PreparedSymbol:
+    """Columnas de indicadores de un símbolo, alineadas al marco base."""
+    __slots__ = ("symbol", "time", "open", "high", "low", "close", "v13",
+                 "supertrend", "st_rows", "st_valid_rows", "ema21", "bar_ms")
+
+    def __init__(self, symbol: str, series: dict):
+        base = series[BASE_INTERVAL]
+        self.symbol = symbol
+        self.bar_ms = interval_to_ms(BASE_INTERVAL)
+        self.time = np.asarray(base["time"], dtype=np.int64)
+        self.open = np.asarray(base["open"], dtype=np.float64)
+        self.high = np.asarray(base["high"], dtype=np.float64)
+        self.low = np.asarray(base["low"], dtype=np.float64)
+        self.close = np.asarray(base["close"], dtype=np.float64)
+        self.v13 = v13_features(base)
+
+        klines_15m = series[SUPERTREND_INTERVAL]
+        self.supertrend = supertrend_features(klines_15m, series[HTF_INTERVAL])
+        # Vela base que cierra a la vez que cada vela de 15m (el escaneo que la evalúa)
+        st_ms = interval_to_ms(SUPERTREND_INTERVAL)
+        st_close = np.asarray(klines_15m["time"], dtype=np.int64) + st_ms
+        base_close = self.time + self.bar_ms
+        rows = np.searchsorted(base_close, st_close)
+        found = rows < len(base_close)
+        found[found] = base_close[rows[found]] == st_close[found]
+        self.st_rows = rows[found]
+        self.st_valid_rows = np.flatnonzero(found)
+        # EMA21 de 15m vigente en cada vela base (trailing del Engine)
+        idx = asof_index(klines_15m["time"], st_ms, self.time, self.bar_ms)
+        ema21 = np.where(idx >= 0, self.supertrend["ema21"][np.maximum(idx, 0)], 0.0)
+        self.ema21 = np.nan_to_num(ema21, nan=0.0)
+
+    def _on_base(self, values, fill=0):
+        out = np.full(len(self.time), fill, dtype=np.asarray(values).dtype)
+        out[self.st_rows] = values[self.st_valid_rows]
+        return out
+
+    def run(self, v13_params: dict = None, st_params: dict = None, exit_params: dict = None) -> np.ndarray:
+        sig_v13 = v13_signals(self.v13, v13_params)
+        sig_st, exit_long, exit_short = supertrend_signals(self.supertrend, st_params)
+        exit_params = dict({"cooldown_bars": 3_600_000 / self.bar_ms}, **(exit_params or {}))
+        return simulate(
+            self.open, self.high, self.low, self.close,
+            sig_v13, self.v13["atr14"],
+            self._on_base(sig_st), self._on_base(self.supertrend["atr"], np.nan),
+            self._on_base(exit_long, False), self._on_base(exit_short, False),
+            self.ema21, exit_params,
+        )
+
+
+def summarize(trades: np.ndarray) -> dict:
+    """Métricas de un array de operaciones (`TRADE_DTYPE`, con o sin campo `symbol`)."""
+    pnl = trades["pnl"] if len(trades) else np.zeros(0)
+    wins = pnl > 0
+    gross_win = float(pnl[wins].sum())
+    gross_loss = float(-pnl[~wins].sum())
+    equity = np.cumsum(pnl)
+    drawdown = float(np.max(np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity)) if len(pnl) else 0.0
+    summary = {
+        "trades": int(len(pnl)),
+        "win_rate": round(float(wins.mean()) * 100, 2) if len(pnl) else 0.0,
+        "pnl": round(float(pnl.sum()), 4),
+        "fees": round(float(trades["fees"].sum()), 4) if len(trades) else 0.0,
+        "profit_factor": round(gross_win / gross_loss, 3) if gross_loss > 0 else None,
+        "avg_trade": round(float(pnl.mean()), 4) if len(pnl) else 0.0,
+        "max_drawdown": round(drawdown, 4),
+    }
+    if len(trades):
+        summary["by_strategy"] = {
+            name: {"trades": int(m.sum()), "pnl": round(float(pnl[m].sum()), 4),
+                   "win_rate": round(float(wins[m].mean()) * 100, 2)}
+            for code, name in STRATEGY_NAMES.items()
+            for m in [trades["strategy"] == code] if m.any()
+        }
+        summary["by_exit"] = {
+            name: int((trades["reason"] == code).sum())
+            for code, name in EXIT_NAMES.items() if (trades["reason"] == code).any()
+        }
+    return summary
+
+
+def run_backtest(history: dict, v13_params: dict = None, st_params: dict = None, exit_params: dict = None):
+    """
+    `history`: {símbolo: {intervalo: velas KLINE_DTYPE}} con los intervalos de INTERVALS.
+    Devuelve (operaciones de todos los símbolos con campo `symbol`, resumen).
+    """
+    started = time.perf_counter()
+    per_symbol = []
+    bars = 0
+    for symbol, series in history.items():
+        if not series or not len(series.get(BASE_INTERVAL, ())):
+            continue
+        prepared = PreparedSymbol(symbol, series)
+        trades = prepared.run(v13_params, st_params, exit_params)
+        bars += len(prepared.time)
+        tagged = np.empty(len(trades), dtype=_tagged_dtype(trades.dtype))
+        for name in trades.dtype.names:
+            tagged[name] = trades[name]
+        tagged["symbol"] = symbol
+        tagged["entry_time"] = prepared.time[trades["entry_idx"]]
+        tagged["exit_time"] = prepared.time[trades["exit_idx"]] + prepared.bar_ms
+        per_symbol.append(tagged)
+
+    trades = np.concatenate(per_symbol) if per_symbol else np.empty(0, dtype=_tagged_dtype())
+    trades = trades[np.argsort(trades["exit_time"], kind="stable")]
+    summary = summarize(trades)
+    summary["symbols"] = len(per_symbol)
+    summary["bars"] = bars
+    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    logger.info(f"[BACKTEST] {summary['symbols']} símbolos, {bars} velas, {summary['trades']} operaciones "
+                f"en {summary['elapsed_s']}s | PnL {summary['pnl']} USDT")
+    return trades, summary
+
+
+def _tagged_dtype(base: np.dtype = TRADE_DTYPE) -> np.dtype:
+    return np.dtype([("symbol", "U24"), ("entry_time", np.int64), ("exit_time", np.int64)]
+                    + [(name, base.fields[name][0]) for name in base.names])
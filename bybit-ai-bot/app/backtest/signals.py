@@ -0,0 +1,196 @@
+"""
+Señales vectorizadas de AntigravityV13 y SuperTrendRegimeMTF para el backtester.
+
+Las columnas de indicadores se calculan una sola vez sobre todo el historial
+(`v13_features` / `supertrend_features`) y las señales de todas las velas salen
+de comparaciones NumPy contra los umbrales (`v13_signals` / `supertrend_signals`),
+de modo que probar otros umbrales no recalcula ningún indicador.
+
+Las condiciones son las de `evaluate_antigravity_v13` y `evaluate_supertrend_regime`
+evaluadas en cada vela cerrada. Diferencias conocidas con el bot en vivo:
+  * Los indicadores se calientan desde el inicio del historial y no desde la
+    ventana de 250/500 velas de cada llamada (las EMA largas difieren solo
+    durante el calentamiento).
+  * SuperTrend se evalúa al cierre de cada vela de 15m con la última vela de 1h
+    cerrada; en vivo la última fila es la vela aún en formación.
+"""
+import numpy as np
+from app.strategy.v13_features import compute_v13_features, ohlcv_columns
+from app.utils.indicators import ta_adx_arrays, ta_atr_array, ta_ema_array, ta_supertrend_arrays
+
+# Umbrales hoy fijos en las estrategias (los valores por defecto reproducen el bot)
+V13_PARAMS = {
+    "adx_min": 14.0,
+    "rsi_long_min": 30.0, "rsi_long_max": 80.0,
+    "rsi_short_min": 20.0, "rsi_short_max": 70.0,
+    "vol_surge": 1.05,         # volumen > vol_ma20 * vol_surge
+    "vol_sma50_ratio": 0.85,   # volumen > vol_sma50 * vol_sma50_ratio
+    "atr_pct_min": 0.25, "atr_pct_max": 4.5,
+}
+SUPERTREND_PARAMS = {
+    "adx_min": 18.0,
+    "distance_atr": 0.3,       # |close - EMA200| >= distance_atr * ATR
+    "arm_bars": 40,            # ventana de armado (velas de 15m)
+}
+
+# Velas mínimas que exige cada estrategia antes de dar señal
+V13_MIN_BARS = 219            # 220 velas descargadas menos la vela abierta
+SUPERTREND_MIN_ROWS = 170     # filas válidas de 15m tras el dropna
+SUPERTREND_SLOPE_BARS = 10
+
+
+def _rising(values: np.ndarray, length: int) -> np.ndarray:
+    """`ta_rising` en cada vela: values[i] > values[i-1] > ... > values[i-length]."""
+    out = np.zeros(len(values), dtype=bool)
+    if len(values) > length:
+        steps = values[1:] > values[:-1]
+        out[length:] = np.lib.stride_tricks.sliding_window_view(steps, length).all(axis=1)
+    return out
+
+
+def _falling(values: np.ndarray, length: int) -> np.ndarray:
+    out = np.zeros(len(values), dtype=bool)
+    if len(values) > length:
+        steps = values[1:] < values[:-1]
+        out[length:] = np.lib.stride_tricks.sliding_window_view(steps, length).all(axis=1)
+    return out
+
+
+def _any_before(mask: np.ndarray, window: int) -> np.ndarray:
+    """True en i si mask es True en alguna de las `window` velas anteriores (i excluida)."""
+    csum = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    idx = np.arange(len(mask))
+    return csum[idx] - csum[np.maximum(idx - window, 0)] > 0
+
+
+def asof_index(times_hi: np.ndarray, interval_hi_ms: int, times_lo: np.ndarray, interval_lo_ms: int) -> np.ndarray:
+    """
+    Para cada vela del marco bajo, índice de la última vela del marco alto ya
+    cerrada al cierre de aquella (-1 si ninguna).
+    """
+    close_hi = np.asarray(times_hi, dtype=np.int64) + interval_hi_ms
+    close_lo = np.asarray(times_lo, dtype=np.int64) + interval_lo_ms
+    return np.searchsorted(close_hi, close_lo, side="right") - 1
+
+
+# ── AntigravityV13 ─────────────────────────────────────────────────────────
+
+def v13_features(klines) -> dict:
+    """Columnas de `compute_v13_features` más las condiciones que no dependen de umbrales."""
+    f = compute_v13_features(klines)
+    close = f["close"]
+    hull20, hull50 = f["hull20"], f["hull50"]
+    n = len(close)
+    prev20 = np.concatenate(([np.nan], hull20[:-1]))
+    prev50 = np.concatenate(([np.nan], hull50[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f["atr_pct"] = np.where(close > 0, f["atr14"] / close * 100, 0.0)
+    f["trend_bull"] = (close > f["ema100"]) & (f["ema20"] > f["ema50"]) & _rising(f["ema20"], 3)
+    f["trend_bear"] = (close < f["ema100"]) & (f["ema20"] < f["ema50"]) & _falling(f["ema20"], 3)
+    f["macd_bull"] = f["macd"] > f["macd_signal"]
+    f["macd_bear"] = f["macd"] < f["macd_signal"]
+    f["bb_bull"] = (close > f["bb_middle"]) & (close < f["bb_upper"])
+    f["bb_bear"] = (close < f["bb_middle"]) & (close > f["bb_lower"])
+    f["hull_cross_long"] = (prev20 <= prev50) & (hull20 > hull50)
+    f["hull_cross_short"] = (prev20 >= prev50) & (hull20 < hull50)
+    f["valid"] = np.arange(n) >= V13_MIN_BARS - 1
+    return f
+
+
+def v13_signals(f: dict, params: dict = None) -> np.ndarray:
+    """int8 por vela: 1 LONG, -1 SHORT, 0 sin señal."""
+    p = dict(V13_PARAMS, **(params or {}))
+    volume, rsi, adx = f["volume"], f["rsi14"], f["adx14"]
+    vol_filter = (volume > f["vol_ma20"] * p["vol_surge"]) & (volume > f["vol_sma50"] * p["vol_sma50_ratio"])
+    volatility_ok = (f["atr_pct"] > p["atr_pct_min"]) & (f["atr_pct"] < p["atr_pct_max"])
+    common = f["valid"] & vol_filter & volatility_ok & (adx > p["adx_min"])
+
+    long_entry = (common & f["trend_bull"] & (f["plus_di"] > f["minus_di"])
+                  & (rsi > p["rsi_long_min"]) & (rsi < p["rsi_long_max"])
+                  & f["macd_bull"] & f["bb_bull"] & f["hull_cross_long"])
+    short_entry = (common & f["trend_bear"] & (f["minus_di"] > f["plus_di"])
+                   & (rsi < p["rsi_short_max"]) & (rsi > p["rsi_short_min"])
+                   & f["macd_bear"] & f["bb_bear"] & f["hull_cross_short"])
+    signals = np.zeros(len(volume), dtype=np.int8)
+    signals[short_entry] = -1
+    signals[long_entry] = 1
+    return signals
+
+
+# ── SuperTrendRegimeMTF ────────────────────────────────────────────────────
+
+def supertrend_features(klines_15m, klines_1h) -> dict:
+    """Columnas de 15m (y filtro 1h alineado a cada vela de 15m) de `evaluate_supertrend_regime`."""
+    c15 = ohlcv_columns(klines_15m)
+    c1h = ohlcv_columns(klines_1h)
+    high = c15["high"].astype(np.float64, copy=False)
+    low = c15["low"].astype(np.float64, copy=False)
+    close = c15["close"].astype(np.float64, copy=False)
+    n = len(close)
+
+    ema200 = ta_ema_array(close, 200)
+    ema9 = ta_ema_array(close, 9)
+    ema21 = ta_ema_array(close, 21)
+    st, direction = ta_supertrend_arrays(high, low, close, 10, 3.0)
+    atr = ta_atr_array(high, low, close, 10)
+    adx, _, _ = ta_adx_arrays(high, low, close, 14)
+    slope = np.full(n, np.nan)
+    slope[SUPERTREND_SLOPE_BARS:] = ema200[SUPERTREND_SLOPE_BARS:] - ema200[:-SUPERTREND_SLOPE_BARS]
+
+    # dropna del DataFrame: las filas con NaN solo están al principio del historial
+    complete = ~(np.isnan(ema200) | np.isnan(ema9) | np.isnan(ema21) | np.isnan(st)
+                 | np.isnan(atr) | np.isnan(adx) | np.isnan(slope))
+    first = int(np.argmax(complete)) if complete.any() else n
+    valid = np.zeros(n, dtype=bool)
+    valid[first + SUPERTREND_MIN_ROWS - 1:] = True
+
+    # Filtro 1h con la última vela horaria cerrada al cierre de cada vela de 15m
+    close_1h = c1h["close"].astype(np.float64, copy=False)
+    ema200_1h = ta_ema_array(close_1h, 200)
+    ema9_1h = ta_ema_array(close_1h, 9)
+    ema21_1h = ta_ema_array(close_1h, 21)
+    htf_long = (close_1h > ema200_1h) & (ema9_1h > ema21_1h)
+    htf_short = (close_1h < ema200_1h) & (ema9_1h < ema21_1h)
+    idx = asof_index(c1h["time"], 3_600_000, c15["time"], 900_000)
+    has_htf = idx >= 0
+    safe = np.maximum(idx, 0)
+
+    with np.errstate(invalid="ignore"):
+        green = direction == 1
+        red = direction == -1
+        return {
+            "time": c15["time"], "close": close, "atr": atr, "adx": adx, "ema21": ema21,
+            "slope": slope, "distance": np.abs(close - ema200), "valid": valid,
+            # Estructura completa a favor de cada lado (entrada y salida anticipada)
+            "bull_stack": (green & (close > ema200) & (st > ema200) & (ema9 > ema200)
+                           & (ema21 > ema200) & (ema9 > ema21)),
+            "bear_stack": (red & (close < ema200) & (st < ema200) & (ema9 < ema200)
+                           & (ema21 < ema200) & (ema9 < ema21)),
+            # Velas que arman la entrada contraria dentro de la ventana
+            "bear_prior": red & (close < ema200) & (ema9 < ema21),
+            "bull_prior": green & (close > ema200) & (ema9 > ema21),
+            "htf_long": has_htf & htf_long[safe],
+            "htf_short": has_htf & htf_short[safe],
+        }
+
+
+def supertrend_signals(f: dict, params: dict = None):
+    """Devuelve (señal int8, exit_long bool, exit_short bool) por vela de 15m."""
+    p = dict(SUPERTREND_PARAMS, **(params or {}))
+    window = int(p["arm_bars"])
+    long_armed = _any_before(f["bear_prior"], window)
+    short_armed = _any_before(f["bull_prior"], window)
+    valid = f["valid"]
+    with np.errstate(invalid="ignore"):
+        adx_ok = f["adx"] >= p["adx_min"]
+        distance_ok = f["distance"] >= p["distance_atr"] * f["atr"]
+        long_entry = (valid & long_armed & f["bull_stack"] & adx_ok & (f["slope"] > 0)
+                      & distance_ok & f["htf_long"])
+        short_entry = (valid & short_armed & f["bear_stack"] & adx_ok & (f["slope"] < 0)
+                       & distance_ok & f["htf_short"])
+    signals = np.zeros(len(valid), dtype=np.int8)
+    signals[short_entry & ~long_entry] = -1
+    signals[long_entry] = 1
+    exit_long = valid & short_armed & f["bear_stack"]
+    exit_short = valid & long_armed & f["bull_stack"]
+    return signals, exit_long, exit_short
@@ -0,0 +1,287 @@
+"""
+Simulador de salidas del backtester: la gestión de la posición del Engine
+recorrida vela a vela sobre el marco base (5m).
+
+Reproduce `_execute_signal`, `on_fill_event` y `_handle_mark_price`:
+  * SL inicial a 2.5 ATR de la entrada.
+  * AntigravityV13: TP1 (30%) a 1.5 ATR y TP2 (30%) a 3 ATR; el TP2 activa el trailing
+    y el 40% restante corre con él. SuperTrend no pone TPs fijos.
+  * Breakeven: V13 al 33.3% de ROE, SuperTrend a 1.8 ATR; mueve el SL al +15% de ROE.
+  * Trailing al llegar a 2.5 ATR de ganancia: EMA21 de 15m (refrescada en cada
+    escaneo con el trailing activo) o, hasta tenerla, 1.2 ATR desde el mejor precio.
+    El SL nunca retrocede y no se mueve por menos de 0.05 ATR.
+  * Salida anticipada de SuperTrend a mercado y cooldown de 1h tras cerrar sin
+    TP1, breakeven ni trailing.
+
+Dentro de cada vela se asume el peor orden: primero el stop vigente contra el
+extremo adverso y después TPs, breakeven y trailing con el extremo favorable
+(los nuevos stops rigen desde la vela siguiente). Las entradas y salidas a
+mercado se ejecutan en la apertura de la vela siguiente a la señal.
+"""
+import numpy as np
+from app.config import Config
+
+try:
+    from numba import njit
+except ImportError:  # numba es opcional: sin él se usa el fallback en Python puro
+    njit = None
+
+STRATEGY_V13 = 1
+STRATEGY_SUPERTREND = 2
+STRATEGY_NAMES = {STRATEGY_V13: "AntigravityV13", STRATEGY_SUPERTREND: "SuperTrendRegimeMTF"}
+
+EXIT_STOP = 0          # SL inicial
+EXIT_PROTECTED = 1     # SL movido por breakeven o trailing
+EXIT_EARLY = 2         # Early Exit - Patrón Contrario
+EXIT_END = 3           # fin del historial con la posición abierta
+EXIT_NAMES = {EXIT_STOP: "Stop Loss", EXIT_PROTECTED: "SL Breakeven/Trailing",
+              EXIT_EARLY: "Early Exit", EXIT_END: "Fin de datos"}
+
+# Parámetros de gestión (los valores por defecto son los del Engine)
+EXIT_PARAMS = {
+    "leverage": float(Config.LEVERAGE),
+    "notional": Config.MARGIN_USDT * Config.LEVERAGE,
+    "fee_rate": 0.00055,        # taker de Bybit por lado
+    "sl_atr": 2.5,
+    "tp1_atr": 1.5, "tp2_atr": 3.0,
+    "tp1_frac": 0.3, "tp2_frac": 0.3,
+    "be_roe_v13": 0.333,        # breakeven V13: fracción de ROE
+    "be_atr_supertrend": 1.8,
+    "lock_roe": 0.15,           # SL de breakeven: +15% de ROE
+    "trail_atr": 2.5,           # activación del trailing
+    "trail_fallback_atr": 1.2,  # TrailingManager
+    "trail_min_step_atr": 0.05,
+    "cooldown_bars": 12.0,      # 1h en velas de 5m
+}
+_PARAM_ORDER = tuple(EXIT_PARAMS)
+
+TRADE_DTYPE = np.dtype([
+    ("entry_idx", np.int64), ("exit_idx", np.int64), ("strategy", np.int8), ("side", np.int8),
+    ("entry_price", np.float64), ("exit_price", np.float64), ("qty", np.float64),
+    ("pnl", np.float64), ("fees", np.float64), ("reason", np.int8),
+    ("tp1", np.bool_), ("tp2", np.bool_), ("breakeven", np.bool_), ("trailing", np.bool_),
+])
+_N_FIELDS = len(TRADE_DTYPE.names)
+
+
+def pack_params(params: dict = None) -> np.ndarray:
+    p = dict(EXIT_PARAMS, **(params or {}))
+    return np.array([float(p[k]) for k in _PARAM_ORDER])
+
+
+def _simulate_loop(open_, high, low, close, sig_v13, atr_v13, sig_st, atr_st,
+                   exit_long, exit_short, ema21, p, out):
+    # Bucle secuencial por definición (estado de la posición); numba lo compila si está.
+    leverage, notional, fee_rate = p[0], p[1], p[2]
+    sl_atr, tp1_atr, tp2_atr, tp1_frac, tp2_frac = p[3], p[4], p[5], p[6], p[7]
+    be_roe, be_atr_st, lock_roe = p[8], p[9], p[10]
+    trail_atr, trail_fb_atr, trail_step_atr, cooldown_bars = p[11], p[12], p[13], p[14]
+
+    n = len(close)
+    count = 0
+    side = 0
+    pending_side = 0
+    pending_strategy = 0
+    pending_atr = 0.0
+    pending_exit = False
+    cooldown_until = -1
+    strategy = 0
+    entry_idx = 0
+    entry = atr = sl = tp1 = tp2 = lock = be_thr = best = ema_trail = 0.0
+    qty = remaining = realized = fees = exit_value = 0.0
+    tp1_hit = tp2_hit = be_hit = trailing = False
+
+    for i in range(n):
+        closed = False
+        reason = 0
+        # ── Órdenes a mercado decididas en el cierre anterior ──────────────
+        if pending_exit and side != 0:
+            fill = open_[i]
+            realized += remaining * (fill - entry) * side
+            fees += remaining * fill * fee_rate
+            exit_value += remaining * fill
+            remaining = 0.0
+            closed = True
+            reason = 2
+        pending_exit = False
+
+        if not closed and side == 0 and pending_side != 0:
+            side = pending_side
+            strategy = pending_strategy
+            entry = open_[i]
+            atr = pending_atr
+            if not atr > 0:
+                atr = entry * 0.01
+            entry_idx = i
+            sl = entry - side * sl_atr * atr
+            tp1 = entry + side * tp1_atr * atr
+            tp2 = entry + side * tp2_atr * atr
+            lock = entry + side * entry * (lock_roe / leverage)
+            be_thr = entry * (be_roe / leverage) if strategy == 1 else be_atr_st * atr
+            qty = notional / entry
+            remaining = qty
+            realized = 0.0
+            fees = qty * entry * fee_rate
+            exit_value = 0.0
+            best = entry
+            ema_trail = 0.0
+            tp1_hit = tp2_hit = be_hit = trailing = False
+        pending_side = 0
+
+        if side != 0 and not closed:
+            # ── Stop vigente contra el extremo adverso ─────────────────────
+            if side == 1:
+                stop_hit = low[i] <= sl
+                fill = min(open_[i], sl)
+            else:
+                stop_hit = high[i] >= sl
+                fill = max(open_[i], sl)
+            if stop_hit:
+                realized += remaining * (fill - entry) * side
+                fees += remaining * fill * fee_rate
+                exit_value += remaining * fill
+                remaining = 0.0
+                closed = True
+                reason = 1 if (be_hit or trailing) else 0
+            else:
+                favorable = high[i] if side == 1 else low[i]
+                # ── TPs parciales (solo V13) ───────────────────────────────
+                if strategy == 1:
+                    if not tp1_hit and (favorable - tp1) * side >= 0:
+                        fill = max(open_[i], tp1) if side == 1 else min(open_[i], tp1)
+                        q = qty * tp1_frac
+                        realized += q * (fill - entry) * side
+                        fees += q * fill * fee_rate
+                        exit_value += q * fill
+                        remaining -= q
+                        tp1_hit = True
+                    if not tp2_hit and (favorable - tp2) * side >= 0:
+                        fill = max(open_[i], tp2) if side == 1 else min(open_[i], tp2)
+                        q = qty * tp2_frac
+                        realized += q * (fill - entry) * side
+                        fees += q * fill * fee_rate
+                        exit_value += q * fill
+                        remaining -= q
+                        tp2_hit = True
+                        trailing = True
+                # ── Mark price: breakeven, mejor precio y trailing ─────────
+                move = (favorable - entry) * side
+                if not be_hit and move >= be_thr:
+                    sl = lock
+                    be_hit = True
+                if (favorable - best) * side > 0:
+                    best = favorable
+                if not trailing and move >= trail_atr * atr:
+                    trailing = True
+                if trailing:
+                    if ema_trail > 0:
+                        new_sl = ema_trail
+                        if (new_sl - sl) * side < 0:
+                            new_sl = sl
+                    else:
+                        new_sl = best - side * trail_fb_atr * atr
+                        if (new_sl - sl) * side <= 0:
+                            new_sl = sl
+                    if abs(new_sl - sl) > atr * trail_step_atr:
+                        sl = new_sl
+                # ── Escaneo al cierre: EMA21 del trailing y salida anticipada ─
+                if trailing:
+                    ema_trail = ema21[i]
+                if strategy == 2 and ((side == 1 and exit_long[i]) or (side == -1 and exit_short[i])):
+                    pending_exit = True
+
+        if closed:
+            row = out[count]
+            row[0] = entry_idx
+            row[1] = i
+            row[2] = strategy
+            row[3] = side
+            row[4] = entry
+            row[5] = exit_value / qty
+            row[6] = qty
+            row[7] = realized - fees
+            row[8] = fees
+            row[9] = reason
+            row[10] = 1.0 if tp1_hit else 0.0
+            row[11] = 1.0 if tp2_hit else 0.0
+            row[12] = 1.0 if be_hit else 0.0
+            row[13] = 1.0 if trailing else 0.0
+            count += 1
+            if not (tp1_hit or be_hit or trailing):
+                cooldown_until = i + int(cooldown_bars)
+            side = 0
+
+        # ── Nueva entrada en el cierre (SuperTrend tiene prioridad) ─────────
+        if side == 0 and i + 1 < n and i >= cooldown_until:
+            if sig_st[i] != 0:
+                pending_side = sig_st[i]
+                pending_strategy = 2
+                pending_atr = atr_st[i]
+            elif sig_v13[i] != 0:
+                pending_side = sig_v13[i]
+                pending_strategy = 1
+                pending_atr = atr_v13[i]
+
+    if side != 0:
+        fill = close[n - 1]
+        realized += remaining * (fill - entry) * side
+        fees += remaining * fill * fee_rate
+        exit_value += remaining * fill
+        row = out[count]
+        row[0] = entry_idx
+        row[1] = n - 1
+        row[2] = strategy
+        row[3] = side
+        row[4] = entry
+        row[5] = exit_value / qty
+        row[6] = qty
+        row[7] = realized - fees
+        row[8] = fees
+        row[9] = 3
+        row[10] = 1.0 if tp1_hit else 0.0
+        row[11] = 1.0 if tp2_hit else 0.0
+        row[12] = 1.0 if be_hit else 0.0
+        row[13] = 1.0 if trailing else 0.0
+        count += 1
+    return count
+
+_simulate_kernel = njit(cache=True)(_simulate_loop) if njit else None
+
+
+def simulate(open_, high, low, close, sig_v13, atr_v13, sig_st, atr_st,
+             exit_long, exit_short, ema21, params: dict = None) -> np.ndarray:
+    """
+    Recorre el marco base y devuelve las operaciones cerradas como array `TRADE_DTYPE`.
+    Todas las series van alineadas al marco base; las de SuperTrend solo tienen
+    señal en las velas que cierran una vela de 15m.
+    """
+    n = len(close)
+    p = pack_params(params)
+    columns = [np.ascontiguousarray(a, dtype=np.float64) for a in (open_, high, low, close)]
+    sig_v13 = np.ascontiguousarray(sig_v13, dtype=np.int64)
+    sig_st = np.ascontiguousarray(sig_st, dtype=np.int64)
+    atr_v13 = np.ascontiguousarray(atr_v13, dtype=np.float64)
+    atr_st = np.ascontiguousarray(atr_st, dtype=np.float64)
+    exit_long = np.ascontiguousarray(exit_long, dtype=np.bool_)
+    exit_short = np.ascontiguousarray(exit_short, dtype=np.bool_)
+    ema21 = np.ascontiguousarray(ema21, dtype=np.float64)
+    # Como mucho una operación cerrada por vela (más la que quede abierta al final)
+    capacity = n + 1
+
+    if _simulate_kernel is not None:
+        out = np.zeros((capacity, _N_FIELDS))
+        count = _simulate_kernel(*columns, sig_v13, atr_v13, sig_st, atr_st,
+                                 exit_long, exit_short, ema21, p, out)
+        rows = out[:count]
+    else:
+        # Fallback sin numba: listas Python (el acceso escalar a listas es ~10x más rápido que a ndarray)
+        out = [[0.0] * _N_FIELDS for _ in range(capacity)]
+        count = _simulate_loop(*(c.tolist() for c in columns), sig_v13.tolist(), atr_v13.tolist(),
+                               sig_st.tolist(), atr_st.tolist(), exit_long.tolist(), exit_short.tolist(),
+                               ema21.tolist(), p.tolist(), out)
+        rows = np.array(out[:count], dtype=np.float64).reshape(-1, _N_FIELDS)
+
+    trades = np.empty(len(rows), dtype=TRADE_DTYPE)
+    for j, name in enumerate(TRADE_DTYPE.names):
+        trades[name] = rows[:, j]
+    return trades
@@ -0,0 +1,255 @@
+"""
+Barrido de parámetros del backtester en varios procesos.
+
+El proceso principal publica las velas de cada (símbolo, intervalo) en bloques
+de memoria compartida (`SharedHistory`); los workers de `ProcessPoolExecutor`
+las mapean sin copiarlas ni recibirlas serializadas en cada tarea. Cada tarea
+es (símbolo, lote de combinaciones): el worker calcula los indicadores del
+símbolo una vez (`PreparedSymbol`, cache acotada por worker) y solo re-evalúa
+señales y salidas por combinación. Las tareas se agrupan por símbolo para
+aprovechar esa cache.
+
+Los parámetros se nombran con el prefijo del bloque al que van:
+`v13.adx_min`, `st.arm_bars`, `exit.sl_atr`... (ver V13_PARAMS,
+SUPERTREND_PARAMS y EXIT_PARAMS). El resultado es un archivo columnar .npz:
+una columna por parámetro y por métrica, una fila por combinación.
+"""
+import itertools
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from app.backtest.runner import PreparedSymbol
+from app.backtest.signals import SUPERTREND_PARAMS, V13_PARAMS
+from app.backtest.simulator import EXIT_PARAMS
+from app.exchange.kline_cache import KLINE_DTYPE
+from app.exchange.ohlcv_store import as_klines
+from app.logger import logger
+
+PARAM_GROUPS = {"v13": V13_PARAMS, "st": SUPERTREND_PARAMS, "exit": EXIT_PARAMS}
+
+# Umbrales hoy fijos en las estrategias: espacio por defecto del barrido
+DEFAULT_SPACE = {
+    "v13.adx_min": [10, 14, 18, 22],
+    "v13.rsi_long_min": [25, 30, 35],
+    "v13.rsi_long_max": [75, 80, 85],
+    "v13.vol_surge": [1.0, 1.05, 1.2, 1.5],
+    "v13.atr_pct_min": [0.15, 0.25, 0.35],
+    "v13.atr_pct_max": [3.0, 4.5],
+    "st.adx_min": [14, 18, 22, 26],
+    "st.distance_atr": [0.1, 0.3, 0.5],
+    "st.arm_bars": [20, 40, 60],
+}
+
+# Métricas por combinación; las de suma se agregan entre símbolos
+METRICS = ("trades", "wins", "pnl", "fees", "gross_win", "gross_loss", "max_drawdown")
+BATCH_SIZE = 32
+# Símbolos con indicadores en memoria por worker
+WORKER_CACHE_SYMBOLS = 2
+
+
+def grid(space: dict) -> list:
+    """Todas las combinaciones del espacio {nombre: [valores]}."""
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_search(space: dict, samples: int, seed: int = None) -> list:
+    """
+    `samples` combinaciones al azar. Cada dimensión es una lista de valores o un
+    rango (min, max) continuo; si min y max son enteros el rango es entero.
+    """
+    rng = random.Random(seed)
+    names = sorted(space)
+    combos = []
+    for _ in range(samples):
+        combo = {}
+        for name in names:
+            values = space[name]
+            if isinstance(values, tuple) and len(values) == 2:
+                lo, hi = values
+                combo[name] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else rng.uniform(lo, hi)
+            else:
+                combo[name] = rng.choice(list(values))
+        combos.append(combo)
+    return combos
+
+
+def split_params(combo: dict) -> tuple:
+    """{'v13.adx_min': 18, ...} -> (v13_params, st_params, exit_params)."""
+    groups = {g: {} for g in PARAM_GROUPS}
+    for name, value in combo.items():
+        group, _, key = name.partition(".")
+        if group not in PARAM_GROUPS or key not in PARAM_GROUPS[group]:
+            raise ValueError(f"Parámetro desconocido: {name}")
+        groups[group][key] = value
+    return groups["v13"], groups["st"], groups["exit"]
+
+
+# ── Memoria compartida ─────────────────────────────────────────────────────
+
+class SharedHistory:
+    """Velas de cada (símbolo, intervalo) en un bloque de memoria compartida."""
+
+    def __init__(self, history: dict):
+        self._blocks = []
+        self.layout = {}  # símbolo -> {intervalo: (nombre del bloque, velas)}
+        try:
+            for symbol, series in history.items():
+                self.layout[symbol] = {}
+                for interval, klines in series.items():
+                    klines = as_klines(klines)
+                    block = shared_memory.SharedMemory(create=True, size=max(klines.nbytes, 1))
+                    self._blocks.append(block)
+                    np.ndarray(klines.shape, dtype=KLINE_DTYPE, buffer=block.buf)[:] = klines
+                    self.layout[symbol][interval] = (block.name, len(klines))
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.size for b in self._blocks)
+
+    def close(self):
+        for block in self._blocks:
+            try:
+                block.close()
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_worker = {"layout": None, "blocks": {}, "prepared": OrderedDict()}
+
+
+def _init_worker(layout: dict):
+    _worker["layout"] = layout
+    _worker["blocks"] = {}
+    _worker["prepared"] = OrderedDict()
+
+
+def _attach(name: str, length: int) -> np.ndarray:
+    block = _worker["blocks"].get(name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+        _worker["blocks"][name] = block
+    return np.ndarray((length,), dtype=KLINE_DTYPE, buffer=block.buf)
+
+
+def _prepared(symbol: str) -> PreparedSymbol:
+    cache = _worker["prepared"]
+    prepared = cache.get(symbol)
+    if prepared is None:
+        series = {iv: _attach(name, length) for iv, (name, length) in _worker["layout"][symbol].items()}
+        prepared = PreparedSymbol(symbol, series)
+        cache[symbol] = prepared
+        while len(cache) > WORKER_CACHE_SYMBOLS:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(symbol)
+    return prepared
+
+
+def _metrics(trades: np.ndarray) -> list:
+    pnl = trades["pnl"]
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+    return [len(pnl), int((pnl > 0).sum()), float(pnl.sum()), float(trades["fees"].sum()),
+            float(pnl[pnl > 0].sum()), float(-pnl[pnl <= 0].sum()),
+            float((peak - equity).max()) if len(pnl) else 0.0]
+
+
+def _run_batch(symbol: str, start: int, combos: list):
+    prepared = _prepared(symbol)
+    rows = [_metrics(prepared.run(*split_params(combo))) for combo in combos]
+    return symbol, start, np.array(rows, dtype=np.float64).reshape(-1, len(METRICS))
+
+
+# ── Ejecución ──────────────────────────────────────────────────────────────
+
+def run_sweep(history: dict, combos: list, workers: int = None, batch_size: int = BATCH_SIZE,
+              results_path: str = None) -> dict:
+    """
+    Evalúa cada combinación en todos los símbolos de `history` y devuelve las
+    columnas del resultado (ver `save_results`). Si `results_path`, las guarda.
+    """
+    for combo in combos:
+        split_params(combo)  # valida nombres antes de lanzar procesos
+    started = time.perf_counter()
+    symbols = [s for s, series in history.items() if series]
+    totals = np.zeros((len(combos), len(METRICS)))
+    done = np.zeros(len(combos), dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+
+    with SharedHistory({s: history[s] for s in symbols}) as shared:
+        logger.info(f"[SWEEP] {len(combos)} combinaciones x {len(symbols)} símbolos en {workers} procesos "
+                    f"({shared.nbytes / 1e6:.1f} MB de velas en memoria compartida)")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.layout,)) as pool:
+            futures = [pool.submit(_run_batch, symbol, start, combos[start:start + batch_size])
+                       for symbol in symbols for start in range(0, len(combos), batch_size)]
+            for future in as_completed(futures):
+                symbol, start, rows = future.result()
+                end = start + len(rows)
+                # Sumas entre símbolos; el drawdown se queda con el peor símbolo
+                totals[start:end, :-1] += rows[:, :-1]
+                totals[start:end, -1] = np.maximum(totals[start:end, -1], rows[:, -1])
+                done[start:end] += 1
+
+    results = _columns(combos, totals, done)
+    elapsed = time.perf_counter() - started
+    logger.info(f"[SWEEP] {len(combos) * len(symbols)} backtests en {elapsed:.1f}s")
+    if results_path:
+        save_results(results_path, results, meta={"symbols": symbols, "elapsed_s": round(elapsed, 3)})
+    return results
+
+
+def _columns(combos: list, totals: np.ndarray, done: np.ndarray) -> dict:
+    names = sorted({name for combo in combos for name in combo})
+    columns = {}
+    for name in names:
+        group, _, key = name.partition(".")
+        default = PARAM_GROUPS[group][key]
+        columns[name] = np.array([combo.get(name, default) for combo in combos], dtype=np.float64)
+    for j, metric in enumerate(METRICS):
+        columns[metric] = totals[:, j]
+    trades = totals[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["win_rate"] = np.where(trades > 0, totals[:, 1] / trades * 100, 0.0)
+        columns["profit_factor"] = np.where(totals[:, 5] > 0, totals[:, 4] / totals[:, 5], np.inf)
+    columns["symbols_done"] = done
+    return columns
+
+
+def save_results(path: str, columns: dict, meta: dict = None):
+    """Archivo columnar comprimido: un array por columna más `__meta__` (JSON)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, __meta__=np.array(json.dumps(meta or {})), **columns)
+    os.replace(tmp, path)
+
+
+def load_results(path: str) -> tuple:
+    """Devuelve (columnas, meta)."""
+    with np.load(path) as data:
+        meta = json.loads(str(data["__meta__"])) if "__meta__" in data.files else {}
+        return {k: data[k] for k in data.files if k != "__meta__"}, meta
+
+
+def top(columns: dict, by: str = "pnl", n: int = 20, min_trades: int = 1) -> list:
+    """Las `n` mejores filas según `by`, como dicts."""
+    eligible = np.flatnonzero(columns["trades"] >= min_trades)
+    order = eligible[np.argsort(-columns[by][eligible], kind="stable")][:n]
+    return [{k: (v[i].item() if hasattr(v[i], "item") else v[i]) for k, v in columns.items()} for i in order]
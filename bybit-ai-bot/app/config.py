@@ -19,6 +19,8 @@ class Config:
     MAX_CONCURRENT_TRADES = int(os.getenv("MAX_CONCURRENT_TRADES", "5"))
     SAME_SYMBOL_ONLY = os.getenv("SAME_SYMBOL_ONLY", "false").lower() == "true"
     SCAN_INTERVAL_SECONDS = int(os.getenv("SCAN_INTERVAL_SECONDS", "15"))
+    # Símbolos USDT por volumen a escanear (velas por WS, repartidas en varias conexiones)
+    SCAN_UNIVERSE_SIZE = int(os.getenv("SCAN_UNIVERSE_SIZE", "25"))
     USE_TELEGRAM = os.getenv("USE_TELEGRAM", "false").lower() == "true"
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
     TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
@@ -6,8 +6,15 @@ STORAGE_PATH = Config.STORAGE_DIR
 TRADES_FILE = os.path.join(STORAGE_PATH, "trades.json")
 POSITIONS_FILE = os.path.join(STORAGE_PATH, "positions.json")
 RUNTIME_STATE_FILE = os.path.join(STORAGE_PATH, "runtime_state.json")
-BOT_LOG_FILE = os.path.join(STORAGE_PATH, "bot.log")
-ERRORS_LOG_FILE = os.path.join(STORAGE_PATH, "errors.log")
+# Logs: en storage/ salvo LOG_DIR (p.ej. replay.py, para no mezclarse con los del bot real)
+LOG_DIR = os.getenv("LOG_DIR", STORAGE_PATH)
+os.makedirs(LOG_DIR, exist_ok=True)
+BOT_LOG_FILE = os.path.join(LOG_DIR, "bot.log")
+ERRORS_LOG_FILE = os.path.join(LOG_DIR, "errors.log")
+BOT_JSON_LOG_FILE = os.path.join(LOG_DIR, "bot.jsonl")
+# Base SQLite: /data o el directorio actual, salvo DB_DIR (p.ej. replay.py, para aislarla de la real)
+DB_DIR = os.getenv("DB_DIR") or ("/data" if os.path.exists("/data") else ".")
+DB_FILE = f"{DB_DIR}/app.db"
 PNL_OFFSET_FILE = os.path.join(STORAGE_PATH, "pnl_offset.json")
 BTC_BLOCK_FILE = os.path.join(STORAGE_PATH, "btc_block.json")
 
@@ -0,0 +1,241 @@
+"""
+Benchmarks del engine: indicadores, estrategias, mark price y ciclos de
+análisis completos sobre el exchange simulado (sin red).
+
+Grupos (`run_benchmarks(groups=...)`):
+  - indicators: cada función pública de app/utils/indicators.py sobre
+    `INDICATOR_BARS` velas (las `calculate_*` con listas, las `*_array` con numpy).
+  - strategies: `evaluate_antigravity_v13` y `evaluate_supertrend_regime` con
+    un MarketDataContext nuevo por llamada, como en cada ciclo.
+  - mark_price: `Engine._handle_mark_price` para 1/10/50 operaciones abiertas y
+    el camino completo WS -> buzón (`_on_ws_mark_price`).
+  - scan: ciclo de `_kline_polling_loop` (top volumen + `scan_symbols`) para
+    25/100/400 símbolos. Antes de cada iteración el mercado avanza una vela de
+    5m; las velas nuevas llegan por REST incremental (sin WS), y las señales se
+    cuentan sin ejecutarse. `latency` añade ida y vuelta real por petición.
+
+Cada caso devuelve las métricas de `app.utils.bench.run_case`; si faltan
+dependencias (p.ej. pandas_ta), `{"skipped": motivo}`.
+"""
+import asyncio
+import inspect
+import numpy as np
+from app.exchange.kline_cache import KLINE_DTYPE, interval_to_ms
+from app.exchange.market_data import MarketDataContext
+from app.exchange.market_events import MarkPrice
+from app.exchange.simulated_exchange import SimulatedBybitClient, SimulatedExchange, SimulatedWebSocket
+from app.logger import logger
+from app.utils import indicators
+from app.utils.bench import run_case
+
+GROUPS = ("indicators", "strategies", "mark_price", "scan")
+SCAN_SIZES = (25, 100, 400)
+OPEN_TRADES = (1, 10, 50)
+INDICATOR_BARS = 500
+# Historial previo al inicio: 250 velas de 1h para SuperTrend (3000 de 5m) con margen
+HISTORY_BARS = 3100
+BASE_INTERVAL = "5"
+START_MS = 1_700_006_400_000
+
+# Valores para parámetros sin default, por nombre
+_DEFAULT_ARGS = {"period": 14, "length": 14, "alpha": 2 / 15}
+_SERIES_ARGS = {"data", "closes", "values", "series"}
+
+
+def synthetic_candles(symbols: list, bars_after: int, seed: int = 7) -> dict:
+    """{símbolo: {"5": velas}}: paseos aleatorios con tendencia por tramos, HISTORY_BARS antes de START_MS."""
+    step = interval_to_ms(BASE_INTERVAL)
+    n = HISTORY_BARS + bars_after
+    out = {}
+    for i, symbol in enumerate(symbols):
+        rng = np.random.default_rng(seed + i)
+        drift = 0.002 * np.sin(np.arange(n) / rng.uniform(150, 600))
+        close = rng.uniform(0.5, 500) * np.exp(np.cumsum(rng.normal(0, 0.004, n) + drift))
+        open_ = np.concatenate((close[:1], close[:-1]))
+        k = np.empty(n, dtype=KLINE_DTYPE)
+        k["time"] = START_MS + (np.arange(n) - HISTORY_BARS) * step
+        k["open"], k["close"] = open_, close
+        k["high"] = np.maximum(open_, close) * (1 + rng.random(n) * 0.003)
+        k["low"] = np.minimum(open_, close) * (1 - rng.random(n) * 0.003)
+        k["volume"] = rng.lognormal(10, 0.7, n)
+        out[symbol] = {BASE_INTERVAL: k}
+    return out
+
+
+def _symbols(count: int) -> list:
+    return [f"SIM{i:03d}USDT" for i in range(count)]
+
+
+# ── Indicadores ────────────────────────────────────────────────────────────
+
+def indicator_cases(bars: int = INDICATOR_BARS) -> dict:
+    """{nombre: fn sin argumentos} para cada función pública de app.utils.indicators."""
+    k = synthetic_candles(["IND"], 0)["IND"][BASE_INTERVAL][-bars:]
+    arrays = {"highs": k["high"].copy(), "lows": k["low"].copy(), "closes": k["close"].copy()}
+    cases = {}
+    for name, fn in inspect.getmembers(indicators, inspect.isfunction):
+        if name.startswith("_") or fn.__module__ != indicators.__name__:
+            continue
+        args, supported = [], True
+        for param in inspect.signature(fn).parameters.values():
+            if param.default is not inspect.Parameter.empty:
+                break
+            if param.name in arrays or param.name in _SERIES_ARGS:
+                values = arrays.get(param.name, arrays["closes"])
+                args.append(values.tolist() if "list" in str(param.annotation) else values)
+            elif param.name in _DEFAULT_ARGS:
+                args.append(_DEFAULT_ARGS[param.name])
+            else:
+                supported = False
+        if supported:
+            cases[f"indicators.{name}"] = (lambda f=fn, a=tuple(args): f(*a))
+    return cases
+
+
+# ── Mercado simulado ───────────────────────────────────────────────────────
+
+class SimMarket:
+    """Exchange simulado + cliente con `symbols` sintéticos, avanzable vela a vela."""
+
+    def __init__(self, symbols: list, bars_after: int, latency: float = 0.0):
+        self.exchange = SimulatedExchange(synthetic_candles(symbols, bars_after), START_MS)
+        self.client = SimulatedBybitClient(self.exchange, latency=latency)
+        self._next = 0
+
+    def advance_bar(self):
+        """Reproduce la siguiente vela base de todos los símbolos y la cierra."""
+        ex = self.exchange
+        step = interval_to_ms(ex.base_interval)
+        for symbol, recorded in ex.recorded.items():
+            if self._next >= len(recorded):
+                continue
+            for ts, price, volume in ex.bar_ticks(recorded[self._next].tolist()):
+                ex.tick(symbol, price, volume, ts)
+        self._next += 1
+        ex.advance_to(START_MS + self._next * step)
+
+
+def _engine(market: SimMarket):
+    from app.core.engine import Engine
+    return Engine(market.client, ws_factory=SimulatedWebSocket.factory(market.exchange), history=None)
+
+
+async def _strategy_cases(repeat: int, warmup: int) -> dict:
+    results = {}
+    market = SimMarket(["BENCHUSDT"], warmup + repeat + 2)
+    with market.exchange.clock.install():
+        market.advance_bar()
+        for name, module in (("evaluate_antigravity_v13", "app.strategy.antigravity_v13_pro"),
+                             ("evaluate_supertrend_regime", "app.strategy.supertrend_regime")):
+            try:
+                evaluate = getattr(__import__(module, fromlist=[name]), name)
+            except ImportError as e:
+                results[f"strategies.{name}"] = {"skipped": str(e)}
+                continue
+            results[f"strategies.{name}"] = await run_case(
+                lambda: evaluate(MarketDataContext(market.client), "BENCHUSDT"),
+                repeat, warmup, before=market.advance_bar,
+            )
+    return results
+
+
+# ── Mark price ─────────────────────────────────────────────────────────────
+
+def _open_trades(engine, market: SimMarket):
+    for symbol, price in market.exchange.last.items():
+        engine.trade_state[symbol] = {
+            "symbol": symbol, "side": "LONG", "strategy": "AntigravityV13", "filled": True,
+            "entry_price": price, "tp2_price": price * 1.06, "sl_price": price * 0.97, "atr": price * 0.01,
+            "remaining_size": 1.0, "sl_order_id": "bench",
+        }
+
+
+async def _mark_price_cases(repeat: int, warmup: int) -> dict:
+    results = {}
+    for count in OPEN_TRADES:
+        market = SimMarket(_symbols(count), 0)
+        try:
+            engine = _engine(market)
+        except ImportError as e:
+            return {f"mark_price.{kind}.{n}": {"skipped": str(e)} for kind in ("handle", "ws") for n in OPEN_TRADES}
+        _open_trades(engine, market)
+        # Oscila por debajo de los umbrales de BE/trailing: el camino de cada tick sin órdenes
+        prices = {s: t["entry_price"] for s, t in engine.trade_state.items()}
+        flip = [1.0]
+
+        async def handle_all():
+            flip[0] = -flip[0]
+            for symbol, price in prices.items():
+                await engine._handle_mark_price(symbol, price * (1 + 0.001 * flip[0]))
+
+        async def ws_round():
+            flip[0] = -flip[0]
+            target = engine.mark_prices.stats["processed"] + len(prices)
+            for symbol, price in prices.items():
+                await engine._on_ws_mark_price(MarkPrice(symbol, price * (1 + 0.001 * flip[0])))
+            while engine.mark_prices.stats["processed"] < target:
+                await asyncio.sleep(0)
+
+        results[f"mark_price.handle.{count}"] = await run_case(handle_all, repeat, warmup)
+        results[f"mark_price.ws.{count}"] = await run_case(ws_round, repeat, warmup)
+        await engine.mark_prices.close()
+    return results
+
+
+# ── Ciclo de análisis ──────────────────────────────────────────────────────
+
+async def _scan_cases(sizes, repeat: int, warmup: int, latency: float) -> dict:
+    results = {}
+    for count in sizes:
+        case = f"scan.{count}"
+        market = SimMarket(_symbols(count), warmup + repeat + 3, latency)
+        try:
+            engine = _engine(market)
+        except ImportError as e:
+            results[case] = {"skipped": str(e)}
+            continue
+        signals = []
+
+        async def record_signal(symbol, signal_data, strategy_name="Unknown"):
+            signals.append((symbol, strategy_name))
+
+        # Se mide el análisis, no la ejecución de órdenes
+        engine._execute_signal = record_signal
+        last = {}
+
+        async def cycle():
+            requests = market.exchange.stats["requests"]
+            symbols = await market.client.get_top_volume_symbols(count)
+            scan = await engine.scan_symbols(symbols)
+            last.update(scan.stats, requests=market.exchange.stats["requests"] - requests)
+
+        with market.exchange.clock.install():
+            market.advance_bar()
+            # El primer ciclo descarga el historial completo de cada serie (arranque en frío)
+            cold = await run_case(cycle, repeat=1, warmup=0)
+            stats = await run_case(cycle, repeat, warmup, before=market.advance_bar)
+        results[case] = dict(stats, cold_ms=cold["p50_ms"], requests=last.get("requests", 0),
+                             fetches=last.get("fetches", 0), shared=last.get("shared", 0), signals=len(signals))
+        logger.info(f"[BENCH] {case}: p50 {stats['p50_ms']:.1f}ms p99 {stats['p99_ms']:.1f}ms "
+                    f"({results[case]['requests']} peticiones/ciclo)")
+    return results
+
+
+async def run_benchmarks(groups=GROUPS, repeat: int = 30, warmup: int = 3, scan_sizes=SCAN_SIZES,
+                         latency: float = 0.0) -> dict:
+    """{caso: métricas} de los grupos pedidos."""
+    results = {}
+    if "indicators" in groups:
+        for name, fn in indicator_cases().items():
+            results[name] = await run_case(fn, repeat, warmup)
+    if "strategies" in groups:
+        results.update(await _strategy_cases(repeat, warmup))
+    if "mark_price" in groups:
+        results.update(await _mark_price_cases(repeat, warmup))
+    if "scan" in groups:
+        # Los ciclos grandes son lentos: menos repeticiones
+        results.update(await _scan_cases(scan_sizes, max(5, repeat // 3), min(warmup, 2), latency))
+    skipped = [name for name, r in results.items() if "skipped" in r]
+    if skipped:
+        logger.warning(f"[BENCH] {len(skipped)} casos omitidos: {skipped[0]} -> {results[skipped[0]]['skipped']}")
+    return results
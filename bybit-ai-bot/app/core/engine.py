@@ -2,13 +2,18 @@ import asyncio
 import time
 import os
 import json
-from app.logger import logger
+from app.logger import get_logger
 from app.config import Config
 from app.exchange.websocket_client import BybitWebSocket
-from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.market_events import MarkPrice, Execution
+from app.exchange.bybit_client import get_shared_client
+from app.exchange.candle_store import CandleStore, STRATEGY_INTERVALS
+from app.exchange.market_data import MarketDataContext
+from app.exchange.ohlcv_store import ohlcv_store
 from app.exchange.order_executor import OrderExecutor
 from app.core.guardian import ExchangeSynchronizer
 from app.core.recovery_engine import RecoveryEngine
+from app.core.stats_engine import stats_engine
 from app.risk.trailing_manager import TrailingManager
 from app.database import crud
 from app.strategy.antigravity_v13_pro import evaluate_antigravity_v13
@@ -16,23 +21,51 @@ from app.strategy.supertrend_regime import evaluate_supertrend_regime
 from app.persistence.disk_manager import disk_manager
 from app.persistence.trade_recorder import trade_recorder
 from app.persistence.state_snapshot import state_snapshot
+from app.persistence.write_queue import write_queue
+from app.utils.streaming_indicators import IndicatorRegistry
+from app.utils.mailbox import LatestValueMailbox
 import pandas as pd
 import pandas_ta as ta
+
+logger = get_logger("engine")
+
+INDICATORS_FILENAME = "indicadores_incrementales.json"
+
 class Engine:
-    def __init__(self):
-        self.client = AsyncBybitClient()
-        self.executor = OrderExecutor()
+    def __init__(self, client=None, ws_factory=BybitWebSocket, history=ohlcv_store):
+        # Cliente compartido: lo reutilizan synchronizer, recovery, executor y la API
+        self.client = client or get_shared_client()
+        self.executor = OrderExecutor(self.client)
         self.synchronizer = ExchangeSynchronizer(self)
         self.recovery = RecoveryEngine(self)
-        self.ws = BybitWebSocket(
-            message_callback=self._noop_ws,
+        # Velas en vivo por WS sobre el mismo cache de klines que usa self.client
+        self.indicators = IndicatorRegistry()
+        # Historial local en disco: recibe las velas cerradas y siembra el cache tras un reinicio
+        # (None en una reproducción, para no mezclar velas simuladas con el historial real)
+        self.history = history
+        self.client.kline_cache.store = history
+        self.candle_store = CandleStore(self.client.kline_cache, self.indicators, history=history)
+        # ws_factory: BybitWebSocket o, en una reproducción, el WebSocket del exchange simulado
+        self.ws = ws_factory(
             fill_callback=self.on_fill_event,
-            mark_price_callback=self._handle_ws_mark_price
+            mark_price_callback=self._on_ws_mark_price,
+            kline_callback=self.candle_store.on_kline,
+            kline_gap_callback=self._backfill_kline_gap,
+            # Streams privados: estado de cuenta del supervisor sin polling REST por símbolo
+            order_callback=self.synchronizer.account.on_order_event,
+            position_callback=self.synchronizer.account.on_position_event
         )
+        # Último mark price por símbolo; un worker por símbolo evalúa BE/trailing
+        self.mark_prices = LatestValueMailbox(self._handle_mark_price, name="WS MARK PRICE")
         self.trade_state = {}
         self.trade_lock = asyncio.Lock()
         self.cooldowns = {}
         self.tracked_symbols = []
+        # Limita a 5 los símbolos evaluados a la vez en un ciclo de análisis.
+        # Los límites de Bybit los aplica request_scheduler (rate_limiter.py) para todo el proceso.
+        self._scan_semaphore = asyncio.Semaphore(5)
+        # Duración y velas del último ciclo de análisis (API / benchmarks)
+        self.last_scan = {}
         self.running = False
 
     async def start(self):
@@ -50,15 +83,18 @@ class Engine:
         # Registrar callbacks de disco
         disk_manager.on_disconnect(self._on_disk_disconnect)
         disk_manager.on_reconnect(self._on_disk_reconnect)
+        # Journal de operaciones: carga (y conversión del layout anterior) fuera del loop
+        await asyncio.to_thread(trade_recorder.open)
         
         # ── Cargar estado persistido desde el disco ────────────────────────
         saved = state_snapshot.load()
         if saved.get("trade_state"):
             self.trade_state = saved["trade_state"]
-            logger.info(f"[ENGINE] 🔄 {len(self.trade_state)} operaciones restauradas del disco.")
+            logger.info("[ENGINE] 🔄 %s operaciones restauradas del disco.", len(self.trade_state))
         if saved.get("cooldowns"):
             self.cooldowns = saved["cooldowns"]
-            logger.info(f"[ENGINE] 🕒 {len(self.cooldowns)} cooldowns restaurados.")
+            logger.info("[ENGINE] 🕒 %s cooldowns restaurados.", len(self.cooldowns))
+        self.indicators.load(self._indicators_path())
         
         await crud.init_db()
         await self.recovery.execute_recovery()
@@ -76,15 +112,27 @@ class Engine:
         # ── Guardar estado completo antes de apagar ───────────────────────
         logger.info("[ENGINE] 💾 Guardando estado en disco antes de apagar...")
         state_snapshot.save(self.trade_state, self.cooldowns)
+        self.indicators.save(self._indicators_path())
+        if self.history:
+            await self.candle_store.flush_history()
+            self.history.close()
+        # Vaciar la cola de escrituras diferidas (incluidos los appends del journal) antes de salir
+        if not await asyncio.to_thread(write_queue.flush, 10.0):
+            logger.warning("[ENGINE] ⚠️ Quedaron escrituras pendientes en la cola de persistencia.")
+        trade_recorder.close()
         
         await self.synchronizer.stop()
         await self.ws.stop()
+        await self.mark_prices.close()
         if hasattr(self, '_polling_task'):
             self._polling_task.cancel()
         if hasattr(self, '_sync_task'):
             self._sync_task.cancel()
         logger.info("[ENGINE] Apagado completado.")
 
+    def _indicators_path(self) -> str:
+        return os.path.join(disk_manager.memory_dir_local, INDICATORS_FILENAME)
+
     def _on_disk_disconnect(self):
         """Callback cuando el disco de red se desconecta."""
         logger.error("[ENGINE] 🔴 DISCO DE RED DESCONECTADO. Operando en modo local temporal.")
@@ -127,46 +175,47 @@ class Engine:
                 if abs(amt) > 0:
                     await self.executor.close_position_market(symbol, side, "MANUAL_RESET")
         except Exception as e:
-            logger.error(f"[ENGINE] Error cerrando posiciones en reset: {e}")
+            logger.error("[ENGINE] Error cerrando posiciones en reset: %s", e)
         
         self.trade_state.clear()
         logger.info("✅ [ENGINE] Estado reseteado.")
 
-    async def _noop_ws(self, data):
-        pass
+    async def _backfill_kline_gap(self, pairs: list, gap_start_ms: int, gap_end_ms: int):
+        filled = await self.candle_store.backfill(self.client, pairs)
+        logger.info("[ENGINE] Hueco del WS rellenado: %s/%s series de velas al día.", filled, len(pairs))
 
-    async def on_fill_event(self, data: dict):
+    async def on_fill_event(self, event: Execution):
         try:
-            order_id = str(data.get("i", data.get("orderId", "")))
-            status = data.get("X", data.get("status", ""))
-            symbol = data.get("s", data.get("symbol", ""))
-
-            if status != "FILLED": return
+            if not event.filled: return
+            order_id = event.order_id
+            symbol = event.symbol
             trade = self.trade_state.get(symbol)
             if not trade: return
+            # El fill cambia posición y órdenes: snapshot REST en la próxima patrulla
+            self.synchronizer.account.invalidate()
 
             # Entry
             if order_id == trade.get("trade_id") and not trade.get("filled"):
-                logger.info(f"✅ [FILL] Entrada ejecutada para {symbol}. Colocando SL y TPs...")
+                logger.info("✅ [FILL] Entrada ejecutada para %s. Colocando SL y TPs...", symbol)
                 trade["filled"] = True
                 await self._place_protections(symbol, trade)
                 
             # TP1
             elif order_id == trade.get("tp1_order_id") and not trade.get("tp1_hit"):
-                logger.info(f"🎯 [TP1] 30% asegurado en {symbol}. (No se mueve SL aquí)")
+                logger.info("🎯 [TP1] 30%% asegurado en %s. (No se mueve SL aquí)", symbol)
                 trade["tp1_hit"] = True
                 trade["remaining_size"] -= trade["position_size"] * 0.3
                 
             # TP2
             elif order_id == trade.get("tp2_order_id") and not trade.get("tp2_hit"):
-                logger.info(f"🎯 [TP2] 30% adicional asegurado en {symbol}. Activando Trailing Stop.")
+                logger.info("🎯 [TP2] 30%% adicional asegurado en %s. Activando Trailing Stop.", symbol)
                 trade["tp2_hit"] = True
                 trade["remaining_size"] -= trade["position_size"] * 0.3
                 trade["trailing_active"] = True
 
             # Stop Loss
             elif order_id == trade.get("sl_order_id"):
-                logger.info(f"🛑 [FILL] Stop Loss ejecutado para {symbol}.")
+                logger.info("🛑 [FILL] Stop Loss ejecutado para %s.", symbol)
                 # Se cerrará en _close_position_internal (vía websocket o guardián)
                 # No hacemos remove directo para que _close_position_internal decida el cooldown.
 
@@ -181,7 +230,7 @@ class Engine:
                 await crud.save_trade(db_trade)
 
         except Exception as e:
-            logger.error(f"[FILL EVENT] Error: {e}")
+            logger.error("[FILL EVENT] Error: %s", e)
 
     async def _place_protections(self, symbol, trade):
         sl = trade["sl_price"]
@@ -203,7 +252,7 @@ class Engine:
         async with trade["lock"]:
             if trade.get("profit_lock_active"): return
             
-            logger.info(f"🔒 [BREAKEVEN] Moviendo SL a punto de entrada (Breakeven) para {symbol}.")
+            logger.info("🔒 [BREAKEVEN] Moviendo SL a punto de entrada (Breakeven) para %s.", symbol)
             new_sl = trade["profit_lock_price"]
             new_id = await self.executor.update_sl(
                 symbol, trade["side"], trade.get("sl_order_id"), new_sl, trade["remaining_size"]
@@ -213,13 +262,13 @@ class Engine:
                 trade["sl_price"] = new_sl
                 trade["profit_lock_active"] = True
 
-    async def _handle_ws_mark_price(self, data):
+    async def _on_ws_mark_price(self, event: MarkPrice):
+        """Lector del WS: solo deja el último precio en el buzón del símbolo."""
+        if event.symbol in self.trade_state:
+            self.mark_prices.put(event.symbol, event.mark_price)
+
+    async def _handle_mark_price(self, symbol: str, mark_price):
         try:
-            ws_data = data.get("data", {})
-            symbol = ws_data.get("symbol")
-            mark_price = ws_data.get("markPrice")
-            if not symbol or not mark_price: return
-            
             mark_price = float(mark_price)
             trade = self.trade_state.get(symbol)
             
@@ -256,11 +305,11 @@ class Engine:
                     if side == "LONG" and mark_price >= entry_price + trail_threshold:
                         trade["trailing_active"] = True
                         trail_ready = True
-                        logger.info(f"🚀 [TRAILING] Activado para {symbol} LONG al cruzar 2.5 ATR de ganancia.")
+                        logger.info("🚀 [TRAILING] Activado para %s LONG al cruzar 2.5 ATR de ganancia.", symbol)
                     elif side == "SHORT" and mark_price <= entry_price - trail_threshold:
                         trade["trailing_active"] = True
                         trail_ready = True
-                        logger.info(f"🚀 [TRAILING] Activado para {symbol} SHORT al cruzar 2.5 ATR de ganancia.")
+                        logger.info("🚀 [TRAILING] Activado para %s SHORT al cruzar 2.5 ATR de ganancia.", symbol)
 
                 if trail_ready:
                     # Usamos el EMA21 calculado asíncronamente en el polling, o caemos al ATR
@@ -284,7 +333,7 @@ class Engine:
                         if not trade["lock"].locked():
                             async with trade["lock"]:
                                 try:
-                                    logger.info(f"🚀 [TRAILING] Moviendo SL a {new_sl:.4f} para {symbol}.")
+                                    logger.info("🚀 [TRAILING] Moviendo SL a %.4f para %s.", new_sl, symbol)
                                     new_id = await self.executor.update_sl(
                                         symbol, side, trade.get("sl_order_id"), new_sl, trade["remaining_size"]
                                     )
@@ -292,9 +341,9 @@ class Engine:
                                         trade["sl_order_id"] = new_id
                                         trade["sl_price"] = new_sl
                                 except Exception as e:
-                                    logger.error(f"[TRAILING] Error actualizando SL: {e}")
+                                    logger.error("[TRAILING] Error actualizando SL: %s", e)
         except Exception as e:
-            logger.error(f"[WS MARK PRICE] Error: {e}")
+            logger.error("[WS MARK PRICE] Error: %s", e)
 
     async def _close_position_internal(self, symbol: str, reason: str, pnl: float = 0.0):
         trade = self.trade_state.pop(symbol, None)
@@ -303,11 +352,11 @@ class Engine:
             if db_trade:
                 db_trade.position_closed = True
                 await crud.save_trade(db_trade)
-            logger.info(f"🛑 [CLOSE] {symbol} cerrada. Motivo: {reason}")
+            logger.info("🛑 [CLOSE] %s cerrada. Motivo: %s", symbol, reason)
             
             # Si se cerró y no tocamos ni TP1, ni BE, ni Trailing -> Fue un SL inicial negativo
             if not trade.get("tp1_hit") and not trade.get("profit_lock_active") and not trade.get("trailing_active"):
-                logger.info(f"💤 [COOLDOWN] {symbol} cerró en pérdida. Puesta a descansar por 1 hora.")
+                logger.info("💤 [COOLDOWN] %s cerró en pérdida. Puesta a descansar por 1 hora.", symbol)
                 self.cooldowns[symbol] = time.time() + 3600 # 1 hour
             
             # ── Registrar cierre en disco de red ──────────────────────────
@@ -327,83 +376,112 @@ class Engine:
                     }
                 )
             except Exception as e:
-                logger.error(f"[TRADE-RECORDER] Error registrando cierre en disco: {e}")
+                logger.error("[TRADE-RECORDER] Error registrando cierre en disco: %s", e)
+
+            # ── Estadísticas: enriquecer el closed-pnl y sincronizar ya ───
+            stats_engine.on_trade_closed(
+                symbol,
+                strategy        = trade.get("strategy", ""),
+                reason          = reason,
+                breakeven_hit   = trade.get("profit_lock_active", False),
+                trailing_active = trade.get("trailing_active", False),
+            )
                 
             await self.ws.unsubscribe_mark_price(symbol)
 
 
+    async def _wait_next_scan(self, timeout: float = 60):
+        """
+        Espera al cierre de la próxima vela del timeframe principal (push del WS).
+        Si el stream de klines no llega, vuelve al ciclo fijo de `timeout` segundos.
+        """
+        interval = Config.TIMEFRAME.replace("m", "")
+        if await self.candle_store.wait_for_bar_close(interval, timeout):
+            # Margen para que lleguen los cierres del resto de símbolos (mismo timestamp)
+            await asyncio.sleep(1)
+
+    async def _evaluate_and_execute(self, symbol, market):
+        # `market`: MarketDataContext del ciclo, compartido por todas las estrategias
+        async with self._scan_semaphore:
+            try:
+                trade = self.trade_state.get(symbol)
+                
+                if trade:
+                    # Evaluar early exit si es SuperTrend
+                    if trade.get("strategy") == "SuperTrendRegimeMTF":
+                        try:
+                            st_res = await evaluate_supertrend_regime(market, symbol)
+                            if trade["side"] == "LONG" and st_res.get("exit_long"):
+                                logger.warning("🚨 [EARLY EXIT] Patrón bajista detectado en %s. Cerrando LONG anticipadamente.", symbol)
+                                await self.executor.close_position_market(symbol, "LONG")
+                                await self._close_position_internal(symbol, "Early Exit - Patrón Contrario")
+                                return
+                            elif trade["side"] == "SHORT" and st_res.get("exit_short"):
+                                logger.warning("🚨 [EARLY EXIT] Patrón alcista detectado en %s. Cerrando SHORT anticipadamente.", symbol)
+                                await self.executor.close_position_market(symbol, "SHORT")
+                                await self._close_position_internal(symbol, "Early Exit - Patrón Contrario")
+                                return
+                        except Exception as e:
+                            logger.error("[EARLY EXIT] Error evaluando %s: %s", symbol, e)
+
+                    # Actualizar EMA21 de los trades activos para el trailing
+                    if trade.get("trailing_active"):
+                        # Si es SuperTrend, sale de las velas 15m ya descargadas para el early exit
+                        klines = await market.get_klines(symbol, interval="15", limit=30, as_array=True)
+                        if len(klines):
+                            ema21 = ta.ema(pd.Series(klines["close"]), length=21)
+                            if ema21 is not None and not ema21.empty:
+                                trade["ema_21"] = ema21.iloc[-1]
+                    return
+
+                # Timeout de 15 segundos máximo por moneda para evitar bloqueos
+                ag_task = asyncio.create_task(evaluate_antigravity_v13(market, symbol, self.indicators))
+                st_task = asyncio.create_task(evaluate_supertrend_regime(market, symbol))
+                
+                done, pending = await asyncio.wait([ag_task, st_task], timeout=15.0)
+                for p in pending: p.cancel()
+                
+                ag_res = ag_task.result() if ag_task in done and not ag_task.exception() else {"signal": "NONE"}
+                st_res = st_task.result() if st_task in done and not st_task.exception() else {"signal": "NONE"}
+                
+                if st_res.get("signal") != "NONE":
+                    if len(self.trade_state) >= Config.MAX_OPEN_TRADES: return
+                    await self._execute_signal(symbol, st_res, "SuperTrendRegimeMTF")
+                elif ag_res.get("signal") != "NONE":
+                    if len(self.trade_state) >= Config.MAX_OPEN_TRADES: return
+                    await self._execute_signal(symbol, ag_res, "AntigravityV13")
+                    
+            except asyncio.TimeoutError:
+                logger.error("[POLL] Timeout evaluando %s. Saltando...", symbol)
+            except Exception as e:
+                logger.error("[POLL] Error evaluando %s: %s", symbol, e)
+
+    async def scan_symbols(self, symbols) -> MarketDataContext:
+        """Un ciclo de análisis: evalúa `symbols` en paralelo sobre un MarketDataContext nuevo."""
+        market = MarketDataContext(self.client)
+        tasks = [asyncio.create_task(self._evaluate_and_execute(sym, market)) for sym in symbols]
+        if tasks:
+            await asyncio.gather(*tasks)
+        return market
+
     async def _kline_polling_loop(self):
         await asyncio.sleep(5)
         
-        # Semáforo para limitar concurrencia a 5 agentes simultáneos (evita baneos de IP/Rate Limits en Bybit)
-        semaphore = asyncio.Semaphore(5)
-        
-        async def evaluate_and_execute(symbol):
-            async with semaphore:
-                try:
-                    trade = self.trade_state.get(symbol)
-                    
-                    if trade:
-                        # Evaluar early exit si es SuperTrend
-                        if trade.get("strategy") == "SuperTrendRegimeMTF":
-                            try:
-                                st_res = await evaluate_supertrend_regime(self.client, symbol)
-                                if trade["side"] == "LONG" and st_res.get("exit_long"):
-                                    logger.warning(f"🚨 [EARLY EXIT] Patrón bajista detectado en {symbol}. Cerrando LONG anticipadamente.")
-                                    await self.executor.close_position_market(symbol, "LONG")
-                                    await self._close_position_internal(symbol, "Early Exit - Patrón Contrario")
-                                    return
-                                elif trade["side"] == "SHORT" and st_res.get("exit_short"):
-                                    logger.warning(f"🚨 [EARLY EXIT] Patrón alcista detectado en {symbol}. Cerrando SHORT anticipadamente.")
-                                    await self.executor.close_position_market(symbol, "SHORT")
-                                    await self._close_position_internal(symbol, "Early Exit - Patrón Contrario")
-                                    return
-                            except Exception as e:
-                                logger.error(f"[EARLY EXIT] Error evaluando {symbol}: {e}")
-
-                        # Actualizar EMA21 de los trades activos para el trailing
-                        if trade.get("trailing_active"):
-                            klines = await self.client.get_klines(symbol, interval="15", limit=30)
-                            if klines:
-                                df = pd.DataFrame(klines)
-                                ema21 = ta.ema(df['close'], length=21)
-                                if ema21 is not None and not ema21.empty:
-                                    trade["ema_21"] = ema21.iloc[-1]
-                        return
-
-                    # Timeout de 15 segundos máximo por moneda para evitar bloqueos
-                    ag_task = asyncio.create_task(evaluate_antigravity_v13(self.client, symbol))
-                    st_task = asyncio.create_task(evaluate_supertrend_regime(self.client, symbol))
-                    
-                    done, pending = await asyncio.wait([ag_task, st_task], timeout=15.0)
-                    for p in pending: p.cancel()
-                    
-                    ag_res = ag_task.result() if ag_task in done and not ag_task.exception() else {"signal": "NONE"}
-                    st_res = st_task.result() if st_task in done and not st_task.exception() else {"signal": "NONE"}
-                    
-                    if st_res.get("signal") != "NONE":
-                        if len(self.trade_state) >= Config.MAX_OPEN_TRADES: return
-                        await self._execute_signal(symbol, st_res, "SuperTrendRegimeMTF")
-                    elif ag_res.get("signal") != "NONE":
-                        if len(self.trade_state) >= Config.MAX_OPEN_TRADES: return
-                        await self._execute_signal(symbol, ag_res, "AntigravityV13")
-                        
-                except asyncio.TimeoutError:
-                    logger.error(f"[POLL] Timeout evaluando {symbol}. Saltando...")
-                except Exception as e:
-                    logger.error(f"[POLL] Error evaluando {symbol}: {e}")
-        
         while self.running:
             logger.info("[POLL] Analizando el mercado en busca de oportunidades (V13 PRO) de forma concurrente...")
             try:
-                symbols = await self.client.get_top_volume_symbols(25)
+                symbols = await self.client.get_top_volume_symbols(Config.SCAN_UNIVERSE_SIZE)
             except Exception as e:
-                logger.error(f"[POLL] Error obteniendo símbolos de volumen: {e}")
+                logger.error("[POLL] Error obteniendo símbolos de volumen: %s", e)
                 symbols = []
                 
             if not symbols: 
                 await asyncio.sleep(5)
                 continue
+
+            # Velas en vivo por WS para el universo y las posiciones abiertas (REST solo para backfill);
+            # los símbolos que salen del universo se dan de baja y los shards se rebalancean
+            await self.ws.set_kline_universe(list(set(symbols) | set(self.trade_state.keys())), STRATEGY_INTERVALS)
                 
             # Filtramos símbolos que ya tienen una operación activa o están en descanso
             symbols_to_evaluate = []
@@ -411,11 +489,10 @@ class Engine:
             # Limite Global de Operaciones simultáneas
             active_trades_count = len(self.trade_state)
             if active_trades_count >= Config.MAX_OPEN_TRADES:
-                logger.warning(f"[POLL] Límite de posiciones abiertas alcanzado ({active_trades_count}/{Config.MAX_OPEN_TRADES}). Solo actualizando EMA21 para trailing.")
+                logger.warning("[POLL] Límite de posiciones abiertas alcanzado (%s/%s). Solo actualizando EMA21 para trailing.", active_trades_count, Config.MAX_OPEN_TRADES)
                 # Solo evaluamos los que ya están en self.trade_state para actualizar EMA21
-                tasks = [asyncio.create_task(evaluate_and_execute(sym)) for sym in self.trade_state.keys()]
-                if tasks: await asyncio.gather(*tasks)
-                await asyncio.sleep(60)
+                await self.scan_symbols(list(self.trade_state.keys()))
+                await self._wait_next_scan(60)
                 continue
 
             for sym in symbols:
@@ -432,15 +509,19 @@ class Engine:
             
             if symbols_to_evaluate:
                 # Lanzamos el análisis de todas las monedas en paralelo
-                tasks = [asyncio.create_task(evaluate_and_execute(sym)) for sym in symbols_to_evaluate]
-                await asyncio.gather(*tasks)
+                started = time.perf_counter()
+                market = await self.scan_symbols(symbols_to_evaluate)
+                self.last_scan = {"symbols": len(symbols_to_evaluate), "seconds": round(time.perf_counter() - started, 3),
+                                  "fetches": market.stats['fetches'], "shared": market.stats['shared']}
+                logger.debug("[POLL] Velas del ciclo: %s descargas, %s compartidas", market.stats['fetches'], market.stats['shared'])
                 
-            logger.info(f"[POLL] Escaneo multi-agente completado en {len(symbols_to_evaluate)} monedas. Esperando el siguiente ciclo...")
-            await asyncio.sleep(60)
+            logger.info("[POLL] Escaneo multi-agente completado en %s monedas (%.2fs). Esperando el siguiente cierre de vela...",
+                        len(symbols_to_evaluate), self.last_scan.get("seconds", 0.0))
+            await self._wait_next_scan(60)
 
     async def _execute_signal(self, symbol, signal_data, strategy_name="Unknown"):
         side = signal_data["signal"]
-        logger.info(f"🚨 [SEÑAL] {symbol} {side} by {strategy_name}")
+        logger.info("🚨 [SEÑAL] %s %s by %s", symbol, side, strategy_name)
         
         ticker = await self.client.get_ticker(symbol)
         if not ticker: return
@@ -472,7 +553,7 @@ class Engine:
         # Tamaño de posición fijo: $15 USDT margen * Apalancamiento
         total_volume_usdt = Config.MARGIN_USDT * Config.LEVERAGE
         if entry_price <= 0:
-            logger.error(f"[{symbol}] Error: Entry Price es 0.")
+            logger.error("[%s] Error: Entry Price es 0.", symbol)
             return
             
         size = total_volume_usdt / entry_price
@@ -480,7 +561,7 @@ class Engine:
 
         async with self.trade_lock:
             if len(self.trade_state) >= Config.MAX_OPEN_TRADES:
-                logger.warning(f"[{symbol}] Omitiendo orden, se alcanzó el MAX_OPEN_TRADES.")
+                logger.warning("[%s] Omitiendo orden, se alcanzó el MAX_OPEN_TRADES.", symbol)
                 return
             # Placeholder temporal para evitar Race Conditions con otras operaciones concurrentes
             self.trade_state[symbol] = {"status": "pending_entry"}
@@ -490,6 +571,8 @@ class Engine:
             async with self.trade_lock:
                 self.trade_state.pop(symbol, None)
             return
+        # Orden nueva en el exchange: el guardián no debe auditar con el estado previo del stream
+        self.synchronizer.account.invalidate()
 
         trade = {
             "trade_id": order_id,
@@ -545,4 +628,4 @@ class Engine:
                 "atr":          atr,
             })
         except Exception as e:
-            logger.error(f"[TRADE-RECORDER] Error registrando apertura en disco: {e}")
\ No newline at end of file
+            logger.error("[TRADE-RECORDER] Error registrando apertura en disco: %s", e)
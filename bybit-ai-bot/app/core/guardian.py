@@ -1,9 +1,13 @@
 import asyncio
 import time
-from app.logger import logger
-from app.exchange.bybit_client import AsyncBybitClient
+from app.logger import get_logger
 from app.database import crud
-from app.exchange.order_executor import OrderExecutor
+from app.exchange.account_state import AccountState
+
+logger = get_logger("guardian")
+
+# Con el WS privado activo, REST solo verifica el estado cada N segundos
+REST_CHECKSUM_INTERVAL = 30
 
 class ExchangeSynchronizer:
     """
@@ -16,8 +20,12 @@ class ExchangeSynchronizer:
     """
     def __init__(self, engine):
         self.engine = engine
-        self.client = AsyncBybitClient()
-        self.executor = OrderExecutor()
+        # Mismo cliente y executor que el engine (una sola sesión HTTP)
+        self.client = engine.client
+        self.executor = engine.executor
+        # Posiciones y órdenes de toda la cuenta (streams privados + checksum REST)
+        self.account = AccountState()
+        self._ws_was_ready = False
         self.running = False
 
     async def start(self):
@@ -25,6 +33,33 @@ class ExchangeSynchronizer:
         logger.info("🦸‍♂️ [SUPER SUPERVISOR] Inicializado. Vigilancia estricta de Timeout/SL/TP/BE/Trailing activada.")
         await self._patrol()
 
+    async def _refresh_account(self) -> bool:
+        """
+        Deja `self.account` al día para auditar todos los trades del tick.
+        Con el WS privado listo basta el estado del stream; si no, o cada
+        REST_CHECKSUM_INTERVAL, una consulta de posiciones y otra de órdenes
+        para toda la cuenta. False si el snapshot REST falló (no auditar).
+        """
+        ws_ready = getattr(self.engine.ws, "private_ready", False)
+        if ws_ready and not self._ws_was_ready:
+            # Reconexión: pudimos perder eventos mientras estaba caído
+            self.account.invalidate()
+        self._ws_was_ready = ws_ready
+        if ws_ready and not self.account.needs_resync(REST_CHECKSUM_INTERVAL):
+            return True
+
+        started = time.monotonic()
+        positions, orders = await asyncio.gather(
+            self.client.get_all_positions(), self.client.get_all_open_orders()
+        )
+        if positions is None or orders is None:
+            logger.warning("🦸‍♂️ [SUPER SUPERVISOR] Snapshot de cuenta incompleto. Se reintenta en la próxima patrulla.")
+            return False
+        drift = self.account.apply_snapshot(positions, orders, started)
+        if ws_ready and drift:
+            logger.warning("🦸‍♂️ [SUPER SUPERVISOR] Checksum REST corrigió %s diferencias respecto al stream privado.", drift)
+        return True
+
     async def _patrol(self):
         backoff_time = 2
         max_backoff = 60
@@ -35,6 +70,10 @@ class ExchangeSynchronizer:
                 if not active_symbols:
                     continue
 
+                # Un snapshot por tick para todos los símbolos (antes: 5 peticiones por símbolo)
+                if not await self._refresh_account():
+                    continue
+
                 for symbol in active_symbols:
                     trade = self.engine.trade_state.get(symbol)
                     if not trade: continue
@@ -44,39 +83,48 @@ class ExchangeSynchronizer:
                     # ─────────────────────────────────────────────────────
                     if not trade.get("filled"):
                         # Parche Anti-Ghost: Verificar si ByBit ya la llenó pero el WS no avisó
-                        pos = await self.executor.verify_position_exists(symbol, trade["side"])
+                        pos = self.account.position(symbol, trade["side"])
                         if pos:
-                            logger.info(f"✅ [SUPER SUPERVISOR] ¡Ghost Fill detectado! {symbol} se llenó en ByBit (WS lag). Activando protecciones...")
+                            logger.info("✅ [SUPER SUPERVISOR] ¡Ghost Fill detectado! %s se llenó en ByBit (WS lag). Activando protecciones...", symbol)
                             trade["filled"] = True
                             trade["remaining_size"] = abs(float(pos.get("positionAmt", 0)))
                             await self.engine._place_protections(symbol, trade)
-                            # Continuamos con el resto de verificaciones para protegerla
+                            self.account.invalidate()
+                            # Las órdenes recién creadas aún no están en el snapshot: se auditan en el próximo tick
+                            continue
                         else:
                             timeout = trade.get("entry_timeout", 0)
                             if timeout > 0 and time.time() > timeout:
-                                logger.warning(f"⏰ [TIMEOUT] {symbol} no llenó en 15 min. Cancelando orden límite...")
+                                logger.warning("⏰ [TIMEOUT] %s no llenó en 15 min. Cancelando orden límite...", symbol)
                                 await self.client.cancel_all_orders(symbol)
+                                self.account.invalidate()
                                 self.engine.trade_state.pop(symbol, None)
-                                logger.info(f"🚫 [TIMEOUT] {symbol} eliminada. Cooldown 1h aplicado.")
+                                logger.info("🚫 [TIMEOUT] %s eliminada. Cooldown 1h aplicado.", symbol)
                                 self.engine.cooldowns[symbol] = time.time() + 3600
                                 continue
                             else:
                                 remaining = max(0, (timeout - time.time()) / 60)
-                                logger.info(f"⏳ [PENDING] {symbol} esperando llenado. Timeout en {remaining:.1f} min.")
+                                logger.info("⏳ [PENDING] %s esperando llenado. Timeout en %.1f min.", symbol, remaining)
                                 continue
 
                     # ─────────────────────────────────────────────────────
                     # CHECK 1: ¿LA POSICIÓN SIGUE EXISTIENDO EN BYBIT?
                     # ─────────────────────────────────────────────────────
-                    pos = await self.executor.verify_position_exists(symbol, trade["side"])
+                    pos = self.account.position(symbol, trade["side"])
                     if not pos:
-                        logger.info(f"🦸‍♂️ [SUPER SUPERVISOR] La posición {symbol} ya NO existe en el Exchange. Limpiando...")
-                        await self.engine._close_position_internal(symbol, "Cerrada por SL/TP en Exchange")
-                        continue
+                        # El estado de cuenta puede venir solo del stream: confirmar por REST antes de cerrar
+                        pos = await self.executor.verify_position_exists(symbol, trade["side"])
+                        if pos:
+                            logger.warning("🦸‍♂️ [SUPER SUPERVISOR] %s sigue abierta en Bybit pero no en el stream. Forzando resync...", symbol)
+                            self.account.invalidate()
+                        else:
+                            logger.info("🦸‍♂️ [SUPER SUPERVISOR] La posición %s ya NO existe en el Exchange. Limpiando...", symbol)
+                            await self.engine._close_position_internal(symbol, "Cerrada por SL/TP en Exchange")
+                            continue
                         
                     real_size = abs(float(pos.get("positionAmt", 0)))
                     if abs(real_size - trade["remaining_size"]) > (trade["position_size"] * 0.01):
-                        logger.warning(f"🦸‍♂️ [SUPER SUPERVISOR] Desfase volumen {symbol}. Memoria:{trade['remaining_size']:.4f} Bybit:{real_size:.4f}. Sincronizando...")
+                        logger.warning("🦸‍♂️ [SUPER SUPERVISOR] Desfase volumen %s. Memoria:%.4f Bybit:%.4f. Sincronizando...", symbol, trade['remaining_size'], real_size)
                         trade["remaining_size"] = real_size
 
                     # ─────────────────────────────────────────────────────
@@ -84,8 +132,11 @@ class ExchangeSynchronizer:
                     # ─────────────────────────────────────────────────────
                     if not trade.get("profit_lock_active"):
                         try:
-                            ticker = await self.client.get_ticker(symbol)
-                            mark_price = float(ticker.get("lastPrice", 0))
+                            # markPrice viene en la propia posición: sin petición de ticker
+                            mark_price = float(pos.get("markPrice", 0))
+                            if mark_price <= 0:
+                                ticker = await self.client.get_ticker(symbol)
+                                mark_price = float(ticker.get("lastPrice", 0))
                             if mark_price > 0:
                                 side = trade["side"]
                                 entry_price = trade["entry_price"]
@@ -103,15 +154,16 @@ class ExchangeSynchronizer:
                                     (side == "SHORT" and mark_price <= entry_price - be_threshold)
                                 )
                                 if be_triggered:
-                                    logger.info(f"🦸‍♂️ [SUPER SUPERVISOR→BE] Condición Breakeven detectada para {symbol} @ {mark_price:.4f}. Activando...")
+                                    logger.info("🦸‍♂️ [SUPER SUPERVISOR→BE] Condición Breakeven detectada para %s @ %.4f. Activando...", symbol, mark_price)
                                     await self.engine._activate_profit_lock(symbol, trade)
+                                    self.account.invalidate()
                         except Exception as e:
-                            logger.error(f"[SUPER SUPERVISOR BE CHECK] Error en {symbol}: {e}")
+                            logger.error("[SUPER SUPERVISOR BE CHECK] Error en %s: %s", symbol, e)
 
                     # ─────────────────────────────────────────────────────
                     # CHECK 3: AUDITAR ÓRDENES ABIERTAS Y LIMPIAR DUPLICADOS
                     # ─────────────────────────────────────────────────────
-                    open_orders = await self.client.get_open_orders(symbol)
+                    open_orders = self.account.orders_for(symbol)
                     
                     found_sl = False
                     found_tp1 = False
@@ -165,9 +217,10 @@ class ExchangeSynchronizer:
                                     
                     # Limpiar Stop Loss Duplicados
                     if len(sl_orders) > 1:
-                        logger.warning(f"🦸‍♂️ [SUPER SUPERVISOR] Detectados {len(sl_orders)} Stop Loss duplicados para {symbol}. Limpiando excedentes...")
+                        logger.warning("🦸‍♂️ [SUPER SUPERVISOR] Detectados %s Stop Loss duplicados para %s. Limpiando excedentes...", len(sl_orders), symbol)
                         for oid, _ in sl_orders[1:]:
                             await self.client.cancel_order(symbol, oid)
+                        self.account.invalidate()
                         sl_orders = [sl_orders[0]] # Conservar uno para evitar loop de recreación
 
                     if len(sl_orders) == 1:
@@ -177,15 +230,17 @@ class ExchangeSynchronizer:
 
                     # Limpiar TP Duplicados
                     if len(tp1_orders) > 1:
-                        logger.warning(f"🦸‍♂️ [SUPER SUPERVISOR] Detectados {len(tp1_orders)} TP1 duplicados para {symbol}. Limpiando...")
+                        logger.warning("🦸‍♂️ [SUPER SUPERVISOR] Detectados %s TP1 duplicados para %s. Limpiando...", len(tp1_orders), symbol)
                         for oid, _ in tp1_orders: await self.client.cancel_order(symbol, oid)
+                        self.account.invalidate()
                     elif len(tp1_orders) == 1:
                         found_tp1 = True
                         trade["tp1_order_id"] = tp1_orders[0][0]
 
                     if len(tp2_orders) > 1:
-                        logger.warning(f"🦸‍♂️ [SUPER SUPERVISOR] Detectados {len(tp2_orders)} TP2 duplicados para {symbol}. Limpiando...")
+                        logger.warning("🦸‍♂️ [SUPER SUPERVISOR] Detectados %s TP2 duplicados para %s. Limpiando...", len(tp2_orders), symbol)
                         for oid, _ in tp2_orders: await self.client.cancel_order(symbol, oid)
+                        self.account.invalidate()
                     elif len(tp2_orders) == 1:
                         found_tp2 = True
                         trade["tp2_order_id"] = tp2_orders[0][0]
@@ -194,39 +249,43 @@ class ExchangeSynchronizer:
                     # CHECK 4: VALIDAR Y FORZAR STOP LOSS
                     # ─────────────────────────────────────────────────────
                     if not found_sl:
-                        logger.error(f"⚠️ [SUPER SUPERVISOR] ALERTA: {symbol} ({trade.get('strategy', 'Unknown')}) NO tiene Stop Loss en Bybit! Recreando @ {trade['sl_price']:.4f}...")
+                        logger.error("⚠️ [SUPER SUPERVISOR] ALERTA: %s (%s) NO tiene Stop Loss en Bybit! Recreando @ %.4f...", symbol, trade.get('strategy', 'Unknown'), trade['sl_price'])
                         new_sl = await self.executor.update_sl(
                             symbol, trade["side"], old_sl_id="", new_sl_price=trade["sl_price"], remaining_size=trade["remaining_size"]
                         )
+                        self.account.invalidate()
                         if new_sl:
                             trade["sl_order_id"] = new_sl
-                            logger.info(f"✅ [SUPER SUPERVISOR] SL Restaurado exitosamente para {symbol}.")
+                            logger.info("✅ [SUPER SUPERVISOR] SL Restaurado exitosamente para %s.", symbol)
                     else:
                         # Chequeo de Ghost SL (desfase por red)
                         if abs(exchange_sl_price - trade["sl_price"]) > (trade["atr"] * 0.05):
-                            logger.warning(f"👻 [SUPER SUPERVISOR] Ghost SL en {symbol}. Bybit:{exchange_sl_price:.4f} Memoria:{trade['sl_price']:.4f}. Corrigiendo...")
+                            logger.warning("👻 [SUPER SUPERVISOR] Ghost SL en %s. Bybit:%.4f Memoria:%.4f. Corrigiendo...", symbol, exchange_sl_price, trade['sl_price'])
                             new_sl = await self.executor.update_sl(
                                 symbol, trade["side"], old_sl_id=trade["sl_order_id"], new_sl_price=trade["sl_price"], remaining_size=trade["remaining_size"]
                             )
+                            self.account.invalidate()
                             if new_sl:
                                 trade["sl_order_id"] = new_sl
-                                logger.info(f"🦸‍♂️ [SUPER SUPERVISOR] SL Sincronizado correctamente para {symbol}.")
+                                logger.info("🦸‍♂️ [SUPER SUPERVISOR] SL Sincronizado correctamente para %s.", symbol)
 
                     # ─────────────────────────────────────────────────────
                     # CHECK 5: VALIDAR TAKE PROFITS HUÉRFANOS (Solo Estrategia 1)
                     # ─────────────────────────────────────────────────────
                     if trade.get("tp1_price") is not None:
                         if not found_tp1 and not trade.get("tp1_hit"):
-                            logger.error(f"⚠️ [SUPER SUPERVISOR] ALERTA: TP1 de {symbol} desaparecido. Recreando...")
+                            logger.error("⚠️ [SUPER SUPERVISOR] ALERTA: TP1 de %s desaparecido. Recreando...", symbol)
                             tp1_qty = trade["position_size"] * 0.3
                             new_tp1 = await self.executor.place_single_tp(symbol, trade["side"], trade["tp1_price"], tp1_qty)
+                            self.account.invalidate()
                             if new_tp1:
                                 trade["tp1_order_id"] = new_tp1
                                 
                         if not found_tp2 and not trade.get("tp2_hit"):
-                            logger.error(f"⚠️ [SUPER SUPERVISOR] ALERTA: TP2 de {symbol} desaparecido. Recreando...")
+                            logger.error("⚠️ [SUPER SUPERVISOR] ALERTA: TP2 de %s desaparecido. Recreando...", symbol)
                             tp2_qty = trade["position_size"] * 0.3
                             new_tp2 = await self.executor.place_single_tp(symbol, trade["side"], trade["tp2_price"], tp2_qty)
+                            self.account.invalidate()
                             if new_tp2:
                                 trade["tp2_order_id"] = new_tp2
 
@@ -241,16 +300,16 @@ class ExchangeSynchronizer:
                     
                     t1 = f"{trade['tp1_price']:.4f}" if trade.get('tp1_price') else "OFF"
                     t2 = f"{trade['tp2_price']:.4f}" if trade.get('tp2_price') else "OFF"
-                    logger.info(f"🦸‍♂️ [SUPER SUPERVISOR] {symbol} {trade['side']} ({trade.get('strategy', 'Unknown')}) | {phase} | SL:{trade['sl_price']:.4f} | TP1:{t1} | TP2:{t2}")
+                    logger.info("🦸‍♂️ [SUPER SUPERVISOR] %s %s (%s) | %s | SL:%.4f | TP1:%s | TP2:%s", symbol, trade['side'], trade.get('strategy', 'Unknown'), phase, trade['sl_price'], t1, t2)
 
             except Exception as e:
                 error_msg = str(e)
                 if "429" in error_msg or "Too Many Requests" in error_msg or "timeout" in error_msg.lower():
                     backoff_time = min(backoff_time * 2, max_backoff)
-                    logger.error(f"🦸‍♂️ [SUPER SUPERVISOR] Rate Limit. Durmiendo {backoff_time}s.")
+                    logger.error("🦸‍♂️ [SUPER SUPERVISOR] Rate Limit. Durmiendo %ss.", backoff_time)
                     await asyncio.sleep(backoff_time)
                 else:
-                    logger.error(f"🦸‍♂️ [SUPER SUPERVISOR] Error durante patrullaje: {e}")
+                    logger.error("🦸‍♂️ [SUPER SUPERVISOR] Error durante patrullaje: %s", e)
             else:
                 backoff_time = 2
 
@@ -1,8 +1,6 @@
 import asyncio
 import time
 from app.logger import logger
-from app.exchange.bybit_client import AsyncBybitClient
-from app.exchange.order_executor import OrderExecutor
 from app.database import crud
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -24,8 +22,8 @@ from app.database import crud
 class RetroactivePositionManager:
     def __init__(self, engine):
         self.engine = engine
-        self.client = AsyncBybitClient()
-        self.executor = OrderExecutor()
+        self.client = engine.client
+        self.executor = engine.executor
         self.running = False
         self._audit_interval = 60  # segundos entre auditorías de klines
 
@@ -2,8 +2,6 @@ import asyncio
 import time
 from app.logger import logger
 from app.database import crud
-from app.exchange.bybit_client import AsyncBybitClient
-from app.exchange.order_executor import OrderExecutor
 import pandas as pd
 import pandas_ta as ta
 
@@ -20,8 +18,8 @@ class RecoveryEngine:
     """
     def __init__(self, engine):
         self.engine = engine
-        self.client = AsyncBybitClient()
-        self.executor = OrderExecutor()
+        self.client = engine.client
+        self.executor = engine.executor
 
     async def execute_recovery(self):
         logger.info("🔄 [RECOVERY] Iniciando recuperación inteligente post-reinicio...")
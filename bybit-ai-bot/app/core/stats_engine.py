@@ -0,0 +1,245 @@
+"""
+Stats Engine: agregados de PnL en memoria para /api/stats.
+
+En vez de releer trades.json y sumar el closed-pnl completo en cada petición,
+mantiene acumulados por día de trading (el día cambia a las 23:00 UTC-5 =
+04:00 UTC) y totales de wins/losses/profit factor que se actualizan al llegar
+cada cierre. El closed-pnl de Bybit se pagina por cursor solo desde el último
+registro visto: en marcha normal es una única página casi vacía. El endpoint
+sirve `snapshot()` directamente de memoria.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+from app.logger import logger
+from app.persistence.write_queue import write_queue
+
+DAY_MS = 86_400_000
+RESET_OFFSET_MS = 4 * 3600 * 1000   # Reset diario 23:00 UTC-5 (04:00 UTC)
+MAX_RANGE_MS = 7 * DAY_MS           # Bybit closed-pnl: como mucho 7 días por consulta
+OVERLAP_MS = 60_000                 # Solape con la última consulta (registros con el mismo ms)
+SYNC_INTERVAL = 60
+RECENT_TRADES = 10
+ENRICH_WINDOW_MS = 180_000          # Cierre local ↔ registro de Bybit: hasta 3 min de diferencia
+STATS_FILENAME = "estadisticas_pnl.json"
+
+
+def trading_day(ts_ms: int) -> int:
+    return (ts_ms - RESET_OFFSET_MS) // DAY_MS
+
+
+def _day_date(day: int):
+    return datetime.fromtimestamp(day * DAY_MS / 1000, tz=timezone.utc).date()
+
+
+class StatsEngine:
+    def __init__(self):
+        self.start_ms = 0               # PNL_START_TIME / último reset manual
+        self._wake = None
+        self._local_closes = deque(maxlen=50)
+        self._reset_aggregates()
+
+    def _reset_aggregates(self):
+        self.days = {}                  # día de trading -> [pnl, wins, losses]
+        self.pnl_total = 0.0
+        self.wins = self.losses = 0
+        self.gross_profit = self.gross_loss = 0.0
+        self.recent = []                # últimos trades, más recientes primero
+        self.last_seen_ms = 0
+        self._seen = {}                 # orderId -> createdTime (deduplicación del solape)
+
+    def reset(self, start_ms: int):
+        """RESET manual: todo a cero y se ignora el PnL anterior a `start_ms`."""
+        self._reset_aggregates()
+        self.start_ms = start_ms
+        self.last_seen_ms = start_ms
+
+    # ──────────────────────────────────────────────────────────────
+    # Eventos
+    # ──────────────────────────────────────────────────────────────
+
+    def apply(self, item: dict) -> bool:
+        """Aplica un registro de /v5/position/closed-pnl. False si ya se había contado."""
+        ts = int(item.get("createdTime", item.get("updatedTime", 0)) or 0)
+        oid = item.get("orderId") or f"{item.get('symbol')}:{ts}"
+        if oid in self._seen:
+            return False
+        self._seen[oid] = ts
+        self.last_seen_ms = max(self.last_seen_ms, ts)
+        if ts < self.start_ms:
+            return False
+
+        amt = float(item.get("closedPnl", 0.0) or 0.0)
+        bucket = self.days.setdefault(trading_day(ts), [0.0, 0, 0])
+        bucket[0] += amt
+        self.pnl_total += amt
+        if amt > 0:
+            bucket[1] += 1
+            self.wins += 1
+            self.gross_profit += amt
+        elif amt < 0:
+            bucket[2] += 1
+            self.losses += 1
+            self.gross_loss += abs(amt)
+
+        side_str = item.get("side", "")
+        trade = {
+            "symbol": item.get("symbol", ""),
+            "side": "LONG" if side_str == "Sell" else ("SHORT" if side_str == "Buy" else "TRADE"),
+            "pnl": amt,
+            "reason": "",
+            "strategy": "UNKNOWN",
+            "breakeven_hit": False,
+            "trailing_active": False,
+            "time": ts,
+        }
+        for local in self._local_closes:
+            if self._enrich(trade, local):
+                break
+        self.recent.append(trade)
+        self.recent.sort(key=lambda t: t["time"], reverse=True)
+        del self.recent[RECENT_TRADES:]
+        return True
+
+    def on_trade_closed(self, symbol: str, strategy: str, reason: str,
+                        breakeven_hit: bool = False, trailing_active: bool = False):
+        """Cierre detectado por el engine: datos locales para enriquecer y sync inmediato."""
+        local = {
+            "symbol": symbol, "time": int(time.time() * 1000), "strategy": strategy or "UNKNOWN",
+            "reason": reason, "breakeven_hit": breakeven_hit, "trailing_active": trailing_active,
+        }
+        self._local_closes.append(local)
+        for trade in self.recent:
+            if self._enrich(trade, local):
+                break
+        if self._wake is not None:
+            self._wake.set()
+
+    @staticmethod
+    def _enrich(trade: dict, local: dict) -> bool:
+        if trade["symbol"] != local["symbol"] or abs(trade["time"] - local["time"]) >= ENRICH_WINDOW_MS:
+            return False
+        for key in ("strategy", "reason", "breakeven_hit", "trailing_active"):
+            trade[key] = local[key]
+        return True
+
+    # ──────────────────────────────────────────────────────────────
+    # Sincronización con Bybit
+    # ──────────────────────────────────────────────────────────────
+
+    async def sync(self, client) -> int:
+        """Trae solo los registros nuevos desde el último visto. Devuelve cuántos se aplicaron."""
+        now_ms = int(time.time() * 1000)
+        if self.last_seen_ms:
+            start = self.last_seen_ms - OVERLAP_MS
+        else:
+            start = max(self.start_ms, now_ms - MAX_RANGE_MS)
+        # Si el bot estuvo parado más de 7 días, la ventana se ancla a hoy
+        start = max(start, now_ms - MAX_RANGE_MS + OVERLAP_MS)
+
+        items = await client.get_closed_pnl(start_time=start)
+        if items is None:
+            return 0
+        applied = 0
+        for item in sorted(items, key=lambda i: int(i.get("createdTime", 0) or 0)):
+            applied += self.apply(item)
+
+        # Olvidar ids fuera de la ventana de solape
+        horizon = self.last_seen_ms - 2 * OVERLAP_MS
+        self._seen = {oid: ts for oid, ts in self._seen.items() if ts >= horizon}
+        return applied
+
+    async def run(self, client, path: str = None):
+        """Bucle de fondo: sync cada SYNC_INTERVAL o en cuanto el engine cierra un trade."""
+        self._wake = asyncio.Event()
+        if path:
+            self.load(path)
+        while True:
+            try:
+                if await self.sync(client) and path:
+                    self.save(path)
+            except Exception as e:
+                logger.error(f"[STATS] Error sincronizando closed-pnl: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=SYNC_INTERVAL)
+                # Bybit tarda unos segundos en publicar el closed-pnl del cierre
+                await asyncio.sleep(3)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    # ──────────────────────────────────────────────────────────────
+    # Lectura
+    # ──────────────────────────────────────────────────────────────
+
+    def _sum_days(self, first: int, last: int) -> tuple:
+        pnl, wins, losses = 0.0, 0, 0
+        for day, (p, w, l) in self.days.items():
+            if first <= day <= last:
+                pnl += p
+                wins += w
+                losses += l
+        return pnl, wins, losses
+
+    def snapshot(self, now_ms: int = None) -> dict:
+        now_ms = now_ms or int(time.time() * 1000)
+        today = trading_day(now_ms)
+        date = _day_date(today)
+        week_start = today - date.weekday()
+        month_start = today - (date.day - 1)
+
+        p_today, w_today, l_today = self.days.get(today, (0.0, 0, 0))
+        p_week, w_week, l_week = self._sum_days(week_start, today)
+        p_month, w_month, l_month = self._sum_days(month_start, today)
+        total = self.wins + self.losses
+        return {
+            "pnl_today": round(p_today, 2), "win_today": w_today, "loss_today": l_today,
+            "pnl_week": round(p_week, 2), "win_week": w_week, "loss_week": l_week,
+            "pnl_month": round(p_month, 2), "win_month": w_month, "loss_month": l_month,
+            "pnl_total": round(self.pnl_total, 2), "total_trades": total,
+            "win_rate": (self.wins / total * 100) if total > 0 else 0.0,
+            "profit_factor": (self.gross_profit / self.gross_loss) if self.gross_loss > 0 else (99.9 if self.gross_profit > 0 else 0.0),
+            "mean_win": (self.gross_profit / self.wins) if self.wins > 0 else 0.0,
+            "mean_loss": (self.gross_loss / self.losses) if self.losses > 0 else 0.0,
+            "recent_trades": [dict(t) for t in self.recent],
+        }
+
+    # ──────────────────────────────────────────────────────────────
+    # Persistencia (los acumulados sobreviven a reinicios más allá de los 7 días de Bybit)
+    # ──────────────────────────────────────────────────────────────
+
+    def save(self, path: str):
+        write_queue.write_json(path, {
+            "start_ms": self.start_ms,
+            "last_seen_ms": self.last_seen_ms,
+            "days": {str(d): v for d, v in self.days.items()},
+            "pnl_total": self.pnl_total,
+            "wins": self.wins, "losses": self.losses,
+            "gross_profit": self.gross_profit, "gross_loss": self.gross_loss,
+            "recent": self.recent,
+            "seen": self._seen,
+        })
+
+    def load(self, path: str):
+        try:
+            data = write_queue.read_json(path)
+        except Exception as e:
+            logger.error(f"[STATS] No se pudieron cargar las estadísticas guardadas: {e}")
+            return
+        # Un RESET posterior al guardado invalida los acumulados
+        if not data or data.get("start_ms", 0) < self.start_ms:
+            return
+        self.start_ms = data["start_ms"]
+        self.last_seen_ms = data.get("last_seen_ms", 0)
+        self.days = {int(d): v for d, v in data.get("days", {}).items()}
+        self.pnl_total = data.get("pnl_total", 0.0)
+        self.wins, self.losses = data.get("wins", 0), data.get("losses", 0)
+        self.gross_profit, self.gross_loss = data.get("gross_profit", 0.0), data.get("gross_loss", 0.0)
+        self.recent = data.get("recent", [])
+        self._seen = data.get("seen", {})
+        logger.info(f"[STATS] Estadísticas restauradas: {self.wins + self.losses} trades, PnL total {self.pnl_total:.2f}.")
+
+
+# Instancia global
+stats_engine = StatsEngine()
@@ -27,6 +27,13 @@ class Watchdog:
                     logger.error("[WATCHDOG] WebSocket is NOT running! Triggering reconnect...")
                     self.engine.ws.running = True
                     asyncio.create_task(self.engine.ws.connect())
+                else:
+                    # El supervisor de cada conexión reconecta solo; aquí se deja constancia
+                    for name, st in self.engine.ws.status().items():
+                        if not st["connected"]:
+                            logger.warning(f"[WATCHDOG] WS {name} desconectado (reconexiones: {st['reconnects']}).")
+                        else:
+                            logger.debug(f"[WATCHDOG] WS {name} | RTT {st['rtt_avg_ms']} ms | silencio {st['silent_s']}s | reconexiones {st['reconnects']}")
 
                 # Check engine is still running
                 if not self.engine.running:
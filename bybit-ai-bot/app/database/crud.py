@@ -1,12 +1,12 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select, update
+from app.constants import DB_FILE
 from app.database.models import Base, TradeState, TradeHistory, SymbolCooldown
 import datetime
 import os
 
-DB_DIR = "/data" if os.path.exists("/data") else "."
-DB_URL = f"sqlite+aiosqlite:///{DB_DIR}/app.db"
+DB_URL = f"sqlite+aiosqlite:///{DB_FILE}"
 engine = create_async_engine(DB_URL, echo=False)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -0,0 +1,100 @@
+"""
+Account State: posiciones y órdenes abiertas de la cuenta, indexadas por símbolo.
+
+Lo mantienen los streams privados `position` y `order` del WebSocket; REST
+(`get_all_positions` + `get_all_open_orders`, una consulta de cuenta cada una)
+solo se usa como checksum periódico, cuando el WS privado no está listo o
+cuando el supervisor acaba de modificar órdenes y necesita la foto exacta.
+"""
+import time
+from app.exchange.bybit_client import AsyncBybitClient
+
+# Estados de orden que siguen vivas en el exchange (stream `order` de Bybit v5)
+OPEN_ORDER_STATUSES = {"New", "PartiallyFilled", "Untriggered", "Active"}
+
+
+def _norm(symbol: str) -> str:
+    return symbol.replace("-", "").upper()
+
+
+class AccountState:
+    def __init__(self):
+        self.positions = {}  # (símbolo, positionSide) -> posición BingX-like
+        self.orders = {}     # orderId -> orden tal como la da Bybit
+        # Claves tocadas por el WS y cuándo: prevalecen sobre un REST iniciado antes
+        self._touched = {}
+        self.synced_at = 0.0
+        self.dirty = True
+
+    def invalidate(self):
+        """Fuerza un snapshot REST en la próxima patrulla (p.ej. tras crear/cancelar órdenes)."""
+        self.dirty = True
+
+    def needs_resync(self, max_age: float) -> bool:
+        return self.dirty or time.monotonic() - self.synced_at > max_age
+
+    # ── Consultas ──────────────────────────────────────────────────────────
+
+    def position(self, symbol: str, side: str) -> dict:
+        """Igual que `OrderExecutor.verify_position_exists`: {} si no hay posición abierta."""
+        pos = self.positions.get((_norm(symbol), "LONG" if side == "LONG" else "SHORT"))
+        if pos and abs(float(pos.get("positionAmt", 0))) > 0:
+            return pos
+        return {}
+
+    def orders_for(self, symbol: str) -> list:
+        symbol = _norm(symbol)
+        return [o for o in self.orders.values() if o.get("symbol") == symbol]
+
+    # ── Actualizaciones ────────────────────────────────────────────────────
+
+    def apply_snapshot(self, positions: list, orders: list, started: float) -> int:
+        """
+        Sustituye el estado por el snapshot REST. `started` es el monotonic de
+        antes de pedirlo: lo que el WS haya cambiado después se conserva.
+        Devuelve cuántas entradas difieren del estado previo (deriva del WS).
+        """
+        new_positions = {(p["symbol"], p["positionSide"]): p for p in positions}
+        new_orders = {str(o.get("orderId")): o for o in orders}
+        for (kind, key), ts in self._touched.items():
+            if ts < started:
+                continue
+            current, target = (self.positions, new_positions) if kind == "position" else (self.orders, new_orders)
+            if key in current:
+                target[key] = current[key]
+            else:
+                target.pop(key, None)
+
+        drift = len(set(new_orders) ^ set(self.orders))
+        for key in set(new_positions) | set(self.positions):
+            old, new = self.positions.get(key, {}), new_positions.get(key, {})
+            if old.get("positionAmt", 0) != new.get("positionAmt", 0):
+                drift += 1
+
+        self.positions, self.orders = new_positions, new_orders
+        self._touched.clear()
+        self.synced_at = time.monotonic()
+        self.dirty = False
+        return drift
+
+    async def on_position_event(self, items: list):
+        now = time.monotonic()
+        for raw in items:
+            if raw.get("category", "linear") != "linear":
+                continue
+            pos = AsyncBybitClient.normalize_position(raw)
+            key = (pos["symbol"], pos["positionSide"])
+            self.positions[key] = pos
+            self._touched[("position", key)] = now
+
+    async def on_order_event(self, events: list):
+        """Stream `order` del WS privado ya convertido a `OrderUpdate`."""
+        now = time.monotonic()
+        for event in events:
+            if event.category != "linear":
+                continue
+            if event.status in OPEN_ORDER_STATUSES:
+                self.orders[event.order_id] = event.raw
+            else:
+                self.orders.pop(event.order_id, None)
+            self._touched[("order", event.order_id)] = now
@@ -4,10 +4,23 @@ import time
 import os
 import urllib.parse
 import aiohttp
-import json
+import numpy as np
+from app.utils import json_codec
 import asyncio
 from app.config import Config
 from app.logger import logger
+from app.exchange.kline_cache import (
+    MAX_KLINE_LIMIT, KlineCache, empty_klines, interval_to_ms, klines_to_dicts, parse_kline_rows,
+)
+from app.exchange.rate_limiter import RATE_LIMIT_RET_CODE, request_scheduler
+
+# Pool HTTP compartido: conexiones keep-alive a la API (evita un handshake TLS por orden)
+HTTP_POOL_LIMIT = 20
+HTTP_POOL_LIMIT_PER_HOST = 10
+HTTP_KEEPALIVE_TIMEOUT = 60
+HTTP_DNS_CACHE_TTL = 300
+# Páginas de /v5/market/kline en vuelo por cada descarga de historial
+KLINE_HISTORY_CONCURRENCY = int(os.getenv("KLINE_HISTORY_CONCURRENCY", "8"))
 
 class AsyncBybitClient:
     def __init__(self):
@@ -16,10 +29,18 @@ class AsyncBybitClient:
         self.base_url = Config.REST_URL
         self._session = None
         self._contract_precisions = {}
+        self.kline_cache = KlineCache()
         
     async def get_session(self):
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
         return self._session
         
     async def close(self):
@@ -62,42 +83,53 @@ class AsyncBybitClient:
             else:
                 url_with_params = url
                 if params and method.upper() == "POST":
-                    payload = json.dumps(params)
+                    payload = json_codec.dumps(params)
                 else:
                     payload = ""
 
-            if signed:
-                timestamp = str(int(time.time() * 1000))
-                recv_window = "10000"
-                sig = self._generate_signature(timestamp, recv_window, payload)
-                headers["X-BAPI-API-KEY"] = self.api_key
-                headers["X-BAPI-TIMESTAMP"] = timestamp
-                headers["X-BAPI-RECV-WINDOW"] = recv_window
-                headers["X-BAPI-SIGN"] = sig
-
             proxy = os.getenv("BYBIT_PROXY") or os.getenv("HTTP_PROXY") or os.getenv("HTTPS_PROXY")
+            # Turno y token del planificador global (órdenes antes que datos de mercado)
+            await request_scheduler.acquire(endpoint)
             try:
+                if signed:
+                    # Firmar tras obtener turno: la espera en cola no debe consumir el recv_window
+                    timestamp = str(int(time.time() * 1000))
+                    recv_window = "10000"
+                    sig = self._generate_signature(timestamp, recv_window, payload)
+                    headers["X-BAPI-API-KEY"] = self.api_key
+                    headers["X-BAPI-TIMESTAMP"] = timestamp
+                    headers["X-BAPI-RECV-WINDOW"] = recv_window
+                    headers["X-BAPI-SIGN"] = sig
+
                 if method.upper() == "GET":
                     async with session.get(url_with_params, headers=headers, timeout=10, proxy=proxy) as resp:
-                        text = await resp.text()
-                        if not text:
+                        body = await resp.read()
+                        resp_headers = resp.headers
+                        if not body:
+                            request_scheduler.observe(endpoint, resp_headers)
                             raise ValueError(f"Empty response from Bybit. Status: {resp.status}")
-                        res_json = json.loads(text)
+                        res_json = json_codec.loads(body)
                 elif method.upper() == "POST":
                     async with session.post(url_with_params, headers=headers, data=payload, timeout=10, proxy=proxy) as resp:
-                        text = await resp.text()
-                        if not text:
+                        body = await resp.read()
+                        resp_headers = resp.headers
+                        if not body:
+                            request_scheduler.observe(endpoint, resp_headers)
                             raise ValueError(f"Empty response from Bybit. Status: {resp.status}")
-                        res_json = json.loads(text)
+                        res_json = json_codec.loads(body)
                 else:
                     raise ValueError(f"Unsupported HTTP method: {method}")
                 
                 # Bybit uses retCode 0 for success
                 if not isinstance(res_json, dict):
                     raise ValueError(f"Bybit returned non-dict JSON: {res_json}")
-                    
+
+                request_scheduler.observe(endpoint, resp_headers, res_json.get("retCode"))
                 if res_json.get("retCode") == 0:
                     return {"success": True, "data": res_json.get("result"), "msg": res_json.get("retMsg"), "code": 0}
+                elif res_json.get("retCode") == RATE_LIMIT_RET_CODE and attempt < max_retries - 1:
+                    # El bucket ya quedó bloqueado hasta el reset: se reintenta tras la pausa
+                    logger.warning(f"Bybit rate limit on {url} (Attempt {attempt+1}/{max_retries})")
                 else:
                     err_msg = res_json.get("retMsg", "Unknown error")
                     code = res_json.get("retCode")
@@ -106,38 +138,90 @@ class AsyncBybitClient:
                     
             except Exception as e:
                 logger.error(f"Bybit API Request Exception (Attempt {attempt+1}/{max_retries}): {e}")
+            finally:
+                request_scheduler.release()
                 
             if attempt < max_retries - 1:
                 await asyncio.sleep(1 * (attempt + 1))
                 
         return {"success": False, "data": None, "msg": "Max retries exceeded"}
 
-    async def get_klines(self, symbol: str, interval: str = "5m", limit: int = 100) -> list:
-        bybit_interval = interval.replace("m", "")
+    async def get_klines(self, symbol: str, interval: str = "5m", limit: int = 100,
+                         use_cache: bool = True, as_array: bool = False):
+        """
+        Velas oldest-first. Con `as_array=True` devuelve el array estructurado
+        (`KLINE_DTYPE`: time/open/high/low/close/volume) sin crear un dict por vela;
+        por defecto, la lista de dicts de siempre.
+        """
         # Map 5m to 5 for Bybit
-        params = {"category": "linear", "symbol": symbol.replace("-", "").upper(), "interval": bybit_interval, "limit": limit}
+        bybit_interval = interval.replace("m", "")
+        bybit_symbol = symbol.replace("-", "").upper()
+
+        async def fetch(n):
+            return await self._fetch_klines(bybit_symbol, bybit_interval, n)
+
+        if not use_cache:
+            klines = await fetch(limit)
+        else:
+            # Solo se descargan las velas nuevas desde la última vela cerrada guardada
+            klines = await self.kline_cache.get(bybit_symbol, bybit_interval, limit, fetch)
+        return klines if as_array else klines_to_dicts(klines)
+
+    async def _fetch_klines(self, symbol: str, interval: str, limit: int):
+        params = {"category": "linear", "symbol": symbol, "interval": interval, "limit": limit}
         res = await self._request("GET", "/v5/market/kline", params=params, signed=False)
-        raw = res.get("data", {}).get("list", [])
-        if not raw:
-            return []
+        # Bybit v5 kline format: [startTime, openPrice, highPrice, lowPrice, closePrice, volume, turnover]
+        return parse_kline_rows(res.get("data", {}).get("list", []))
 
-        parsed = []
-        for k in raw:
-            try:
-                # Bybit v5 kline format: [startTime, openPrice, highPrice, lowPrice, closePrice, volume, turnover]
-                parsed.append({
-                    "open":   float(k[1]),
-                    "high":   float(k[2]),
-                    "low":    float(k[3]),
-                    "close":  float(k[4]),
-                    "volume": float(k[5]),
-                    "time":   int(k[0]),
-                })
-            except Exception as e:
-                continue
-        # Bybit returns newest first, we usually need oldest first for indicators
-        parsed.reverse()
-        return parsed
+    async def get_kline_history(self, symbol: str, interval: str, start_ms: int, end_ms: int):
+        """
+        Velas [start_ms, end_ms] como array `KLINE_DTYPE` oldest-first, sin cache.
+        El rango se parte en ventanas de MAX_KLINE_LIMIT velas que se piden en
+        paralelo (como mucho KLINE_HISTORY_CONCURRENCY a la vez; el ritmo real lo
+        marca el rate limiter). Devuelve None si falla alguna página.
+        """
+        bybit_interval = interval.replace("m", "")
+        step = interval_to_ms(bybit_interval)
+        if not step:
+            return None
+        params = {"category": "linear", "symbol": symbol.replace("-", "").upper(),
+                  "interval": bybit_interval, "limit": MAX_KLINE_LIMIT}
+        window = step * MAX_KLINE_LIMIT
+        start_ms = int(start_ms) - int(start_ms) % step
+        limiter = asyncio.Semaphore(KLINE_HISTORY_CONCURRENCY)
+
+        async def page(start):
+            async with limiter:
+                res = await self._request("GET", "/v5/market/kline", signed=False,
+                                          params=dict(params, start=start, end=min(start + window - 1, int(end_ms))))
+            if not res or not res.get("success"):
+                logger.error(f"Failed to page klines for {symbol} {interval}: {res}")
+                return None
+            return parse_kline_rows((res.get("data") or {}).get("list", []))
+
+        pages = await asyncio.gather(*[page(s) for s in range(start_ms, int(end_ms) + 1, window)])
+        if any(p is None for p in pages):
+            return None
+        pages = [p for p in pages if len(p)]
+        if not pages:
+            return empty_klines()
+        klines = np.concatenate(pages)
+        _, unique = np.unique(klines["time"], return_index=True)
+        return klines[unique]
+
+    @staticmethod
+    def normalize_position(p: dict) -> dict:
+        """Posición de Bybit (REST o stream `position`) en el formato BingX-like que usa el bot."""
+        side = p.get("positionIdx")
+        pos_side = "LONG" if side == 1 else ("SHORT" if side == 2 else "BOTH")
+        return {
+            "symbol": p.get("symbol"),
+            "positionSide": pos_side,
+            "positionAmt": float(p.get("size") or 0.0),
+            "entryPrice": float(p.get("avgPrice") or p.get("entryPrice") or 0.0),
+            "markPrice": float(p.get("markPrice") or 0.0),
+            "unrealizedProfit": float(p.get("unrealisedPnl") or 0.0)
+        }
 
     async def get_positions(self, symbol: str = None):
         params = {"category": "linear", "settleCoin": "USDT"}
@@ -150,19 +234,53 @@ class AsyncBybitClient:
         
         # Convert to BingX-like format for compatibility
         bybit_pos = res.get("data", {}).get("list", [])
-        bingx_pos = []
-        for p in bybit_pos:
-            side = p.get("positionIdx")
-            pos_side = "LONG" if side == 1 else ("SHORT" if side == 2 else "BOTH")
-            bingx_pos.append({
-                "symbol": p.get("symbol"),
-                "positionSide": pos_side,
-                "positionAmt": float(p.get("size") or 0.0),
-                "entryPrice": float(p.get("avgPrice") or 0.0),
-                "markPrice": float(p.get("markPrice") or 0.0),
-                "unrealizedProfit": float(p.get("unrealisedPnl") or 0.0)
-            })
-        return bingx_pos
+        return [self.normalize_position(p) for p in bybit_pos]
+
+    async def _get_all_pages(self, endpoint: str, params: dict, max_pages: int = 10):
+        """Recorre `nextPageCursor`. Devuelve None si alguna página falla (snapshot incompleto)."""
+        items, cursor = [], None
+        for _ in range(max_pages):
+            page_params = dict(params, cursor=cursor) if cursor else params
+            res = await self._request("GET", endpoint, params=page_params, signed=True)
+            if not res or not res.get("success"):
+                logger.error(f"Failed to page {endpoint}: {res}")
+                return None
+            data = res.get("data") or {}
+            items.extend(data.get("list", []))
+            cursor = data.get("nextPageCursor")
+            if not cursor:
+                break
+        return items
+
+    async def get_all_positions(self):
+        """Todas las posiciones USDT de la cuenta en una petición. None si falla."""
+        params = {"category": "linear", "settleCoin": "USDT", "limit": 200}
+        raw = await self._get_all_pages("/v5/position/list", params)
+        if raw is None:
+            return None
+        return [self.normalize_position(p) for p in raw]
+
+    async def get_all_open_orders(self):
+        """
+        Órdenes abiertas de toda la cuenta (normales, condicionales y TP/SL):
+        una consulta por tipo en lugar de tres por símbolo. None si falla alguna.
+        """
+        base = {"category": "linear", "settleCoin": "USDT", "limit": 50}
+        pages = await asyncio.gather(*[
+            self._get_all_pages("/v5/order/realtime", dict(base, orderFilter=f))
+            for f in ("Order", "StopOrder", "tpslOrder")
+        ])
+        if any(p is None for p in pages):
+            return None
+        orders, seen = [], set()
+        for page in pages:
+            for order in page:
+                oid = order.get("orderId")
+                if oid in seen:
+                    continue
+                seen.add(oid)
+                orders.append(order)
+        return orders
 
     async def get_ticker(self, symbol: str) -> dict:
         params = {"category": "linear", "symbol": symbol.replace("-", "").upper()}
@@ -355,3 +473,22 @@ class AsyncBybitClient:
         res = await self._request("GET", "/v5/position/closed-pnl", params=params, signed=True)
         return res.get("data", {}).get("list", [])
 
+    async def get_closed_pnl(self, start_time: int, end_time: int = None, max_pages: int = 20):
+        """Closed-pnl desde `start_time` (ms, ventana máx. 7 días), todas las páginas. None si falla."""
+        params = {"category": "linear", "startTime": int(start_time), "limit": 100}
+        if end_time:
+            params["endTime"] = int(end_time)
+        return await self._get_all_pages("/v5/position/closed-pnl", params, max_pages=max_pages)
+
+
+_shared_client = None
+
+def get_shared_client() -> AsyncBybitClient:
+    """
+    Cliente único del proceso: una sola sesión/pool HTTP, un solo cache de
+    precisiones de contrato y un solo cache de velas para todos los subsistemas.
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncBybitClient()
+    return _shared_client
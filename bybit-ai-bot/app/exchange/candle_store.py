@@ -0,0 +1,116 @@
+"""
+Candle Store: velas en vivo alimentadas por el stream público `kline.{interval}.{symbol}`.
+
+Cada push del WebSocket se aplica al KlineCache compartido del cliente REST, de
+modo que las estrategias siguen llamando a `client.get_klines()` pero leen de
+memoria; REST solo se usa para el backfill inicial o para rellenar huecos.
+Cuando una vela se cierra (`confirm=true`) despierta a quien espere el cierre
+de barra, para evaluar las estrategias al instante en vez de cada 60s, y
+avanza en O(1) los indicadores incrementales del símbolo. Con `history`
+(`OHLCVStore`) cada vela cerrada se añade también al historial local en disco,
+en un hilo aparte: un append que rellena un hueco reescribe la serie entera y
+no puede hacerse en el callback del lector del WS.
+"""
+import asyncio
+import time
+import numpy as np
+from app.exchange.kline_cache import KLINE_DTYPE, candle_row, interval_to_ms
+from app.exchange.market_events import Kline
+
+# Intervalos que usan las estrategias: V13 (5m), SuperTrend (15m + 1h)
+STRATEGY_INTERVALS = ["5", "15", "60"]
+
+
+class CandleStore:
+    def __init__(self, kline_cache, indicators=None, history=None):
+        self.kline_cache = kline_cache
+        self.indicators = indicators
+        self.history = history
+        self._close_events = {}
+        self._last_close_ms = {}
+        # (símbolo, intervalo) -> [velas] pendientes de guardar en `history`
+        self._pending_history = {}
+        self._history_task = None
+
+    def _event(self, interval: str) -> asyncio.Event:
+        ev = self._close_events.get(interval)
+        if ev is None:
+            ev = asyncio.Event()
+            self._close_events[interval] = ev
+        return ev
+
+    async def on_kline(self, event: Kline):
+        """Callback del WS público: una vela (`Kline`) de un topic kline."""
+        symbol, interval = event.symbol, event.interval
+        candle = event.as_candle()
+        confirmed = event.confirm
+        self.kline_cache.ingest(symbol, interval, candle, confirmed=confirmed)
+        if not confirmed:
+            return
+
+        if self.history is not None:
+            self._queue_history(symbol, interval, np.array([candle_row(candle)], dtype=KLINE_DTYPE))
+        if self.indicators is not None:
+            self.indicators.on_closed_candle(
+                symbol, interval, candle, interval_to_ms(interval),
+                history=lambda: self.kline_cache.closed_candles(symbol, interval)
+            )
+
+        self._last_close_ms[interval] = int(time.time() * 1000)
+        # Despertar a todos los que esperan y preparar un evento nuevo para el siguiente cierre
+        self._event(interval).set()
+        self._close_events[interval] = asyncio.Event()
+
+    async def backfill(self, client, pairs: list) -> int:
+        """
+        Tras un corte del WS público: trae por REST (incremental, desde la última
+        vela guardada) las velas perdidas de las series que ya estaban en cache y
+        avanza sus indicadores. Devuelve cuántas series se rellenaron.
+        """
+        pairs = [(sym, iv) for sym, iv in pairs if self.kline_cache.has(sym, iv)]
+
+        async def fill(symbol, interval):
+            await client.get_klines(symbol, interval, limit=1, as_array=True)
+            closed = self.kline_cache.closed_candles(symbol, interval)
+            if self.history is not None and len(closed):
+                # Las velas cerradas durante el corte también van al historial local
+                self._queue_history(symbol, interval, closed.copy())
+            if self.indicators is not None and len(closed):
+                self.indicators.on_closed_candle(
+                    symbol, interval, closed[-1], interval_to_ms(interval), history=lambda: closed
+                )
+
+        results = await asyncio.gather(*[fill(sym, iv) for sym, iv in pairs], return_exceptions=True)
+        return sum(1 for r in results if not isinstance(r, Exception))
+
+    # ── Historial en disco ─────────────────────────────────────────────────
+
+    def _queue_history(self, symbol: str, interval: str, klines: np.ndarray):
+        """Encola velas cerradas para `history`. No bloquea; un único worker las guarda en orden."""
+        self._pending_history.setdefault((symbol, interval), []).append(klines)
+        if self._history_task is None or self._history_task.done():
+            self._history_task = asyncio.get_running_loop().create_task(self._drain_history())
+
+    async def flush_history(self):
+        """Espera a que lo pendiente quede guardado (al apagar, antes de cerrar el store)."""
+        if self._history_task is not None and not self._history_task.done():
+            await self._history_task
+        await self._drain_history()
+
+    async def _drain_history(self):
+        while self._pending_history:
+            pending, self._pending_history = self._pending_history, {}
+            await asyncio.to_thread(self._append_history, pending)
+
+    def _append_history(self, pending: dict):
+        for (symbol, interval), chunks in pending.items():
+            # Un append por serie: el store ordena y descarta las ya guardadas
+            self.history.append(symbol, interval, np.concatenate(chunks))
+
+    async def wait_for_bar_close(self, interval: str, timeout: float) -> bool:
+        """Espera al próximo cierre de vela del intervalo. False si vence el timeout."""
+        try:
+            await asyncio.wait_for(self._event(interval).wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
@@ -0,0 +1,252 @@
+"""
+Kline Cache: historial de velas en memoria compartido por (símbolo, intervalo).
+
+Guarda el historial una sola vez en un buffer acotado y en cada refresco solo pide
+a Bybit las velas desde la última vela cerrada, fusionándolas por timestamp.
+Así el escaneo de 60s pasa de ~100 descargas completas por minuto a 1-2 velas
+por símbolo e intervalo. Si el stream público de klines alimenta la serie
+(`ingest`), la cola ya está al día y no se hace ninguna petición REST. Con un
+historial local (`store`, ver ohlcv_store.py) la primera carga tras un reinicio
+parte de las velas guardadas y solo descarga las posteriores.
+
+Las velas se guardan en columnas (array estructurado NumPy, ver `KLINE_DTYPE`)
+y no como un dict por vela: el parseo de la respuesta de Bybit es una sola
+conversión vectorizada y las estrategias reciben las columnas directamente.
+"""
+import time
+import numpy as np
+
+# Bybit /v5/market/kline devuelve como máximo 1000 velas por petición
+MAX_KLINE_LIMIT = 1000
+# Antigüedad máxima del último push del WS para considerar la serie "en vivo"
+LIVE_MAX_AGE_MS = 90_000
+
+
+def interval_to_ms(interval: str) -> int:
+    """'5' -> 300000. Devuelve 0 para intervalos no numéricos (D/W/M), que no se cachean."""
+    try:
+        return int(interval) * 60_000
+    except (TypeError, ValueError):
+        return 0
+
+
+# Una fila por vela, oldest-first. Los nombres coinciden con las claves de los dicts legacy
+KLINE_DTYPE = np.dtype([
+    ("time", np.int64), ("open", np.float64), ("high", np.float64),
+    ("low", np.float64), ("close", np.float64), ("volume", np.float64),
+])
+
+
+def empty_klines() -> np.ndarray:
+    return np.empty(0, dtype=KLINE_DTYPE)
+
+
+def parse_kline_rows(raw: list) -> np.ndarray:
+    """
+    Convierte `result.list` de /v5/market/kline (newest-first,
+    [startTime, open, high, low, close, volume, turnover] como strings)
+    en un array estructurado oldest-first, sin crear un dict por vela.
+    """
+    if not raw:
+        return empty_klines()
+    try:
+        values = np.array([k[:6] for k in raw], dtype=np.float64)
+    except (TypeError, ValueError, IndexError):
+        # Alguna fila mal formada: se descartan solo esas
+        rows = []
+        for k in raw:
+            try:
+                row = [float(x) for x in k[:6]]
+            except (TypeError, ValueError):
+                continue
+            if len(row) == 6:
+                rows.append(row)
+        if not rows:
+            return empty_klines()
+        values = np.array(rows, dtype=np.float64)
+
+    # Bybit devuelve la más reciente primero; los indicadores necesitan oldest-first
+    values = values[::-1]
+    out = np.empty(len(values), dtype=KLINE_DTYPE)
+    out["time"] = values[:, 0].astype(np.int64)
+    for i, name in enumerate(("open", "high", "low", "close", "volume"), start=1):
+        out[name] = values[:, i]
+    return out
+
+
+def candle_row(candle: dict) -> tuple:
+    return (int(candle["time"]), candle["open"], candle["high"],
+            candle["low"], candle["close"], candle["volume"])
+
+
+def klines_to_dicts(klines: np.ndarray) -> list:
+    """Formato legacy de `get_klines`: lista de dicts open/high/low/close/volume/time."""
+    return [
+        {"open": o, "high": h, "low": l, "close": c, "volume": v, "time": t}
+        for t, o, h, l, c, v in zip(
+            klines["time"].tolist(), klines["open"].tolist(), klines["high"].tolist(),
+            klines["low"].tolist(), klines["close"].tolist(), klines["volume"].tolist(),
+        )
+    ]
+
+
+class _KlineSeries:
+    """Buffer de velas (oldest-first, como mucho `capacity`) para un único (símbolo, intervalo)."""
+    __slots__ = ("candles", "capacity", "exhausted", "ws_updated_ms", "last_closed")
+
+    def __init__(self, candles: np.ndarray, capacity: int, exhausted: bool):
+        self.candles = candles[-capacity:].copy()
+        self.capacity = capacity
+        # True si Bybit devolvió menos velas de las pedidas (símbolo con poco historial)
+        self.exhausted = exhausted
+        # Último push del WS aplicado sin huecos (0 = la serie solo se mantiene por REST)
+        self.ws_updated_ms = 0
+        # True si la última vela es una recién confirmada por el WS y aún falta la vela en curso
+        self.last_closed = False
+
+    def covers(self, limit: int) -> bool:
+        return self.exhausted or (self.capacity >= limit and len(self.candles) >= limit)
+
+    def append(self, rows: np.ndarray):
+        self.candles = np.concatenate((self.candles, rows))[-self.capacity:]
+
+
+class KlineCache:
+    """
+    Cache de velas con refresco incremental de la cola.
+
+    `get()` recibe una función `fetch(limit)` que descarga las últimas `limit`
+    velas como array `KLINE_DTYPE` oldest-first (ver `parse_kline_rows`) y
+    devuelve una copia del mismo formato. La primera vez descarga el historial
+    completo; después solo las velas transcurridas desde la última guardada.
+    """
+
+    def __init__(self, store=None):
+        self._series = {}
+        # Historial local de velas cerradas (`OHLCVStore`) para sembrar series nuevas
+        self.store = store
+        self.stats = {"full": 0, "incremental": 0, "hits": 0, "store": 0}
+
+    def clear(self, symbol: str = None):
+        if symbol is None:
+            self._series.clear()
+            return
+        for key in [k for k in self._series if k[0] == symbol]:
+            del self._series[key]
+
+    def _bars_since(self, series: _KlineSeries, interval_ms: int, now_ms: int) -> int:
+        """Velas a pedir para cubrir desde la última vela guardada (incluida) hasta ahora."""
+        last_start = int(series.candles["time"][-1])
+        return max(1, (now_ms - last_start) // interval_ms + 1)
+
+    async def get(self, symbol: str, interval: str, limit: int, fetch) -> np.ndarray:
+        interval_ms = interval_to_ms(interval)
+        limit = min(int(limit), MAX_KLINE_LIMIT)
+        if interval_ms <= 0 or limit <= 0:
+            return await fetch(limit)
+
+        key = (symbol, interval)
+        series = self._series.get(key)
+        now_ms = int(time.time() * 1000)
+
+        if (series is None or not len(series.candles)) and self.store is not None:
+            series = self._seed_from_store(key, limit, interval_ms, now_ms)
+
+        if series is None or not len(series.candles) or not series.covers(limit):
+            return await self._full_refresh(key, limit, fetch, series)
+
+        needed = self._bars_since(series, interval_ms, now_ms)
+        if needed == 1 and not series.last_closed and now_ms - series.ws_updated_ms < LIVE_MAX_AGE_MS:
+            # La vela en curso llega por WebSocket: no hace falta REST
+            self.stats["hits"] += 1
+            return series.candles[-limit:].copy()
+
+        if needed >= series.capacity:
+            # El hueco es mayor que el buffer: no compensa fusionar
+            return await self._full_refresh(key, limit, fetch, series)
+
+        # La vela más reciente puede haber estado abierta: siempre se re-descarga
+        fresh = await fetch(needed + 1)
+        if not len(fresh):
+            self.stats["hits"] += 1
+            return series.candles[-limit:].copy()
+
+        if fresh["time"][0] > series.candles["time"][-1] + interval_ms:
+            # No solapa con lo guardado (reloj desfasado / mantenimiento): historial completo
+            return await self._full_refresh(key, limit, fetch, series)
+
+        self._merge(series, fresh)
+        self.stats["incremental"] += 1
+        return series.candles[-limit:].copy()
+
+    def _seed_from_store(self, key, limit: int, interval_ms: int, now_ms: int):
+        """Serie inicial con las últimas `limit` velas guardadas, si llegan hasta hace poco."""
+        # Solo velas ya abiertas: en una reproducción el store puede tener las "futuras"
+        stored = self.store.read(key[0], key[1], end_ms=now_ms)
+        stored = stored[max(0, len(stored) - limit):]
+        if len(stored) < limit or (now_ms - int(stored["time"][-1])) // interval_ms + 1 >= limit:
+            return None
+        series = _KlineSeries(stored.to_klines(), limit, exhausted=False)
+        self._series[key] = series
+        self.stats["store"] += 1
+        return series
+
+    async def _full_refresh(self, key, limit: int, fetch, previous: _KlineSeries = None) -> np.ndarray:
+        capacity = max(limit, previous.capacity if previous else 0)
+        candles = await fetch(capacity)
+        if not len(candles):
+            return empty_klines()
+        self._series[key] = _KlineSeries(candles, capacity, exhausted=len(candles) < capacity)
+        self.stats["full"] += 1
+        return candles[-limit:].copy()
+
+    def has(self, symbol: str, interval: str) -> bool:
+        return (symbol, interval) in self._series
+
+    def closed_candles(self, symbol: str, interval: str) -> np.ndarray:
+        """Velas cerradas guardadas (sin la última si sigue abierta)."""
+        series = self._series.get((symbol, interval))
+        if not series:
+            return empty_klines()
+        return series.candles.copy() if series.last_closed else series.candles[:-1].copy()
+
+    def ingest(self, symbol: str, interval: str, candle: dict, confirmed: bool = False):
+        """
+        Aplica una vela recibida por el stream público de klines.
+        Solo actualiza series ya cargadas por REST (el backfill sigue siendo REST).
+        Tras cerrarse una vela la serie no tiene vela en curso (`last_closed`):
+        hasta el primer push de la siguiente, `get()` la trae por REST en vez de
+        servir la cerrada como si siguiera abierta.
+        """
+        interval_ms = interval_to_ms(interval)
+        series = self._series.get((symbol, interval))
+        if interval_ms <= 0 or series is None or not len(series.candles):
+            return
+
+        row = candle_row(candle)
+        last_time = int(series.candles["time"][-1])
+        if row[0] == last_time:
+            if series.last_closed and not confirmed:
+                return  # Push atrasado de una vela ya confirmada
+            series.candles[-1] = row
+        elif row[0] == last_time + interval_ms:
+            series.append(np.array([row], dtype=KLINE_DTYPE))
+        elif row[0] < last_time:
+            return  # Mensaje atrasado, ya tenemos algo más reciente
+        else:
+            # Hueco (reconexión): el próximo get() lo rellena por REST
+            series.ws_updated_ms = 0
+            return
+
+        series.last_closed = confirmed
+        series.ws_updated_ms = int(time.time() * 1000)
+
+    @staticmethod
+    def _merge(series: _KlineSeries, fresh: np.ndarray):
+        """Sustituye las velas solapadas de la cola por las nuevas y añade el resto."""
+        # `time` está ordenado: las velas a conservar son las anteriores a la primera nueva
+        keep = np.searchsorted(series.candles["time"], fresh["time"][0], side="left")
+        series.candles = series.candles[:keep]
+        series.append(fresh)
+        # La cola viene de REST: su última vela es la que está en curso
+        series.last_closed = False
@@ -0,0 +1,44 @@
+"""
+Market Data Context: velas compartidas durante un único ciclo de escaneo.
+
+En cada escaneo V13, SuperTrend (entrada y early exit) y el trailing EMA21
+pedían por separado las velas del mismo símbolo. El contexto descarga cada
+(símbolo, intervalo) como mucho una vez por ciclo; si varias tareas lo piden a
+la vez, todas esperan al mismo future en vuelo. Expone el mismo `get_klines`
+que `AsyncBybitClient`, así que se pasa a las estrategias en lugar del cliente.
+"""
+import asyncio
+from app.exchange.kline_cache import klines_to_dicts
+
+
+class MarketDataContext:
+    def __init__(self, client):
+        self.client = client
+        # (símbolo, intervalo) -> (limit descargado, future con el array KLINE_DTYPE)
+        self._klines = {}
+        self.stats = {"fetches": 0, "shared": 0}
+
+    async def get_klines(self, symbol: str, interval: str = "5m", limit: int = 100,
+                         use_cache: bool = True, as_array: bool = False):
+        key = (symbol.replace("-", "").upper(), interval.replace("m", ""))
+        entry = self._klines.get(key)
+        if entry is not None and entry[0] >= limit:
+            self.stats["shared"] += 1
+            klines = await asyncio.shield(entry[1])
+        else:
+            # Primera petición del ciclo (o más historial del ya descargado)
+            task = asyncio.ensure_future(
+                self.client.get_klines(symbol, interval, limit, use_cache=use_cache, as_array=True)
+            )
+            self._klines[key] = (limit, task)
+            self.stats["fetches"] += 1
+            try:
+                klines = await asyncio.shield(task)
+            except Exception:
+                # No se cachea el error: otra tarea del ciclo puede reintentar
+                if self._klines.get(key, (None, None))[1] is task:
+                    del self._klines[key]
+                raise
+
+        klines = klines[-limit:]
+        return klines if as_array else klines_to_dicts(klines)
@@ -0,0 +1,145 @@
+"""
+Market Events: modelo interno de eventos del WebSocket de Bybit v5.
+
+`BybitWebSocket` convierte cada mensaje una sola vez en estos objetos y el
+engine, el CandleStore y el AccountState los consumen tal cual, sin formatos
+intermedios estilo BingX. Los tickers llegan como `snapshot` + `delta`
+(en el delta solo vienen los campos que cambiaron), así que `TickerBook`
+mantiene el estado fusionado por símbolo y solo emite `MarkPrice` cuando el
+mark price cambia.
+"""
+import time
+
+
+class MarkPrice:
+    __slots__ = ("symbol", "mark_price", "last_price", "ts")
+
+    def __init__(self, symbol: str, mark_price: float, last_price: float = 0.0, ts: int = 0):
+        self.symbol = symbol
+        self.mark_price = mark_price
+        self.last_price = last_price
+        self.ts = ts
+
+    def __repr__(self):
+        return f"MarkPrice({self.symbol} {self.mark_price})"
+
+
+class Kline:
+    __slots__ = ("symbol", "interval", "start", "open", "high", "low", "close", "volume", "confirm")
+
+    def __init__(self, symbol: str, interval: str, start: int, open: float, high: float,
+                 low: float, close: float, volume: float, confirm: bool = False):
+        self.symbol = symbol
+        self.interval = interval
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.confirm = confirm
+
+    @classmethod
+    def from_bybit(cls, symbol: str, interval: str, raw: dict) -> "Kline":
+        """Elemento de `data` de un topic kline.{interval}.{symbol}. Lanza KeyError/ValueError si viene mal."""
+        return cls(symbol, interval, int(raw["start"]), float(raw["open"]), float(raw["high"]),
+                   float(raw["low"]), float(raw["close"]), float(raw["volume"]), bool(raw.get("confirm")))
+
+    def as_candle(self) -> dict:
+        """Mismo formato de vela que `KlineCache` / `get_klines`."""
+        return {"open": self.open, "high": self.high, "low": self.low, "close": self.close,
+                "volume": self.volume, "time": self.start}
+
+    def __repr__(self):
+        return f"Kline({self.symbol} {self.interval} {self.start} c={self.close}{' confirm' if self.confirm else ''})"
+
+
+class Execution:
+    __slots__ = ("symbol", "order_id", "side", "exec_qty", "exec_price", "leaves_qty", "exec_type", "ts")
+
+    def __init__(self, symbol: str, order_id: str, side: str, exec_qty: float, exec_price: float,
+                 leaves_qty: float, exec_type: str = "Trade", ts: int = 0):
+        self.symbol = symbol
+        self.order_id = order_id
+        self.side = side
+        self.exec_qty = exec_qty
+        self.exec_price = exec_price
+        self.leaves_qty = leaves_qty
+        self.exec_type = exec_type
+        self.ts = ts
+
+    @property
+    def filled(self) -> bool:
+        """La orden quedó completamente ejecutada con esta ejecución."""
+        return self.leaves_qty <= 0
+
+    @classmethod
+    def from_bybit(cls, raw: dict) -> "Execution":
+        return cls(
+            raw.get("symbol", ""), str(raw.get("orderId", "")), raw.get("side", ""),
+            float(raw.get("execQty") or 0), float(raw.get("execPrice") or 0),
+            float(raw.get("leavesQty") or 0), raw.get("execType", "Trade"),
+            int(raw.get("execTime") or 0),
+        )
+
+    def __repr__(self):
+        return f"Execution({self.symbol} {self.order_id} {self.exec_qty}@{self.exec_price} leaves={self.leaves_qty})"
+
+
+class OrderUpdate:
+    __slots__ = ("symbol", "order_id", "status", "category", "raw")
+
+    def __init__(self, symbol: str, order_id: str, status: str, category: str = "linear", raw: dict = None):
+        self.symbol = symbol
+        self.order_id = order_id
+        self.status = status
+        self.category = category
+        # La orden tal como la da Bybit: el supervisor lee triggerPrice, stopOrderType, qty...
+        self.raw = raw if raw is not None else {}
+
+    @classmethod
+    def from_bybit(cls, raw: dict) -> "OrderUpdate":
+        return cls(raw.get("symbol", ""), str(raw.get("orderId", "")), raw.get("orderStatus", ""),
+                   raw.get("category", "linear"), raw)
+
+    def __repr__(self):
+        return f"OrderUpdate({self.symbol} {self.order_id} {self.status})"
+
+
+class TickerBook:
+    """Estado fusionado de tickers.{symbol} (snapshot + deltas)."""
+
+    def __init__(self):
+        self._tickers = {}  # símbolo -> dict con los últimos valores de cada campo
+
+    def apply(self, message: dict):
+        """Fusiona un mensaje tickers.* y devuelve un `MarkPrice` si el mark price cambió."""
+        data = message.get("data") or {}
+        symbol = data.get("symbol") or message.get("topic", "").split(".")[-1]
+        if not symbol:
+            return None
+        previous = self._tickers.get(symbol)
+        previous_mark = previous.get("markPrice") if previous is not None else None
+        if message.get("type") == "snapshot" or previous is None:
+            merged = dict(data)
+        else:
+            # Delta: solo campos que cambiaron (los vacíos no son un cambio)
+            merged = previous
+            merged.update((k, v) for k, v in data.items() if v not in ("", None))
+        self._tickers[symbol] = merged
+
+        mark = merged.get("markPrice")
+        if not mark or mark == previous_mark:
+            return None
+        try:
+            return MarkPrice(symbol, float(mark), float(merged.get("lastPrice") or 0),
+                             int(message.get("ts") or time.time() * 1000))
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, symbol: str) -> dict:
+        ticker = self._tickers.get(symbol)
+        return dict(ticker) if ticker is not None else {}
+
+    def discard(self, symbol: str):
+        self._tickers.pop(symbol, None)
@@ -0,0 +1,352 @@
+"""
+OHLCV Store: historial local de velas cerradas por (símbolo, intervalo).
+
+Cada serie es un directorio `storage/ohlcv/{SÍMBOLO}_{intervalo}/` con un
+archivo binario por campo (`time.i64`, `open.f64`, ..., `volume.f64`), en el
+orden de `KLINE_DTYPE`. Añadir velas es un append secuencial a cada archivo;
+leerlas, un `np.memmap` por columna, así que estrategias, backtester y
+dashboard reciben vistas sin copiar (`CandleColumns`). El número de velas es
+el tamaño de los archivos: si un corte deja columnas de distinta longitud, al
+abrir la serie se recortan a la más corta (la última vela completa).
+
+Lo alimentan dos caminos:
+  - el stream público de klines (`CandleStore`) añade cada vela confirmada;
+  - `backfill()` rellena por REST los huecos que detecta `gaps()`, paginando
+    /v5/market/kline en paralelo (`AsyncBybitClient.get_kline_history`).
+
+Backfill masivo:
+    python -m app.exchange.ohlcv_store --symbols BTCUSDT,ETHUSDT --intervals 5,15,60 --days 90
+"""
+import asyncio
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from app.constants import STORAGE_PATH
+from app.exchange.kline_cache import KLINE_DTYPE, interval_to_ms
+from app.logger import logger
+
+OHLCV_DIR = os.path.join(STORAGE_PATH, "ohlcv")
+FIELDS = KLINE_DTYPE.names
+_SUFFIX = {np.dtype(np.int64): ".i64", np.dtype(np.float64): ".f64"}
+
+
+def _normalize(symbol: str, interval: str) -> tuple:
+    return symbol.replace("-", "").upper(), str(interval).replace("m", "")
+
+
+class CandleColumns:
+    """
+    Velas como columnas separadas (vistas de los memmap del store). Se indexa
+    como el array `KLINE_DTYPE`: `c["close"]`, `len(c)`, `c[-300:]`.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, columns: dict):
+        for name in FIELDS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def empty(cls) -> "CandleColumns":
+        return cls({name: np.empty(0, dtype=KLINE_DTYPE[name]) for name in FIELDS})
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return CandleColumns({name: getattr(self, name)[key] for name in FIELDS})
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def to_klines(self) -> np.ndarray:
+        """Copia como array estructurado `KLINE_DTYPE` (buffers mutables, memoria compartida)."""
+        out = np.empty(len(self), dtype=KLINE_DTYPE)
+        for name in FIELDS:
+            out[name] = getattr(self, name)
+        return out
+
+
+def as_klines(klines) -> np.ndarray:
+    """`KLINE_DTYPE` contiguo a partir de un array estructurado o de `CandleColumns`."""
+    if isinstance(klines, CandleColumns):
+        return klines.to_klines()
+    return np.ascontiguousarray(klines, dtype=KLINE_DTYPE)
+
+
+class _Series:
+    """Estado abierto de una serie: longitud, archivos en append y mapas vigentes."""
+    __slots__ = ("path", "length", "files", "view")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.length = 0
+        self.files = {}    # campo -> archivo abierto en append (sin buffer)
+        self.view = None   # CandleColumns mapeadas para `length` velas
+
+    def column_path(self, name: str) -> str:
+        return os.path.join(self.path, name + _SUFFIX[KLINE_DTYPE[name]])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        self.view = None
+
+
+class OHLCVStore:
+    def __init__(self, directory: str = OHLCV_DIR):
+        self.directory = directory
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.directory, f"{symbol}_{interval}")
+
+    def _open(self, symbol: str, interval: str, create: bool = False):
+        key = (symbol, interval)
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        path = self._path(symbol, interval)
+        if not os.path.isdir(path):
+            if not create:
+                return None
+            os.makedirs(path, exist_ok=True)
+        series = _Series(path)
+        sizes = {}
+        for name in FIELDS:
+            column = series.column_path(name)
+            sizes[name] = os.path.getsize(column) if os.path.exists(column) else 0
+        series.length = min(size // KLINE_DTYPE[name].itemsize for name, size in sizes.items())
+        for name in FIELDS:
+            expected = series.length * KLINE_DTYPE[name].itemsize
+            if sizes[name] != expected:
+                # Append interrumpido: fuera las filas a medio escribir
+                with open(series.column_path(name), "ab") as f:
+                    f.truncate(expected)
+                logger.warning(f"[OHLCV] {symbol} {interval}m: columna {name} recortada a {series.length} velas.")
+        self._series[key] = series
+        return series
+
+    def _view(self, series: _Series) -> CandleColumns:
+        if series.view is None or len(series.view) != series.length:
+            if not series.length:
+                return CandleColumns.empty()
+            series.view = CandleColumns({
+                name: np.memmap(series.column_path(name), dtype=KLINE_DTYPE[name], mode="r", shape=(series.length,))
+                for name in FIELDS
+            })
+        return series.view
+
+    # ── Escritura ───────────────────────────────────────────────────────────
+
+    def append(self, symbol: str, interval: str, klines) -> int:
+        """
+        Guarda velas cerradas (`KLINE_DTYPE` o `CandleColumns`). Las posteriores
+        a la última guardada se añaden al final; las que rellenan un hueco o
+        preceden a la serie obligan a reescribirla. Las ya guardadas se ignoran.
+        Devuelve cuántas velas nuevas se guardaron.
+        """
+        symbol, interval = _normalize(symbol, interval)
+        rows = as_klines(klines)
+        if not len(rows):
+            return 0
+        if np.any(np.diff(rows["time"]) <= 0):
+            _, unique = np.unique(rows["time"], return_index=True)
+            rows = rows[unique]
+        try:
+            with self._lock:
+                series = self._open(symbol, interval, create=True)
+                stored = self._view(series)
+                if not series.length or rows["time"][0] > stored.time[-1]:
+                    self._write_tail(series, rows)
+                    return len(rows)
+                return self._merge(series, stored, rows)
+        except OSError as e:
+            logger.error(f"[OHLCV] No se pudo guardar {symbol} {interval}m: {e}")
+            return 0
+
+    @staticmethod
+    def _write_tail(series: _Series, rows: np.ndarray):
+        for name in FIELDS:
+            f = series.files.get(name)
+            if f is None:
+                f = series.files[name] = open(series.column_path(name), "ab", buffering=0)
+            f.write(np.ascontiguousarray(rows[name]).tobytes())
+        series.length += len(rows)
+
+    def _merge(self, series: _Series, stored: CandleColumns, rows: np.ndarray) -> int:
+        # Solo se compara contra el tramo guardado que solapa con las velas nuevas
+        lo, hi = np.searchsorted(stored.time, [rows["time"][0], rows["time"][-1]], side="left")
+        hi = min(hi + 1, series.length)
+        rows = rows[~np.isin(rows["time"], stored.time[lo:hi])]
+        if not len(rows):
+            return 0
+        if rows["time"][0] > stored.time[-1]:
+            self._write_tail(series, rows)
+            return len(rows)
+
+        merged = np.concatenate((stored.to_klines(), rows))
+        merged = merged[np.argsort(merged["time"], kind="stable")]
+        # Reescritura completa en un directorio temporal y cambio de nombre
+        series.close()
+        tmp = series.path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in FIELDS:
+            merged[name].tofile(os.path.join(tmp, os.path.basename(series.column_path(name))))
+        old = series.path + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(series.path, old)
+        os.replace(tmp, series.path)
+        shutil.rmtree(old, ignore_errors=True)
+        series.length = len(merged)
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            for series in self._series.values():
+                series.close()
+            self._series.clear()
+
+    # ── Lectura ─────────────────────────────────────────────────────────────
+
+    def read(self, symbol: str, interval: str, start_ms: int = None, end_ms: int = None) -> CandleColumns:
+        """Velas con apertura en [start_ms, end_ms], como vistas sobre los archivos mapeados."""
+        symbol, interval = _normalize(symbol, interval)
+        with self._lock:
+            series = self._open(symbol, interval)
+            candles = self._view(series) if series is not None else CandleColumns.empty()
+        if start_ms is None and end_ms is None:
+            return candles
+        lo = 0 if start_ms is None else int(np.searchsorted(candles.time, start_ms, side="left"))
+        hi = len(candles) if end_ms is None else int(np.searchsorted(candles.time, end_ms, side="right"))
+        return candles[lo:hi]
+
+    def tail(self, symbol: str, interval: str, count: int) -> CandleColumns:
+        candles = self.read(symbol, interval)
+        return candles[max(0, len(candles) - int(count)):]
+
+    def series(self) -> list:
+        """(símbolo, intervalo) de todas las series guardadas en disco."""
+        if not os.path.isdir(self.directory):
+            return []
+        out = []
+        for entry in sorted(os.listdir(self.directory)):
+            symbol, _, interval = entry.rpartition("_")
+            if symbol and interval_to_ms(interval) and os.path.isdir(os.path.join(self.directory, entry)):
+                out.append((symbol, interval))
+        return out
+
+    def gaps(self, symbol: str, interval: str, start_ms: int = None, end_ms: int = None) -> list:
+        """
+        Tramos sin velas como [(desde, hasta)] (aperturas incluidas). Con
+        `start_ms`/`end_ms` también cuentan el tramo anterior a la primera vela
+        guardada y el posterior a la última (hasta la última vela cerrada).
+        """
+        symbol, interval = _normalize(symbol, interval)
+        step = interval_to_ms(interval)
+        if not step:
+            return []
+        times = self.read(symbol, interval).time
+        if start_ms is not None:
+            start_ms = int(start_ms) - int(start_ms) % step
+        if end_ms is not None:
+            end_ms = int(end_ms) - int(end_ms) % step
+        if not len(times):
+            return [(start_ms, end_ms)] if start_ms is not None and end_ms is not None and start_ms <= end_ms else []
+
+        out = []
+        if start_ms is not None and start_ms < times[0]:
+            out.append((start_ms, int(times[0]) - step))
+        holes = np.flatnonzero(np.diff(times) > step)
+        out.extend((int(times[i]) + step, int(times[i + 1]) - step) for i in holes)
+        if end_ms is not None and end_ms > times[-1]:
+            out.append((int(times[-1]) + step, end_ms))
+        return out
+
+    def status(self) -> list:
+        """Resumen por serie para el dashboard."""
+        out = []
+        for symbol, interval in self.series():
+            candles = self.read(symbol, interval)
+            out.append({
+                "symbol": symbol, "interval": interval, "candles": len(candles),
+                "first": int(candles.time[0]) if len(candles) else None,
+                "last": int(candles.time[-1]) if len(candles) else None,
+                "gaps": len(self.gaps(symbol, interval)),
+            })
+        return out
+
+    # ── Backfill ────────────────────────────────────────────────────────────
+
+    async def backfill(self, client, symbols: list, intervals: list, start_ms: int, end_ms: int = None) -> dict:
+        """
+        Descarga por REST los tramos que faltan en [start_ms, end_ms] de cada
+        (símbolo, intervalo) y los guarda. Todas las series y sus páginas van en
+        paralelo; el ritmo lo marca el rate limiter del cliente. Devuelve
+        {(símbolo, intervalo): velas añadidas}; una serie fallida no frena al resto.
+        """
+        now_ms = int(time.time() * 1000)
+
+        async def fill(symbol, interval):
+            step = interval_to_ms(interval)
+            # Solo velas cerradas: la en curso la completa el stream en vivo
+            last_closed = min(end_ms if end_ms is not None else now_ms, now_ms - step)
+            gaps = self.gaps(symbol, interval, start_ms, last_closed)
+            pages = await asyncio.gather(*[client.get_kline_history(symbol, interval, a, b) for a, b in gaps])
+            pages = [p for p in pages if p is not None and len(p)]
+            if not pages:
+                return 0
+            klines = np.concatenate(pages)
+            # Un único append: como mucho una reescritura por serie
+            return await asyncio.to_thread(self.append, symbol, interval, klines[klines["time"] <= last_closed])
+
+        pairs = [_normalize(s, iv) for s in symbols for iv in intervals]
+        results = await asyncio.gather(*[fill(s, iv) for s, iv in pairs], return_exceptions=True)
+        out = {}
+        for pair, result in zip(pairs, results):
+            if isinstance(result, Exception):
+                logger.error(f"[OHLCV] Backfill {pair[0]} {pair[1]}m falló: {result}")
+                continue
+            out[pair] = result
+        logger.info(f"[OHLCV] Backfill: {sum(out.values())} velas nuevas en {len(out)}/{len(pairs)} series.")
+        return out
+
+
+ohlcv_store = OHLCVStore()
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.exchange.bybit_client import AsyncBybitClient
+
+    parser = argparse.ArgumentParser(description="Backfill del historial OHLCV local desde Bybit")
+    parser.add_argument("--symbols", required=True, help="Lista separada por comas")
+    parser.add_argument("--intervals", default="5,15,60", help="Intervalos en minutos, separados por comas")
+    parser.add_argument("--days", type=int, default=30, help="Días hacia atrás desde ahora")
+    parser.add_argument("--dir", default=OHLCV_DIR, help="Directorio del store")
+    args = parser.parse_args()
+
+    async def main():
+        client = AsyncBybitClient()
+        store = OHLCVStore(args.dir)
+        end_ms = int(time.time() * 1000)
+        try:
+            added = await store.backfill(
+                client, [s.strip() for s in args.symbols.split(",") if s.strip()],
+                [iv.strip() for iv in args.intervals.split(",") if iv.strip()],
+                end_ms - args.days * 86_400_000, end_ms,
+            )
+        finally:
+            await client.close()
+            store.close()
+        for (symbol, interval), count in sorted(added.items()):
+            remaining = len(store.gaps(symbol, interval))
+            print(f"{symbol} {interval}m: +{count} velas ({len(store.read(symbol, interval))} en total, {remaining} huecos)")
+
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 import asyncio
 from typing import Optional, Tuple
-from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.bybit_client import get_shared_client
 from app.risk.takeprofit_manager import TakeProfitManager
 from app.logger import logger
 from app.config import Config
@@ -13,8 +13,8 @@ class OrderExecutor:
     - Entry uses postOnly=False (we want immediate execution if possible but as LIMIT).
     - TP/SL: reduceOnly=True
     """
-    def __init__(self):
-        self.client = AsyncBybitClient()
+    def __init__(self, client=None):
+        self.client = client or get_shared_client()
 
     async def setup_leverage(self, symbol: str, side: str):
         margin_ok = await self.client.set_margin_type(symbol, "ISOLATED")
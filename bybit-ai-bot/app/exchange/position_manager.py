@@ -1,13 +1,13 @@
 import asyncio
-from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.bybit_client import get_shared_client
 
 class PositionManager:
     """
     Manages per-symbol locks to prevent race conditions.
     Provides real-time position queries from the exchange.
     """
-    def __init__(self):
-        self.client = AsyncBybitClient()
+    def __init__(self, client=None):
+        self.client = client or get_shared_client()
         self.locks: dict = {}
 
     def get_lock(self, symbol: str) -> asyncio.Lock:
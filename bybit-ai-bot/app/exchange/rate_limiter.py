@@ -0,0 +1,197 @@
+"""
+Rate Limiter: planificador único de peticiones REST a Bybit para todo el proceso.
+
+Todos los `AsyncBybitClient` (engine, guardian, executor, recovery...) pasan por
+`request_scheduler` antes de cada petición:
+  - Token bucket global por IP y uno por endpoint con límite por UID, ajustados
+    en vivo con las cabeceras `X-Bapi-Limit`, `X-Bapi-Limit-Status` y
+    `X-Bapi-Limit-Reset-Timestamp` que devuelve Bybit.
+  - Cola de prioridad para los huecos en vuelo: órdenes/cancelaciones/SL antes
+    que cuenta y posiciones, y estas antes que datos de mercado. Además hay
+    huecos reservados a órdenes, así que un SL nunca espera detrás de un
+    escaneo de velas de 25 símbolos.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from app.logger import logger
+
+PRIORITY_ORDER = 0    # Crear/modificar/cancelar órdenes, SL/TP
+PRIORITY_ACCOUNT = 1  # Posiciones, balance, ejecuciones, PnL
+PRIORITY_MARKET = 2   # Velas, tickers, instrumentos
+
+ORDER_ENDPOINTS = {
+    "/v5/order/create", "/v5/order/amend", "/v5/order/cancel",
+    "/v5/order/cancel-all", "/v5/position/trading-stop",
+}
+
+# Límite por IP: 600 peticiones cada 5s. Se deja margen para no rozar el baneo.
+IP_RATE_PER_SEC = 100
+
+# Límites por UID (peticiones/s) de los endpoints que usa el bot. Bybit los
+# confirma en cada respuesta firmada y el bucket se reajusta con ese valor.
+ENDPOINT_RATE_PER_SEC = {
+    "/v5/order/create": 10,
+    "/v5/order/amend": 10,
+    "/v5/order/cancel": 10,
+    "/v5/order/cancel-all": 10,
+    "/v5/order/realtime": 50,
+    "/v5/order/history": 50,
+    "/v5/position/list": 50,
+    "/v5/position/trading-stop": 10,
+    "/v5/position/set-leverage": 10,
+    "/v5/position/switch-isolated": 10,
+    "/v5/position/closed-pnl": 50,
+    "/v5/execution/list": 50,
+    "/v5/account/wallet-balance": 50,
+}
+
+# retCode de Bybit para "Too many visits"
+RATE_LIMIT_RET_CODE = 10006
+
+
+def endpoint_priority(endpoint: str) -> int:
+    if endpoint in ORDER_ENDPOINTS:
+        return PRIORITY_ORDER
+    if endpoint.startswith("/v5/market/"):
+        return PRIORITY_MARKET
+    return PRIORITY_ACCOUNT
+
+
+class TokenBucket:
+    """Bucket clásico (rate tokens/s, ráfaga máxima `capacity`) con bloqueo hasta un reset."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> float:
+        """Consume un token si hay. Devuelve 0, o los segundos a esperar antes de reintentar."""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def take(self):
+        while True:
+            delay = self.try_take()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def block_for(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def sync(self, limit: int, remaining: int, reset_ms: int = None):
+        """Alinea el bucket con lo que Bybit dice que queda en la ventana actual."""
+        if limit > 0 and limit != self.capacity:
+            self.rate = self.capacity = float(limit)
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, float(remaining))
+        if remaining <= 0:
+            wait = (reset_ms / 1000 - time.time()) if reset_ms else 1.0
+            self.block_for(min(max(wait, 0.05), 5.0))
+
+
+class RequestScheduler:
+    def __init__(self, max_in_flight: int = 8, reserved_for_orders: int = 2,
+                 ip_rate: float = IP_RATE_PER_SEC):
+        self.max_in_flight = max_in_flight
+        self.reserved_for_orders = reserved_for_orders
+        self._ip_bucket = TokenBucket(ip_rate)
+        self._buckets = {ep: TokenBucket(rate) for ep, rate in ENDPOINT_RATE_PER_SEC.items()}
+        self._waiters = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self.stats = {"queued": 0, "throttled": 0}
+
+    def _can_start(self, priority: int) -> bool:
+        limit = self.max_in_flight
+        if priority != PRIORITY_ORDER:
+            limit -= self.reserved_for_orders
+        return self._in_flight < limit
+
+    def _head_priority(self):
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        return self._waiters[0][0] if self._waiters else None
+
+    def _wake(self):
+        while True:
+            head = self._head_priority()
+            if head is None or not self._can_start(head):
+                return
+            _, _, fut = heapq.heappop(self._waiters)
+            self._in_flight += 1
+            fut.set_result(None)
+
+    async def acquire(self, endpoint: str) -> int:
+        """Espera turno (por prioridad) y token para `endpoint`. Llamar a `release()` al terminar."""
+        priority = endpoint_priority(endpoint)
+        head = self._head_priority()
+        if (head is None or head > priority) and self._can_start(priority):
+            self._in_flight += 1
+        else:
+            self.stats["queued"] += 1
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self.release()  # Ya tenía hueco asignado
+                raise
+
+        try:
+            bucket = self._buckets.get(endpoint)
+            if bucket is not None:
+                await bucket.take()
+            await self._ip_bucket.take()
+        except BaseException:
+            self.release()
+            raise
+        return priority
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake()
+
+    def observe(self, endpoint: str, headers, ret_code: int = None):
+        """Actualiza los buckets con las cabeceras de límite y los errores 10006 de la respuesta."""
+        bucket = self._buckets.get(endpoint)
+        status = headers.get("X-Bapi-Limit-Status") if headers is not None else None
+        if status is not None:
+            try:
+                limit = int(headers.get("X-Bapi-Limit") or 0)
+                remaining = int(status)
+                reset_ms = int(headers.get("X-Bapi-Limit-Reset-Timestamp") or 0)
+            except (TypeError, ValueError):
+                limit, remaining, reset_ms = 0, None, 0
+            if remaining is not None:
+                if bucket is None:
+                    bucket = self._buckets[endpoint] = TokenBucket(limit or 10)
+                bucket.sync(limit, remaining, reset_ms)
+                if remaining <= 0:
+                    self.stats["throttled"] += 1
+                    logger.warning(f"[RATE] Límite agotado en {endpoint}, pausando hasta el reset")
+
+        if ret_code == RATE_LIMIT_RET_CODE:
+            self.stats["throttled"] += 1
+            logger.warning(f"[RATE] Bybit devolvió 10006 (Too many visits) en {endpoint}. Frenando 1s.")
+            (bucket or self._ip_bucket).block_for(1.0)
+
+
+request_scheduler = RequestScheduler()
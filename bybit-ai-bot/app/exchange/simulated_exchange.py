@@ -0,0 +1,812 @@
+"""
+Simulated Exchange: Bybit v5 determinista en memoria para reproducir mercado
+grabado a través del bot real, sin red.
+
+`SimulatedExchange` responde las rutas REST que usa el bot con la misma forma
+que devuelve `AsyncBybitClient._request`, así que `SimulatedBybitClient` solo
+sustituye `_request`: `get_klines`, `get_ticker`, `place_order`,
+`cancel_order`, `get_open_orders`, `get_positions`... son el código real del
+cliente (formateo de precisiones, KlineCache, paginación). `SimulatedWebSocket`
+es el `BybitWebSocket` real sobre un socket local (`LocalSocket`): recibe los
+topics kline/tickers y los privados order/execution/position que emite el
+exchange, con los mismos acks de subscribe/auth/ping.
+
+El mercado avanza con `tick()` (precio a precio, desde ticks grabados) o con
+`replay()` sobre velas grabadas: cada vela base se recorre
+open -> low/high -> high/low -> close. En cada tick se casan las órdenes:
+  - límite: se ejecutan cuando el bid/ask las cruza, como mucho `fill_ratio`
+    de la cantidad por tick (ejecuciones parciales);
+  - mercado: al ask/bid con `slippage_bps`;
+  - condicionales (SL/TP con triggerPrice) y el stopLoss adjunto a la entrada
+    (`tpslOrder`): se disparan al cruzar el trigger y se ejecutan a mercado.
+Hedge mode: positionIdx 1 = LONG, 2 = SHORT. Las reduceOnly se recortan a la
+posición; sin posición se cancelan.
+
+`SimClock` es el reloj de la simulación. En `install()` sustituye `time.time`
+(lo que ve el Engine: cooldowns, cache de velas, timeouts) y escala
+`asyncio.sleep` por `speed`, para reproducir un día de mercado a 1000x.
+"""
+import asyncio
+import itertools
+import math
+import statistics
+import time
+from contextlib import contextmanager
+import numpy as np
+from websockets.exceptions import ConnectionClosedOK
+from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.kline_cache import KLINE_DTYPE, interval_to_ms
+from app.exchange.websocket_client import BybitWebSocket
+from app.logger import logger
+from app.utils import json_codec
+
+_real_sleep = asyncio.sleep
+_real_time = time.time
+
+# Estados de orden viva (mismos que AccountState.OPEN_ORDER_STATUSES)
+ACTIVE_STATUSES = {"New", "PartiallyFilled", "Untriggered"}
+SIM_INTERVALS = ("5", "15", "60")
+# Ventana de turnover24h de /v5/market/tickers
+TURNOVER_WINDOW_MS = 86_400_000
+
+RET_INVALID = 10001
+RET_ORDER_NOT_EXISTS = 110001
+RET_REDUCE_ONLY_NO_POSITION = 110017
+RET_TRIGGER_RISING = 110092
+RET_TRIGGER_FALLING = 110093
+
+
+def _fmt(value: float) -> str:
+    return format(float(value), ".10g")
+
+
+def _ok(result: dict) -> dict:
+    return {"success": True, "data": result, "msg": "OK", "code": 0}
+
+
+def _error(code: int, msg: str) -> dict:
+    return {"success": False, "data": None, "msg": msg, "code": code}
+
+
+def _flag(value) -> bool:
+    return value is True or str(value).lower() == "true"
+
+
+class SimClock:
+    """Reloj de la simulación (epoch ms). Solo avanza con `advance_to`."""
+
+    def __init__(self, start_ms: int, speed: float = None):
+        self.now_ms = int(start_ms)
+        self.speed = speed
+
+    def advance_to(self, ts_ms: int):
+        self.now_ms = max(self.now_ms, int(ts_ms))
+
+    def time(self) -> float:
+        return self.now_ms / 1000
+
+    @contextmanager
+    def install(self):
+        """`time.time` lee este reloj y `asyncio.sleep` dura 1/speed (si hay speed)."""
+        speed = self.speed
+
+        async def scaled_sleep(delay, result=None):
+            return await _real_sleep(delay / speed if speed and delay > 0 else 0, result)
+
+        time.time = self.time
+        asyncio.sleep = scaled_sleep
+        try:
+            yield self
+        finally:
+            time.time = _real_time
+            asyncio.sleep = _real_sleep
+
+
+class _Bars:
+    """Velas cerradas de un (símbolo, intervalo) más la vela en formación."""
+    __slots__ = ("interval", "interval_ms", "buffer", "length", "forming")
+
+    def __init__(self, interval: str, closed: np.ndarray):
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.buffer = np.empty(max(256, len(closed) * 2), dtype=KLINE_DTYPE)
+        self.buffer[:len(closed)] = closed
+        self.length = len(closed)
+        self.forming = None  # [time, open, high, low, close, volume]
+
+    def update(self, ts: int, price: float, volume: float):
+        start = ts - ts % self.interval_ms
+        if self.forming is None:
+            self.forming = [start, price, price, price, price, volume]
+            return
+        f = self.forming
+        f[2] = max(f[2], price)
+        f[3] = min(f[3], price)
+        f[4] = price
+        f[5] += volume
+
+    def close_due(self, now_ms: int):
+        """Cierra la vela en formación si su intervalo terminó. Devuelve la fila cerrada o None."""
+        if self.forming is None or self.forming[0] + self.interval_ms > now_ms:
+            return None
+        row = tuple(self.forming)
+        if self.length == len(self.buffer):
+            grown = np.empty(len(self.buffer) * 2, dtype=KLINE_DTYPE)
+            grown[:self.length] = self.buffer[:self.length]
+            self.buffer = grown
+        self.buffer[self.length] = row
+        self.length += 1
+        self.forming = None
+        return row
+
+    def candles(self) -> np.ndarray:
+        closed = self.buffer[:self.length]
+        if self.forming is None:
+            return closed
+        return np.concatenate((closed, np.array([tuple(self.forming)], dtype=KLINE_DTYPE)))
+
+
+class SimOrder:
+    __slots__ = ("order_id", "symbol", "side", "order_type", "price", "qty", "leaves_qty", "cum_qty",
+                 "cum_value", "status", "time_in_force", "reduce_only", "position_idx", "trigger_price",
+                 "trigger_direction", "stop_order_type", "order_filter", "stop_loss", "created_ms",
+                 "updated_ms", "resting")
+
+    def __init__(self, order_id: str, symbol: str, side: str, order_type: str, qty: float, position_idx: int,
+                 now_ms: int, price: float = 0.0, time_in_force: str = "GTC", reduce_only: bool = False,
+                 trigger_price: float = 0.0, trigger_direction: int = 0, stop_order_type: str = "",
+                 order_filter: str = "Order", stop_loss: float = 0.0):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.price = price
+        self.qty = qty
+        self.leaves_qty = qty
+        self.cum_qty = 0.0
+        self.cum_value = 0.0
+        self.status = "Untriggered" if trigger_price else "New"
+        self.time_in_force = time_in_force
+        self.reduce_only = reduce_only
+        self.position_idx = position_idx
+        self.trigger_price = trigger_price
+        self.trigger_direction = trigger_direction
+        self.stop_order_type = stop_order_type
+        self.order_filter = order_filter
+        self.stop_loss = stop_loss
+        self.created_ms = now_ms
+        self.updated_ms = now_ms
+        # False hasta el primer tick tras crearse: las que casan al crearse pagan taker
+        self.resting = False
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def as_bybit(self) -> dict:
+        return {
+            "category": "linear", "orderId": self.order_id, "orderLinkId": "", "symbol": self.symbol,
+            "side": self.side, "orderType": self.order_type, "price": _fmt(self.price), "qty": _fmt(self.qty),
+            "leavesQty": _fmt(self.leaves_qty), "cumExecQty": _fmt(self.cum_qty),
+            "cumExecValue": _fmt(self.cum_value),
+            "avgPrice": _fmt(self.cum_value / self.cum_qty) if self.cum_qty else "0",
+            "orderStatus": self.status, "timeInForce": self.time_in_force, "reduceOnly": self.reduce_only,
+            "positionIdx": self.position_idx, "triggerPrice": _fmt(self.trigger_price),
+            "triggerDirection": self.trigger_direction, "stopOrderType": self.stop_order_type,
+            "stopLoss": _fmt(self.stop_loss), "createdTime": str(self.created_ms), "updatedTime": str(self.updated_ms),
+        }
+
+
+class SimPosition:
+    __slots__ = ("symbol", "position_idx", "size", "avg_price", "realised", "updated_ms")
+
+    def __init__(self, symbol: str, position_idx: int):
+        self.symbol = symbol
+        self.position_idx = position_idx
+        self.size = 0.0
+        self.avg_price = 0.0
+        self.realised = 0.0
+        self.updated_ms = 0
+
+    @property
+    def direction(self) -> int:
+        return 1 if self.position_idx == 1 else -1
+
+    def as_bybit(self, mark: float) -> dict:
+        upnl = (mark - self.avg_price) * self.size * self.direction if self.size else 0.0
+        return {
+            "category": "linear", "symbol": self.symbol, "positionIdx": self.position_idx,
+            "side": ("Buy" if self.direction > 0 else "Sell") if self.size else "",
+            "size": _fmt(self.size), "avgPrice": _fmt(self.avg_price), "markPrice": _fmt(mark),
+            "positionValue": _fmt(self.size * self.avg_price), "unrealisedPnl": _fmt(upnl),
+            "cumRealisedPnl": _fmt(self.realised), "updatedTime": str(self.updated_ms),
+        }
+
+
+# ── Exchange ───────────────────────────────────────────────────────────────
+
+class SimulatedExchange:
+    def __init__(self, candles: dict, start_ms: int, base_interval: str = "5", intervals=SIM_INTERVALS,
+                 balance: float = 10_000.0, taker_fee: float = 0.00055, maker_fee: float = 0.0002,
+                 spread_bps: float = 1.0, slippage_bps: float = 0.0, fill_ratio: float = 1.0,
+                 qty_step: str = "0.001", tick_size: str = "0.0001", clock: SimClock = None):
+        """
+        `candles`: {símbolo: {intervalo: velas KLINE_DTYPE}} con al menos el
+        intervalo base. Lo anterior a `start_ms` es historial cerrado; las velas
+        base desde `start_ms` son las que reproduce `replay()`.
+        """
+        from app.backtest.data import resample
+
+        self.clock = clock or SimClock(start_ms)
+        self.start_ms = int(start_ms)
+        self.base_interval = base_interval
+        self.intervals = tuple(dict.fromkeys((base_interval,) + tuple(intervals)))
+        self.wallet = float(balance)
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.half_spread = spread_bps / 2 / 10_000
+        self.slippage = slippage_bps / 10_000
+        self.fill_ratio = fill_ratio
+        self.qty_step = qty_step
+        self.tick_size = tick_size
+        self._qty_step = float(qty_step)
+
+        self.recorded = {}   # símbolo -> velas base a reproducir
+        self.bars = {}       # (símbolo, intervalo) -> _Bars
+        self.last = {}       # símbolo -> último precio
+        for symbol, series in candles.items():
+            base = series[base_interval] if isinstance(series, dict) else series
+            base = np.ascontiguousarray(base, dtype=KLINE_DTYPE)
+            self.recorded[symbol] = base[base["time"] >= self.start_ms]
+            for iv in self.intervals:
+                klines = series.get(iv) if isinstance(series, dict) else None
+                if klines is None:
+                    klines = resample(base[base["time"] < self.start_ms], iv)
+                klines = np.ascontiguousarray(klines, dtype=KLINE_DTYPE)
+                closed = klines[klines["time"] + interval_to_ms(iv) <= self.start_ms]
+                bars = self.bars[(symbol, iv)] = _Bars(iv, closed)
+                # Vela de intervalo mayor ya empezada en start_ms: se forma con las velas base previas
+                bucket = self.start_ms - self.start_ms % bars.interval_ms
+                partial = base[(base["time"] >= bucket) & (base["time"] < self.start_ms)]
+                if len(partial):
+                    bars.forming = [bucket, float(partial["open"][0]), float(partial["high"].max()),
+                                    float(partial["low"].min()), float(partial["close"][-1]),
+                                    float(partial["volume"].sum())]
+            history = base[base["time"] < self.start_ms]
+            if len(history):
+                self.last[symbol] = float(history["close"][-1])
+
+        self.orders = {}       # orderId -> SimOrder (todas, también las cerradas)
+        self.positions = {}    # (símbolo, positionIdx) -> SimPosition
+        self.closed_pnl = []   # registros de /v5/position/closed-pnl
+        self.sockets = []
+        self._order_ids = itertools.count(1)
+        self._exec_ids = itertools.count(1)
+        self.stats = {"ticks": 0, "requests": 0, "orders": 0, "fills": 0, "triggered": 0,
+                      "cancelled": 0, "rejected": 0}
+        self.delivery_ms = []  # cola -> lectura de cada mensaje WS entregado
+
+        self._routes = {
+            ("GET", "/v5/market/kline"): self._get_kline,
+            ("GET", "/v5/market/tickers"): self._get_tickers,
+            ("GET", "/v5/market/instruments-info"): self._get_instruments,
+            ("GET", "/v5/account/wallet-balance"): self._get_wallet,
+            ("GET", "/v5/position/list"): self._get_positions,
+            ("GET", "/v5/position/closed-pnl"): self._get_closed_pnl,
+            ("GET", "/v5/order/realtime"): self._get_open_orders,
+            ("POST", "/v5/order/create"): self._create_order,
+            ("POST", "/v5/order/cancel"): self._cancel_order,
+            ("POST", "/v5/order/cancel-all"): self._cancel_all,
+            ("POST", "/v5/position/set-leverage"): lambda p: _ok({}),
+            ("POST", "/v5/position/switch-isolated"): lambda p: _ok({}),
+            ("POST", "/v5/position/switch-mode"): lambda p: _ok({}),
+        }
+
+    @property
+    def symbols(self) -> list:
+        return list(self.recorded)
+
+    @property
+    def now_ms(self) -> int:
+        return self.clock.now_ms
+
+    def bid_ask(self, symbol: str) -> tuple:
+        price = self.last.get(symbol, 0.0)
+        return price * (1 - self.half_spread), price * (1 + self.half_spread)
+
+    # ── REST ───────────────────────────────────────────────────────────────
+
+    def handle(self, method: str, endpoint: str, params: dict) -> dict:
+        """Misma respuesta que `AsyncBybitClient._request` para la ruta dada."""
+        self.stats["requests"] += 1
+        route = self._routes.get((method.upper(), endpoint))
+        if route is None:
+            return _error(RET_INVALID, f"Ruta no simulada: {method} {endpoint}")
+        return route(params or {})
+
+    def _get_kline(self, params: dict) -> dict:
+        symbol, interval = params.get("symbol"), str(params.get("interval"))
+        bars = self.bars.get((symbol, interval))
+        if bars is None:
+            return _ok({"symbol": symbol, "category": "linear", "list": []})
+        candles = bars.candles()
+        times = candles["time"]
+        lo = int(np.searchsorted(times, int(params["start"]), side="left")) if "start" in params else 0
+        hi = int(np.searchsorted(times, int(params["end"]), side="right")) if "end" in params else len(candles)
+        limit = int(params.get("limit", 200))
+        rows = candles[max(lo, hi - limit):hi][::-1]
+        return _ok({"symbol": symbol, "category": "linear", "list": [
+            [str(int(r[0])), _fmt(r[1]), _fmt(r[2]), _fmt(r[3]), _fmt(r[4]), _fmt(r[5]), _fmt(r[4] * r[5])]
+            for r in rows.tolist()
+        ]})
+
+    def _turnover_24h(self, symbol: str) -> float:
+        bars = self.bars[(symbol, self.base_interval)]
+        closed = bars.buffer[:bars.length]
+        recent = closed[closed["time"] >= self.now_ms - TURNOVER_WINDOW_MS]
+        return float((recent["close"] * recent["volume"]).sum())
+
+    def ticker(self, symbol: str) -> dict:
+        bid, ask = self.bid_ask(symbol)
+        last = self.last.get(symbol, 0.0)
+        return {"symbol": symbol, "lastPrice": _fmt(last), "markPrice": _fmt(last),
+                "bid1Price": _fmt(bid), "ask1Price": _fmt(ask)}
+
+    def _get_tickers(self, params: dict) -> dict:
+        symbols = [params["symbol"]] if params.get("symbol") else self.symbols
+        return _ok({"category": "linear", "list": [
+            dict(self.ticker(s), turnover24h=_fmt(self._turnover_24h(s))) for s in symbols if s in self.recorded
+        ]})
+
+    def _get_instruments(self, params: dict) -> dict:
+        return _ok({"category": "linear", "list": [
+            {"symbol": s, "lotSizeFilter": {"qtyStep": self.qty_step}, "priceFilter": {"tickSize": self.tick_size}}
+            for s in self.symbols
+        ]})
+
+    def equity(self) -> float:
+        return self.wallet + sum(
+            (self.last.get(p.symbol, p.avg_price) - p.avg_price) * p.size * p.direction
+            for p in self.positions.values() if p.size
+        )
+
+    def _get_wallet(self, params: dict) -> dict:
+        return _ok({"list": [{"accountType": "UNIFIED", "coin": [
+            {"coin": "USDT", "equity": _fmt(self.equity()), "walletBalance": _fmt(self.wallet)}
+        ]}]})
+
+    def _get_positions(self, params: dict) -> dict:
+        symbol = params.get("symbol")
+        return _ok({"category": "linear", "nextPageCursor": "", "list": [
+            p.as_bybit(self.last.get(p.symbol, p.avg_price))
+            for p in self.positions.values() if symbol is None or p.symbol == symbol
+        ]})
+
+    def _get_closed_pnl(self, params: dict) -> dict:
+        start = int(params.get("startTime", 0))
+        end = int(params.get("endTime", self.now_ms))
+        rows = [r for r in self.closed_pnl if start <= int(r["updatedTime"]) <= end]
+        return _ok({"category": "linear", "nextPageCursor": "", "list": rows[::-1][:int(params.get("limit", 50))]})
+
+    def _get_open_orders(self, params: dict) -> dict:
+        symbol, order_filter = params.get("symbol"), params.get("orderFilter")
+        rows = [o.as_bybit() for o in self.orders.values()
+                if o.active and (symbol is None or o.symbol == symbol)
+                and (order_filter is None or o.order_filter == order_filter)]
+        return _ok({"category": "linear", "nextPageCursor": "", "list": rows[::-1]})
+
+    def _create_order(self, params: dict) -> dict:
+        symbol = params.get("symbol")
+        if symbol not in self.recorded:
+            return self._reject(f"symbol invalid: {symbol}")
+        try:
+            qty = float(params["qty"])
+        except (KeyError, TypeError, ValueError):
+            qty = 0.0
+        if qty <= 0:
+            return self._reject("Qty invalid")
+        position_idx = int(params.get("positionIdx", 0)) or (1 if params.get("side") == "Buy" else 2)
+        trigger = float(params.get("triggerPrice") or 0)
+        price = self.last.get(symbol, 0.0)
+        if trigger:
+            direction = int(params.get("triggerDirection") or (1 if trigger > price else 2))
+            # Bybit rechaza un trigger que ya está cruzado
+            if direction == 1 and trigger <= price:
+                return self._reject(f"expect Rising, but trigger_price[{trigger}] <= current[{price}]",
+                                    RET_TRIGGER_RISING)
+            if direction == 2 and trigger >= price:
+                return self._reject(f"expect Falling, but trigger_price[{trigger}] >= current[{price}]",
+                                    RET_TRIGGER_FALLING)
+        else:
+            direction = 0
+        reduce_only = _flag(params.get("reduceOnly"))
+        if reduce_only and not trigger and not self._position(symbol, position_idx).size:
+            return self._reject("current position is zero, cannot fix reduce-only order qty",
+                                RET_REDUCE_ONLY_NO_POSITION)
+
+        order = SimOrder(
+            f"sim-{next(self._order_ids):08d}", symbol, params.get("side", "Buy"), params.get("orderType", "Market"),
+            qty, position_idx, self.now_ms, price=float(params.get("price") or 0),
+            time_in_force=params.get("timeInForce", "GTC"), reduce_only=reduce_only,
+            trigger_price=trigger, trigger_direction=direction, stop_order_type=params.get("stopOrderType", ""),
+            order_filter="StopOrder" if trigger else "Order", stop_loss=float(params.get("stopLoss") or 0),
+        )
+        bid, ask = self.bid_ask(symbol)
+        crosses = order.order_type == "Limit" and (order.price >= ask if order.side == "Buy" else order.price <= bid)
+        if order.time_in_force == "PostOnly" and crosses:
+            order.status = "Cancelled"
+        self.orders[order.order_id] = order
+        self.stats["orders"] += 1
+        self._publish_order(order)
+        if order.active and not trigger:
+            self._match_order(order)
+        order.resting = True
+        return _ok({"orderId": order.order_id, "orderLinkId": ""})
+
+    def _reject(self, msg: str, code: int = RET_INVALID) -> dict:
+        self.stats["rejected"] += 1
+        return _error(code, msg)
+
+    def _cancel_order(self, params: dict) -> dict:
+        order = self.orders.get(str(params.get("orderId")))
+        order_filter = params.get("orderFilter")
+        if order is None or not order.active or (order_filter and order.order_filter != order_filter):
+            return _error(RET_ORDER_NOT_EXISTS, "order not exists or too late to cancel")
+        self._cancel(order)
+        return _ok({"orderId": order.order_id, "orderLinkId": ""})
+
+    def _cancel_all(self, params: dict) -> dict:
+        symbol, order_filter = params.get("symbol"), params.get("orderFilter", "Order")
+        cancelled = [o for o in list(self.orders.values())
+                     if o.active and o.symbol == symbol and o.order_filter == order_filter]
+        for order in cancelled:
+            self._cancel(order)
+        return _ok({"list": [{"orderId": o.order_id, "orderLinkId": ""} for o in cancelled], "success": "1"})
+
+    def _cancel(self, order: SimOrder, status: str = None):
+        order.status = status or ("Deactivated" if order.order_filter != "Order" else "Cancelled")
+        order.updated_ms = self.now_ms
+        self.stats["cancelled"] += 1
+        self._publish_order(order)
+
+    # ── Mercado ────────────────────────────────────────────────────────────
+
+    def advance_to(self, ts_ms: int):
+        """Avanza el reloj y cierra (confirm) las velas cuyo intervalo terminó."""
+        self.clock.advance_to(ts_ms)
+        for (symbol, interval), bars in self.bars.items():
+            row = bars.close_due(self.now_ms)
+            if row is not None:
+                self._publish_kline(symbol, bars, row, confirm=True)
+
+    def tick(self, symbol: str, price: float, volume: float = 0.0, ts_ms: int = None):
+        """Un precio negociado: actualiza velas y ticker, y casa las órdenes del símbolo."""
+        if ts_ms is not None:
+            self.advance_to(ts_ms)
+        price = float(price)
+        self.last[symbol] = price
+        self.stats["ticks"] += 1
+        for interval in self.intervals:
+            bars = self.bars[(symbol, interval)]
+            bars.update(self.now_ms, price, volume)
+            self._publish_kline(symbol, bars, bars.forming, confirm=False)
+        self._publish(f"tickers.{symbol}", {"topic": f"tickers.{symbol}", "type": "delta", "ts": self.now_ms,
+                                            "data": self.ticker(symbol)})
+        for order in [o for o in self.orders.values() if o.active and o.symbol == symbol]:
+            if order.active:
+                self._match_order(order)
+
+    def bar_ticks(self, bar) -> list:
+        """Recorrido determinista de una vela: [(ts, precio, volumen)]."""
+        start, o, h, l, c, v = bar
+        step = interval_to_ms(self.base_interval) // 4
+        first, second = (l, h) if c >= o else (h, l)
+        return [(start, o, 0.0), (start + step, first, 0.0), (start + 2 * step, second, 0.0),
+                (start + 3 * step, c, v)]
+
+    # ── Casado de órdenes ──────────────────────────────────────────────────
+
+    def _position(self, symbol: str, position_idx: int) -> SimPosition:
+        key = (symbol, position_idx)
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.positions[key] = SimPosition(symbol, position_idx)
+        return pos
+
+    def _match_order(self, order: SimOrder):
+        price = self.last.get(order.symbol)
+        if price is None:
+            return
+        bid, ask = self.bid_ask(order.symbol)
+        if order.status == "Untriggered":
+            if not ((order.trigger_direction == 1 and price >= order.trigger_price) or
+                    (order.trigger_direction == 2 and price <= order.trigger_price)):
+                return
+            order.status = "Triggered"
+            order.order_type = "Market"
+            self.stats["triggered"] += 1
+            if order.order_filter == "tpslOrder":
+                order.qty = order.leaves_qty = self._position(order.symbol, order.position_idx).size
+            self._publish_order(order)
+
+        pos = self._position(order.symbol, order.position_idx)
+        closing = self._is_closing(order)
+        if order.reduce_only or order.order_filter == "tpslOrder":
+            if not closing or not pos.size:
+                self._cancel(order, "Deactivated" if order.order_filter != "Order" else "Cancelled")
+                return
+            order.leaves_qty = min(order.leaves_qty, pos.size)
+
+        if order.order_type == "Market":
+            fill_price = ask * (1 + self.slippage) if order.side == "Buy" else bid * (1 - self.slippage)
+            self._fill(order, order.leaves_qty, fill_price, maker=False)
+            return
+
+        if order.side == "Buy" and ask <= order.price:
+            fill_price = order.price if order.resting else min(order.price, ask)
+        elif order.side == "Sell" and bid >= order.price:
+            fill_price = order.price if order.resting else max(order.price, bid)
+        else:
+            return
+        qty = order.leaves_qty
+        if self.fill_ratio < 1.0:
+            chunk = math.floor(order.qty * self.fill_ratio / self._qty_step) * self._qty_step
+            qty = min(qty, max(chunk, self._qty_step))
+        self._fill(order, qty, fill_price, maker=order.resting)
+
+    @staticmethod
+    def _is_closing(order: SimOrder) -> bool:
+        return (order.position_idx == 1 and order.side == "Sell") or (order.position_idx == 2 and order.side == "Buy")
+
+    def _fill(self, order: SimOrder, qty: float, price: float, maker: bool):
+        now = self.now_ms
+        pos = self._position(order.symbol, order.position_idx)
+        fee = qty * price * (self.maker_fee if maker else self.taker_fee)
+        self.wallet -= fee
+        closed_size = 0.0
+        if self._is_closing(order):
+            closed_size = min(qty, pos.size)
+            pnl = (price - pos.avg_price) * closed_size * pos.direction
+            self.wallet += pnl
+            pos.realised += pnl - fee
+            self.closed_pnl.append({
+                "symbol": order.symbol, "orderId": order.order_id, "side": order.side, "qty": _fmt(closed_size),
+                "orderType": order.order_type, "avgEntryPrice": _fmt(pos.avg_price), "avgExitPrice": _fmt(price),
+                "closedSize": _fmt(closed_size), "closedPnl": _fmt(pnl - fee), "leverage": "",
+                "createdTime": str(now), "updatedTime": str(now),
+            })
+            pos.size = max(0.0, pos.size - closed_size)
+            if pos.size <= 1e-12:
+                pos.size, pos.avg_price = 0.0, 0.0
+        else:
+            pos.avg_price = (pos.avg_price * pos.size + price * qty) / (pos.size + qty)
+            pos.size += qty
+            pos.realised -= fee
+        pos.updated_ms = now
+
+        order.leaves_qty = max(0.0, order.leaves_qty - qty)
+        if order.leaves_qty < self._qty_step / 2:
+            order.leaves_qty = 0.0
+        order.cum_qty += qty
+        order.cum_value += qty * price
+        order.status = "Filled" if not order.leaves_qty else "PartiallyFilled"
+        order.updated_ms = now
+        self.stats["fills"] += 1
+
+        self._publish("execution", {"topic": "execution", "creationTime": now, "data": [{
+            "category": "linear", "symbol": order.symbol, "orderId": order.order_id, "orderLinkId": "",
+            "side": order.side, "orderType": order.order_type, "orderPrice": _fmt(order.price),
+            "orderQty": _fmt(order.qty), "execId": f"sim-exec-{next(self._exec_ids)}", "execPrice": _fmt(price),
+            "execQty": _fmt(qty), "execFee": _fmt(fee), "execType": "Trade", "execTime": str(now),
+            "isMaker": maker, "leavesQty": _fmt(order.leaves_qty), "closedSize": _fmt(closed_size),
+        }]})
+        self._publish_order(order)
+        self._publish("position", {"topic": "position", "creationTime": now,
+                                   "data": [pos.as_bybit(self.last.get(pos.symbol, price))]})
+
+        if pos.size and order.stop_loss and not closed_size:
+            self._attach_stop_loss(pos, order.stop_loss)
+        if not pos.size:
+            # Al cerrarse la posición Bybit retira su TP/SL y las órdenes reduceOnly pendientes
+            for other in list(self.orders.values()):
+                if other.active and (other.reduce_only or other.order_filter == "tpslOrder") \
+                        and other.symbol == pos.symbol and other.position_idx == pos.position_idx:
+                    self._cancel(other)
+
+    def _attach_stop_loss(self, pos: SimPosition, stop_loss: float):
+        """stopLoss de la orden de entrada: TP/SL de posición (tpslOrder) sobre toda la posición."""
+        for other in self.orders.values():
+            if other.active and other.order_filter == "tpslOrder" and other.symbol == pos.symbol \
+                    and other.position_idx == pos.position_idx:
+                other.trigger_price = stop_loss
+                other.qty = other.leaves_qty = pos.size
+                self._publish_order(other)
+                return
+        order = SimOrder(
+            f"sim-{next(self._order_ids):08d}", pos.symbol, "Sell" if pos.direction > 0 else "Buy", "Market",
+            pos.size, pos.position_idx, self.now_ms, reduce_only=True, trigger_price=stop_loss,
+            trigger_direction=2 if pos.direction > 0 else 1, stop_order_type="StopLoss", order_filter="tpslOrder",
+        )
+        order.resting = True
+        self.orders[order.order_id] = order
+        self._publish_order(order)
+
+    # ── WebSocket ──────────────────────────────────────────────────────────
+
+    def _publish(self, topic: str, message: dict):
+        targets = [s for s in self.sockets if s.wants(topic)]
+        if not targets:
+            return
+        frame = json_codec.dumps(message)
+        for sock in targets:
+            sock.deliver(frame)
+
+    def _publish_order(self, order: SimOrder):
+        self._publish("order", {"topic": "order", "creationTime": self.now_ms, "data": [order.as_bybit()]})
+
+    def _publish_kline(self, symbol: str, bars: _Bars, row, confirm: bool):
+        topic = f"kline.{bars.interval}.{symbol}"
+        if not any(s.wants(topic) for s in self.sockets):
+            return
+        start, o, h, l, c, v = row
+        self._publish(topic, {"topic": topic, "type": "snapshot", "ts": self.now_ms, "data": [{
+            "start": int(start), "end": int(start) + bars.interval_ms - 1, "interval": bars.interval,
+            "open": _fmt(o), "high": _fmt(h), "low": _fmt(l), "close": _fmt(c), "volume": _fmt(v),
+            "turnover": _fmt(c * v), "confirm": confirm, "timestamp": self.now_ms,
+        }]})
+
+    def ticker_snapshot(self, symbol: str) -> dict:
+        return {"topic": f"tickers.{symbol}", "type": "snapshot", "ts": self.now_ms, "data": self.ticker(symbol)}
+
+    def report(self) -> dict:
+        delivery = sorted(self.delivery_ms)
+        pnl = sum(float(r["closedPnl"]) for r in self.closed_pnl)
+        return dict(
+            self.stats, closed_trades=len(self.closed_pnl), closed_pnl=round(pnl, 4),
+            equity=round(self.equity(), 4),
+            ws_messages=len(delivery),
+            ws_delivery_p50_ms=round(statistics.median(delivery), 3) if delivery else None,
+            ws_delivery_p99_ms=round(delivery[int(0.99 * (len(delivery) - 1))], 3) if delivery else None,
+        )
+
+
+# ── Reproducción ───────────────────────────────────────────────────────────
+
+async def replay(exchange: SimulatedExchange, end_ms: int = None, speed: float = None) -> dict:
+    """
+    Reproduce las velas base grabadas desde `exchange.start_ms`, todos los
+    símbolos intercalados por tiempo. `speed` es el factor sobre tiempo real
+    (1000 = un día en ~86s); sin `speed`, sin pausas (solo cede el loop entre
+    ticks). Devuelve `exchange.report()` con el tiempo real empleado.
+    """
+    events, last_bar = [], exchange.start_ms - interval_to_ms(exchange.base_interval)
+    for symbol, bars in exchange.recorded.items():
+        for bar in bars.tolist():
+            if end_ms is not None and bar[0] >= end_ms:
+                break
+            last_bar = max(last_bar, bar[0])
+            events.extend((ts, symbol, price, volume) for ts, price, volume in exchange.bar_ticks(bar))
+    events.sort(key=lambda e: e[0])
+    started = time.perf_counter()
+    for ts, group in itertools.groupby(events, key=lambda e: e[0]):
+        if speed:
+            target = started + (ts - exchange.start_ms) / 1000 / speed
+            await _real_sleep(max(0.0, target - time.perf_counter()))
+        else:
+            await _real_sleep(0)
+        exchange.advance_to(ts)
+        for _, symbol, price, volume in group:
+            exchange.tick(symbol, price, volume)
+    # Cierra la última vela reproducida
+    exchange.advance_to(last_bar + interval_to_ms(exchange.base_interval))
+    await _real_sleep(0)
+    wall = time.perf_counter() - started
+    report = exchange.report()
+    span = (exchange.now_ms - exchange.start_ms) / 1000
+    report.update(wall_s=round(wall, 3), sim_s=span, speed=round(span / wall, 1) if wall else None)
+    logger.info(f"[SIM] {report['ticks']} ticks ({span / 3600:.1f}h simuladas) en {wall:.1f}s | "
+                f"{report['orders']} órdenes, {report['fills']} ejecuciones, PnL {report['closed_pnl']}")
+    return report
+
+
+# ── Cliente REST y WebSocket ───────────────────────────────────────────────
+
+class SimulatedBybitClient(AsyncBybitClient):
+    """`AsyncBybitClient` cuyas peticiones responde el exchange simulado."""
+
+    def __init__(self, exchange: SimulatedExchange, latency: float = 0.0):
+        super().__init__()
+        self.exchange = exchange
+        # Segundos reales de ida y vuelta por petición (0: solo cede el loop, como la petición HTTP)
+        self.latency = latency
+
+    async def _request(self, method: str, endpoint: str, params: dict = None, signed: bool = True,
+                       max_retries: int = 3):
+        await _real_sleep(self.latency)
+        return self.exchange.handle(method, endpoint, params)
+
+    async def close(self):
+        pass
+
+
+class LocalSocket:
+    """Conexión WebSocket en proceso: lo que envía el bot lo contesta el exchange simulado."""
+    OPEN, CLOSED = 1, 3
+
+    def __init__(self, exchange: SimulatedExchange, private: bool):
+        self.exchange = exchange
+        self.private = private
+        self.topics = set()
+        self.state = self.OPEN
+        self._queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        self.exchange.sockets.append(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def wants(self, topic: str) -> bool:
+        return self.state == self.OPEN and topic in self.topics
+
+    def deliver(self, frame: str):
+        self._queue.put_nowait((time.perf_counter(), frame))
+
+    async def send(self, payload):
+        message = json_codec.loads(payload)
+        op = message.get("op")
+        if op == "ping":
+            reply = {"op": "pong", "req_id": message.get("req_id"), "args": [str(self.exchange.now_ms)]} \
+                if self.private else {"success": True, "ret_msg": "pong", "op": "ping", "req_id": message.get("req_id")}
+        elif op in ("subscribe", "unsubscribe"):
+            args = message.get("args", [])
+            if op == "subscribe":
+                self.topics.update(args)
+            else:
+                self.topics.difference_update(args)
+            reply = {"success": True, "ret_msg": "", "op": op, "req_id": message.get("req_id", "")}
+        else:
+            reply = {"success": True, "ret_msg": "", "op": op}
+        self.deliver(json_codec.dumps(reply))
+        if op == "subscribe":
+            # Como Bybit, el primer mensaje de cada ticker es un snapshot
+            for topic in message.get("args", []):
+                symbol = topic.split(".", 1)[1] if topic.startswith("tickers.") else None
+                if symbol in self.exchange.recorded:
+                    self.deliver(json_codec.dumps(self.exchange.ticker_snapshot(symbol)))
+
+    async def recv(self, decode: bool = True):
+        queued, frame = await self._queue.get()
+        if frame is None:
+            raise ConnectionClosedOK(None, None)
+        self.exchange.delivery_ms.append((time.perf_counter() - queued) * 1000)
+        return frame if decode else frame.encode()
+
+    async def close(self):
+        if self.state == self.CLOSED:
+            return
+        self.state = self.CLOSED
+        if self in self.exchange.sockets:
+            self.exchange.sockets.remove(self)
+        self._queue.put_nowait((time.perf_counter(), None))
+
+
+class SimulatedWebSocket(BybitWebSocket):
+    """`BybitWebSocket` conectado a sockets locales del exchange simulado."""
+    PUBLIC_URL = "sim://public"
+    PRIVATE_URL = "sim://private"
+
+    def __init__(self, exchange: SimulatedExchange, **callbacks):
+        super().__init__(**callbacks)
+        self.exchange = exchange
+        self.ws_public_url = self.PUBLIC_URL
+        self.ws_private_url = self.PRIVATE_URL
+
+    def _open_socket(self, url: str):
+        return LocalSocket(self.exchange, private=url == self.PRIVATE_URL)
+
+    @classmethod
+    def factory(cls, exchange: SimulatedExchange):
+        """Constructor para `Engine(ws_factory=...)`: mismos callbacks que `BybitWebSocket`."""
+        return lambda **callbacks: cls(exchange, **callbacks)
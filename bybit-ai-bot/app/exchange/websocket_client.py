@@ -1,164 +1,480 @@
 import asyncio
+import random
 import time
-import json
 import os
 import websockets
 import hmac
 import hashlib
 from app.config import Config
-from app.logger import logger
+from app.logger import get_logger
 from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.market_events import Kline, Execution, OrderUpdate, TickerBook
+from app.exchange.ws_health import ConnectionHealth
+from app.utils import json_codec
+
+logger = get_logger("ws")
 
 # Replace hyphens for Bybit: BTC-USDT -> BTCUSDT
 SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "BNBUSDT", "DOGEUSDT", "ADAUSDT", "LINKUSDT"]
 TF_MAP = {"5m": "5", "15m": "15", "1m": "1"}
 
+# Bybit acepta como máximo 10 args por petición de suscripción
+SUBSCRIBE_CHUNK = 10
+
+# Supervisor de conexión: Bybit recomienda un {"op": "ping"} cada 20s
+PING_INTERVAL = 20
+PONG_TIMEOUT = 10
+# Sin ningún mensaje en este tiempo la conexión se da por muerta y se reconecta
+CONNECTION_STALE_SECONDS = 60
+# Un topic suscrito sin pushes en este tiempo se re-suscribe
+TOPIC_STALE_SECONDS = 120
+# Reconexión con backoff exponencial y jitter
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+
+# Topics por conexión pública: Bybit limita el tamaño total de args de una
+# conexión, así que el universo se reparte en varias (shards)
+MAX_TOPICS_PER_CONNECTION = int(os.getenv("WS_TOPICS_PER_CONNECTION", "200"))
+# Diferencia de carga entre shards a partir de la cual se mueven topics
+REBALANCE_THRESHOLD = max(1, MAX_TOPICS_PER_CONNECTION // 4)
+
+async def _raw_frames(ws):
+    """
+    Como `async for message in ws`, pero los frames de texto llegan como bytes
+    (recv(decode=False), websockets >= 13): el codec los decodifica sin pasar
+    por un str intermedio. Con versiones antiguas se recibe el str de siempre.
+    """
+    decode_kwargs = {"decode": False}
+    while True:
+        try:
+            message = await ws.recv(**decode_kwargs)
+        except TypeError:
+            if not decode_kwargs:
+                raise
+            decode_kwargs = {}
+            continue
+        except websockets.exceptions.ConnectionClosedOK:
+            return
+        yield message
+
+
+class PublicShard:
+    """Una conexión pública con su propio set de topics, salud y tarea de lectura."""
+    __slots__ = ("index", "topics", "health", "ws", "task", "retired")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.topics = set()
+        self.health = ConnectionHealth(f"public-{index}")
+        self.ws = None
+        self.task = None
+        self.retired = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.ws is not None and getattr(self.ws, "state", None) != 3
+
+    @property
+    def room(self) -> int:
+        return MAX_TOPICS_PER_CONNECTION - len(self.topics)
+
+
 class BybitWebSocket:
-    def __init__(self, message_callback, fill_callback=None, mark_price_callback=None):
+    def __init__(self, message_callback=None, fill_callback=None, mark_price_callback=None, kline_callback=None,
+                 order_callback=None, position_callback=None, kline_gap_callback=None):
         self.ws_public_url = Config.WS_URL
         self.ws_private_url = getattr(Config, "WS_PRIVATE_URL", "wss://stream-testnet.bybit.com/v5/private")
+        # Eventos tipados (app.exchange.market_events), convertidos una sola vez aquí:
+        #   mark_price_callback(MarkPrice), kline_callback(Kline),
+        #   fill_callback(Execution), order_callback([OrderUpdate])
+        # position_callback(items) recibe el stream `position` tal cual.
+        # message_callback(data) recibe cualquier otro topic público sin convertir.
+        # kline_gap_callback([(symbol, interval)], desde_ms, hasta_ms) rellena por REST
+        # las velas perdidas mientras el WS público estuvo caído.
         self.message_callback = message_callback
         self.fill_callback = fill_callback
         self.mark_price_callback = mark_price_callback
-        self.ws_public = None
+        self.kline_callback = kline_callback
+        self.order_callback = order_callback
+        self.position_callback = position_callback
+        self.kline_gap_callback = kline_gap_callback
+        # Estado fusionado de tickers (snapshot + deltas) de los símbolos suscritos
+        self.tickers = TickerBook()
         self.ws_private = None
+        # True mientras el WS privado está autenticado y suscrito (sin huecos desde entonces)
+        self.private_ready = False
         self.running = False
-        self._reconnect_delay = 2
+        self.private_health = ConnectionHealth("private")
+        tf_key = TF_MAP.get(Config.TIMEFRAME, "5")
+        self._kline_topics = {f"kline.{tf_key}.{sym}" for sym in SYMBOLS}
+        self._ticker_topics = set()
+        # Conexiones públicas; cada topic vive en exactamente una
+        self.shards = []
+        self._shard_lock = asyncio.Lock()
+        self._assign_topics(sorted(self._public_topics()))
+
+    async def _send_subscribe(self, ws, op: str, topics: list):
+        for i in range(0, len(topics), SUBSCRIBE_CHUNK):
+            await ws.send(json_codec.dumps({"op": op, "args": topics[i:i + SUBSCRIBE_CHUNK]}))
+
+    async def subscribe_klines(self, symbols: list, intervals: list):
+        """Añade topics kline para los símbolos/intervalos dados (solo envía los nuevos)."""
+        topics = {f"kline.{iv}.{sym.replace('-', '')}" for sym in symbols for iv in intervals}
+        if topics - self._kline_topics:
+            self._kline_topics.update(topics)
+            await self._sync_shards()
+
+    async def set_kline_universe(self, symbols: list, intervals: list):
+        """
+        Deja suscritas exactamente las klines de `symbols` x `intervals`: añade
+        las nuevas y da de baja las de los símbolos que salieron del universo.
+        """
+        topics = {f"kline.{iv}.{sym.replace('-', '')}" for sym in symbols for iv in intervals}
+        if topics != self._kline_topics:
+            self._kline_topics = topics
+            await self._sync_shards()
 
     async def subscribe_mark_price(self, symbol: str):
-        if self.ws_public and getattr(self.ws_public, "state", None) != 3:
-            try:
-                symbol = symbol.replace("-", "")
-                sub_msg = {"op": "subscribe", "args": [f"tickers.{symbol}"]}
-                await self.ws_public.send(json.dumps(sub_msg))
-            except Exception:
-                pass
+        """Suscribe tickers.{symbol}. Se recuerda para re-suscribir tras reconectar."""
+        topic = f"tickers.{symbol.replace('-', '')}"
+        if topic not in self._ticker_topics:
+            self._ticker_topics.add(topic)
+            await self._sync_shards()
 
     async def unsubscribe_mark_price(self, symbol: str):
-        if self.ws_public and getattr(self.ws_public, "state", None) != 3:
-            try:
-                symbol = symbol.replace("-", "")
-                unsub_msg = {"op": "unsubscribe", "args": [f"tickers.{symbol}"]}
-                await self.ws_public.send(json.dumps(unsub_msg))
-            except Exception:
-                pass
+        symbol = symbol.replace("-", "")
+        self._ticker_topics.discard(f"tickers.{symbol}")
+        self.tickers.discard(symbol)
+        await self._sync_shards()
 
     async def connect(self):
         self.running = True
-        asyncio.create_task(self._connect_public())
+        self._start_public()
         asyncio.create_task(self._connect_private())
 
+    # ── Shards públicos ────────────────────────────────────────────────────
+
+    def _new_shard(self) -> PublicShard:
+        used = {s.index for s in self.shards}
+        shard = PublicShard(next(i for i in range(len(self.shards) + 1) if i not in used))
+        self.shards.append(shard)
+        return shard
+
+    def _least_loaded(self) -> PublicShard:
+        open_shards = [s for s in self.shards if s.room > 0]
+        if not open_shards:
+            return self._new_shard()
+        return min(open_shards, key=lambda s: (len(s.topics), s.index))
+
+    def _assign_topics(self, topics) -> dict:
+        """Reparte topics nuevos en el shard con menos carga. Devuelve {shard: [topics]}."""
+        added = {}
+        for topic in topics:
+            shard = self._least_loaded()
+            shard.topics.add(topic)
+            added.setdefault(shard, []).append(topic)
+        return added
+
+    def _plan_rebalance(self) -> list:
+        """
+        Mueve topics del shard más cargado al menos cargado mientras la
+        diferencia supere REBALANCE_THRESHOLD. Devuelve [(origen, destino, [topics])].
+        """
+        moves = []
+        while len(self.shards) > 1:
+            heavy = max(self.shards, key=lambda s: (len(s.topics), -s.index))
+            light = min(self.shards, key=lambda s: (len(s.topics), s.index))
+            diff = len(heavy.topics) - len(light.topics)
+            if diff <= REBALANCE_THRESHOLD:
+                break
+            moved = sorted(heavy.topics)[:diff // 2]
+            heavy.topics.difference_update(moved)
+            light.topics.update(moved)
+            moves.append((heavy, light, moved))
+        return moves
+
+    def _consolidate(self) -> tuple:
+        """
+        Si el universo cabe en menos conexiones, retira los shards más vacíos
+        (siempre queda uno) y reparte sus topics. Devuelve (retirados, {shard: [topics]}).
+        """
+        total = sum(len(s.topics) for s in self.shards)
+        needed = max(1, -(-total // MAX_TOPICS_PER_CONNECTION))
+        retired, added = [], {}
+        while len(self.shards) > needed:
+            victim = min(self.shards, key=lambda s: (len(s.topics), -s.index))
+            self.shards.remove(victim)
+            victim.retired = True
+            retired.append(victim)
+            orphans, victim.topics = sorted(victim.topics), set()
+            for shard, topics in self._assign_topics(orphans).items():
+                added.setdefault(shard, []).extend(topics)
+        return retired, added
+
+    async def _sync_shards(self):
+        """
+        Lleva los shards al set deseado (klines + tickers): baja de los topics
+        que sobran, cierre de conexiones sobrantes, alta de los nuevos en el
+        shard con menos carga (abriendo conexiones si no caben) y rebalanceo.
+        Las altas se envían antes que las bajas y que los cierres, para no
+        perder pushes mientras un topic cambia de conexión.
+        """
+        async with self._shard_lock:
+            desired = self._public_topics()
+            removed = {}
+            for shard in self.shards:
+                gone = shard.topics - desired
+                if gone:
+                    shard.topics -= gone
+                    removed[shard] = sorted(gone)
+
+            retired, added = self._consolidate()
+            current = set().union(*(s.topics for s in self.shards))
+            for shard, topics in self._assign_topics(sorted(desired - current)).items():
+                added.setdefault(shard, []).extend(topics)
+            for src, dst, topics in self._plan_rebalance():
+                added.setdefault(dst, []).extend(topics)
+                removed.setdefault(src, []).extend(topics)
+                logger.info("[WS PUBLIC] Rebalanceo: %s topics del shard %s al shard %s",
+                            len(topics), src.index, dst.index)
+
+            for shard, topics in added.items():
+                if shard.task is None:
+                    if self.running:
+                        self._start_shard(shard)  # Suscribe su set completo al conectar
+                elif shard.is_open:
+                    await self._safe_send(shard, "subscribe", topics)
+            for shard, topics in removed.items():
+                if shard.is_open and not shard.retired:
+                    await self._safe_send(shard, "unsubscribe", topics)
+            for shard in retired:
+                logger.info("[WS PUBLIC] Cerrando shard %s: el universo cabe en %s conexiones",
+                            shard.index, len(self.shards))
+                if shard.ws is not None:
+                    try:
+                        await shard.ws.close()
+                    except Exception:
+                        pass
+
+    async def _safe_send(self, shard: PublicShard, op: str, topics: list):
+        try:
+            await self._send_subscribe(shard.ws, op, sorted(topics))
+            if op == "subscribe":
+                for topic in topics:
+                    shard.health.touch(topic)
+        except Exception as e:
+            logger.error("[WS PUBLIC] Error en %s del shard %s: %s", op, shard.index, e)
+
+    def _start_shard(self, shard: PublicShard):
+        shard.task = asyncio.create_task(self._connect_public(shard))
+
+    def _start_public(self):
+        for shard in self.shards:
+            if shard.task is None or shard.task.done():
+                self._start_shard(shard)
+
     def _ws_proxy(self):
         """Devuelve el proxy configurado para WebSocket (soporta HTTP tunneling)."""
         proxy = os.getenv("BYBIT_PROXY") or os.getenv("HTTP_PROXY") or os.getenv("HTTPS_PROXY")
         return proxy  # websockets acepta proxy como str 'http://host:port'
 
-    async def _connect_public(self):
-        while self.running:
+    def _open_socket(self, url: str):
+        """Conexión (async context manager) de un bucle de lectura. El simulador la sustituye por un socket local."""
+        proxy = self._ws_proxy()
+        connect_kwargs = {}
+        if proxy:
+            connect_kwargs["proxy"] = proxy
+        return websockets.connect(url, **connect_kwargs)
+
+    def _public_topics(self) -> set:
+        return self._kline_topics | self._ticker_topics
+
+    @staticmethod
+    def _reconnect_delay(health: ConnectionHealth) -> float:
+        delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** max(health.failures - 1, 0))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _connect_public(self, shard: PublicShard):
+        """Bucle de lectura de un shard: conecta, suscribe su set y reconecta con backoff."""
+        health = shard.health
+        while self.running and not shard.retired:
             try:
-                proxy = self._ws_proxy()
-                connect_kwargs = {}
-                if proxy:
-                    connect_kwargs["proxy"] = proxy
-                async with websockets.connect(self.ws_public_url, **connect_kwargs) as ws:
-                    self.ws_public = ws
-                    logger.info(f"Public WS connected to {self.ws_public_url}")
-                    
-                    tf_key = TF_MAP.get(Config.TIMEFRAME, "5")
-                    args = [f"kline.{tf_key}.{sym}" for sym in SYMBOLS]
-                    await ws.send(json.dumps({"op": "subscribe", "args": args}))
-                    
-                    async for message in ws:
-                        if not self.running: break
-                        await self._handle_public_message(message)
+                async with self._open_socket(self.ws_public_url) as ws:
+                    shard.ws = ws
+                    health.on_connect()
+                    logger.info("Public WS shard %s connected to %s (%s topics)",
+                                shard.index, self.ws_public_url, len(shard.topics))
+
+                    # Tras reconectar se re-suscribe todo el set del shard (klines añadidas y tickers);
+                    # el primer mensaje de cada ticker vuelve a ser un snapshot
+                    await self._send_subscribe(ws, "subscribe", sorted(shard.topics))
+                    if health.gap_start_ms:
+                        asyncio.create_task(self._backfill_gap(health.gap_start_ms, shard.topics))
+                        health.gap_start_ms = 0
+                    supervisor = asyncio.create_task(self._supervise(ws, health, lambda: shard.topics))
+                    try:
+                        async for message in _raw_frames(ws):
+                            if not self.running: break
+                            await self._handle_public_message(message, health)
+                    finally:
+                        supervisor.cancel()
             except Exception as e:
-                logger.error(f"Public WS Error: {e}")
-            
-            if self.running:
-                await asyncio.sleep(self._reconnect_delay)
+                logger.error("Public WS shard %s error: %s", shard.index, e)
+            finally:
+                health.on_disconnect()
+
+            if self.running and not shard.retired:
+                await asyncio.sleep(self._reconnect_delay(health))
 
     async def _connect_private(self):
+        health = self.private_health
         while self.running:
             try:
-                proxy = self._ws_proxy()
-                connect_kwargs = {}
-                if proxy:
-                    connect_kwargs["proxy"] = proxy
-                async with websockets.connect(self.ws_private_url, **connect_kwargs) as ws:
+                async with self._open_socket(self.ws_private_url) as ws:
                     self.ws_private = ws
-                    logger.info(f"Private WS connected to {self.ws_private_url}")
+                    health.on_connect()
+                    logger.info("Private WS connected to %s", self.ws_private_url)
                     
                     # Auth
                     expires = int((time.time() + 10) * 1000)
                     sig = hmac.new(Config.SECRET_KEY.encode(), f"GET/realtime{expires}".encode(), hashlib.sha256).hexdigest()
-                    await ws.send(json.dumps({"op": "auth", "args": [Config.API_KEY, expires, sig]}))
+                    await ws.send(json_codec.dumps({"op": "auth", "args": [Config.API_KEY, expires, sig]}))
                     
                     await asyncio.sleep(1)
-                    await ws.send(json.dumps({"op": "subscribe", "args": ["order", "execution"]}))
-                    
-                    async for message in ws:
-                        if not self.running: break
-                        await self._handle_private_message(message)
+                    await ws.send(json_codec.dumps({"op": "subscribe", "args": ["order", "execution", "position"]}))
+
+                    # Los streams privados solo empujan cuando hay actividad: se vigila con ping/pong
+                    supervisor = asyncio.create_task(self._supervise(ws, health))
+                    try:
+                        async for message in _raw_frames(ws):
+                            if not self.running: break
+                            await self._handle_private_message(message)
+                    finally:
+                        supervisor.cancel()
             except Exception as e:
-                logger.error(f"Private WS Error: {e}")
+                logger.error("Private WS Error: %s", e)
+            finally:
+                self.private_ready = False
+                health.on_disconnect()
                 
             if self.running:
-                await asyncio.sleep(self._reconnect_delay)
+                await asyncio.sleep(self._reconnect_delay(health))
 
-    async def _handle_public_message(self, message):
+    async def _supervise(self, ws, health: ConnectionHealth, topics=None):
+        """
+        Heartbeat y detección de streams muertos de una conexión. Cierra el
+        socket (y el bucle de lectura reconecta) si no llega el pong o si no
+        llega nada; re-suscribe los topics que dejaron de empujar.
+        """
         try:
-            data = json.loads(message)
-            if "topic" in data:
-                topic = data["topic"]
-                if topic.startswith("kline"):
-                    # Map back to BingX expected format
-                    symbol = topic.split(".")[-1]
-                    # Format as BTC-USDT
-                    bingx_sym = symbol.replace("USDT", "-USDT")
-                    # data["data"][0] has start, open, high, low, close, volume
-                    kline = data["data"][0]
-                    fake_bingx_data = {
-                        "dataType": f"{bingx_sym}@{TF_MAP.get(Config.TIMEFRAME, '5')}m",
-                        "data": [{
-                            "c": kline["close"],
-                            "T": int(kline["start"]),
-                            "v": kline["volume"]
-                        }]
-                    }
-                    await self.message_callback(fake_bingx_data)
-                elif topic.startswith("tickers") and self.mark_price_callback:
-                    # Map to mark price
-                    symbol = topic.split(".")[-1]
-                    bingx_sym = symbol.replace("USDT", "-USDT")
-                    fake_bingx_data = {
-                        "dataType": f"{bingx_sym}@markPrice",
-                        "data": {
-                            "p": data["data"].get("markPrice", data["data"].get("lastPrice", 0))
-                        }
-                    }
-                    await self.mark_price_callback(fake_bingx_data)
-        except Exception:
+            while True:
+                await asyncio.sleep(PING_INTERVAL)
+                if health.pong_overdue(PONG_TIMEOUT) or health.silent_for() > CONNECTION_STALE_SECONDS:
+                    logger.warning("[WS %s] Sin pong/mensajes en %.0fs. Forzando reconexión.",
+                                   health.name.upper(), health.silent_for())
+                    await ws.close()
+                    return
+                await ws.send(json_codec.dumps(health.ping_payload()))
+
+                if topics is None:
+                    continue
+                stale = health.stale_topics(sorted(topics()), TOPIC_STALE_SECONDS)
+                if stale:
+                    logger.warning("[WS %s] %s topics sin datos en %ss. Re-suscribiendo: %s",
+                                   health.name.upper(), len(stale), TOPIC_STALE_SECONDS, ", ".join(stale[:5]))
+                    await self._send_subscribe(ws, "unsubscribe", stale)
+                    await self._send_subscribe(ws, "subscribe", stale)
+                    for topic in stale:
+                        health.touch(topic)
+        except asyncio.CancelledError:
             pass
+        except Exception as e:
+            logger.error("[WS %s] Error en el supervisor: %s", health.name.upper(), e)
+
+    async def _backfill_gap(self, gap_start_ms: int, topics):
+        """Pide por REST las velas de los topics kline (del shard caído) perdidas durante la desconexión."""
+        if not self.kline_gap_callback:
+            return
+        gap_end_ms = int(time.time() * 1000)
+        pairs = []
+        for topic in sorted(topics):
+            if not topic.startswith("kline."):
+                continue
+            _, interval, symbol = topic.split(".")
+            pairs.append((symbol, interval))
+        if not pairs:
+            return
+        logger.info("[WS PUBLIC] Hueco de %.1fs. Rellenando %s series de velas por REST.",
+                    (gap_end_ms - gap_start_ms) / 1000, len(pairs))
+        try:
+            await self.kline_gap_callback(pairs, gap_start_ms, gap_end_ms)
+        except Exception as e:
+            logger.error("[WS PUBLIC] Error rellenando el hueco de velas: %s", e)
+
+    def status(self) -> dict:
+        """Salud de las conexiones para el Watchdog / API (una entrada por shard público)."""
+        status = {s.health.name: dict(s.health.snapshot(), subscribed=len(s.topics))
+                  for s in sorted(self.shards, key=lambda s: s.index)}
+        status["private"] = dict(self.private_health.snapshot(), ready=self.private_ready)
+        return status
+
+    async def _handle_public_message(self, message, health: ConnectionHealth):
+        try:
+            data = json_codec.loads(message)
+            topic = data.get("topic")
+            health.on_message(topic)
+            if not topic:
+                # Respuesta al heartbeat: {"op": "ping", "ret_msg": "pong", "req_id": ...}
+                if data.get("op") == "ping" or data.get("ret_msg") == "pong":
+                    health.on_pong(data.get("req_id"))
+                return
+            if topic.startswith("kline"):
+                if not self.kline_callback:
+                    return
+                # kline.{interval}.{symbol}
+                _, interval, symbol = topic.split(".")
+                for raw in data.get("data", []):
+                    try:
+                        event = Kline.from_bybit(symbol, interval, raw)
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    await self.kline_callback(event)
+            elif topic.startswith("tickers"):
+                event = self.tickers.apply(data)
+                if event is not None and self.mark_price_callback:
+                    await self.mark_price_callback(event)
+            elif self.message_callback:
+                await self.message_callback(data)
+        except Exception as e:
+            logger.debug("Public WS message error: %s", e)
 
     async def _handle_private_message(self, message):
         try:
-            data = json.loads(message)
-            if data.get("topic") == "execution" and self.fill_callback:
-                for exec_data in data.get("data", []):
-                    # Fake bingX fill format
-                    fake_fill = {
-                        "e": "ORDER_TRADE_UPDATE",
-                        "data": {
-                            "orderId": exec_data.get("orderId"),
-                            "s": exec_data.get("symbol").replace("USDT", "-USDT"),
-                            "X": "FILLED"
-                        }
-                    }
-                    await self.fill_callback(fake_fill)
-        except Exception:
-            pass
+            data = json_codec.loads(message)
+            self.private_health.on_message(data.get("topic"))
+            if data.get("op") == "pong":
+                self.private_health.on_pong(data.get("req_id"))
+                return
+            if data.get("op") == "subscribe":
+                self.private_ready = bool(data.get("success"))
+                if not self.private_ready:
+                    logger.error("Private WS subscribe failed: %s", data.get('ret_msg'))
+                return
+            topic = data.get("topic")
+            if topic == "order" and self.order_callback:
+                await self.order_callback([OrderUpdate.from_bybit(o) for o in data.get("data", [])])
+            elif topic == "position" and self.position_callback:
+                await self.position_callback(data.get("data", []))
+            elif topic == "execution" and self.fill_callback:
+                for raw in data.get("data", []):
+                    if raw.get("category", "linear") != "linear":
+                        continue
+                    await self.fill_callback(Execution.from_bybit(raw))
+        except Exception as e:
+            logger.debug("Private WS message error: %s", e)
 
     async def stop(self):
         self.running = False
-        if self.ws_public: await self.ws_public.close()
+        for shard in self.shards:
+            if shard.ws: await shard.ws.close()
         if self.ws_private: await self.ws_private.close()
@@ -0,0 +1,105 @@
+"""
+WS Health: estado de salud de una conexión WebSocket de Bybit.
+
+Lo alimenta `BybitWebSocket` (cada mensaje, cada ping/pong, conexión y
+desconexión) y lo consulta su supervisor para decidir cuándo re-suscribir un
+topic que dejó de llegar o forzar una reconexión, además del Watchdog y la API
+para mostrar latencia y reconexiones.
+"""
+import itertools
+import time
+
+# Media móvil exponencial de la latencia (peso de la última muestra)
+RTT_EWMA_ALPHA = 0.2
+
+
+class ConnectionHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.connected = False
+        self.connected_at = 0.0
+        self.last_message = 0.0          # monotonic del último mensaje recibido
+        self.last_message_ms = 0         # epoch ms del último mensaje (inicio del hueco al caer)
+        self.gap_start_ms = 0            # epoch ms en que se perdió la conexión anterior
+        self.reconnects = 0
+        self.failures = 0                # desconexiones seguidas sin recibir nada (backoff)
+        self.rtt_ms = None               # último round-trip ping/pong
+        self.rtt_avg_ms = None
+        self.topic_seen = {}             # topic -> monotonic del último push
+        self._pending_pings = {}         # req_id -> monotonic de envío
+        self._req_ids = itertools.count(1)
+
+    # ── Ciclo de vida ──────────────────────────────────────────────────────
+
+    def on_connect(self):
+        now = time.monotonic()
+        if self.connected_at:
+            self.reconnects += 1
+        self.connected = True
+        self.connected_at = now
+        self.last_message = now
+        self.topic_seen.clear()
+        self._pending_pings.clear()
+
+    def on_disconnect(self):
+        if self.connected:
+            self.gap_start_ms = self.last_message_ms or int(time.time() * 1000)
+        self.connected = False
+        self.failures += 1
+
+    def on_message(self, topic: str = None):
+        now = time.monotonic()
+        self.last_message = now
+        self.last_message_ms = int(time.time() * 1000)
+        self.failures = 0
+        if topic:
+            self.topic_seen[topic] = now
+
+    # ── Heartbeat ──────────────────────────────────────────────────────────
+
+    def ping_payload(self) -> dict:
+        req_id = str(next(self._req_ids))
+        self._pending_pings[req_id] = time.monotonic()
+        return {"op": "ping", "req_id": req_id}
+
+    def on_pong(self, req_id) -> float:
+        """Registra el pong y devuelve el RTT en ms (None si no corresponde a un ping nuestro)."""
+        sent = self._pending_pings.pop(str(req_id), None) if req_id is not None else None
+        if sent is None:
+            return None
+        self.rtt_ms = (time.monotonic() - sent) * 1000
+        self.rtt_avg_ms = self.rtt_ms if self.rtt_avg_ms is None else (
+            RTT_EWMA_ALPHA * self.rtt_ms + (1 - RTT_EWMA_ALPHA) * self.rtt_avg_ms)
+        # Los pings anteriores sin respuesta ya no cuentan como pendientes
+        self._pending_pings = {r: t for r, t in self._pending_pings.items() if t > sent}
+        return self.rtt_ms
+
+    def pong_overdue(self, timeout: float) -> bool:
+        now = time.monotonic()
+        return any(now - sent > timeout for sent in self._pending_pings.values())
+
+    # ── Staleness ──────────────────────────────────────────────────────────
+
+    def silent_for(self) -> float:
+        return time.monotonic() - self.last_message if self.connected else 0.0
+
+    def stale_topics(self, topics, max_age: float) -> list:
+        """Topics suscritos sin pushes en `max_age` s (contando desde la conexión si nunca llegaron)."""
+        now = time.monotonic()
+        return [t for t in topics
+                if now - self.topic_seen.get(t, self.connected_at) > max_age]
+
+    def touch(self, topic: str):
+        """Reinicia el reloj de un topic (p.ej. recién re-suscrito)."""
+        self.topic_seen[topic] = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "connected": self.connected,
+            "uptime_s": round(time.monotonic() - self.connected_at, 1) if self.connected else 0.0,
+            "silent_s": round(self.silent_for(), 1),
+            "rtt_ms": round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+            "rtt_avg_ms": round(self.rtt_avg_ms, 1) if self.rtt_avg_ms is not None else None,
+            "reconnects": self.reconnects,
+            "topics": len(self.topic_seen),
+        }
@@ -1,31 +1,180 @@
+import atexit
+import gzip
+import json
 import logging
+import os
+import queue
+import shutil
 import sys
-from .constants import BOT_LOG_FILE, ERRORS_LOG_FILE
+import time
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from .constants import BOT_LOG_FILE, ERRORS_LOG_FILE, BOT_JSON_LOG_FILE
 
-def setup_logger(name="QUANTUM BYBIT"):
+ROOT_LOGGER = "QUANTUM BYBIT"
+
+# Rotación: por tamaño o por antigüedad, lo que llegue antes. Los archivos
+# rotados se comprimen (bot.log.1.gz, bot.log.2.gz, ...).
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+# Niveles por subsistema, p.ej. LOG_LEVELS="ws=WARNING,guardian=INFO"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Copia estructurada (una línea JSON por registro) en storage/bot.jsonl
+LOG_JSON = os.getenv("LOG_JSON", "0").lower() in ("1", "true", "yes")
+
+
+class CompressedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler que además rota cada `max_age` segundos y guarda los archivos rotados en gzip."""
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 max_age=LOG_ROTATE_HOURS * 3600, encoding="utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.max_age = max_age
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+        # Inicio del segmento actual en un archivo al lado (`bot.log.started`): la fecha de
+        # modificación es la de la última escritura y reiniciar el proceso no debe resetearlo
+        self._started_path = f"{self.baseFilename}.started"
+        self._opened_at = self._segment_started()
+
+    def _segment_started(self) -> float:
+        try:
+            if not os.path.getsize(self.baseFilename):
+                return self._mark_started()
+        except OSError:
+            return self._mark_started()
+        try:
+            with open(self._started_path, "r", encoding="utf-8") as f:
+                return float(f.read().strip())
+        except (OSError, ValueError):
+            # Log anterior sin marca: la creación si el sistema la da, si no la última escritura
+            st = os.stat(self.baseFilename)
+            return self._mark_started(getattr(st, "st_birthtime", st.st_mtime))
+
+    def _mark_started(self, started: float = None) -> float:
+        started = time.time() if started is None else started
+        try:
+            with open(self._started_path, "w", encoding="utf-8") as f:
+                f.write(repr(started))
+        except OSError:
+            pass
+        return started
+
+    @staticmethod
+    def _compress(source, dest):
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.max_age and time.time() - self._opened_at >= self.max_age:
+            return os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._opened_at = self._mark_started()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Encola el LogRecord tal cual: el `msg % args` y el formateo se hacen en el
+    hilo del listener, no en el que llama (QueueHandler.prepare los haría aquí).
+    Los args se formatean después, así que no pasar objetos que se muten justo
+    tras el log.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Una línea JSON por registro: ts, level, logger, msg (+ exc si lo hay)."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _parse_levels(spec: str) -> dict:
+    """Parsea LOG_LEVELS ("engine=INFO,guardian=WARNING") a {subsistema: nivel}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        subsystem, _, level = item.partition("=")
+        level = logging.getLevelName(level.strip().upper())
+        if isinstance(level, int):
+            levels[subsystem.strip()] = level
+    return levels
+
+
+_listener = None
+
+
+def setup_logger(name=ROOT_LOGGER):
+    global _listener
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
     if not logger.handlers:
         fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s")
-        
+
         # Console Handler
         ch = logging.StreamHandler(sys.stdout)
         ch.setLevel(logging.INFO)
         ch.setFormatter(fmt)
-        
+
         # File Handler (General)
-        fh = logging.FileHandler(BOT_LOG_FILE)
+        fh = CompressedRotatingFileHandler(BOT_LOG_FILE)
         fh.setLevel(logging.DEBUG)
         fh.setFormatter(fmt)
-        
+
         # File Handler (Errors)
-        eh = logging.FileHandler(ERRORS_LOG_FILE)
+        eh = CompressedRotatingFileHandler(ERRORS_LOG_FILE)
         eh.setLevel(logging.ERROR)
         eh.setFormatter(fmt)
-        
-        logger.addHandler(ch)
-        logger.addHandler(fh)
-        logger.addHandler(eh)
+
+        handlers = [ch, fh, eh]
+        if LOG_JSON:
+            jh = CompressedRotatingFileHandler(BOT_JSON_LOG_FILE)
+            jh.setLevel(logging.DEBUG)
+            jh.setFormatter(JsonLinesFormatter())
+            handlers.append(jh)
+
+        # Los handlers viven en el hilo del listener; quien loguea solo encola
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(_DeferredQueueHandler(log_queue))
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+        for subsystem, level in _parse_levels(LOG_LEVELS).items():
+            set_level(subsystem, level)
     return logger
 
-logger = setup_logger()
\ No newline at end of file
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Logger hijo por subsistema ("engine", "ws", "guardian"...), con nivel ajustable por separado."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+
+
+def set_level(subsystem: str, level):
+    """Cambia el nivel de un subsistema en caliente (p.ej. set_level("ws", "DEBUG"))."""
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    get_logger(subsystem).setLevel(level)
+
+
+def shutdown_logging():
+    """Vacía la cola y detiene el hilo del listener (al apagar)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+logger = setup_logger()
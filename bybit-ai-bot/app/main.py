@@ -14,19 +14,36 @@ from app.core.watchdog import Watchdog
 from app.core.position_manager import RetroactivePositionManager
 
 from app.logger import logger
-from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.bybit_client import get_shared_client
+from app.exchange.ohlcv_store import ohlcv_store
 from app.config import Config
 from app.constants import BOT_LOG_FILE, TRADES_FILE
+from app.utils.log_tail import tail_lines
 from app.persistence.disk_manager  import disk_manager
 from app.persistence.trade_recorder import trade_recorder
 from app.persistence.state_snapshot import state_snapshot
+from app.core.stats_engine import stats_engine, STATS_FILENAME
 
 
-engine = Engine()
+bybit_client = get_shared_client()
+
+engine = Engine(bybit_client)
+SUPERTREND_LOG_FILE = os.path.join(Config.STORAGE_DIR, "supertrend_raw.log")
+STATS_FILE = os.path.join(Config.STORAGE_DIR, STATS_FILENAME)
 watchdog = Watchdog(engine)
 retro_pm = RetroactivePositionManager(engine)
 
-bybit_client = AsyncBybitClient()
+def _load_pnl_start_time() -> int:
+    """PNL_START_TIME de storage/pnl_start_time.txt (último RESET) o de la config."""
+    pnl_start_time = getattr(Config, "PNL_START_TIME", 0)
+    pnl_start_time_file = os.path.join(Config.STORAGE_DIR, "pnl_start_time.txt")
+    if os.path.exists(pnl_start_time_file):
+        try:
+            with open(pnl_start_time_file, "r") as f:
+                pnl_start_time = int(f.read().strip())
+        except Exception as e:
+            logger.error(f"Error loading pnl_start_time.txt: {e}")
+    return pnl_start_time
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -40,10 +57,13 @@ async def lifespan(app: FastAPI):
     logger.info("Checking Hedge Mode...")
     await bybit_client.ensure_hedge_mode()
 
+    stats_engine.start_ms = _load_pnl_start_time()
+
     logger.info("Starting QUANTUM BYBIT Bot...")
     engine_task    = asyncio.create_task(engine.start())
     watchdog_task  = asyncio.create_task(watchdog.start())
     retro_pm_task  = asyncio.create_task(retro_pm.start())
+    stats_task     = asyncio.create_task(stats_engine.run(bybit_client, STATS_FILE))
     logger.info("🔭 [RETRO-PM] Inteligencia Retroactiva por K-lines activada.")
 
     logger.info("🔭 [RETRO-PM] Inteligencia Retroactiva por K-lines activada.")
@@ -58,6 +78,8 @@ async def lifespan(app: FastAPI):
     engine_task.cancel()
     watchdog_task.cancel()
     retro_pm_task.cancel()
+    stats_task.cancel()
+    await bybit_client.close()
 
 
 app = FastAPI(
@@ -116,7 +138,6 @@ async def reset_bot():
     logger.info("[USER] Manual RESET clicked. Clearing all states and closing positions...")
     from app.database import crud
     from app.constants import POSITIONS_FILE, PNL_OFFSET_FILE
-    global _stats_cache, _stats_last_fetch
     
     # 1. Reset engine memory and close active exchange positions
     await engine.reset_state()
@@ -149,9 +170,9 @@ async def reset_bot():
     except Exception as e:
         logger.error(f"Error saving PNL offset file: {e}")
         
-    # 6. Clear stats cache in memory
-    globals()["_stats_cache"] = None
-    globals()["_stats_last_fetch"] = 0
+    # 6. Reset in-memory stats aggregates
+    stats_engine.reset(now_ms)
+    stats_engine.save(STATS_FILE)
     
     # 7. Sincronizar (limpiar) el terminal visual vaciando el log
     if os.path.exists(BOT_LOG_FILE):
@@ -167,11 +188,8 @@ async def reset_bot():
 @app.get("/api/debug-log")
 async def get_debug_log():
     try:
-        import os
-        if os.path.exists("storage/bot.log"):
-            with open("storage/bot.log", "r") as f:
-                lines = f.readlines()
-                return {"logs": [line.strip() for line in lines[-100:]]}
+        if os.path.exists(BOT_LOG_FILE):
+            return {"logs": [line.strip() for line in tail_lines(BOT_LOG_FILE, 100)]}
         return {"logs": ["storage/bot.log does not exist"]}
     except Exception as e:
         return {"logs": [f"Error: {e}"]}
@@ -179,11 +197,8 @@ async def get_debug_log():
 @app.get("/api/supertrend-log")
 async def get_supertrend_log():
     try:
-        import os
-        if os.path.exists("storage/supertrend_raw.log"):
-            with open("storage/supertrend_raw.log", "r") as f:
-                lines = f.readlines()
-                return {"logs": [line.strip() for line in lines[-100:]]}
+        if os.path.exists(SUPERTREND_LOG_FILE):
+            return {"logs": [line.strip() for line in tail_lines(SUPERTREND_LOG_FILE, 100)]}
         return {"logs": ["storage/supertrend_raw.log does not exist"]}
     except Exception as e:
         return {"logs": [f"Error: {e}"]}
@@ -236,185 +251,8 @@ async def api_dashboard():
 
 @app.get("/api/stats")
 async def api_stats():
-    """Calculates global performance from trades.json."""
-    stats = {
-        "pnl_today": 0.0, "win_today": 0, "loss_today": 0,
-        "pnl_week": 0.0, "win_week": 0, "loss_week": 0,
-        "pnl_month": 0.0, "win_month": 0, "loss_month": 0,
-        "pnl_total": 0.0, "total_trades": 0,
-        "win_rate": 0.0, "profit_factor": 0.0,
-        "mean_win": 0.0, "mean_loss": 0.0,
-        "recent_trades": []
-    }
-
-    if os.path.exists(TRADES_FILE):
-        try:
-            with open(TRADES_FILE, "r") as f:
-                trades = json.load(f)
-            
-            # If trades is a dict, get values
-            if isinstance(trades, dict):
-                trade_list = list(trades.values())
-            else:
-                trade_list = trades
-                
-            if trade_list:
-                wins = 0
-                losses = 0
-                gross_profit = 0.0
-                gross_loss = 0.0
-
-                for t in trade_list:
-                    pnl = float(t.get("pnl", 0.0) or 0.0)
-                    stats["total_trades"] += 1
-
-                    if pnl > 0:
-                        wins += 1
-                        gross_profit += pnl
-                    elif pnl < 0:
-                        losses += 1
-                        gross_loss += abs(pnl)
-
-                stats["win_rate"] = (wins / stats["total_trades"] * 100) if stats["total_trades"] > 0 else 0.0
-                stats["profit_factor"] = (gross_profit / gross_loss) if gross_loss > 0 else (99.9 if gross_profit > 0 else 0.0)
-                stats["mean_win"] = (gross_profit / wins) if wins > 0 else 0.0
-                stats["mean_loss"] = (gross_loss / losses) if losses > 0 else 0.0
-
-                # Sort by latest if possible, and return top 5
-                stats["recent_trades"] = trade_list[-5:]
-        except Exception as e:
-            logger.error(f"Error calculating stats from trades.json: {e}")
-
-    # We cache this heavy operation for 60 seconds
-    global _stats_cache, _stats_last_fetch
-    if "time" in globals() and time.time() - globals().get("_stats_last_fetch", 0) < 60:
-        if globals().get("_stats_cache"):
-            return JSONResponse(globals()["_stats_cache"])
-
-    try:
-        real_trades = []
-        
-        # Fetch Realized PNL and Fees using Bybit client
-        income_data = []
-        try:
-            income_data = await bybit_client.get_income(limit=1000)
-        except Exception as api_e:
-            logger.error(f"Error fetching extended income: {api_e}")
-        
-        # Load PNL_START_TIME from storage/pnl_start_time.txt if exists
-        pnl_start_time = getattr(Config, "PNL_START_TIME", 0)
-        pnl_start_time_file = os.path.join(Config.STORAGE_DIR, "pnl_start_time.txt")
-        if os.path.exists(pnl_start_time_file):
-            try:
-                with open(pnl_start_time_file, "r") as f:
-                    pnl_start_time = int(f.read().strip())
-            except Exception as e:
-                logger.error(f"Error loading pnl_start_time.txt: {e}")
-
-        now_ms = int(time.time() * 1000)
-        
-        # Calculate last 11:00 PM UTC-5 (which is 04:00 UTC)
-        # Epoch 0 is 00:00 UTC. We get the start of today in UTC, add 4 hours.
-        current_day_utc_start = (now_ms // 86400000) * 86400000
-        reset_ms = current_day_utc_start + (4 * 3600 * 1000)
-        if now_ms < reset_ms:
-            reset_ms -= 86400000  # Reset was yesterday
-            
-        # Use pnl_start_time if it's more recent than the daily reset
-        if pnl_start_time > reset_ms:
-            reset_ms = pnl_start_time
-            
-        p_today = 0.0
-        w_today = 0
-        l_today = 0
-        
-        # Initialize vars for removed stats (to not break the return dict)
-        p_week, p_month, p_total = 0.0, 0.0, 0.0
-        w_week, w_month, l_week, l_month = 0, 0, 0, 0
-
-        if income_data:
-            for item in income_data:
-                amt = float(item.get("closedPnl", 0.0))
-                ts = int(item.get("createdTime", item.get("updatedTime", 0)))
-                
-                p_total += amt
-                if ts >= reset_ms: 
-                    p_today += amt
-                    if amt > 0: w_today += 1
-                    elif amt < 0: l_today += 1
-
-            # Build history from REALIZED_PNL only
-        for item in income_data:
-            amt = float(item.get("closedPnl", 0.0))
-            sym = item.get("symbol", "")
-            ts = int(item.get("createdTime", item.get("updatedTime", 0)))
-            side_str = item.get("side", "")
-            side = "LONG" if side_str == "Sell" else ("SHORT" if side_str == "Buy" else "TRADE")
-            # Try to enrich with local trade data
-            local_strat = "UNKNOWN"
-            local_reason = ""
-            local_be = False
-            local_trail = False
-            if 'trade_list' in locals() and trade_list:
-                for lt in trade_list:
-                    if lt.get("symbol") == sym:
-                        lt_time = lt.get("close_timestamp", 0) * 1000
-                        # Allow up to 3 minutes delta
-                        if abs(ts - lt_time) < 180000:
-                            local_strat = lt.get("strategy", "UNKNOWN")
-                            local_reason = lt.get("close_reason", "")
-                            local_be = lt.get("breakeven_hit", False)
-                            local_trail = lt.get("trailing_active", False)
-                            break
-            
-            real_trades.append({
-                "symbol": sym,
-                "side": side,
-                "pnl": amt,
-                "reason": local_reason,
-                "strategy": local_strat,
-                "breakeven_hit": local_be,
-                "trailing_active": local_trail,
-                "time": ts
-            })
-        
-        # Calculate real stats from real_trades
-        wins = sum(1 for t in real_trades if t["pnl"] > 0)
-        losses = sum(1 for t in real_trades if t["pnl"] < 0)
-        gross_profit = sum(t["pnl"] for t in real_trades if t["pnl"] > 0)
-        gross_loss = sum(abs(t["pnl"]) for t in real_trades if t["pnl"] < 0)
-        total_trades = wins + losses
-
-        stats["win_rate"] = (wins / total_trades * 100) if total_trades > 0 else 0.0
-        stats["profit_factor"] = (gross_profit / gross_loss) if gross_loss > 0 else (99.9 if gross_profit > 0 else 0.0)
-        stats["mean_win"] = (gross_profit / wins) if wins > 0 else 0.0
-        stats["mean_loss"] = (gross_loss / losses) if losses > 0 else 0.0
-        stats["total_trades"] = total_trades
-
-        # Sort trades by time desc and take top 10
-        real_trades.sort(key=lambda x: x["time"], reverse=True)
-        stats["recent_trades"] = real_trades[:10]
-
-        if income_data:
-            stats["pnl_today"] = round(p_today, 2)
-            stats["pnl_week"] = round(p_week, 2)
-            stats["pnl_month"] = round(p_month, 2)
-            stats["pnl_total"] = round(p_total, 2)
-            
-            stats["win_today"] = w_today
-            stats["loss_today"] = l_today
-            stats["win_week"] = w_week
-            stats["loss_week"] = l_week
-            stats["win_month"] = w_month
-            stats["loss_month"] = l_month
-            
-        globals()["_stats_cache"] = stats
-        globals()["_stats_last_fetch"] = time.time()
-        
-    except Exception as e:
-        logger.error(f"Error computing live PNL from exchange: {e}")
-
-    return JSONResponse(stats)
+    """Estadísticas de rendimiento servidas desde los acumulados en memoria de `stats_engine`."""
+    return JSONResponse(stats_engine.snapshot())
 
 @app.get("/api/logs")
 async def api_logs():
@@ -422,9 +260,7 @@ async def api_logs():
     logs = []
     if os.path.exists(BOT_LOG_FILE):
         try:
-            with open(BOT_LOG_FILE, "r", encoding="utf-8", errors="replace") as f:
-                lines = f.readlines()
-                logs = [l.strip() for l in lines[-100:] if l.strip()]
+            logs = [l.strip() for l in tail_lines(BOT_LOG_FILE, 100) if l.strip()]
         except Exception as e:
             logs = [f"[ERROR] Could not read logs: {e}"]
     return JSONResponse({"logs": logs})
@@ -485,6 +321,23 @@ async def api_open_trades_disk():
     except Exception as e:
         return JSONResponse({"total": 0, "trades": [], "error": str(e)})
 
+# ─── Historial OHLCV local ────────────────────────────────────────────────────
+
+@app.get("/api/ohlcv")
+async def api_ohlcv_status():
+    """Series guardadas en el historial local: velas, rango y huecos."""
+    return JSONResponse({"series": await asyncio.to_thread(ohlcv_store.status)})
+
+@app.get("/api/ohlcv/{symbol}")
+async def api_ohlcv(symbol: str, interval: str = "5", limit: int = 300):
+    """Últimas `limit` velas cerradas del historial local (columnas, oldest-first)."""
+    candles = ohlcv_store.tail(symbol, interval, max(1, min(limit, 5000)))
+    return JSONResponse({
+        "symbol": symbol.upper(),
+        "interval": interval,
+        **{name: column.tolist() for name, column in candles.as_dict().items()},
+    })
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 7860))
     uvicorn.run("app.main:app", host="0.0.0.0", port=port, reload=False)
@@ -5,7 +5,7 @@ El disco USB Lexar está conectado al router ETB y expuesto via FTP en 192.168.2
 import os
 import io
 import time
-import json
+from app.utils import json_codec
 import shutil
 import threading
 import ftplib
@@ -33,6 +33,9 @@ class FTPDiskManager:
 
         self._available   = False
         self._lock        = threading.Lock()
+        # Sesión FTP persistente del hilo escritor (ver write_queue.py)
+        self._ftp         = None
+        self._remote_dirs = set()
         self._monitor_thread = None
         self._on_disconnect_cb = None
         self._on_reconnect_cb  = None
@@ -62,6 +65,8 @@ class FTPDiskManager:
     def logs_dir_local(self):     return self._local_logs
     @property
     def memory_dir_local(self):   return self._local_memory
+    @property
+    def journal_dir_local(self):  return os.path.join(self._local_base, "operaciones_bybit", "journal")
 
     # ──────────────────────────────────────────────────────────────
     # Inicialización
@@ -94,6 +99,50 @@ class FTPDiskManager:
         ftp.set_pasv(True)
         return ftp
 
+    def _session(self) -> ftplib.FTP:
+        """Sesión FTP persistente. Llamar con self._lock tomado."""
+        if self._ftp is None:
+            self._ftp = self._get_ftp()
+        return self._ftp
+
+    def _drop_session(self):
+        if self._ftp is not None:
+            try: self._ftp.close()
+            except Exception: pass
+        self._ftp = None
+        self._remote_dirs.clear()
+
+    def keepalive(self):
+        """NOOP sobre la sesión persistente para que el servidor no la cierre por inactividad."""
+        with self._lock:
+            if self._ftp is None:
+                return
+            try:
+                self._ftp.voidcmd("NOOP")
+            except Exception:
+                self._drop_session()
+
+    def upload(self, remote_path: str, content: bytes) -> bool:
+        """Sube `content` reutilizando la sesión persistente (reconecta una vez si se cayó)."""
+        if not self._available:
+            return False
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    ftp = self._session()
+                    parent = "/".join(remote_path.split("/")[:-1])
+                    if parent and parent not in self._remote_dirs:
+                        try: ftp.mkd(parent)
+                        except ftplib.error_perm: pass  # Ya existe
+                        self._remote_dirs.add(parent)
+                    ftp.storbinary(f"STOR {remote_path}", io.BytesIO(content))
+                    return True
+                except Exception as e:
+                    self._drop_session()
+                    if attempt == 1:
+                        logger.error(f"[DISK] Error escribiendo en FTP {remote_path}: {e}")
+        return False
+
     def _test_connection(self) -> bool:
         """Verifica si el FTP responde. (Desactivado para la nube)"""
         return False
@@ -128,8 +177,9 @@ class FTPDiskManager:
         """
         Escribe un JSON en el disco FTP Y en local (doble copia).
         Si el FTP no está disponible, solo escribe en local.
+        Es bloqueante: desde código async usar `write_queue.write_json`.
         """
-        content = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        content = json_codec.dumps_bytes(data, pretty=True)
 
         # Siempre escribir localmente
         if local_path:
@@ -137,19 +187,8 @@ class FTPDiskManager:
             with open(local_path, "wb") as f:
                 f.write(content)
 
-        # Intentar escribir en FTP
-        if self._available:
-            try:
-                ftp = self._get_ftp()
-                # Crear directorio padre si no existe
-                parent = "/".join(remote_path.split("/")[:-1])
-                if parent:
-                    try: ftp.mkd(parent)
-                    except: pass
-                ftp.storbinary(f"STOR {remote_path}", io.BytesIO(content))
-                ftp.quit()
-            except Exception as e:
-                logger.error(f"[DISK] Error escribiendo en FTP {remote_path}: {e}")
+        # Intentar escribir en FTP (sesión persistente)
+        self.upload(remote_path, content)
 
     def read_json(self, remote_path: str, local_path: str = None) -> dict:
         """Lee un JSON del disco FTP. Si falla, intenta desde local."""
@@ -160,14 +199,14 @@ class FTPDiskManager:
                 buf = io.BytesIO()
                 ftp.retrbinary(f"RETR {remote_path}", buf.write)
                 ftp.quit()
-                return json.loads(buf.getvalue().decode("utf-8"))
+                return json_codec.loads(buf.getvalue())
             except Exception:
                 pass
 
         # Fallback a archivo local
         if local_path and os.path.exists(local_path):
-            with open(local_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(local_path, "rb") as f:
+                return json_codec.loads(f.read())
         return {}
 
     def list_files(self, remote_dir: str, local_dir: str = None) -> list:
@@ -190,12 +229,11 @@ class FTPDiskManager:
     def delete_file(self, remote_path: str, local_path: str = None):
         """Elimina un archivo del FTP y del local."""
         if self._available:
-            try:
-                ftp = self._get_ftp()
-                ftp.delete(remote_path)
-                ftp.quit()
-            except Exception:
-                pass
+            with self._lock:
+                try:
+                    self._session().delete(remote_path)
+                except Exception:
+                    pass
         if local_path and os.path.exists(local_path):
             try: os.remove(local_path)
             except: pass
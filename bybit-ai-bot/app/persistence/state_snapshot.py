@@ -4,11 +4,12 @@ Al apagar, serializa toda la memoria del engine.
 Al encender, carga el estado y restaura operaciones abiertas.
 """
 import os
-import json
+from app.utils import json_codec
 import time
 from datetime import datetime
 from app.logger import logger
 from app.persistence.disk_manager import disk_manager
+from app.persistence.write_queue import write_queue
 
 
 STATE_FILENAME = "estado_bot.json"
@@ -48,23 +49,14 @@ class StateSnapshot:
             "disk_source":   "network" if disk_manager.is_available() else "local",
         }
 
-        path = self._state_path()
-        # Backup del archivo anterior
-        if os.path.exists(path):
-            backup = path.replace(".json", "_backup.json")
-            try:
-                import shutil
-                shutil.copy2(path, backup)
-            except Exception:
-                pass
-
         try:
             local_path = self._state_path()
             remote_path = f"{disk_manager.memory_dir}/{STATE_FILENAME}"
-            with open(local_path, "w", encoding="utf-8") as f:
-                json.dump(snapshot, f, ensure_ascii=False, indent=2)
-            # Subir al FTP también
-            disk_manager.write_json(remote_path, snapshot, local_path)
+            # El hilo escritor hace el backup del archivo anterior, escribe en local y sube al FTP
+            write_queue.write_json(
+                local_path, snapshot, remote_path,
+                backup_path=local_path.replace(".json", "_backup.json")
+            )
             logger.info(f"[STATE] 💾 Estado guardado: {len(trade_state)} operaciones activas.")
         except Exception as e:
             logger.error(f"[STATE] Error guardando estado: {e}")
@@ -81,8 +73,8 @@ class StateSnapshot:
             return {"trade_state": {}, "cooldowns": {}}
 
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                snapshot = json.load(f)
+            with open(path, "rb") as f:
+                snapshot = json_codec.loads(f.read())
 
             ts = snapshot.get("guardado_ts", 0)
             age_mins = (time.time() - ts) / 60
@@ -115,9 +107,8 @@ class StateSnapshot:
         """Borra el estado guardado (se usa al hacer RESET manual del bot)."""
         path = self._state_path()
         try:
-            if os.path.exists(path):
-                os.remove(path)
-                logger.info("[STATE] 🗑️ Estado persistente eliminado.")
+            write_queue.delete(path)
+            logger.info("[STATE] 🗑️ Estado persistente eliminado.")
         except Exception as e:
             logger.error(f"[STATE] Error eliminando estado: {e}")
 
@@ -140,7 +131,7 @@ class StateSnapshot:
                 if k == "lock":
                     continue
                 try:
-                    json.dumps(v)  # Test de serializabilidad
+                    json_codec.dumps_bytes(v)  # Test de serializabilidad
                     safe_trade[k] = v
                 except (TypeError, ValueError):
                     safe_trade[k] = str(v)
@@ -171,8 +162,8 @@ class StateSnapshot:
             return {"exists": False}
         try:
             stat = os.stat(path)
-            with open(path, "r", encoding="utf-8") as f:
-                snap = json.load(f)
+            with open(path, "rb") as f:
+                snap = json_codec.loads(f.read())
             return {
                 "exists":      True,
                 "guardado_en": snap.get("guardado_en", ""),
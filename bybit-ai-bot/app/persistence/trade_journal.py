@@ -0,0 +1,276 @@
+"""
+Trade Journal: registro append-only de operaciones en segmentos diarios.
+
+Sustituye el JSON-por-operación de `abiertas/` + `historial/YYYY-MM-DD/`:
+cada evento (apertura, actualización, cierre) es un único append secuencial
+al segmento del día, con formato
+
+    [longitud u32][crc32 u32][JSON compacto]
+
+Al arrancar se recorre cada segmento una vez para reconstruir el índice en
+memoria (operaciones abiertas completas; cerradas como (segmento, offset) por
+trade_id, símbolo y día), así que las consultas del dashboard leen solo los
+registros pedidos. Un registro final truncado (corte de luz a mitad de
+escritura) se descarta y el segmento se recorta a su último registro válido.
+
+Uso del conversor desde el layout de carpetas anterior:
+    python -m app.persistence.trade_journal --import
+"""
+import os
+from app.utils import json_codec
+import time
+import struct
+import zlib
+import threading
+from datetime import datetime
+from app.logger import logger
+
+HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".journal"
+
+# always: fsync en cada append | interval: como mucho cada FSYNC_INTERVAL s | never: lo decide el SO
+FSYNC_POLICY = os.getenv("TRADE_JOURNAL_FSYNC", "interval")
+FSYNC_INTERVAL = float(os.getenv("TRADE_JOURNAL_FSYNC_INTERVAL", "5"))
+
+
+class TradeJournal:
+    def __init__(self, directory: str, fsync_policy: str = None, fsync_interval: float = None):
+        self.directory = directory
+        self.fsync_policy = fsync_policy or FSYNC_POLICY
+        self.fsync_interval = FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self._lock = threading.RLock()
+        self._segment = None     # nombre del segmento abierto para escritura
+        self._fh = None
+        self._last_fsync = 0.0
+        self._loaded = False
+        # Índices
+        self._open = {}          # trade_id -> registro completo de la operación abierta
+        self._closed = []        # [(segmento, offset)] de cierres en orden de llegada
+        self._closed_by_id = {}  # trade_id -> (segmento, offset)
+        self._closed_by_day = {} # segmento -> [(segmento, offset)]
+        self._by_symbol = {}     # símbolo -> [trade_id] en orden de apertura
+
+    # ──────────────────────────────────────────────────────────────
+    # Carga del índice
+    # ──────────────────────────────────────────────────────────────
+
+    def _segments(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f[:-len(SEGMENT_SUFFIX)] for f in os.listdir(self.directory) if f.endswith(SEGMENT_SUFFIX))
+
+    def _segment_path(self, segment: str) -> str:
+        return os.path.join(self.directory, f"{segment}{SEGMENT_SUFFIX}")
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            count = 0
+            for segment in self._segments():
+                for offset, entry in self._scan(segment):
+                    self._index(segment, offset, entry)
+                    count += 1
+            self._loaded = True
+            logger.info(f"[JOURNAL] Índice cargado: {count} eventos, {len(self._open)} abiertas, {len(self._closed)} cerradas.")
+
+    def _scan(self, segment: str):
+        """Itera (offset, registro) de un segmento y recorta una cola corrupta."""
+        path = self._segment_path(segment)
+        valid_end = 0
+        with open(path, "rb") as f:
+            data = f.read()
+        while valid_end + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, valid_end)
+            start = valid_end + HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            try:
+                entry = json_codec.loads(payload)
+            except ValueError:
+                break
+            yield valid_end, entry
+            valid_end = start + length
+        if valid_end < len(data):
+            logger.warning(f"[JOURNAL] Segmento {segment} con {len(data) - valid_end} bytes finales inválidos. Recortando.")
+            with open(path, "r+b") as f:
+                f.truncate(valid_end)
+
+    def _index(self, segment: str, offset: int, entry: dict):
+        op, trade_id, data = entry.get("op"), entry.get("id"), entry.get("data") or {}
+        if op == "open":
+            self._open[trade_id] = data
+            symbol = data.get("symbol", "")
+            self._by_symbol.setdefault(symbol, []).append(trade_id)
+        elif op == "update":
+            if trade_id in self._open:
+                self._open[trade_id].update(data)
+        elif op == "close":
+            was_open = self._open.pop(trade_id, None)
+            if was_open is None and trade_id not in self._closed_by_id:
+                self._by_symbol.setdefault(data.get("symbol", ""), []).append(trade_id)
+            loc = (segment, offset)
+            self._closed.append(loc)
+            self._closed_by_id[trade_id] = loc
+            self._closed_by_day.setdefault(segment, []).append(loc)
+
+    # ──────────────────────────────────────────────────────────────
+    # Escritura
+    # ──────────────────────────────────────────────────────────────
+
+    def append(self, op: str, trade_id: str, data: dict, segment: str = None) -> tuple:
+        """Añade un evento (un único write secuencial). `segment` por defecto: el día de hoy."""
+        self.load()
+        segment = segment or datetime.now().strftime("%Y-%m-%d")
+        payload = json_codec.dumps_bytes({"op": op, "id": trade_id, "ts": int(time.time()), "data": data})
+        frame = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._segment != segment:
+                self._close_segment()
+                self._fh = open(self._segment_path(segment), "ab")
+                self._segment = segment
+            offset = self._fh.tell()
+            self._fh.write(frame)
+            self._fh.flush()
+            self._maybe_fsync()
+            self._index(segment, offset, {"op": op, "id": trade_id, "data": data})
+        return segment, offset
+
+    def _maybe_fsync(self, force: bool = False):
+        if self.fsync_policy == "never" and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync_policy == "always" or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._fh.fileno())
+            self._last_fsync = now
+
+    def _close_segment(self):
+        if self._fh is not None:
+            self._maybe_fsync(force=True)
+            self._fh.close()
+        self._fh, self._segment = None, None
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+    # ──────────────────────────────────────────────────────────────
+    # Consultas
+    # ──────────────────────────────────────────────────────────────
+
+    def _read(self, locations: list) -> list:
+        out, handles = [], {}
+        try:
+            for segment, offset in locations:
+                fh = handles.get(segment)
+                if fh is None:
+                    fh = handles[segment] = open(self._segment_path(segment), "rb")
+                fh.seek(offset)
+                length, _ = HEADER.unpack(fh.read(HEADER.size))
+                out.append(json_codec.loads(fh.read(length))["data"])
+        finally:
+            for fh in handles.values():
+                fh.close()
+        return out
+
+    def get_open(self, trade_id: str) -> dict:
+        self.load()
+        with self._lock:
+            record = self._open.get(trade_id)
+            return dict(record) if record is not None else None
+
+    def open_trades(self) -> list:
+        self.load()
+        # Los appends llegan desde el hilo escritor: copiar bajo el lock
+        with self._lock:
+            return [dict(r) for r in self._open.values()]
+
+    def history(self, date_str: str = None, limit: int = 50) -> list:
+        """Últimas `limit` operaciones cerradas (más recientes primero), opcionalmente de un día."""
+        self.load()
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+            locations = self._closed_by_day.get(date_str, []) if date_str else self._closed
+            selected = locations[::-1][:limit] if limit else locations[::-1]
+        return self._read(selected)
+
+    def trades_for_symbol(self, symbol: str, limit: int = 50) -> list:
+        """Operaciones (abiertas y cerradas) de un símbolo, más recientes primero."""
+        self.load()
+        entries = []
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+            for trade_id in reversed(self._by_symbol.get(symbol, [])):
+                if trade_id in self._open:
+                    entries.append(dict(self._open[trade_id]))
+                elif trade_id in self._closed_by_id:
+                    entries.append(self._closed_by_id[trade_id])
+                if len(entries) >= limit:
+                    break
+        # Las cerradas se leen del segmento fuera del lock, en orden
+        return [e if isinstance(e, dict) else self._read([e])[0] for e in entries]
+
+    def __contains__(self, trade_id: str) -> bool:
+        self.load()
+        with self._lock:
+            return trade_id in self._open or trade_id in self._closed_by_id
+
+
+def convert_directory_layout(journal: TradeJournal, open_dir: str, hist_dir: str) -> tuple:
+    """
+    Importa el layout anterior (abiertas/*.json + historial/YYYY-MM-DD/*.json)
+    al journal. Idempotente: omite los trade_id ya presentes. Los archivos
+    originales no se tocan. Devuelve (abiertas, cerradas) importadas.
+    """
+    def _load(path):
+        try:
+            with open(path, "rb") as f:
+                return json_codec.loads(f.read())
+        except Exception as e:
+            logger.error(f"[JOURNAL] No se pudo importar {path}: {e}")
+            return None
+
+    imported_open = imported_closed = 0
+    if os.path.isdir(hist_dir):
+        for day in sorted(os.listdir(hist_dir)):
+            day_dir = os.path.join(hist_dir, day)
+            if not os.path.isdir(day_dir):
+                continue
+            records = [r for r in (_load(os.path.join(day_dir, f)) for f in os.listdir(day_dir) if f.endswith(".json")) if r]
+            records.sort(key=lambda r: r.get("cierre_ts", 0))
+            for record in records:
+                trade_id = str(record.get("trade_id") or f"{record.get('symbol', '')}_{record.get('cierre_ts', 0)}")
+                if trade_id in journal:
+                    continue
+                journal.append("close", trade_id, record, segment=day)
+                imported_closed += 1
+
+    if os.path.isdir(open_dir):
+        for fname in sorted(os.listdir(open_dir)):
+            if not fname.endswith(".json"):
+                continue
+            record = _load(os.path.join(open_dir, fname))
+            trade_id = str((record or {}).get("trade_id") or fname[:-5])
+            if record and trade_id not in journal:
+                journal.append("open", trade_id, record)
+                imported_open += 1
+
+    if imported_open or imported_closed:
+        logger.info(f"[JOURNAL] Importadas {imported_open} abiertas y {imported_closed} cerradas del layout anterior.")
+    return imported_open, imported_closed
+
+
+if __name__ == "__main__":
+    import sys
+    from app.persistence.disk_manager import disk_manager
+    if "--import" not in sys.argv:
+        print("Uso: python -m app.persistence.trade_journal --import")
+        sys.exit(1)
+    journal = TradeJournal(disk_manager.journal_dir_local)
+    opened, closed = convert_directory_layout(journal, disk_manager.ops_open_dir_local, disk_manager.ops_hist_dir_local)
+    journal.close()
+    print(f"Importadas {opened} abiertas y {closed} cerradas en {journal.directory}")
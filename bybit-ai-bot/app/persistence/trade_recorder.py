@@ -1,46 +1,78 @@
 """
-Trade Recorder: Guarda cada operación del bot en el disco de red como archivos JSON.
-Crea un archivo por operación abierta y lo archiva al cerrarse, con historial por fecha.
+Trade Recorder: Guarda cada operación del bot en el disco como eventos de un journal.
+Cada apertura, actualización y cierre es un único append al segmento del día
+(ver trade_journal.py); el historial y las abiertas salen del índice en memoria.
+
+El engine llama a record_open/record_close desde el event loop: allí solo se
+construye el registro, y el append (write + fsync) y la copia en el FTP los
+hace el hilo escritor de `write_queue`, en orden de llegada.
 """
 import os
-import json
 import time
 from datetime import datetime
-from pathlib import Path
 from app.logger import logger
+from app.utils import json_codec
 from app.persistence.disk_manager import disk_manager
+from app.persistence.trade_journal import TradeJournal, convert_directory_layout
+from app.persistence.write_queue import write_queue
+
+
+# En el directorio del journal: el layout anterior ya se importó por completo
+LEGACY_IMPORT_MARKER = ".legacy_imported"
 
 
 class TradeRecorder:
     """
-    Registra operaciones de trading en el disco de red/local.
+    Registra operaciones de trading en el disco local.
     
     Estructura de archivos:
     operaciones_bybit/
-    ├── abiertas/
-    │   └── {SYMBOL}_{SIDE}_{TIMESTAMP}.json
-    └── historial/
-        └── {YYYY-MM-DD}/
-            └── {SYMBOL}_{SIDE}_{ESTADO}_{TIMESTAMP}.json
+    └── journal/
+        └── {YYYY-MM-DD}.journal   (eventos open/update/close de ese día)
+
+    El layout anterior (abiertas/*.json + historial/{YYYY-MM-DD}/*.json) se
+    importa automáticamente hasta que una importación termina completa.
+
+    Cada operación abierta se copia además al FTP en abiertas/{trade_id}.json
+    y se borra de allí al cerrarse.
     """
 
-    def _open_path(self, trade_id: str) -> str:
-        """Ruta local del archivo de una operación abierta."""
-        return os.path.join(disk_manager.ops_open_dir_local, f"{trade_id}.json")
+    def __init__(self, journal: TradeJournal = None, queue=write_queue):
+        self._journal = journal
+        self._queue = queue
+
+    @property
+    def journal(self) -> TradeJournal:
+        if self._journal is None:
+            journal = TradeJournal(disk_manager.journal_dir_local)
+            # El marcador se escribe al terminar: una importación interrumpida se repite
+            # entera en el siguiente arranque (el conversor omite los trade_id ya importados)
+            marker = os.path.join(disk_manager.journal_dir_local, LEGACY_IMPORT_MARKER)
+            if not os.path.exists(marker):
+                convert_directory_layout(
+                    journal, disk_manager.ops_open_dir_local, disk_manager.ops_hist_dir_local
+                )
+                journal.close()  # fsync de lo importado antes de marcarlo como completo
+                with open(marker, "w", encoding="utf-8") as f:
+                    f.write(datetime.now().isoformat())
+            self._journal = journal
+        return self._journal
 
-    def _history_path(self, symbol: str, side: str, state: str) -> str:
-        """Ruta local del archivo de historial por fecha."""
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        ts = int(time.time())
-        date_dir = os.path.join(disk_manager.ops_hist_dir_local, date_str)
-        os.makedirs(date_dir, exist_ok=True)
-        return os.path.join(date_dir, f"{symbol}_{side}_{state}_{ts}.json")
+    def open(self) -> TradeJournal:
+        """
+        Carga el journal (e importa el layout anterior la primera vez).
+        Bloqueante: el engine lo llama al arrancar con asyncio.to_thread.
+        """
+        return self.journal
+
+    def _remote_open_path(self, trade_id: str) -> str:
+        return f"{disk_manager.ops_open_dir}/{trade_id}.json"
 
     # ──────────────────────────────────────────────────────────────
 
     def record_open(self, trade_id: str, trade_data: dict):
         """
-        Guarda una operación abierta en disco local Y en FTP.
+        Registra una operación abierta en el journal.
         Se llama en el momento en que el bot ejecuta la orden de entrada.
         """
         record = {
@@ -68,136 +100,97 @@ class TradeRecorder:
             "estado":             "ABIERTA",
             "notas":              []
         }
-        local_path = self._open_path(trade_id)
-        remote_path = f"{disk_manager.ops_open_dir}/{trade_id}.json"
+        self._queue.submit(lambda: self._append_open(trade_id, record))
+
+    def _append_open(self, trade_id: str, record: dict):
         try:
-            # Guardar local
-            with open(local_path, "w", encoding="utf-8") as f:
-                json.dump(record, f, ensure_ascii=False, indent=2)
-            # Subir al FTP en background (no bloquea el bot)
-            disk_manager.write_json(remote_path, record, local_path)
-            logger.info(f"[TRADE-RECORDER] 📂 Operación guardada: {trade_data.get('symbol')} {trade_data.get('side')}")
+            self.journal.append("open", trade_id, record)
+            # Copia en el FTP (no-op si el disco no está disponible)
+            disk_manager.upload(self._remote_open_path(trade_id), json_codec.dumps_bytes(record, pretty=True))
+            logger.info(f"[TRADE-RECORDER] 📂 Operación guardada: {record['symbol']} {record['side']}")
         except Exception as e:
             logger.error(f"[TRADE-RECORDER] Error guardando operación {trade_id}: {e}")
 
-
     def update_open(self, trade_id: str, updates: dict):
         """
-        Actualiza el archivo JSON de una operación abierta.
+        Actualiza una operación abierta (solo se escriben los campos cambiados).
         Llamado periódicamente para actualizar PnL, Trailing, Breakeven, etc.
         """
-        path = self._open_path(trade_id)
-        if not os.path.exists(path):
-            return
+        updates = dict(updates, ultima_actualizacion=datetime.now().isoformat())
+        self._queue.submit(lambda: self._append_update(trade_id, updates))
+
+    def _append_update(self, trade_id: str, updates: dict):
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                record = json.load(f)
-            record.update(updates)
-            record["ultima_actualizacion"] = datetime.now().isoformat()
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(record, f, ensure_ascii=False, indent=2)
+            if self.journal.get_open(trade_id) is None:
+                return
+            self.journal.append("update", trade_id, updates)
         except Exception as e:
             logger.error(f"[TRADE-RECORDER] Error actualizando {trade_id}: {e}")
 
     def record_close(self, trade_id: str, symbol: str, side: str,
                      pnl: float, reason: str, extra: dict = None):
         """
-        Cierra una operación: mueve el archivo de 'abiertas/' al historial por fecha.
+        Cierra una operación: añade el evento de cierre al journal del día.
         Incluye el PnL real, motivo de cierre y todos los parámetros de protección usados.
         """
-        open_path = self._open_path(trade_id)
-        
-        # Leer el registro abierto
-        record = {}
-        if os.path.exists(open_path):
-            try:
-                with open(open_path, "r", encoding="utf-8") as f:
-                    record = json.load(f)
-            except Exception:
-                pass
+        closed_at = (datetime.now().isoformat(), int(time.time()))
+        self._queue.submit(lambda: self._append_close(trade_id, symbol, side, pnl, reason, extra, closed_at))
+
+    def _append_close(self, trade_id: str, symbol: str, side: str, pnl: float, reason: str,
+                      extra: dict, closed_at: tuple):
+        # Registro abierto (desde el índice en memoria; su apertura ya se aplicó: misma cola)
+        record = self.journal.get_open(trade_id) or {}
 
         # Enriquecer con datos de cierre
+        cierre, cierre_ts = closed_at
         estado = "GANADA" if pnl > 0 else ("PERDIDA" if pnl < 0 else "BREAKEVEN")
         record.update({
-            "cierre":         datetime.now().isoformat(),
-            "cierre_ts":      int(time.time()),
+            "cierre":         cierre,
+            "cierre_ts":      cierre_ts,
             "pnl_realizado":  round(pnl, 4),
             "motivo_cierre":  reason,
             "estado_final":   estado,
-            "duracion_mins":  round((int(time.time()) - record.get("apertura_ts", int(time.time()))) / 60, 1),
+            "duracion_mins":  round((cierre_ts - record.get("apertura_ts", cierre_ts)) / 60, 1),
         })
         if extra:
             record.update(extra)
-        record["notas"].append(f"Cerrada por: {reason}. PnL: {pnl:.4f} USDT. Estado: {estado}")
+        record["notas"] = record.get("notas", []) + [f"Cerrada por: {reason}. PnL: {pnl:.4f} USDT. Estado: {estado}"]
+
+        record.setdefault("trade_id", trade_id)
+        record.setdefault("symbol", symbol)
+        record.setdefault("side", side)
 
         # Guardar en historial
-        hist_path = self._history_path(symbol, side, estado)
         try:
-            with open(hist_path, "w", encoding="utf-8") as f:
-                json.dump(record, f, ensure_ascii=False, indent=2)
+            self.journal.append("close", trade_id, record)
+            disk_manager.delete_file(self._remote_open_path(trade_id))
             logger.info(f"[TRADE-RECORDER] 📊 Operación archivada: {symbol} {side} → {estado} ({pnl:+.4f} USDT)")
         except Exception as e:
             logger.error(f"[TRADE-RECORDER] Error archivando {trade_id}: {e}")
 
-        # Eliminar de abiertas
-        try:
-            if os.path.exists(open_path):
-                os.remove(open_path)
-        except Exception as e:
-            logger.error(f"[TRADE-RECORDER] Error eliminando archivo abierto {trade_id}: {e}")
-
     def get_all_open(self) -> list:
-        """Retorna todos los registros de operaciones abiertas en disco."""
-        trades = []
-        open_dir = disk_manager.ops_open_dir_local
-        if not open_dir or not os.path.exists(open_dir):
-            return trades
+        """Retorna todos los registros de operaciones abiertas."""
         try:
-            for fname in os.listdir(open_dir):
-                if fname.endswith(".json"):
-                    fpath = os.path.join(open_dir, fname)
-                    try:
-                        with open(fpath, "r", encoding="utf-8") as f:
-                            trades.append(json.load(f))
-                    except Exception:
-                        continue
+            return self.journal.open_trades()
         except Exception as e:
             logger.error(f"[TRADE-RECORDER] Error leyendo operaciones abiertas: {e}")
-        return trades
+            return []
 
     def get_history(self, date_str: str = None, limit: int = 50) -> list:
         """
-        Retorna el historial de operaciones cerradas.
+        Retorna el historial de operaciones cerradas (más recientes primero).
         Si date_str=None, retorna las últimas `limit` operaciones de todos los días.
         """
-        trades = []
-        hist_dir = disk_manager.ops_hist_dir_local
-        if not hist_dir or not os.path.exists(hist_dir):
-            return trades
         try:
-            if date_str:
-                date_dir = os.path.join(hist_dir, date_str)
-                dirs = [date_dir] if os.path.exists(date_dir) else []
-            else:
-                dirs = sorted(
-                    [os.path.join(hist_dir, d) for d in os.listdir(hist_dir)
-                     if os.path.isdir(os.path.join(hist_dir, d))],
-                    reverse=True
-                )
-
-            for d in dirs:
-                for fname in sorted(os.listdir(d), reverse=True):
-                    if fname.endswith(".json"):
-                        try:
-                            with open(os.path.join(d, fname), "r", encoding="utf-8") as f:
-                                trades.append(json.load(f))
-                            if len(trades) >= limit:
-                                return trades
-                        except Exception:
-                            continue
+            return self.journal.history(date_str, limit)
         except Exception as e:
             logger.error(f"[TRADE-RECORDER] Error leyendo historial: {e}")
-        return trades
+            return []
+
+    def close(self):
+        """Cierra el segmento abierto del journal (fsync incluido). Tras vaciar `write_queue`."""
+        if self._journal is not None:
+            self._journal.close()
 
 
 # Instancia global
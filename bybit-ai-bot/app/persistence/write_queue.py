@@ -0,0 +1,158 @@
+"""
+Write Queue: persistencia en segundo plano para no bloquear el event loop.
+
+TradeRecorder y StateSnapshot solo serializan el JSON (en el hilo que llama,
+para capturar una foto consistente del estado) y lo encolan. Un único hilo
+escritor vacía la cola por lotes: escribe en local de forma atómica y sube al
+FTP reutilizando la sesión persistente de `disk_manager`. Si la misma ruta se
+escribe varias veces antes de vaciarse la cola, solo se escribe la última
+versión. Las lecturas pasan por `read_json()`, que ve lo encolado y aún no
+escrito. `submit()` encola además trabajos arbitrarios (p.ej. los appends del
+journal de operaciones), que el mismo hilo ejecuta en orden con el resto.
+"""
+import os
+from app.utils import json_codec
+import shutil
+import threading
+from app.logger import logger
+from app.persistence.disk_manager import disk_manager
+
+# Ventana para agrupar escrituras seguidas en un mismo lote
+BATCH_WINDOW = 0.2
+# Sin actividad, cada cuánto se hace NOOP a la sesión FTP para mantenerla viva
+KEEPALIVE_INTERVAL = 30.0
+
+
+class _PendingOp:
+    __slots__ = ("content", "remote_path", "backup_path", "action")
+
+    def __init__(self, content, remote_path, backup_path=None, action=None):
+        self.content = content          # bytes, o None para borrar
+        self.remote_path = remote_path
+        self.backup_path = backup_path
+        self.action = action            # callable del hilo escritor (submit)
+
+
+class WriteQueue:
+    def __init__(self):
+        self._pending = {}              # local_path -> _PendingOp (orden de llegada)
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread = None
+        self._jobs = 0
+        self.stats = {"enqueued": 0, "written": 0, "coalesced": 0, "jobs": 0}
+
+    # ──────────────────────────────────────────────────────────────
+    # API (hilo del event loop)
+    # ──────────────────────────────────────────────────────────────
+
+    def write_json(self, local_path: str, data, remote_path: str = None, backup_path: str = None):
+        """Encola `data` para `local_path` (y `remote_path` en el FTP). No bloquea."""
+        content = json_codec.dumps_bytes(data, pretty=True)
+        self._enqueue(local_path, _PendingOp(content, remote_path, backup_path))
+
+    def delete(self, local_path: str, remote_path: str = None):
+        self._enqueue(local_path, _PendingOp(None, remote_path))
+
+    def submit(self, action):
+        """Encola `action()` para el hilo escritor, en orden con las escrituras. No bloquea."""
+        with self._cond:
+            self._jobs += 1
+            key = f"<job:{self._jobs}>"
+        self._enqueue(key, _PendingOp(None, None, action=action))
+
+    def read_json(self, local_path: str, default=None):
+        """Lee `local_path` viendo primero lo encolado y aún no escrito."""
+        with self._cond:
+            op = self._pending.get(local_path)
+        if op is not None:
+            return default if op.content is None else json_codec.loads(op.content)
+        if not os.path.exists(local_path):
+            return default
+        with open(local_path, "rb") as f:
+            return json_codec.loads(f.read())
+
+    def pending_in(self, local_dir: str) -> dict:
+        """{ruta: datos o None si se va a borrar} de lo encolado dentro de `local_dir`."""
+        local_dir = os.path.normpath(local_dir)
+        with self._cond:
+            ops = [(p, op) for p, op in self._pending.items()
+                   if op.action is None and os.path.dirname(os.path.normpath(p)) == local_dir]
+        return {p: (None if op.content is None else json_codec.loads(op.content)) for p, op in ops}
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera a que la cola quede vacía (al apagar). Bloqueante: usar con asyncio.to_thread."""
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout=timeout)
+
+    def _enqueue(self, local_path: str, op: _PendingOp):
+        with self._cond:
+            previous = self._pending.pop(local_path, None)
+            if previous is not None:
+                self.stats["coalesced"] += 1
+                if op.backup_path is None:
+                    op.backup_path = previous.backup_path
+            self._pending[local_path] = op
+            self.stats["enqueued"] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer_loop, daemon=True, name="PersistenceWriter")
+                self._thread.start()
+            self._cond.notify_all()
+
+    # ──────────────────────────────────────────────────────────────
+    # Hilo escritor
+    # ──────────────────────────────────────────────────────────────
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait(timeout=KEEPALIVE_INTERVAL)
+                if not self._pending:
+                    disk_manager.keepalive()
+                    continue
+                # Dejar que lleguen más escrituras del mismo evento y coalescerlas
+                self._cond.wait(timeout=BATCH_WINDOW)
+                batch = list(self._pending.items())
+                self._pending.clear()
+                self._busy = True
+            try:
+                for local_path, op in batch:
+                    self._apply(local_path, op)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _apply(self, local_path: str, op: _PendingOp):
+        try:
+            if op.action is not None:
+                op.action()
+                self.stats["jobs"] += 1
+                return
+
+            if op.content is None:
+                if os.path.exists(local_path):
+                    os.remove(local_path)
+                if op.remote_path:
+                    disk_manager.delete_file(op.remote_path)
+                return
+
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            if op.backup_path and os.path.exists(local_path):
+                shutil.copy2(local_path, op.backup_path)
+            # Escritura atómica: los lectores (API) nunca ven un JSON a medias
+            tmp_path = f"{local_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(op.content)
+            os.replace(tmp_path, local_path)
+            if op.remote_path:
+                disk_manager.upload(op.remote_path, op.content)
+            self.stats["written"] += 1
+        except Exception as e:
+            logger.error(f"[DISK] Error en escritura diferida de {local_path}: {e}")
+
+
+# Instancia global
+write_queue = WriteQueue()
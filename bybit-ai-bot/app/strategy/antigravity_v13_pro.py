@@ -1,49 +1,55 @@
-from app.utils.indicators import calculate_ema, calculate_sma, calculate_atr, calculate_hull_ma, calculate_macd, calculate_bollinger_bands, ta_rising, ta_falling, calculate_dmi, calculate_rsi
+from app.utils.indicators import ta_rising, ta_falling
+from app.strategy.v13_features import compute_v13_features
 from app.config import Config
 from app.logger import logger
 
-async def evaluate_antigravity_v13(client, symbol: str) -> dict:
+async def evaluate_antigravity_v13(client, symbol: str, indicators=None) -> dict:
     """
     Estrategia "ANTIGRAVITY QUANTUM V13 PRO - FINAL"
+
+    `indicators` (IndicatorRegistry del engine): si tiene el estado incremental
+    del símbolo al día con la última vela cerrada, se usa en lugar de recalcular
+    todo el historial con `compute_v13_features`.
     """
     # Fetch enough klines for EMA200 calculation
-    klines = await client.get_klines(symbol, Config.TIMEFRAME, 250)
-    if not klines or len(klines) < 220:
+    klines = await client.get_klines(symbol, Config.TIMEFRAME, 250, as_array=True)
+    if klines is None or len(klines) < 220:
         return {"signal": "NONE"}
     
     # Drop the unclosed candle
     klines = klines[:-1]
     
-    closes = [c["close"] for c in klines]
-    highs = [c["high"] for c in klines]
-    lows = [c["low"] for c in klines]
-    volumes = [c["volume"] for c in klines]
+    # INDICADORES: estado incremental si está al día; si no, una sola pasada columnar (ver v13_features)
+    ind = indicators.get(symbol.replace("-", "").upper(), Config.TIMEFRAME.replace("m", "")) if indicators is not None else None
+    f = ind.features(int(klines["time"][-1]), window=len(klines)) if ind is not None else None
+    if f is None:
+        f = compute_v13_features(klines)
+    closes = f["close"]
+    volumes = f["volume"]
     
-    # INDICADORES
-    ema9 = calculate_ema(closes, 9)
-    ema20 = calculate_ema(closes, 20)
-    ema50 = calculate_ema(closes, 50)
-    ema100 = calculate_ema(closes, 100)
-    ema200 = calculate_ema(closes, 200)
+    ema9 = f["ema9"]
+    ema20 = f["ema20"]
+    ema50 = f["ema50"]
+    ema100 = f["ema100"]
     
-    hull20 = calculate_hull_ma(closes, 20)
-    hull50 = calculate_hull_ma(closes, 50)
+    hull20 = f["hull20"]
+    hull50 = f["hull50"]
     
-    atr14 = calculate_atr(highs, lows, closes, 14)
-    plus_di, minus_di, adx14 = calculate_dmi(highs, lows, closes, 14)
+    atr14 = f["atr14"]
+    plus_di, minus_di, adx14 = f["plus_di"], f["minus_di"], f["adx14"]
     
-    volMA = calculate_sma(volumes, 20)
-    volSMA50 = calculate_sma(volumes, 50)
+    volMA = f["vol_ma20"]
+    volSMA50 = f["vol_sma50"]
     
-    rsi14 = calculate_rsi(closes, 14)
-    macd_line, signal_line, _ = calculate_macd(closes, 12, 26, 9)
+    rsi14 = f["rsi14"]
+    macd_line, signal_line = f["macd"], f["macd_signal"]
     
-    bb_middle, bb_upper, bb_lower = calculate_bollinger_bands(closes, 20, 2.0)
+    bb_middle, bb_upper, bb_lower = f["bb_middle"], f["bb_upper"], f["bb_lower"]
     
     # Current values
-    current_close = closes[-1]
-    current_volume = volumes[-1]
-    current_atr = atr14[-1] if atr14 else 0
+    current_close = float(closes[-1])
+    current_volume = float(volumes[-1])
+    current_atr = float(atr14[-1]) if len(atr14) else 0
     
     # Trend Bull/Bear
     rising_ema9 = ta_rising(ema9, 2)
@@ -16,12 +16,13 @@ async def evaluate_supertrend_regime(client, symbol: str):
     """
     try:
         # Fetch data for 15m and 1h. Need enough data for EMA200 + 160 candles lookback
-        klines_15m = await client.get_klines(symbol, interval="15", limit=500)
-        klines_1h = await client.get_klines(symbol, interval="60", limit=250)
+        klines_15m = await client.get_klines(symbol, interval="15", limit=500, as_array=True)
+        klines_1h = await client.get_klines(symbol, interval="60", limit=250, as_array=True)
 
-        if not klines_15m or len(klines_15m) < 400 or not klines_1h or len(klines_1h) < 220:
+        if klines_15m is None or len(klines_15m) < 400 or klines_1h is None or len(klines_1h) < 220:
             return {"signal": "NONE", "exit_long": False, "exit_short": False}
 
+        # Columnas directas del array estructurado, sin pasar por dicts
         df_15m = pd.DataFrame(klines_15m)
         df_1h = pd.DataFrame(klines_1h)
 
@@ -0,0 +1,142 @@
+"""
+Features de AntigravityV13 en una sola pasada sobre arrays NumPy.
+
+Sustituye las once llamadas a `calculate_*` (cada una construía su propia
+Series/DataFrame a partir de listas y devolvía `.tolist()`) por un único
+pipeline columnar que reutiliza los intermedios compartidos: el True Range
+para ATR y DMI, las EMA 12/26 para el MACD y la ventana de 20 velas del
+cierre para la media y la desviación de Bollinger.
+Los valores coinciden con los de `app/utils/indicators.py`, rellenos incluidos.
+"""
+import numpy as np
+from app.exchange.ohlcv_store import CandleColumns
+from app.utils.indicators import (
+    ema_array, ewm_array, rolling_mean_array, true_range_array, wma_array,
+)
+
+
+def ohlcv_columns(klines) -> dict:
+    """
+    Devuelve {'open','high','low','close','volume','time'} como arrays NumPy.
+    Acepta el array estructurado de `get_klines(as_array=True)`, la lista de dicts
+    legacy, un dict de columnas o las columnas del historial local (`CandleColumns`).
+    """
+    if isinstance(klines, CandleColumns):
+        return klines.as_dict()
+    if isinstance(klines, dict):
+        return {k: np.asarray(v) for k, v in klines.items()}
+    if isinstance(klines, np.ndarray) and klines.dtype.names:
+        return {k: klines[k] for k in klines.dtype.names}
+    rows = np.array(
+        [(c["open"], c["high"], c["low"], c["close"], c["volume"], c["time"]) for c in klines],
+        dtype=np.float64,
+    ).reshape(-1, 6)
+    return {
+        "open": rows[:, 0], "high": rows[:, 1], "low": rows[:, 2],
+        "close": rows[:, 3], "volume": rows[:, 4], "time": rows[:, 5].astype(np.int64),
+    }
+
+
+def _fill(values: np.ndarray, fill: float = 0.0) -> np.ndarray:
+    """fillna(fill) de pandas: solo NaN (los inf se conservan)."""
+    return np.where(np.isnan(values), fill, values)
+
+
+def _sma(values: np.ndarray, period: int) -> np.ndarray:
+    if len(values) < period:
+        return np.zeros(len(values))
+    return _fill(rolling_mean_array(values, period))
+
+
+def _ema(values: np.ndarray, period: int) -> np.ndarray:
+    if len(values) < period:
+        return np.zeros(len(values))
+    return ema_array(values, period)
+
+
+def _hull(values: np.ndarray, period: int) -> np.ndarray:
+    n = len(values)
+    if n < period:
+        return np.zeros(n)
+    half = int(period / 2)
+    wma_half = _fill(wma_array(values, half)) if n >= half else np.zeros(n)
+    wma_full = _fill(wma_array(values, period))
+    raw = 2 * wma_half - wma_full
+    return _fill(wma_array(raw, int(np.sqrt(period))))
+
+
+def compute_v13_features(klines) -> dict:
+    """Calcula todas las series que usa `evaluate_antigravity_v13` en una pasada."""
+    cols = ohlcv_columns(klines)
+    high = cols["high"].astype(np.float64, copy=False)
+    low = cols["low"].astype(np.float64, copy=False)
+    close = cols["close"].astype(np.float64, copy=False)
+    volume = cols["volume"].astype(np.float64, copy=False)
+    n = len(close)
+    f = {"close": close, "high": high, "low": low, "volume": volume}
+
+    for p in (9, 20, 50, 100, 200):
+        f[f"ema{p}"] = _ema(close, p)
+    f["hull20"] = _hull(close, 20)
+    f["hull50"] = _hull(close, 50)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # True Range compartido por ATR y DMI
+        tr = true_range_array(high, low, close)
+        period = 14
+        if n <= period:
+            f["atr14"] = np.zeros(n)
+            f["plus_di"] = f["minus_di"] = f["adx14"] = np.zeros(n)
+        else:
+            f["atr14"] = _fill(rolling_mean_array(tr, period))
+            up_move = np.zeros(n)
+            down_move = np.zeros(n)
+            up_move[1:] = high[1:] - high[:-1]
+            down_move[1:] = low[:-1] - low[1:]
+            plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+            minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+            alpha = 1 / period
+            tr_s = ewm_array(tr, alpha)
+            plus_di = 100 * (ewm_array(plus_dm, alpha) / tr_s)
+            minus_di = 100 * (ewm_array(minus_dm, alpha) / tr_s)
+            dx = 100 * (np.abs(plus_di - minus_di) / (plus_di + minus_di))
+            f["plus_di"] = _fill(plus_di)
+            f["minus_di"] = _fill(minus_di)
+            f["adx14"] = _fill(ewm_array(dx, alpha))
+
+        f["vol_ma20"] = _sma(volume, 20)
+        f["vol_sma50"] = _sma(volume, 50)
+
+        # RSI (media simple de ganancias/pérdidas)
+        if n <= 14:
+            f["rsi14"] = np.full(n, 50.0)
+        else:
+            delta = np.empty(n)
+            delta[0] = np.nan
+            delta[1:] = np.diff(close)
+            gain = rolling_mean_array(np.where(delta > 0, delta, 0.0), 14)
+            loss = rolling_mean_array(np.where(delta < 0, -delta, 0.0), 14)
+            f["rsi14"] = _fill(100 - (100 / (1 + gain / loss)), 50.0)
+
+        # MACD sobre las EMA 12/26 calculadas una sola vez
+        if n < 26:
+            f["macd"] = f["macd_signal"] = np.zeros(n)
+        else:
+            macd = ema_array(close, 12) - ema_array(close, 26)
+            f["macd"] = macd
+            f["macd_signal"] = ema_array(macd, 9)
+
+        # Bollinger: misma ventana de 20 cierres para la media y la desviación
+        if n < 20:
+            f["bb_middle"] = f["bb_upper"] = f["bb_lower"] = np.zeros(n)
+        else:
+            window = np.lib.stride_tricks.sliding_window_view(close, 20)
+            middle, upper, lower = np.zeros(n), np.zeros(n), np.zeros(n)
+            sma20 = window.mean(axis=1)
+            std20 = window.std(axis=1, ddof=1)
+            middle[19:] = sma20
+            upper[19:] = sma20 + std20 * 2.0
+            lower[19:] = sma20 - std20 * 2.0
+            f["bb_middle"], f["bb_upper"], f["bb_lower"] = middle, upper, lower
+
+    return f
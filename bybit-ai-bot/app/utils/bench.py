@@ -0,0 +1,139 @@
+"""
+Bench: medición de latencia y memoria de funciones del bot, con resultados
+guardados por commit para detectar regresiones.
+
+`run_case()` ejecuta una función (síncrona o async) `warmup + repeat` veces y
+devuelve p50/p99/media/mínimo en ms. Las asignaciones se miden aparte, en una
+ejecución más bajo tracemalloc (que ralentiza mucho y falsearía los tiempos):
+`alloc_peak_kb` es el pico de memoria Python de una llamada y
+`alloc_retained_kb` lo que queda retenido al terminar. Un `before()` opcional
+prepara cada iteración fuera del tiempo medido (p.ej. avanzar el mercado).
+
+`save_results()` escribe storage/benchmarks/<commit>.json y `compare()` cruza
+dos ejecuciones caso a caso.
+"""
+import inspect
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from app.constants import STORAGE_PATH
+
+BENCH_DIR = os.path.join(STORAGE_PATH, "benchmarks")
+# p50 por encima de baseline x REGRESSION_RATIO = regresión
+REGRESSION_RATIO = 1.25
+
+
+async def _call(fn):
+    result = fn()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * (len(sorted_values) - 1) + 0.5))]
+
+
+async def run_case(fn, repeat: int = 50, warmup: int = 3, before=None) -> dict:
+    """Latencia (ms) y memoria (KB) de `fn()`. `fn` y `before` pueden devolver un awaitable."""
+    samples = []
+    for i in range(warmup + repeat):
+        if before is not None:
+            await _call(before)
+        started = time.perf_counter_ns()
+        await _call(fn)
+        elapsed = time.perf_counter_ns() - started
+        if i >= warmup:
+            samples.append(elapsed / 1e6)
+
+    if before is not None:
+        await _call(before)
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    await _call(fn)
+    current, peak = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "n": len(samples),
+        "p50_ms": round(_percentile(samples, 0.50), 4),
+        "p99_ms": round(_percentile(samples, 0.99), 4),
+        "mean_ms": round(sum(samples) / len(samples), 4),
+        "min_ms": round(samples[0], 4),
+        "alloc_peak_kb": round((peak - base) / 1024, 1),
+        "alloc_retained_kb": round((current - base) / 1024, 1),
+    }
+
+
+# ── Resultados por commit ─────────────────────────────────────────────────
+
+def git_revision() -> str:
+    """Commit corto del árbol actual (+ '-dirty' con cambios sin commitear), o 'unknown'."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             timeout=10, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, timeout=30).stdout.strip()
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def save_results(results: dict, directory: str = BENCH_DIR, revision: str = None) -> str:
+    """Guarda {caso: métricas} en <directory>/<commit>.json. Devuelve la ruta."""
+    revision = revision or git_revision()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{revision}.json")
+    payload = {
+        "revision": revision,
+        "created": int(time.time()),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+        "results": results,
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    return path
+
+
+def load_results(ref: str, directory: str = BENCH_DIR) -> dict:
+    """Ejecución guardada: ruta a un .json o commit (storage/benchmarks/<commit>.json)."""
+    path = ref if ref.endswith(".json") else os.path.join(directory, f"{ref}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latest_results(directory: str = BENCH_DIR, exclude: str = None):
+    """La ejecución guardada más reciente (distinta de `exclude`), o None."""
+    if not os.path.isdir(directory):
+        return None
+    runs = []
+    for name in os.listdir(directory):
+        if name.endswith(".json") and name[:-5] != exclude:
+            runs.append(load_results(os.path.join(directory, name)))
+    return max(runs, key=lambda r: r.get("created", 0)) if runs else None
+
+
+def compare(current: dict, baseline: dict, ratio: float = REGRESSION_RATIO) -> list:
+    """
+    Filas (caso, p50 base, p50 actual, cociente, regresión) de los casos
+    medidos en ambas ejecuciones. `current`/`baseline`: {caso: métricas}.
+    """
+    rows = []
+    for case in sorted(set(current) & set(baseline)):
+        now, before = current[case], baseline[case]
+        if "p50_ms" not in now or "p50_ms" not in before:
+            continue
+        change = now["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("inf")
+        rows.append((case, before["p50_ms"], now["p50_ms"], round(change, 3), change > ratio))
+    return rows
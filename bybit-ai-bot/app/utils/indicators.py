@@ -1,6 +1,12 @@
+import math
 import pandas as pd
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # numba es opcional: sin él se usa el fallback en Python puro
+    njit = None
+
 def calculate_sma(data: list[float], period: int) -> list[float]:
     if len(data) < period:
         return [0.0] * len(data)
@@ -75,57 +81,239 @@ def calculate_adx(highs: list[float], lows: list[float], closes: list[float], pe
     
     return adx.fillna(0.0).tolist()
 
-def calculate_supertrend(highs: list[float], lows: list[float], closes: list[float], period: int = 10, multiplier: float = 3.0) -> list[dict]:
-    if len(closes) <= period:
-        return [{"value": 0.0, "dir": 1} for _ in closes]
-        
-    df = pd.DataFrame({'high': highs, 'low': lows, 'close': closes})
-    
-    # Calculate ATR
-    df['prev_close'] = df['close'].shift(1)
-    df['tr1'] = df['high'] - df['low']
-    df['tr2'] = (df['high'] - df['prev_close']).abs()
-    df['tr3'] = (df['low'] - df['prev_close']).abs()
-    df['tr'] = df[['tr1', 'tr2', 'tr3']].max(axis=1)
-    df['atr'] = df['tr'].rolling(window=period).mean()
-    
-    hl2 = (df['high'] + df['low']) / 2
-    
-    df['basic_ub'] = hl2 + (multiplier * df['atr'])
-    df['basic_lb'] = hl2 - (multiplier * df['atr'])
-    
-    df['final_ub'] = 0.00
-    df['final_lb'] = 0.00
-    
-    for i in range(period, len(df)):
-        df.loc[i, 'final_ub'] = df.loc[i, 'basic_ub'] if df.loc[i, 'basic_ub'] < df.loc[i - 1, 'final_ub'] or df.loc[i - 1, 'close'] > df.loc[i - 1, 'final_ub'] else df.loc[i - 1, 'final_ub']
-        df.loc[i, 'final_lb'] = df.loc[i, 'basic_lb'] if df.loc[i, 'basic_lb'] > df.loc[i - 1, 'final_lb'] or df.loc[i - 1, 'close'] < df.loc[i - 1, 'final_lb'] else df.loc[i - 1, 'final_lb']
-        
-    df['st'] = 0.00
-    df['dir'] = 1
-    
-    for i in range(period, len(df)):
-        if df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_ub'] and df.loc[i, 'close'] <= df.loc[i, 'final_ub']:
-            df.loc[i, 'st'] = df.loc[i, 'final_ub']
-        elif df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_ub'] and df.loc[i, 'close'] > df.loc[i, 'final_ub']:
-            df.loc[i, 'st'] = df.loc[i, 'final_lb']
-        elif df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_lb'] and df.loc[i, 'close'] >= df.loc[i, 'final_lb']:
-            df.loc[i, 'st'] = df.loc[i, 'final_lb']
-        elif df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_lb'] and df.loc[i, 'close'] < df.loc[i, 'final_lb']:
-            df.loc[i, 'st'] = df.loc[i, 'final_ub']
-            
-        if df.loc[i, 'close'] > df.loc[i, 'st']:
-            df.loc[i, 'dir'] = 1
+def true_range_array(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """TR con la misma convención que pandas: en la primera vela TR = high - low."""
+    tr = highs - lows
+    if len(closes) > 1:
+        prev_close = closes[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(highs[1:] - prev_close), np.abs(lows[1:] - prev_close)))
+    return tr
+
+def rolling_mean_array(values: np.ndarray, period: int) -> np.ndarray:
+    """Media móvil simple; NaN en las primeras period-1 posiciones (como Series.rolling)."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = np.lib.stride_tricks.sliding_window_view(values, period).mean(axis=1)
+    return out
+
+def wma_array(values: np.ndarray, period: int) -> np.ndarray:
+    """Media ponderada lineal (pesos 1..period); NaN en las primeras period-1 posiciones."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        weights = np.arange(1, period + 1, dtype=np.float64)
+        out[period - 1:] = np.lib.stride_tricks.sliding_window_view(values, period) @ weights / weights.sum()
+    return out
+
+def _ewm_loop(values, alpha, out):
+    # Réplica de Series.ewm(alpha=alpha, adjust=False).mean() con ignore_na=False
+    weighted = values[0]
+    old_wt = 1.0
+    out[0] = weighted
+    for i in range(1, len(values)):
+        cur = values[i]
+        if weighted == weighted:
+            old_wt *= 1.0 - alpha
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+
+_ewm_kernel = njit(cache=True)(_ewm_loop) if njit else None
+
+def ewm_array(values, alpha: float) -> np.ndarray:
+    """Media exponencial con la semántica de pandas `ewm(alpha=..., adjust=False)` (NaN incluidos)."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return np.zeros(0)
+    if _ewm_kernel is not None:
+        out = np.empty(n)
+        _ewm_kernel(values, alpha, out)
+        return out
+    out = [0.0] * n
+    _ewm_loop(values.tolist(), alpha, out)
+    return np.array(out)
+
+def ema_array(values, period: int) -> np.ndarray:
+    """EMA (span=period, adjust=False) sembrada con el primer valor, como `calculate_ema` sin el relleno."""
+    return ewm_array(values, 2.0 / (period + 1))
+
+def _supertrend_loop(basic_ub, basic_lb, closes, period, final_ub, final_lb, st, direction):
+    # Recurrencia de bandas finales + cambio de régimen. Es secuencial por definición,
+    # así que se compila con numba si está disponible o se ejecuta sobre listas Python.
+    for i in range(period, len(closes)):
+        if basic_ub[i] < final_ub[i - 1] or closes[i - 1] > final_ub[i - 1]:
+            final_ub[i] = basic_ub[i]
+        else:
+            final_ub[i] = final_ub[i - 1]
+        if basic_lb[i] > final_lb[i - 1] or closes[i - 1] < final_lb[i - 1]:
+            final_lb[i] = basic_lb[i]
+        else:
+            final_lb[i] = final_lb[i - 1]
+
+    for i in range(period, len(closes)):
+        if st[i - 1] == final_ub[i - 1] and closes[i] <= final_ub[i]:
+            st[i] = final_ub[i]
+        elif st[i - 1] == final_ub[i - 1] and closes[i] > final_ub[i]:
+            st[i] = final_lb[i]
+        elif st[i - 1] == final_lb[i - 1] and closes[i] >= final_lb[i]:
+            st[i] = final_lb[i]
+        elif st[i - 1] == final_lb[i - 1] and closes[i] < final_lb[i]:
+            st[i] = final_ub[i]
+        direction[i] = 1 if closes[i] > st[i] else -1
+
+_supertrend_kernel = njit(cache=True)(_supertrend_loop) if njit else None
+
+def supertrend_arrays(highs, lows, closes, period: int = 10, multiplier: float = 3.0):
+    """
+    SuperTrend sobre arrays NumPy. Devuelve (valor, dirección) como np.ndarray
+    (float64 / int64), con la misma salida que `calculate_supertrend`.
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    n = len(closes)
+    if n <= period:
+        return np.zeros(n), np.ones(n, dtype=np.int64)
+
+    atr = rolling_mean_array(true_range_array(highs, lows, closes), period)
+    hl2 = (highs + lows) / 2
+    basic_ub = hl2 + multiplier * atr
+    basic_lb = hl2 - multiplier * atr
+
+    if _supertrend_kernel is not None:
+        final_ub, final_lb, st = np.zeros(n), np.zeros(n), np.zeros(n)
+        direction = np.ones(n, dtype=np.int64)
+        _supertrend_kernel(basic_ub, basic_lb, closes, period, final_ub, final_lb, st, direction)
+        return st, direction
+
+    # Fallback sin numba: listas Python (el acceso escalar a listas es ~10x más rápido que a ndarray)
+    final_ub, final_lb, st, direction = [0.0] * n, [0.0] * n, [0.0] * n, [1] * n
+    _supertrend_loop(basic_ub.tolist(), basic_lb.tolist(), closes.tolist(), period, final_ub, final_lb, st, direction)
+    return np.array(st), np.array(direction, dtype=np.int64)
+
+# ── Réplicas NumPy de pandas_ta (SuperTrendRegimeMTF) ───────────────────
+# La estrategia SuperTrend calcula con pandas_ta, cuyas convenciones difieren de
+# las de arriba: EMA sembrada con la SMA de las primeras `length` velas, ATR/ADX
+# suavizados con RMA (`ewm(alpha=1/length, min_periods=length)`, adjust=True) y
+# TR con NaN en la primera vela. El backtester usa estas versiones para calcular
+# las columnas una sola vez sobre todo el historial.
+
+def _ewm_adjusted_loop(values, alpha, min_periods, out):
+    # Réplica de Series.ewm(alpha=alpha, min_periods=min_periods).mean() (adjust=True, ignore_na=False)
+    decay = 1.0 - alpha
+    num = 0.0
+    den = 0.0
+    nobs = 0
+    for i in range(len(values)):
+        cur = values[i]
+        num *= decay
+        den *= decay
+        if cur == cur:
+            num += cur
+            den += 1.0
+            nobs += 1
+        out[i] = num / den if nobs >= min_periods and den > 0 else math.nan
+
+_ewm_adjusted_kernel = njit(cache=True)(_ewm_adjusted_loop) if njit else None
+
+def rma_array(values, period: int) -> np.ndarray:
+    """RMA de pandas_ta (media de Wilder con adjust=True y `min_periods=period`)."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if _ewm_adjusted_kernel is not None:
+        out = np.empty(n)
+        _ewm_adjusted_kernel(values, 1.0 / period, period, out)
+        return out
+    out = [0.0] * n
+    _ewm_adjusted_loop(values.tolist(), 1.0 / period, period, out)
+    return np.array(out)
+
+def ta_ema_array(values, period: int) -> np.ndarray:
+    """`ta.ema(close, length)`: NaN en las primeras period-1 velas y sembrada con su SMA."""
+    values = np.array(values, dtype=np.float64)
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    with np.errstate(invalid="ignore"):
+        seed = np.nanmean(values[:period])
+    values[:period - 1] = np.nan
+    values[period - 1] = seed
+    return ewm_array(values, 2.0 / (period + 1))
+
+def ta_true_range_array(highs, lows, closes) -> np.ndarray:
+    """`ta.true_range`: como `true_range_array` pero con NaN en la primera vela."""
+    tr = true_range_array(np.asarray(highs, dtype=np.float64).copy(), np.asarray(lows, dtype=np.float64),
+                          np.asarray(closes, dtype=np.float64))
+    if len(tr):
+        tr[0] = np.nan
+    return tr
+
+def ta_atr_array(highs, lows, closes, period: int = 14) -> np.ndarray:
+    """`ta.atr(high, low, close, length)` (mamode RMA)."""
+    return rma_array(ta_true_range_array(highs, lows, closes), period)
+
+def ta_adx_arrays(highs, lows, closes, period: int = 14):
+    """`ta.adx(...)`: devuelve (ADX, DMP, DMN) como arrays."""
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    n = len(highs)
+    up = np.full(n, np.nan)
+    dn = np.full(n, np.nan)
+    up[1:] = highs[1:] - highs[:-1]
+    dn[1:] = lows[:-1] - lows[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pos = np.where((up > dn) & (up > 0), up, 0.0)
+        neg = np.where((dn > up) & (dn > 0), dn, 0.0)
+        pos[0] = neg[0] = np.nan
+        k = 100.0 / ta_atr_array(highs, lows, closes, period)
+        dmp = k * rma_array(pos, period)
+        dmn = k * rma_array(neg, period)
+        dx = 100.0 * np.abs(dmp - dmn) / (dmp + dmn)
+    return rma_array(dx, period), dmp, dmn
+
+def _ta_supertrend_loop(closes, upper, lower, trend, direction):
+    # Bucle de `ta.supertrend`: las bandas solo se arrastran mientras no cambia la dirección
+    for i in range(1, len(closes)):
+        if closes[i] > upper[i - 1]:
+            direction[i] = 1
+        elif closes[i] < lower[i - 1]:
+            direction[i] = -1
         else:
-            df.loc[i, 'dir'] = -1
-            
-    result = []
-    for i in range(len(df)):
-        result.append({
-            "value": float(df.loc[i, 'st']),
-            "dir": int(df.loc[i, 'dir'])
-        })
-    return result
+            direction[i] = direction[i - 1]
+            if direction[i] > 0 and lower[i] < lower[i - 1]:
+                lower[i] = lower[i - 1]
+            if direction[i] < 0 and upper[i] > upper[i - 1]:
+                upper[i] = upper[i - 1]
+        trend[i] = lower[i] if direction[i] > 0 else upper[i]
+
+_ta_supertrend_kernel = njit(cache=True)(_ta_supertrend_loop) if njit else None
+
+def ta_supertrend_arrays(highs, lows, closes, length: int = 10, multiplier: float = 3.0):
+    """`ta.supertrend(...)`: devuelve (SUPERT, SUPERTd) como arrays float64 / int64."""
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    n = len(closes)
+    matr = multiplier * ta_atr_array(highs, lows, closes, length)
+    hl2 = (highs + lows) / 2
+    upper = hl2 + matr
+    lower = hl2 - matr
+    if _ta_supertrend_kernel is not None:
+        trend = np.zeros(n)
+        direction = np.ones(n, dtype=np.int64)
+        _ta_supertrend_kernel(closes, upper, lower, trend, direction)
+        return trend, direction
+    trend, direction = [0.0] * n, [1] * n
+    upper, lower = upper.tolist(), lower.tolist()
+    _ta_supertrend_loop(closes.tolist(), upper, lower, trend, direction)
+    return np.array(trend), np.array(direction, dtype=np.int64)
+
+def calculate_supertrend(highs: list[float], lows: list[float], closes: list[float], period: int = 10, multiplier: float = 3.0) -> list[dict]:
+    st, direction = supertrend_arrays(highs, lows, closes, period, multiplier)
+    return [{"value": v, "dir": d} for v, d in zip(st.tolist(), direction.tolist())]
 
 def calculate_wma(data: list[float], period: int) -> list[float]:
     if len(data) < period:
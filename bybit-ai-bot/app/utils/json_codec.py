@@ -0,0 +1,82 @@
+"""
+JSON Codec: una sola capa de (de)serialización JSON para REST, WebSocket y persistencia.
+
+Usa orjson si está instalado, si no ujson y por último la librería estándar.
+Se puede forzar con JSON_CODEC=orjson|ujson|json. `loads()` acepta bytes
+directamente (frames del WS y cuerpos HTTP sin pasar por str). Si el backend
+rápido no sabe serializar un valor (p.ej. escalares numpy o enteros de más de
+64 bits), se reintenta con la librería estándar en vez de fallar.
+"""
+import json
+import os
+
+_PREFERRED = os.getenv("JSON_CODEC", "auto").lower()
+
+
+def _load_orjson():
+    import orjson
+
+    def dumps_bytes(obj, pretty=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+    return "orjson", orjson.loads, dumps_bytes, (orjson.JSONEncodeError, TypeError)
+
+
+def _load_ujson():
+    import ujson
+
+    def loads(data):
+        return ujson.loads(data)
+
+    def dumps_bytes(obj, pretty=False):
+        text = ujson.dumps(obj, ensure_ascii=False, indent=2) if pretty else ujson.dumps(obj, ensure_ascii=False)
+        return text.encode("utf-8")
+
+    return "ujson", loads, dumps_bytes, (TypeError, OverflowError)
+
+
+def _load_stdlib():
+    def dumps_bytes(obj, pretty=False):
+        if pretty:
+            return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return "json", json.loads, dumps_bytes, ()
+
+
+def _select():
+    loaders = {"orjson": _load_orjson, "ujson": _load_ujson, "json": _load_stdlib}
+    order = [_PREFERRED] if _PREFERRED in loaders else []
+    order += [name for name in ("orjson", "ujson", "json") if name not in order]
+    for name in order:
+        try:
+            return loaders[name]()
+        except ImportError:
+            continue
+    return _load_stdlib()
+
+
+BACKEND, _loads, _dumps_bytes, _ENCODE_ERRORS = _select()
+_std_dumps_bytes = _load_stdlib()[2]
+
+
+def loads(data):
+    """Decodifica bytes/bytearray/memoryview/str."""
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return _loads(data)
+
+
+def dumps_bytes(obj, pretty: bool = False) -> bytes:
+    """JSON en UTF-8, compacto o con indentación de 2 espacios (archivos legibles)."""
+    if _ENCODE_ERRORS:
+        try:
+            return _dumps_bytes(obj, pretty)
+        except _ENCODE_ERRORS:
+            pass
+    return _std_dumps_bytes(obj, pretty)
+
+
+def dumps(obj) -> str:
+    """JSON compacto como str (frames de texto del WS, cuerpo firmado de los POST)."""
+    return dumps_bytes(obj).decode("utf-8")
@@ -0,0 +1,104 @@
+"""
+Log Tail: últimas N líneas de un log sin leer el archivo entero.
+
+La primera lectura busca hacia atrás desde el final en bloques de CHUNK_SIZE
+hasta juntar las líneas pedidas y guarda el offset de inicio de cada línea.
+Las siguientes (el dashboard hace polling) solo leen los bytes añadidos desde
+la última vez para extender el índice, y después leen de disco justo el tramo
+final. Si el archivo encoge o cambia de inode (rotación, RESET que lo vacía),
+el índice se descarta y se vuelve a buscar desde el final.
+"""
+import os
+import threading
+from collections import deque
+
+CHUNK_SIZE = 64 * 1024
+MAX_INDEXED_LINES = 1000
+
+
+class LogTail:
+    def __init__(self, path: str, max_lines: int = MAX_INDEXED_LINES):
+        self.path = path
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, identity):
+        self._identity = identity       # (st_dev, st_ino) del archivo indexado
+        self._size = 0                  # bytes ya indexados
+        self._starts = deque(maxlen=self.max_lines + 1)  # offsets de inicio de línea
+        self._from_start = False        # el índice llega hasta el byte 0
+
+    def _scan_backwards(self, f, size: int):
+        """Recorre el final del archivo hacia atrás hasta tener `max_lines` inicios de línea."""
+        starts, pos = [], size
+        while pos > 0 and len(starts) <= self.max_lines:
+            read = min(CHUNK_SIZE, pos)
+            pos -= read
+            f.seek(pos)
+            chunk = f.read(read)
+            idx = len(chunk)
+            while len(starts) <= self.max_lines:
+                idx = chunk.rfind(b"\n", 0, idx)
+                if idx < 0:
+                    break
+                starts.append(pos + idx + 1)
+        self._from_start = pos == 0 and len(starts) <= self.max_lines
+        if self._from_start:
+            starts.append(0)
+        self._starts.extend(sorted(starts))
+
+    def _scan_forward(self, f, size: int):
+        """Indexa solo lo escrito desde la última lectura."""
+        f.seek(self._size)
+        offset = self._size
+        while offset < size:
+            chunk = f.read(min(CHUNK_SIZE, size - offset))
+            if not chunk:
+                break
+            idx = chunk.find(b"\n")
+            while idx >= 0:
+                self._starts.append(offset + idx + 1)
+                idx = chunk.find(b"\n", idx + 1)
+            offset += len(chunk)
+        if len(self._starts) == self._starts.maxlen:
+            self._from_start = False
+
+    def lines(self, n: int = 100) -> list:
+        n = min(n, self.max_lines)
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset(None)
+                return []
+            identity = (st.st_dev, st.st_ino)
+            with open(self.path, "rb") as f:
+                if identity != self._identity or st.st_size < self._size:
+                    self._reset(identity)
+                    self._scan_backwards(f, st.st_size)
+                elif st.st_size > self._size:
+                    self._scan_forward(f, st.st_size)
+                self._size = st.st_size
+
+                # Con salto de línea final, el último "inicio" es el propio EOF
+                starts = [s for s in self._starts if s < st.st_size]
+                if not starts:
+                    return []
+                first = starts[-n] if len(starts) >= n else starts[0]
+                f.seek(first)
+                data = f.read(st.st_size - first)
+        return data.decode("utf-8", errors="replace").splitlines()
+
+
+_tails = {}
+_tails_lock = threading.Lock()
+
+
+def tail_lines(path: str, n: int = 100) -> list:
+    """Últimas `n` líneas de `path` (sin '\\n'). [] si el archivo no existe."""
+    with _tails_lock:
+        tail = _tails.get(path)
+        if tail is None:
+            tail = _tails[path] = LogTail(path)
+    return tail.lines(n)
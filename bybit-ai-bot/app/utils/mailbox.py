@@ -0,0 +1,61 @@
+"""
+Latest-Value Mailbox: buzón por clave que solo guarda el último valor.
+
+El lector del WebSocket deja el precio más reciente de cada símbolo con
+`put()` (síncrono, O(1), nunca espera) y sigue vaciando el socket. Un worker
+por símbolo procesa el valor más fresco en cuanto queda libre; los ticks que
+llegan mientras el worker espera a un REST lento (p.ej. `update_sl`) se
+sobrescriben en vez de encolarse. Así la latencia de decisión queda acotada a
+una llamada en curso, y un símbolo lento no retrasa a los demás.
+"""
+import asyncio
+from app.logger import get_logger
+
+logger = get_logger("mailbox")
+
+_EMPTY = object()
+
+
+class LatestValueMailbox:
+    def __init__(self, handler, name: str = "MAILBOX"):
+        # handler(key, value) -> awaitable
+        self.handler = handler
+        self.name = name
+        self._latest = {}       # clave -> último valor sin procesar
+        self._workers = {}      # clave -> asyncio.Task
+        self.stats = {"received": 0, "processed": 0, "dropped": 0}
+
+    def put(self, key, value):
+        """Guarda `value` como último de `key` y despierta su worker. No bloquea."""
+        self.stats["received"] += 1
+        if self._latest.get(key, _EMPTY) is not _EMPTY:
+            self.stats["dropped"] += 1
+        self._latest[key] = value
+        worker = self._workers.get(key)
+        if worker is None or worker.done():
+            self._workers[key] = asyncio.get_running_loop().create_task(self._drain(key))
+
+    async def _drain(self, key):
+        while True:
+            value = self._latest.pop(key, _EMPTY)
+            if value is _EMPTY:
+                return
+            try:
+                await self.handler(key, value)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("[%s] Error procesando %s: %s", self.name, key, e)
+            self.stats["processed"] += 1
+
+    def pending(self) -> int:
+        return len(self._latest)
+
+    async def close(self):
+        """Cancela los workers en curso y descarta lo pendiente (al apagar)."""
+        workers = [w for w in self._workers.values() if not w.done()]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+        self._latest.clear()
@@ -0,0 +1,551 @@
+"""
+Indicadores incrementales (streaming) con actualización O(1) por vela cerrada.
+
+Cada clase reproduce el último valor de su equivalente en `app/utils/indicators.py`
+(mismo warm-up, mismos valores de relleno) pero mantiene su estado entre velas,
+de modo que evaluar cientos de símbolos en cada cierre no recalcula el historial.
+Todas exponen `update(...)`, `value` y `snapshot()` / `restore()` con estado
+serializable a JSON para sobrevivir reinicios.
+"""
+import json
+import math
+import os
+from collections import deque
+from app.logger import logger
+
+
+class _RollingWindow:
+    """
+    Ventana deslizante con suma y suma de cuadrados en O(1).
+    Las sumas se recalculan exactamente cada vez que la ventana da la vuelta
+    (coste amortizado O(1)) para acotar el error de coma flotante acumulado.
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.weighted = 0.0  # sum(j * x_j), j=1..period (para WMA)
+        self._since_resync = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.period
+
+    def push(self, x: float):
+        if self.full:
+            out = self.values[0]
+            self.values.append(x)
+            # WMA: todos los pesos bajan 1 y el nuevo entra con peso `period`
+            self.weighted += self.period * x - self.total
+            self.total += x - out
+            self.total_sq += x * x - out * out
+            self._since_resync += 1
+            if self._since_resync >= self.period:
+                self._resync()
+        else:
+            self.values.append(x)
+            self._resync()
+
+    def _resync(self):
+        self.total = math.fsum(self.values)
+        self.total_sq = math.fsum(v * v for v in self.values)
+        self.weighted = math.fsum((j + 1) * v for j, v in enumerate(self.values))
+        self._since_resync = 0
+
+    def snapshot(self) -> dict:
+        return {"period": self.period, "values": list(self.values)}
+
+    @classmethod
+    def restore(cls, snap: dict):
+        w = cls(snap["period"])
+        w.values.extend(snap["values"])
+        w._resync()
+        return w
+
+
+class _EWM:
+    """`Series.ewm(alpha=..., adjust=False).mean()` de pandas, incluida su gestión de NaN."""
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.weighted = math.nan
+        self.old_wt = 1.0
+
+    def update(self, x: float) -> float:
+        is_obs = x == x
+        if self.weighted == self.weighted:
+            # Con ignore_na=False el peso antiguo decae también en las observaciones NaN
+            self.old_wt *= 1.0 - self.alpha
+            if is_obs:
+                if self.weighted != x:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * x) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif is_obs:
+            self.weighted = x
+        return self.weighted
+
+    def snapshot(self) -> dict:
+        return {"alpha": self.alpha, "weighted": self.weighted, "old_wt": self.old_wt}
+
+    @classmethod
+    def restore(cls, snap: dict):
+        e = cls(snap["alpha"])
+        e.weighted = snap["weighted"]
+        e.old_wt = snap["old_wt"]
+        return e
+
+
+class StreamingIndicator:
+    """Base: snapshot/restore genérico y registro de subclases por nombre."""
+    _registry = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        StreamingIndicator._registry[cls.__name__] = cls
+
+    def snapshot(self) -> dict:
+        state = {}
+        for k, v in self.__dict__.items():
+            state[k] = v.snapshot() if hasattr(v, "snapshot") else v
+        return {"type": type(self).__name__, "state": state}
+
+    @staticmethod
+    def restore(snap: dict):
+        cls = StreamingIndicator._registry[snap["type"]]
+        obj = cls.__new__(cls)
+        for k, v in snap["state"].items():
+            if isinstance(v, dict) and "period" in v and "values" in v:
+                v = _RollingWindow.restore(v)
+            elif isinstance(v, dict) and "alpha" in v and "weighted" in v:
+                v = _EWM.restore(v)
+            elif isinstance(v, dict) and "type" in v and "state" in v:
+                v = StreamingIndicator.restore(v)
+            setattr(obj, k, v)
+        return obj
+
+
+class StreamingSMA(StreamingIndicator):
+    """Último valor de `calculate_sma`."""
+    def __init__(self, period: int):
+        self.period = period
+        self.window = _RollingWindow(period)
+
+    def update(self, x: float) -> float:
+        self.window.push(x)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.window.total / self.period if self.window.full else 0.0
+
+
+class StreamingEMA(StreamingIndicator):
+    """Último valor de `calculate_ema` (ewm span, adjust=False, sembrada con la primera vela)."""
+    def __init__(self, period: int):
+        self.period = period
+        self.ewm = _EWM(2.0 / (period + 1))
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        self.ewm.update(x)
+        self.count += 1
+        return self.value
+
+    @property
+    def raw(self) -> float:
+        return self.ewm.weighted
+
+    @property
+    def value(self) -> float:
+        return self.ewm.weighted if self.count >= self.period else 0.0
+
+
+class StreamingWMA(StreamingIndicator):
+    """Último valor de `calculate_wma`."""
+    def __init__(self, period: int):
+        self.period = period
+        self.window = _RollingWindow(period)
+
+    def update(self, x: float) -> float:
+        self.window.push(x)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if not self.window.full:
+            return 0.0
+        return self.window.weighted / (self.period * (self.period + 1) / 2)
+
+
+class StreamingHullMA(StreamingIndicator):
+    """Último valor de `calculate_hull_ma` (WMA(2·WMA(n/2) − WMA(n), √n))."""
+    def __init__(self, period: int):
+        self.period = period
+        self.half = StreamingWMA(int(period / 2))
+        self.full = StreamingWMA(period)
+        self.hull = StreamingWMA(int(math.sqrt(period)))
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        raw = 2 * self.half.update(x) - self.full.update(x)
+        self.hull.update(raw)
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.hull.value if self.count >= self.period else 0.0
+
+
+class StreamingRSI(StreamingIndicator):
+    """Último valor de `calculate_rsi` (media simple de ganancias/pérdidas)."""
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.gains = _RollingWindow(period)
+        self.losses = _RollingWindow(period)
+        self.prev_close = None
+        self.count = 0
+
+    def update(self, close: float) -> float:
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        self.prev_close = close
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.count <= self.period:
+            return 50.0
+        gain = self.gains.total / self.period
+        loss = self.losses.total / self.period
+        if loss == 0:
+            return 100.0 if gain > 0 else 50.0
+        return 100 - (100 / (1 + gain / loss))
+
+
+class StreamingTR(StreamingIndicator):
+    """True Range y movimientos direccionales compartidos por ATR y DMI."""
+    def __init__(self):
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_close = None
+        self.tr = 0.0
+        self.plus_dm = 0.0
+        self.minus_dm = 0.0
+
+    def update(self, high: float, low: float, close: float):
+        if self.prev_close is None:
+            self.tr, self.plus_dm, self.minus_dm = high - low, 0.0, 0.0
+        else:
+            self.tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+            up_move = high - self.prev_high
+            down_move = self.prev_low - low
+            self.plus_dm = up_move if (up_move > down_move and up_move > 0) else 0.0
+            self.minus_dm = down_move if (down_move > up_move and down_move > 0) else 0.0
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+
+class StreamingATR(StreamingIndicator):
+    """Último valor de `calculate_atr` (media simple del TR)."""
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.window = _RollingWindow(period)
+        self.count = 0
+
+    def update_tr(self, tr: float) -> float:
+        self.window.push(tr)
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.count <= self.period:
+            return 0.0
+        return self.window.total / self.period
+
+
+class StreamingDMI(StreamingIndicator):
+    """Últimos valores de `calculate_dmi` (+DI, −DI, ADX con suavizado de Wilder)."""
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.tr = _EWM(1.0 / period)
+        self.plus = _EWM(1.0 / period)
+        self.minus = _EWM(1.0 / period)
+        self.adx_ewm = _EWM(1.0 / period)
+        self.plus_di = math.nan
+        self.minus_di = math.nan
+        self.count = 0
+
+    def update_dm(self, tr: float, plus_dm: float, minus_dm: float):
+        tr_s = self.tr.update(tr)
+        plus_s = self.plus.update(plus_dm)
+        minus_s = self.minus.update(minus_dm)
+        # TR suavizado nulo (vela sin rango): DI indefinido, como el NaN de pandas
+        self.plus_di = 100 * plus_s / tr_s if tr_s else math.nan
+        self.minus_di = 100 * minus_s / tr_s if tr_s else math.nan
+        denom = self.plus_di + self.minus_di
+        dx = 100 * abs(self.plus_di - self.minus_di) / denom if denom == denom and denom != 0 else math.nan
+        self.adx_ewm.update(dx)
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        if self.count <= self.period:
+            return 0.0, 0.0, 0.0
+        fill = lambda v: v if v == v else 0.0
+        return fill(self.plus_di), fill(self.minus_di), fill(self.adx_ewm.weighted)
+
+
+class StreamingMACD(StreamingIndicator):
+    """Últimos valores de `calculate_macd` (línea, señal, histograma)."""
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.slow = slow
+        self.ema_fast = StreamingEMA(fast)
+        self.ema_slow = StreamingEMA(slow)
+        self.signal_ewm = _EWM(2.0 / (signal + 1))
+        self.count = 0
+
+    def update(self, close: float):
+        self.ema_fast.update(close)
+        self.ema_slow.update(close)
+        self.signal_ewm.update(self.ema_fast.raw - self.ema_slow.raw)
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        if self.count < self.slow:
+            return 0.0, 0.0, 0.0
+        macd = self.ema_fast.raw - self.ema_slow.raw
+        signal = self.signal_ewm.weighted
+        return macd, signal, macd - signal
+
+
+class StreamingBollinger(StreamingIndicator):
+    """Últimos valores de `calculate_bollinger_bands` (media, superior, inferior; std muestral)."""
+    def __init__(self, period: int = 20, std_dev: float = 2.0):
+        self.period = period
+        self.std_dev = std_dev
+        self.window = _RollingWindow(period)
+
+    def update(self, close: float):
+        self.window.push(close)
+        return self.value
+
+    @property
+    def value(self):
+        if not self.window.full:
+            return 0.0, 0.0, 0.0
+        n = self.period
+        mean = self.window.total / n
+        var = max(0.0, (self.window.total_sq - n * mean * mean) / (n - 1))
+        std = math.sqrt(var)
+        return mean, mean + std * self.std_dev, mean - std * self.std_dev
+
+
+# Series de las que V13 lee también valores anteriores (pendiente de EMA 9/20, cruce Hull)
+RECENT_SERIES = ("close", "volume", "hull20", "hull50")
+RECENT_BARS = 4
+# Velas aplicadas antes de que `features()` sustituya al cálculo completo (mismo mínimo que V13)
+READY_BARS = 220
+# Ventana de velas cerradas sobre la que V13 calcula sus indicadores (250 pedidas - la abierta)
+V13_WINDOW = 249
+
+
+class V13IndicatorSet:
+    """
+    Conjunto de indicadores de AntigravityV13 para un (símbolo, intervalo),
+    actualizado vela cerrada a vela cerrada.
+    """
+    def __init__(self):
+        self.last_time = None
+        self.count = 0
+        self.recent = {k: deque(maxlen=RECENT_BARS) for k in RECENT_SERIES}
+        self.ema = {p: StreamingEMA(p) for p in (9, 20, 50, 100, 200)}
+        # Cierres y EMA sin relleno de las últimas V13_WINDOW velas: para re-sembrar las EMA en la ventana
+        self.closes = deque(maxlen=V13_WINDOW)
+        self.ema_raw = {p: deque(maxlen=V13_WINDOW) for p in self.ema}
+        self.hull = {p: StreamingHullMA(p) for p in (20, 50)}
+        self.tr = StreamingTR()
+        self.atr14 = StreamingATR(14)
+        self.dmi14 = StreamingDMI(14)
+        self.vol_ma20 = StreamingSMA(20)
+        self.vol_sma50 = StreamingSMA(50)
+        self.rsi14 = StreamingRSI(14)
+        self.macd = StreamingMACD(12, 26, 9)
+        self.bb = StreamingBollinger(20, 2.0)
+
+    def update(self, candle):
+        """`candle`: dict de vela o fila de un array `KLINE_DTYPE`."""
+        close = float(candle["close"])
+        volume = float(candle["volume"])
+        for ind in self.ema.values():
+            ind.update(close)
+        for ind in self.hull.values():
+            ind.update(close)
+        self.tr.update(float(candle["high"]), float(candle["low"]), close)
+        self.atr14.update_tr(self.tr.tr)
+        self.dmi14.update_dm(self.tr.tr, self.tr.plus_dm, self.tr.minus_dm)
+        self.vol_ma20.update(volume)
+        self.vol_sma50.update(volume)
+        self.rsi14.update(close)
+        self.macd.update(close)
+        self.bb.update(close)
+        for name, value in (("close", close), ("volume", volume), ("hull20", self.hull[20].value),
+                            ("hull50", self.hull[50].value)):
+            self.recent[name].append(value)
+        self.closes.append(close)
+        for p, ind in self.ema.items():
+            self.ema_raw[p].append(ind.raw)
+        self.count += 1
+        self.last_time = int(candle["time"])
+
+    def window_ema(self, period: int, window: int = V13_WINDOW) -> list:
+        """
+        Últimos RECENT_BARS valores de la EMA sembrada con el primer cierre de
+        las últimas `window` velas, como `compute_v13_features` sobre esa ventana.
+        La EMA es lineal: sembrada en s en vez de al inicio del historial, difiere
+        en r^(t-s)·(cierre_s - EMA_s), así que basta la EMA completa en s (O(1)).
+        """
+        raw, closes = self.ema_raw[period], self.closes
+        start = len(closes) - window
+        r = 1.0 - 2.0 / (period + 1)
+        drift = closes[start] - raw[start]
+        return [raw[-1 - j] + r ** (window - 1 - j) * drift for j in range(RECENT_BARS - 1, -1, -1)]
+
+    def features(self, last_time: int = None, window: int = V13_WINDOW):
+        """
+        Últimos valores con las claves de `compute_v13_features(klines)` para
+        las `window` velas cerradas que evalúa V13 (listas cortas con lo que lee
+        `evaluate_antigravity_v13`), o None si el estado aún no está caliente,
+        no cubre la ventana o no llega hasta la vela cerrada `last_time`.
+
+        Las medias de ventana fija (SMA, WMA/Hull, ATR, RSI, Bollinger) son
+        exactas; las EMA se re-siembran al inicio de la ventana (`window_ema`).
+        Las EWM de MACD (span ≤ 26) y DMI (alpha 1/14) olvidan el inicio de la
+        ventana tras 249 velas (< 1e-8); el ADX, EWM de otra EWM, en ~1e-7 relativo.
+        """
+        if self.count < READY_BARS or len(self.closes) < window or window < READY_BARS:
+            return None
+        if last_time is not None and self.last_time != last_time:
+            return None
+        f = {name: list(values) for name, values in self.recent.items()}
+        f.update({f"ema{p}": self.window_ema(p, window) for p in self.ema})
+        plus_di, minus_di, adx = self.dmi14.value
+        macd, signal, _ = self.macd.value
+        middle, upper, lower = self.bb.value
+        f.update({
+            "atr14": [self.atr14.value], "plus_di": [plus_di], "minus_di": [minus_di], "adx14": [adx],
+            "vol_ma20": [self.vol_ma20.value], "vol_sma50": [self.vol_sma50.value], "rsi14": [self.rsi14.value],
+            "macd": [macd], "macd_signal": [signal], "bb_middle": [middle], "bb_upper": [upper], "bb_lower": [lower],
+        })
+        return f
+
+    def snapshot(self) -> dict:
+        return {
+            "last_time": self.last_time,
+            "count": self.count,
+            "recent": {name: list(values) for name, values in self.recent.items()},
+            "closes": list(self.closes),
+            "ema_raw": {str(p): list(values) for p, values in self.ema_raw.items()},
+            "ema":  {str(p): ind.snapshot() for p, ind in self.ema.items()},
+            "hull": {str(p): ind.snapshot() for p, ind in self.hull.items()},
+            **{name: getattr(self, name).snapshot() for name in
+               ("tr", "atr14", "dmi14", "vol_ma20", "vol_sma50", "rsi14", "macd", "bb")},
+        }
+
+    @classmethod
+    def restore(cls, snap: dict):
+        obj = cls.__new__(cls)
+        obj.last_time = snap["last_time"]
+        # Estados guardados sin historial reciente vuelven a calentarse (V13 usa el cálculo completo)
+        obj.count = snap.get("count", 0)
+        obj.recent = {k: deque(snap.get("recent", {}).get(k, []), maxlen=RECENT_BARS) for k in RECENT_SERIES}
+        obj.closes = deque(snap.get("closes", []), maxlen=V13_WINDOW)
+        raw = snap.get("ema_raw", {})
+        obj.ema_raw = {p: deque(raw.get(str(p), []), maxlen=V13_WINDOW) for p in (9, 20, 50, 100, 200)}
+        if any(len(values) != len(obj.closes) for values in obj.ema_raw.values()):
+            obj.closes.clear()
+        obj.ema = {int(p): StreamingIndicator.restore(s) for p, s in snap["ema"].items()}
+        obj.hull = {int(p): StreamingIndicator.restore(s) for p, s in snap["hull"].items()}
+        for name in ("tr", "atr14", "dmi14", "vol_ma20", "vol_sma50", "rsi14", "macd", "bb"):
+            setattr(obj, name, StreamingIndicator.restore(snap[name]))
+        return obj
+
+
+class IndicatorRegistry:
+    """
+    Estado incremental de indicadores por (símbolo, intervalo).
+    Se alimenta con velas cerradas; si detecta un hueco entre la última vela
+    aplicada y la nueva, se re-siembra con el historial que se le pase.
+    """
+    def __init__(self):
+        self._sets = {}
+
+    def get(self, symbol: str, interval: str):
+        return self._sets.get((symbol, interval))
+
+    def warmup(self, symbol: str, interval: str, closed_candles: list) -> V13IndicatorSet:
+        ind = V13IndicatorSet()
+        for c in closed_candles:
+            ind.update(c)
+        self._sets[(symbol, interval)] = ind
+        return ind
+
+    def on_closed_candle(self, symbol: str, interval: str, candle: dict, interval_ms: int, history=None):
+        """
+        Aplica una vela cerrada en O(1). `history()` devuelve las velas cerradas
+        (oldest-first): si hay un hueco (p.ej. estado restaurado tras un reinicio)
+        se reaplican solo las velas que faltan, y si no enlazan se re-siembra.
+        """
+        ind = self._sets.get((symbol, interval))
+        if ind is not None and ind.last_time is not None and ind.last_time >= candle["time"]:
+            return ind
+        if ind is not None and ind.last_time == candle["time"] - interval_ms:
+            ind.update(candle)
+            return ind
+
+        closed = history() if history else []
+        if not len(closed) or closed[-1]["time"] != candle["time"]:
+            return None
+        if ind is not None and ind.last_time is not None:
+            missing = [c for c in closed if c["time"] > ind.last_time]
+            if missing and missing[0]["time"] == ind.last_time + interval_ms:
+                for c in missing:
+                    ind.update(c)
+                return ind
+        return self.warmup(symbol, interval, closed)
+
+    def snapshot(self) -> dict:
+        return {f"{sym}|{iv}": ind.snapshot() for (sym, iv), ind in self._sets.items()}
+
+    def restore(self, snap: dict):
+        self._sets.clear()
+        for key, s in snap.items():
+            try:
+                sym, iv = key.split("|")
+                self._sets[(sym, iv)] = V13IndicatorSet.restore(s)
+            except Exception as e:
+                logger.error(f"[INDICATORS] Estado inválido para {key}: {e}")
+
+    def save(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            logger.info(f"[INDICATORS] 💾 Estado incremental guardado ({len(self._sets)} series).")
+        except Exception as e:
+            logger.error(f"[INDICATORS] Error guardando estado: {e}")
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.restore(json.load(f))
+            logger.info(f"[INDICATORS] 🔄 Estado incremental restaurado ({len(self._sets)} series).")
+        except Exception as e:
+            logger.error(f"[INDICATORS] Error cargando estado: {e}")
@@ -1,17 +1,22 @@
+import argparse
 import asyncio
+import time
 from app.exchange.bybit_client import AsyncBybitClient
 from app.strategy.antigravity_v13_pro import evaluate_antigravity_v13
 from app.strategy.supertrend_regime import evaluate_supertrend_regime
+from app.backtest.data import HISTORY_DIR, load_symbol
+from app.backtest.runner import INTERVALS, run_backtest
+from app.backtest.simulator import EXIT_NAMES, STRATEGY_NAMES
+from app.exchange.ohlcv_store import ohlcv_store
 
-async def run_backtest():
+async def run_live_check(symbols):
     client = AsyncBybitClient()
-    symbols = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
-    
+
     print("Iniciando Backtest Rápido...")
     print("===============================")
     for sym in symbols:
         print(f"\nEvaluando {sym}...")
-        
+
         # Test Antigravity
         try:
             ag_res = await evaluate_antigravity_v13(client, sym)
@@ -20,7 +25,7 @@ async def run_backtest():
                 print(f"   Detalles: {ag_res}")
         except Exception as e:
             print(f"[AntigravityV13] Error en {sym}: {e}")
-            
+
         # Test SuperTrend
         try:
             st_res = await evaluate_supertrend_regime(client, sym)
@@ -32,5 +37,43 @@ async def run_backtest():
 
     await client.close()
 
+async def fetch_all(symbols, days):
+    client = AsyncBybitClient()
+    end_ms = int(time.time() * 1000)
+    try:
+        # Solo se descargan los tramos que faltan en el historial local
+        await ohlcv_store.backfill(client, symbols, INTERVALS, end_ms - days * 86_400_000, end_ms)
+    finally:
+        await client.close()
+
+def run_history(symbols, directory):
+    history = {sym: load_symbol(sym, INTERVALS, directory) for sym in symbols}
+    trades, summary = run_backtest(history)
+
+    print("\n=== BACKTEST V13 + SUPERTREND ===")
+    print(f"Símbolos: {summary['symbols']} | Velas: {summary['bars']} | Tiempo: {summary['elapsed_s']}s")
+    print(f"Operaciones: {summary['trades']} | Win rate: {summary['win_rate']}% | PF: {summary['profit_factor']}")
+    print(f"PnL neto: {summary['pnl']:.2f} USDT (comisiones {summary['fees']:.2f}) | Max DD: {summary['max_drawdown']:.2f}")
+    for name, st in summary.get("by_strategy", {}).items():
+        print(f"  {name}: {st['trades']} ops | PnL {st['pnl']:.2f} | Win {st['win_rate']}%")
+    for name, count in summary.get("by_exit", {}).items():
+        print(f"  Salida {name}: {count}")
+    for t in trades[-10:]:
+        print(f"  {t['symbol']} {STRATEGY_NAMES[t['strategy']]} {'LONG' if t['side'] > 0 else 'SHORT'} "
+              f"{t['entry_price']:.4f} -> {t['exit_price']:.4f} | {t['pnl']:+.2f} USDT | {EXIT_NAMES[t['reason']]}")
+
 if __name__ == "__main__":
-    asyncio.run(run_backtest())
+    parser = argparse.ArgumentParser(description="Backtest histórico de AntigravityV13 y SuperTrendRegimeMTF")
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT,SOLUSDT", help="Lista separada por comas")
+    parser.add_argument("--data-dir", default=HISTORY_DIR, help="Historial .npy para símbolos que no estén en el store")
+    parser.add_argument("--fetch-days", type=int, default=0, help="Completar antes por REST N días del historial local")
+    parser.add_argument("--live", action="store_true", help="Solo evaluar la señal actual con datos en vivo")
+    args = parser.parse_args()
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+
+    if args.live:
+        asyncio.run(run_live_check(symbols))
+    else:
+        if args.fetch_days > 0:
+            asyncio.run(fetch_all(symbols, args.fetch_days))
+        run_history(symbols, args.data_dir)
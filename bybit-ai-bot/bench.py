@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import sys
+from app.core.benchmarks import GROUPS, SCAN_SIZES, run_benchmarks
+from app.utils.bench import BENCH_DIR, REGRESSION_RATIO, compare, git_revision, latest_results, load_results, \
+    save_results
+
+
+def print_results(results):
+    print(f"\n{'caso':<42} {'p50 ms':>10} {'p99 ms':>10} {'pico KB':>9} {'retenido KB':>12}")
+    for case, r in results.items():
+        if "skipped" in r:
+            print(f"{case:<42} {'omitido':>10}   {r['skipped'][:60]}")
+            continue
+        extra = f"   frío {r['cold_ms']:.1f}ms, {r['requests']} peticiones, {r['signals']} señales" \
+            if "cold_ms" in r else ""
+        print(f"{case:<42} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['alloc_peak_kb']:>9.1f} "
+              f"{r['alloc_retained_kb']:>12.1f}{extra}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del engine (latencia p50/p99 y memoria) por commit")
+    parser.add_argument("--groups", default=",".join(GROUPS), help=f"Separados por comas: {', '.join(GROUPS)}")
+    parser.add_argument("--scan-sizes", default=",".join(map(str, SCAN_SIZES)), help="Símbolos por ciclo de análisis")
+    parser.add_argument("--repeat", type=int, default=30, help="Iteraciones medidas por caso")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Ida y vuelta simulada por petición REST")
+    parser.add_argument("--dir", default=BENCH_DIR, help="Directorio de resultados")
+    parser.add_argument("--compare", nargs="?", const="latest",
+                        help="Commit o .json de referencia (sin valor: la última ejecución guardada)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    groups = [g.strip() for g in args.groups.split(",") if g.strip()]
+    sizes = [int(s) for s in args.scan_sizes.split(",") if s.strip()]
+    results = asyncio.run(run_benchmarks(groups, repeat=args.repeat, scan_sizes=sizes,
+                                         latency=args.latency_ms / 1000))
+    print_results(results)
+
+    revision = git_revision()
+    baseline = None
+    if args.compare == "latest":
+        baseline = latest_results(args.dir, exclude=revision)
+    elif args.compare:
+        baseline = load_results(args.compare, args.dir)
+    if not args.no_save:
+        print(f"\nResultados -> {save_results(results, args.dir, revision)}")
+
+    if baseline:
+        rows = compare(results, baseline["results"])
+        print(f"\n=== Comparación con {baseline['revision']} (regresión: p50 > {REGRESSION_RATIO}x) ===")
+        for case, before, now, ratio, regression in rows:
+            print(f"{case:<42} {before:>10.3f} -> {now:>10.3f}  x{ratio:<6} {'REGRESIÓN' if regression else ''}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
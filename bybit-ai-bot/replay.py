@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import calendar
+import os
+import tempfile
+import time
+
+# Todo lo que persiste el Engine (base SQLite, logs, memoria, journal) va a un directorio nuevo por
+# ejecución, sin disco de red ni Telegram: la recuperación y los fills simulados nunca tocan el estado
+# del bot real. Se fuerza (no setdefault) y antes de importar app.*, que fija las rutas al importarse.
+REPLAY_DIR = tempfile.mkdtemp(prefix="bybit-replay-")
+os.environ.update({
+    "STORAGE_DIR": REPLAY_DIR,
+    "DB_DIR": REPLAY_DIR,
+    "LOG_DIR": os.path.join(REPLAY_DIR, "logs"),
+    "NETWORK_DISK_IP": "127.0.0.1",
+    "USE_TELEGRAM": "false",
+})
+
+from app.exchange.ohlcv_store import ohlcv_store
+from app.exchange.simulated_exchange import SIM_INTERVALS, SimClock, SimulatedBybitClient, SimulatedExchange, \
+    SimulatedWebSocket, replay
+
+# Velas previas al inicio que se cargan como historial cerrado (EMA200 en 1h)
+WARMUP_DAYS = 12
+
+
+def load_candles(symbols, start_ms, end_ms):
+    candles = {}
+    for sym in symbols:
+        series = {iv: ohlcv_store.read(sym, iv, start_ms - WARMUP_DAYS * 86_400_000, end_ms).to_klines()
+                  for iv in SIM_INTERVALS}
+        if not len(series["5"]):
+            print(f"[REPLAY] {sym}: sin velas de 5m en el store (python -m app.exchange.ohlcv_store)")
+            continue
+        candles[sym] = series
+    return candles
+
+
+async def run_replay(symbols, day, speed, balance):
+    from app.core.engine import Engine
+
+    start_ms = calendar.timegm(time.strptime(day, "%Y-%m-%d")) * 1000 if day else \
+        (int(time.time() * 1000) // 86_400_000 - 1) * 86_400_000
+    end_ms = start_ms + 86_400_000
+    candles = load_candles(symbols, start_ms, end_ms)
+    if not candles:
+        return None
+
+    clock = SimClock(start_ms, speed)
+    exchange = SimulatedExchange(candles, start_ms, balance=balance, clock=clock)
+    client = SimulatedBybitClient(exchange)
+    with clock.install():
+        engine = Engine(client, ws_factory=SimulatedWebSocket.factory(exchange), history=None)
+        await engine.start()
+        try:
+            report = await replay(exchange, end_ms=end_ms, speed=speed)
+        finally:
+            await engine.stop()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduce un día de velas del store a través del Engine real")
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT,SOLUSDT", help="Lista separada por comas")
+    parser.add_argument("--day", default=None, help="Día UTC a reproducir (YYYY-MM-DD, por defecto ayer)")
+    parser.add_argument("--speed", type=float, default=1000.0, help="Factor sobre tiempo real")
+    parser.add_argument("--balance", type=float, default=10_000.0)
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    report = asyncio.run(run_replay(symbols, args.day, args.speed, args.balance))
+    if report:
+        print("\n=== REPLAY ===")
+        for key, value in report.items():
+            print(f"{key:>20}: {value}")
+    print(f"\nBase, logs y estado de la simulación en {REPLAY_DIR}")
@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+import time
+from app.backtest.data import HISTORY_DIR, load_symbol
+from app.backtest.runner import INTERVALS
+from app.backtest.sweep import DEFAULT_SPACE, grid, random_search, run_sweep, top
+from app.constants import STORAGE_PATH
+
+def load_space(path):
+    if not path:
+        return DEFAULT_SPACE
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    # Un rango continuo se escribe como {"min": .., "max": ..}
+    return {k: (v["min"], v["max"]) if isinstance(v, dict) else v for k, v in raw.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de V13 / SuperTrend sobre el historial")
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT,SOLUSDT", help="Lista separada por comas")
+    parser.add_argument("--data-dir", default=HISTORY_DIR, help="Historial .npy para símbolos que no estén en el store")
+    parser.add_argument("--space", help="JSON {parámetro: [valores] | {min, max}} (por defecto DEFAULT_SPACE)")
+    parser.add_argument("--random", type=int, default=0, help="N combinaciones al azar en vez de la rejilla completa")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument("--out", default=None, help="Archivo de resultados .npz")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    space = load_space(args.space)
+    combos = random_search(space, args.random, args.seed) if args.random else grid(space)
+    out = args.out or os.path.join(STORAGE_PATH, "sweeps", f"sweep_{int(time.time())}.npz")
+
+    history = {sym: load_symbol(sym, INTERVALS, args.data_dir) for sym in symbols}
+    results = run_sweep(history, combos, workers=args.workers, results_path=out)
+
+    print(f"\n=== TOP {args.top} por PnL ({len(combos)} combinaciones) -> {out} ===")
+    params = sorted(space)
+    for row in top(results, "pnl", args.top):
+        values = " ".join(f"{p}={row[p]:g}" for p in params)
+        print(f"PnL {row['pnl']:+10.2f} | {int(row['trades']):5d} ops | Win {row['win_rate']:5.1f}% "
+              f"| PF {row['profit_factor']:.2f} | {values}")
@@ -0,0 +1,77 @@
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from app.exchange.account_state import AccountState
+from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.market_events import OrderUpdate
+
+
+def _order(oid, symbol, status="Untriggered", trigger="90"):
+    return {"orderId": oid, "symbol": symbol, "orderStatus": status, "triggerPrice": trigger,
+            "orderType": "Market", "stopOrderType": "StopLoss", "category": "linear"}
+
+
+def test_snapshot_indexed_by_symbol():
+    print("=== Testing AccountState snapshot + private stream ===")
+    account = AccountState()
+    positions = [
+        {"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": 0.01, "markPrice": 100.0},
+        {"symbol": "ETHUSDT", "positionSide": "SHORT", "positionAmt": 0.0, "markPrice": 10.0},
+    ]
+    account.apply_snapshot(positions, [_order("1", "BTCUSDT"), _order("2", "ETHUSDT")], time.monotonic())
+    assert account.position("BTC-USDT", "LONG")["markPrice"] == 100.0
+    assert account.position("ETHUSDT", "SHORT") == {}
+    assert [o["orderId"] for o in account.orders_for("BTCUSDT")] == ["1"]
+    assert not account.needs_resync(30)
+    print("[PASS] Positions and orders indexed by symbol from one snapshot.")
+
+    asyncio.run(account.on_order_event([OrderUpdate.from_bybit(_order("1", "BTCUSDT", status="Cancelled")),
+                                        OrderUpdate.from_bybit(_order("3", "BTCUSDT"))]))
+    assert [o["orderId"] for o in account.orders_for("BTCUSDT")] == ["3"]
+    print("[PASS] Order stream keeps the open-order book current.")
+
+    # Un REST iniciado antes del evento WS no debe pisarlo
+    started = time.monotonic()
+    asyncio.run(account.on_position_event([{"symbol": "BTCUSDT", "positionIdx": 1, "size": "0",
+                                            "category": "linear"}]))
+    drift = account.apply_snapshot(positions, [_order("1", "BTCUSDT")], started)
+    assert account.position("BTCUSDT", "LONG") == {}
+    assert [o["orderId"] for o in account.orders_for("BTCUSDT")] == ["1"]
+    assert drift == 3, drift
+    print("[PASS] Stream updates newer than the REST request survive the checksum.")
+
+
+def test_all_open_orders_paged_and_deduplicated():
+    print("=== Testing account-wide open orders ===")
+    client = AsyncBybitClient()
+    calls = []
+
+    async def fake_request(method, endpoint, params=None, signed=True, max_retries=3):
+        calls.append(dict(params))
+        if params["orderFilter"] == "Order" and not params.get("cursor"):
+            return {"success": True, "data": {"list": [_order("1", "BTCUSDT")], "nextPageCursor": "p2"}}
+        if params["orderFilter"] == "Order":
+            return {"success": True, "data": {"list": [_order("2", "ETHUSDT")], "nextPageCursor": ""}}
+        return {"success": True, "data": {"list": [_order("2", "ETHUSDT")]}}
+
+    client._request = fake_request
+    orders = asyncio.run(client.get_all_open_orders())
+    assert sorted(o["orderId"] for o in orders) == ["1", "2"]
+    assert all("symbol" not in c and c["settleCoin"] == "USDT" for c in calls)
+    assert len(calls) == 4
+    print("[PASS] One account-wide query per order type, paged and deduplicated.")
+
+    async def failing_request(method, endpoint, params=None, signed=True, max_retries=3):
+        return {"success": params["orderFilter"] != "StopOrder", "data": {"list": []}}
+
+    client._request = failing_request
+    assert asyncio.run(client.get_all_open_orders()) is None
+    print("[PASS] Partial failures are reported instead of an empty book.")
+
+
+if __name__ == "__main__":
+    test_snapshot_indexed_by_symbol()
+    test_all_open_orders_paged_and_deduplicated()
@@ -0,0 +1,153 @@
+import asyncio
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+from app.backtest import simulator
+from app.backtest.data import resample
+from app.backtest.runner import run_backtest
+from app.backtest.signals import v13_features, v13_signals
+from app.exchange.kline_cache import KLINE_DTYPE
+from app.strategy.antigravity_v13_pro import evaluate_antigravity_v13
+from app.utils.indicators import rma_array, ta_ema_array
+
+
+def _klines(n, seed=3, drift=0.0015):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, n) + drift * np.sin(np.arange(n) / 400)))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    k = np.empty(n, dtype=KLINE_DTYPE)
+    k["time"] = 1_699_977_600_000 + np.arange(n) * 300_000
+    k["open"], k["close"] = open_, close
+    k["high"] = np.maximum(open_, close) * (1 + rng.random(n) * 0.002)
+    k["low"] = np.minimum(open_, close) * (1 - rng.random(n) * 0.002)
+    k["volume"] = rng.lognormal(10, 0.6, n)
+    return k
+
+
+class _WindowClient:
+    def __init__(self, klines):
+        self.klines = klines
+
+    async def get_klines(self, symbol, interval, limit, as_array=False):
+        return self.klines[-limit:]
+
+
+def test_pandas_ta_conventions():
+    print("=== Testing pandas_ta RMA / EMA replicas ===")
+    rng = np.random.default_rng(5)
+    x = 100 + np.cumsum(rng.normal(0, 1, 400))
+    x[0] = np.nan  # primer TR de pandas_ta
+    ref = pd.Series(x).ewm(alpha=1 / 14, min_periods=14).mean().to_numpy()
+    assert np.allclose(rma_array(x, 14), ref, equal_nan=True)
+
+    y = pd.Series(100 + np.cumsum(rng.normal(0, 1, 400)))
+    seeded = y.copy()
+    seeded[:20] = np.nan
+    seeded.iloc[20] = y[:21].mean()
+    assert np.allclose(ta_ema_array(y.to_numpy(), 21), seeded.ewm(span=21, adjust=False).mean(), equal_nan=True)
+    print("[PASS] RMA (adjust=True, min_periods) and SMA-seeded EMA match pandas.")
+
+
+def test_v13_vectorized_signals_match_strategy():
+    print("=== Testing vectorized V13 conditions against evaluate_antigravity_v13 ===")
+    klines = _klines(3000)
+    # Velas con señal sobre el historial completo más una muestra regular
+    full = v13_signals(v13_features(klines))
+    ends = sorted(set(np.flatnonzero(full[400:]) + 401) | set(range(400, 3000, 25)))
+    checked = fired = 0
+    for end in ends:
+        window = klines[end - 249:end]            # 249 velas cerradas
+        live = asyncio.run(evaluate_antigravity_v13(_WindowClient(klines[end - 249:end + 1]), "TEST"))
+        vectorized = v13_signals(v13_features(window))[-1]
+        expected = {"LONG": 1, "SHORT": -1}.get(live["signal"], 0)
+        assert vectorized == expected, f"bar {end}: {vectorized} != {live['signal']}"
+        checked += 1
+        fired += expected != 0
+    assert fired > 0
+    print(f"[PASS] {checked} windows agree ({fired} with a signal).")
+
+
+def _bars(rows):
+    k = np.empty(len(rows), dtype=KLINE_DTYPE)
+    k["time"] = np.arange(len(rows)) * 300_000
+    for j, name in enumerate(("open", "high", "low", "close")):
+        k[name] = [r[j] for r in rows]
+    k["volume"] = 1.0
+    return k
+
+
+def _simulate(bars, sig_v13=None, sig_st=None, exit_long=None, ema21=None, **params):
+    n = len(bars)
+    zeros = np.zeros(n)
+    return simulator.simulate(
+        bars["open"], bars["high"], bars["low"], bars["close"],
+        sig_v13 if sig_v13 is not None else zeros, np.full(n, 1.0),
+        sig_st if sig_st is not None else zeros, np.full(n, 1.0),
+        exit_long if exit_long is not None else zeros.astype(bool), zeros.astype(bool),
+        ema21 if ema21 is not None else zeros, params)
+
+
+def test_exit_logic_replays_engine_rules():
+    print("=== Testing simulated exits: TP1/TP2 partials, trailing, BE, cooldown ===")
+    # V13 LONG en 100 con ATR 1: SL 97.5, TP1 101.5, TP2 103, BE (1000x -> 0.0333%) al instante
+    bars = _bars([(100, 100, 100, 100), (100, 101.6, 99.9, 101.5), (101.5, 103.2, 101.4, 103),
+                  (103, 104, 102.9, 103.5), (103.5, 103.6, 101.0, 101.2), (101.2, 101.3, 101.1, 101.2)])
+    sig = np.zeros(len(bars))
+    sig[0] = 1
+    trades = _simulate(bars, sig_v13=sig, leverage=1000.0, fee_rate=0.0, notional=100.0)
+    t = trades[0]
+    assert len(trades) == 1 and t["strategy"] == simulator.STRATEGY_V13 and t["side"] == 1
+    assert t["tp1"] and t["tp2"] and t["breakeven"] and t["trailing"]
+    # Trailing 1.2 ATR bajo el máximo (104) -> 102.8, ejecutado en la vela 4
+    assert t["exit_idx"] == 4 and t["reason"] == simulator.EXIT_PROTECTED
+    expected = 0.3 * 1.5 + 0.3 * 3.0 + 0.4 * 2.8
+    assert abs(t["pnl"] - expected) < 1e-9, t["pnl"]
+    print("[PASS] 30/30/40 partials and ATR trailing reproduce the engine's PnL.")
+
+    # SL inicial -> cooldown de 1h: la señal siguiente dentro de la hora se ignora
+    bars = _bars([(100, 100, 100, 100), (100, 100.2, 97, 97.2)] + [(97.2, 97.3, 97.1, 97.2)] * 16)
+    sig = np.zeros(len(bars))
+    sig[[0, 2, 14]] = 1
+    trades = _simulate(bars, sig_v13=sig, fee_rate=0.0)
+    assert trades["reason"][0] == simulator.EXIT_STOP and trades["exit_price"][0] == 97.5
+    assert trades["entry_idx"][1] == 15
+    print("[PASS] Initial stop fills at the stop price and starts the 1h cooldown.")
+
+    # SuperTrend: sin TPs, salida anticipada a mercado en la apertura siguiente
+    bars = _bars([(100, 100, 100, 100), (100, 100.5, 99.5, 100), (100, 100.5, 99.5, 100),
+                  (100.4, 100.6, 100.2, 100.3)])
+    sig = np.zeros(len(bars))
+    sig[0] = 1
+    exits = np.zeros(len(bars), dtype=bool)
+    exits[2] = True
+    t = _simulate(bars, sig_st=sig, exit_long=exits, fee_rate=0.0)[0]
+    assert t["strategy"] == simulator.STRATEGY_SUPERTREND and not t["tp1"]
+    assert t["reason"] == simulator.EXIT_EARLY and t["exit_idx"] == 3 and abs(t["exit_price"] - 100.4) < 1e-9
+    print("[PASS] SuperTrend early exit closes at the next open.")
+
+
+def test_full_backtest_run():
+    print("=== Testing full multi-symbol backtest ===")
+    history = {}
+    for seed in range(3):
+        base = _klines(20000, seed=seed)
+        history[f"S{seed}USDT"] = {"5": base, "15": resample(base, "15"), "60": resample(base, "60")}
+    trades, summary = run_backtest(history)
+    assert summary["symbols"] == 3 and summary["trades"] == len(trades) > 0
+    assert np.all(np.diff(trades["exit_time"]) >= 0)
+    assert np.all(trades["entry_time"] < trades["exit_time"])
+    assert abs(summary["pnl"] - trades["pnl"].sum()) < 1e-3
+    four_h = resample(history["S0USDT"]["5"][:48], "240")
+    assert len(four_h) == 1 and four_h["high"][0] == history["S0USDT"]["5"]["high"][:48].max()
+    print(f"[PASS] {summary['trades']} trades over {summary['bars']} bars in {summary['elapsed_s']}s.")
+
+
+if __name__ == "__main__":
+    test_pandas_ta_conventions()
+    test_v13_vectorized_signals_match_strategy()
+    test_exit_logic_replays_engine_rules()
+    test_full_backtest_run()
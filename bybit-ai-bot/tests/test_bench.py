@@ -0,0 +1,63 @@
+import asyncio
+import inspect
+import sys
+import tempfile
+
+sys.path.insert(0, '.')
+
+from app.core import benchmarks
+from app.utils import bench, indicators
+
+
+def test_run_case_and_regression_compare():
+    print("=== Testing the benchmark harness ===")
+    calls = {"before": 0, "fn": 0}
+
+    def before():
+        calls["before"] += 1
+
+    async def work():
+        calls["fn"] += 1
+        await asyncio.sleep(0)
+        return [0] * 10_000
+
+    stats = asyncio.run(bench.run_case(work, repeat=20, warmup=2, before=before))
+    assert stats["n"] == 20 and calls == {"before": 23, "fn": 23}  # + la pasada de tracemalloc
+    assert 0 < stats["min_ms"] <= stats["p50_ms"] <= stats["p99_ms"]
+    assert stats["alloc_peak_kb"] >= 70 and stats["alloc_retained_kb"] < 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old = {"a": dict(stats, p50_ms=1.0), "b": dict(stats, p50_ms=2.0), "gone": dict(stats)}
+        bench.save_results(old, tmp, revision="aaa1111")
+        new = {"a": dict(stats, p50_ms=1.1), "b": dict(stats, p50_ms=3.0), "skip": {"skipped": "x"}}
+        path = bench.save_results(new, tmp, revision="bbb2222")
+        assert bench.load_results(path)["results"]["b"]["p50_ms"] == 3.0
+        baseline = bench.latest_results(tmp, exclude="bbb2222")
+        assert baseline["revision"] == "aaa1111"
+        rows = bench.compare(new, baseline["results"])
+        assert [(r[0], r[4]) for r in rows] == [("a", False), ("b", True)]
+    print(f"[PASS] p50 {stats['p50_ms']}ms / p99 {stats['p99_ms']}ms, results round-trip and regressions flagged.")
+
+
+def test_engine_benchmarks():
+    print("=== Testing indicator, strategy, mark price and scan benchmarks ===")
+    cases = benchmarks.indicator_cases(300)
+    public = [n for n, f in inspect.getmembers(indicators, inspect.isfunction)
+              if not n.startswith("_") and f.__module__ == indicators.__name__]
+    assert sorted(cases) == sorted(f"indicators.{n}" for n in public)
+
+    results = asyncio.run(benchmarks.run_benchmarks(repeat=3, warmup=1, scan_sizes=(25,)))
+    assert set(cases) <= set(results)
+    assert results["strategies.evaluate_antigravity_v13"]["n"] == 3
+    for case in ("strategies.evaluate_supertrend_regime", "mark_price.handle.50", "mark_price.ws.1", "scan.25"):
+        # Sin pandas_ta / greenlet el Engine no se importa y el caso queda omitido con el motivo
+        assert "skipped" in results[case] or results[case]["n"] >= 3
+    if "skipped" not in results["scan.25"]:
+        assert results["scan.25"]["requests"] > 0 and results["scan.25"]["cold_ms"] > 0
+    measured = sum("skipped" not in r for r in results.values())
+    print(f"[PASS] {measured}/{len(results)} cases measured.")
+
+
+if __name__ == "__main__":
+    test_run_case_and_regression_compare()
+    test_engine_benchmarks()
@@ -0,0 +1,34 @@
+import sys
+
+sys.path.insert(0, '.')
+
+import numpy as np
+from app.utils import json_codec
+
+
+def test_round_trip_and_fallback():
+    print("=== Testing json_codec (%s backend) ===" % json_codec.BACKEND)
+    data = {"symbol": "BTCUSDT", "estrategia": "Señal V13", "pnl": -1.25, "ids": [1, 2, 3], "ok": True}
+    assert json_codec.loads(json_codec.dumps_bytes(data)) == data
+    assert json_codec.loads(json_codec.dumps(data)) == data
+    assert json_codec.loads(bytearray(b'{"a":1}')) == {"a": 1}
+    assert json_codec.loads(memoryview(b'{"a":2}')) == {"a": 2}
+
+    pretty = json_codec.dumps_bytes(data, pretty=True)
+    assert b"\n  " in pretty and "Señal".encode("utf-8") in pretty
+    assert b" " not in json_codec.dumps_bytes({"a": [1, 2]})
+    print("[PASS] bytes/str round trip, compact and indented output, UTF-8 kept.")
+
+    # Valores que el backend rápido puede rechazar caen a la librería estándar
+    odd = {"big": 2 ** 70, "price": np.float64(1.5)}
+    assert json_codec.loads(json_codec.dumps_bytes(odd)) == {"big": 2 ** 70, "price": 1.5}
+    try:
+        json_codec.dumps_bytes({"lock": object()})
+        assert False, "non-serializable value accepted"
+    except TypeError:
+        pass
+    print("[PASS] Unsupported values fall back to stdlib; real errors still raise TypeError.")
+
+
+if __name__ == "__main__":
+    test_round_trip_and_fallback()
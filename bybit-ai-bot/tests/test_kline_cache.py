@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from app.exchange.kline_cache import KLINE_DTYPE, KlineCache, klines_to_dicts, parse_kline_rows
+from app.exchange.candle_store import CandleStore
+from app.exchange.market_events import Kline
+
+INTERVAL_MS = 5 * 60_000
+
+
+class FakeKlineSource:
+    """Simula /v5/market/kline: devuelve las últimas `limit` velas hasta `now`."""
+    def __init__(self, bars: int):
+        now_ms = int(time.time() * 1000)
+        self.last_start = now_ms - (now_ms % INTERVAL_MS)
+        self.bars = bars
+        self.requested = []
+
+    def raw(self, limit):
+        """Filas como las devuelve Bybit: strings, la más reciente primero."""
+        n = min(limit, self.bars)
+        starts = [self.last_start - i * INTERVAL_MS for i in range(n)]
+        return [[str(t), "1", "2", "0.5", str(t / 1e9), "1", "10"] for t in starts]
+
+    async def fetch(self, limit):
+        self.requested.append(limit)
+        return parse_kline_rows(self.raw(limit))
+
+
+def test_parse_kline_rows():
+    print("=== Testing columnar kline parsing ===")
+    source = FakeKlineSource(bars=5)
+    raw = source.raw(5)
+    parsed = parse_kline_rows(raw)
+    assert parsed.dtype == KLINE_DTYPE and len(parsed) == 5
+    assert parsed["time"][-1] == source.last_start
+    assert list(parsed["time"]) == sorted(parsed["time"])
+    print("[PASS] Newest-first rows parsed into an oldest-first structured array.")
+
+    dicts = klines_to_dicts(parsed)
+    assert dicts[-1] == {"open": 1.0, "high": 2.0, "low": 0.5, "close": source.last_start / 1e9,
+                         "volume": 1.0, "time": source.last_start}
+    assert type(dicts[0]["time"]) is int and type(dicts[0]["close"]) is float
+    print("[PASS] Legacy dict format preserved.")
+
+    bad = raw[:2] + [["oops", "1"]] + raw[2:]
+    assert len(parse_kline_rows(bad)) == 5
+    assert len(parse_kline_rows([])) == 0
+    print("[PASS] Malformed rows skipped.")
+
+
+def test_incremental_refresh():
+    print("=== Testing KlineCache incremental tail refresh ===")
+    cache = KlineCache()
+    source = FakeKlineSource(bars=2000)
+
+    first = asyncio.run(cache.get("BTCUSDT", "5", 250, source.fetch))
+    assert len(first) == 250 and source.requested == [250]
+
+    # Mismo ciclo: solo se vuelve a pedir la vela abierta (+1 de solape)
+    again = asyncio.run(cache.get("BTCUSDT", "5", 250, source.fetch))
+    assert source.requested[-1] <= 3, f"Expected a tail fetch, got limit={source.requested[-1]}"
+    assert [c["time"] for c in again] == [c["time"] for c in first]
+    print("[PASS] Second call only fetched the tail.")
+
+    # Cierra una vela nueva: la cola se fusiona sin duplicados
+    source.last_start += INTERVAL_MS
+    later = asyncio.run(cache.get("BTCUSDT", "5", 250, source.fetch))
+    times = [c["time"] for c in later]
+    assert times[-1] == source.last_start
+    assert len(times) == len(set(times)) == 250
+    assert all(b - a == INTERVAL_MS for a, b in zip(times, times[1:]))
+    print("[PASS] New bar merged and history stays contiguous.")
+
+    # Pedir más historial del guardado obliga a una descarga completa
+    bigger = asyncio.run(cache.get("BTCUSDT", "5", 500, source.fetch))
+    assert len(bigger) == 500 and source.requested[-1] == 500
+    print("[PASS] Larger limit triggers a full refresh.")
+
+
+def test_ws_fed_series():
+    print("=== Testing CandleStore feeding the cache from the kline stream ===")
+    cache = KlineCache()
+    store = CandleStore(cache)
+    source = FakeKlineSource(bars=2000)
+    # Cargada justo antes del cierre: la última vela de REST es la que va a confirmarse
+    source.last_start -= INTERVAL_MS
+
+    async def scenario():
+        await cache.get("BTCUSDT", "5", 250, source.fetch)
+        calls = len(source.requested)
+        start = source.last_start
+
+        waiter = asyncio.create_task(store.wait_for_bar_close("5", timeout=5))
+        await asyncio.sleep(0)
+        await store.on_kline(Kline.from_bybit("BTCUSDT", "5", {
+            "start": start, "open": "1", "high": "3", "low": "0.5", "close": "2.5",
+            "volume": "10", "confirm": True,
+        }))
+        assert await waiter, "Bar close did not wake the waiter"
+        closed = cache.closed_candles("BTCUSDT", "5")
+        assert closed[-1]["time"] == start and closed[-1]["close"] == 2.5
+
+        # Sin push de la vela siguiente no se inventa una plana: la vela en curso viene de REST
+        source.last_start += INTERVAL_MS
+        candles = await cache.get("BTCUSDT", "5", 250, source.fetch)
+        rest_calls = len(source.requested)
+
+        # Con la vela en curso llegando por el stream ya no hace falta REST
+        await store.on_kline(Kline.from_bybit("BTCUSDT", "5", {
+            "start": start + INTERVAL_MS, "open": "2.5", "high": "2.7", "low": "2.4", "close": "2.6",
+            "volume": "4", "confirm": False,
+        }))
+        live = await cache.get("BTCUSDT", "5", 250, source.fetch)
+        return calls, rest_calls, candles, live, start
+
+    calls, rest_calls, candles, live, start = asyncio.run(scenario())
+    assert candles[-2]["time"] == start
+    assert candles[-1]["time"] == start + INTERVAL_MS and candles[-1]["volume"] == 1.0
+    assert rest_calls == calls + 1 and source.requested[-1] <= 3
+    print("[PASS] Closed candle applied; the forming candle is fetched by REST, not fabricated.")
+    assert len(source.requested) == rest_calls
+    assert live[-1]["time"] == start + INTERVAL_MS and live[-1]["close"] == 2.6 and live[-1]["volume"] == 4.0
+    print("[PASS] Once the stream pushes the forming candle, no REST request is made.")
+
+if __name__ == "__main__":
+    test_parse_kline_rows()
+    test_incremental_refresh()
+    test_ws_fed_series()
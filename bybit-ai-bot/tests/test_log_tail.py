@@ -0,0 +1,100 @@
+import gzip
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+
+from app.utils.log_tail import LogTail
+from app.logger import CompressedRotatingFileHandler
+
+
+def test_tail_reverse_seek_and_append():
+    print("=== Testing LogTail reverse seek + incremental index ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bot.log")
+        with open(path, "w") as f:
+            for i in range(5000):
+                f.write(f"line {i} " + "x" * 40 + "\n")
+
+        tail = LogTail(path, max_lines=200)
+        lines = tail.lines(100)
+        assert len(lines) == 100
+        assert lines[0].startswith("line 4900 ") and lines[-1].startswith("line 4999 ")
+        assert not tail._from_start
+        print("[PASS] Last 100 lines read by seeking backwards.")
+
+        with open(path, "a") as f:
+            f.write("line 5000\nline 5001 (sin salto final)")
+        lines = tail.lines(3)
+        assert lines == ["line 4999 " + "x" * 40, "line 5000", "line 5001 (sin salto final)"]
+        with open(path, "a") as f:
+            f.write(" resto\n")
+        assert tail.lines(1) == ["line 5001 (sin salto final) resto"]
+        print("[PASS] Appended bytes extend the index without rereading the file.")
+
+        # RESET del dashboard: el archivo se vacía y se reescribe
+        with open(path, "w") as f:
+            f.write("limpio\n")
+        assert tail.lines(100) == ["limpio"]
+        os.remove(path)
+        assert tail.lines(100) == []
+        print("[PASS] Truncation and deletion drop the stale index.")
+
+
+def test_rotation_compresses_archives():
+    print("=== Testing CompressedRotatingFileHandler ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bot.log")
+        handler = CompressedRotatingFileHandler(path, max_bytes=2000, backup_count=2, max_age=0)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log = logging.getLogger("test_rotation")
+        log.propagate = False
+        log.addHandler(handler)
+        try:
+            for i in range(200):
+                log.warning("mensaje %d %s", i, "y" * 30)
+        finally:
+            log.removeHandler(handler)
+            handler.close()
+
+        archives = sorted(f for f in os.listdir(tmp) if f.endswith(".gz"))
+        assert archives == ["bot.log.1.gz", "bot.log.2.gz"]
+        with gzip.open(os.path.join(tmp, "bot.log.1.gz"), "rt") as f:
+            assert f.read().startswith("mensaje ")
+        assert os.path.getsize(path) <= 2000
+        print("[PASS] Size-based rotation keeps gzip archives and honours backup_count.")
+
+        handler = CompressedRotatingFileHandler(path, max_bytes=0, backup_count=2, max_age=3600)
+        handler._opened_at -= 7200
+        record = logging.LogRecord("t", logging.INFO, __file__, 0, "tras una hora", None, None)
+        assert handler.shouldRollover(record)
+        handler.emit(record)
+        handler.close()
+        with open(path) as f:
+            assert f.read().strip() == "tras una hora"
+        print("[PASS] Time-based rotation triggers once max_age has elapsed.")
+
+        # Un reinicio (escrituras recientes incluidas) no resetea la edad del segmento
+        with open(path + ".started", "w") as f:
+            f.write(repr(time.time() - 7200))
+        with open(path, "a") as f:
+            f.write("escrito justo antes del reinicio\n")
+        handler = CompressedRotatingFileHandler(path, max_bytes=0, backup_count=2, max_age=3600)
+        assert time.time() - handler._opened_at >= 7200
+        assert handler.shouldRollover(record)
+        handler.emit(record)
+        handler.close()
+        with open(path + ".started") as f:
+            assert time.time() - float(f.read()) < 60
+        handler = CompressedRotatingFileHandler(path, max_bytes=0, backup_count=2, max_age=3600)
+        assert not handler.shouldRollover(record)
+        handler.close()
+        print("[PASS] Segment age survives a restart and resets on rollover.")
+
+
+if __name__ == "__main__":
+    test_tail_reverse_seek_and_append()
+    test_rotation_compresses_archives()
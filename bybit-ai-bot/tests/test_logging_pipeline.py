@@ -0,0 +1,74 @@
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueListener
+
+sys.path.insert(0, '.')
+
+from app.logger import _DeferredQueueHandler, JsonLinesFormatter, _parse_levels, get_logger, set_level
+
+
+class _Probe:
+    """Registra en qué hilo se convierte a texto."""
+
+    def __init__(self):
+        self.formatted_in = None
+
+    def __str__(self):
+        self.formatted_in = threading.current_thread().name
+        return "probe"
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def test_formatting_happens_on_listener_thread():
+    print("=== Testing deferred formatting in the queue listener ===")
+    q = queue.SimpleQueue()
+    sink = _Collect()
+    sink.setFormatter(JsonLinesFormatter())
+    listener = QueueListener(q, sink, respect_handler_level=True)
+    log = logging.getLogger("test_pipeline")
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    handler = _DeferredQueueHandler(q)
+    log.addHandler(handler)
+
+    probe = _Probe()
+    log.info("[POLL] valor %s a %.2f", probe, 1.23456)
+    assert probe.formatted_in is None  # El hilo que loguea solo encola
+    listener.start()
+    listener.stop()
+    log.removeHandler(handler)
+
+    assert probe.formatted_in not in (None, threading.current_thread().name)
+    entry = json.loads(sink.lines[0])
+    assert entry["msg"] == "[POLL] valor probe a 1.23" and entry["level"] == "INFO"
+    assert entry["logger"] == "test_pipeline"
+    print("[PASS] Records are formatted (text and JSON lines) off the caller thread.")
+
+
+def test_subsystem_levels():
+    print("=== Testing per-subsystem log levels ===")
+    assert _parse_levels("engine=INFO, ws=warning,bad=NOPE,") == {"engine": logging.INFO, "ws": logging.WARNING}
+    set_level("test_ws", "WARNING")
+    ws_log = get_logger("test_ws")
+    assert ws_log.name == "QUANTUM BYBIT.test_ws"
+    assert not ws_log.isEnabledFor(logging.INFO)
+    assert get_logger("test_engine").isEnabledFor(logging.DEBUG)
+    set_level("test_ws", logging.DEBUG)
+    assert ws_log.isEnabledFor(logging.DEBUG)
+    print("[PASS] Subsystem loggers inherit the pipeline and filter independently.")
+
+
+if __name__ == "__main__":
+    test_formatting_happens_on_listener_thread()
+    test_subsystem_levels()
@@ -0,0 +1,63 @@
+import asyncio
+import sys
+
+sys.path.insert(0, '.')
+
+from app.utils.mailbox import LatestValueMailbox
+
+
+def test_latest_value_coalescing():
+    print("=== Testing LatestValueMailbox coalescing ===")
+    seen = []
+    release = asyncio.Event()
+
+    async def slow_handler(symbol, price):
+        seen.append((symbol, price))
+        if symbol == "BTCUSDT":
+            await release.wait()  # REST lento (update_sl)
+
+    async def run():
+        box = LatestValueMailbox(slow_handler)
+        box.put("BTCUSDT", 1)
+        await asyncio.sleep(0)
+        for price in range(2, 50):
+            box.put("BTCUSDT", price)  # El lector del WS nunca espera
+        box.put("ETHUSDT", 10)
+        await asyncio.sleep(0.01)
+        # ETH no queda detrás del REST lento de BTC
+        assert ("ETHUSDT", 10) in seen
+        release.set()
+        await asyncio.sleep(0.01)
+        assert [p for s, p in seen if s == "BTCUSDT"] == [1, 49]
+        assert box.stats["dropped"] == 47 and box.pending() == 0
+        await box.close()
+
+    asyncio.run(run())
+    print("[PASS] Stale ticks dropped; only the freshest price is processed per symbol.")
+
+
+def test_handler_errors_do_not_kill_worker():
+    print("=== Testing LatestValueMailbox error isolation ===")
+    seen = []
+
+    async def handler(symbol, price):
+        seen.append(price)
+        if price == 1:
+            raise ValueError("boom")
+
+    async def run():
+        box = LatestValueMailbox(handler)
+        box.put("SOLUSDT", 1)
+        await asyncio.sleep(0.01)
+        box.put("SOLUSDT", 2)
+        await asyncio.sleep(0.01)
+        assert seen == [1, 2] and box.stats["processed"] == 2
+        await box.close()
+
+    asyncio.run(run())
+    print("[PASS] A failing tick is logged and the next one is still processed.")
+
+
+if __name__ == "__main__":
+    test_latest_value_coalescing()
+    test_handler_errors_do_not_kill_worker()
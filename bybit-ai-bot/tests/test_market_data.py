@@ -0,0 +1,71 @@
+import asyncio
+import sys
+
+sys.path.insert(0, '.')
+
+import numpy as np
+from app.exchange.kline_cache import KLINE_DTYPE
+from app.exchange.market_data import MarketDataContext
+
+
+class SlowClient:
+    """Cliente falso: cuenta las descargas y tarda lo suficiente para solaparlas."""
+    def __init__(self):
+        self.calls = []
+
+    async def get_klines(self, symbol, interval="5m", limit=100, use_cache=True, as_array=False):
+        self.calls.append((symbol, interval, limit))
+        await asyncio.sleep(0.05)
+        out = np.zeros(limit, dtype=KLINE_DTYPE)
+        out["time"] = np.arange(limit)
+        out["close"] = np.arange(limit, dtype=float)
+        return out
+
+
+def test_single_fetch_per_cycle():
+    print("=== Testing MarketDataContext in-flight de-duplication ===")
+    client = SlowClient()
+
+    async def scenario():
+        market = MarketDataContext(client)
+        # Entrada SuperTrend, early exit y trailing EMA21 del mismo símbolo a la vez
+        results = await asyncio.gather(
+            market.get_klines("BTC-USDT", interval="15", limit=500, as_array=True),
+            market.get_klines("BTCUSDT", interval="15", limit=500, as_array=True),
+            market.get_klines("BTCUSDT", interval="15", limit=30),
+        )
+        return market, results
+
+    market, (a, b, trailing) = asyncio.run(scenario())
+    assert client.calls == [("BTC-USDT", "15", 500)], client.calls
+    assert len(a) == len(b) == 500 and len(trailing) == 30
+    assert trailing[-1]["close"] == a["close"][-1]
+    assert market.stats == {"fetches": 1, "shared": 2}
+    print("[PASS] Concurrent callers shared one download.")
+
+    # Un ciclo nuevo vuelve a descargar
+    asyncio.run(MarketDataContext(client).get_klines("BTCUSDT", interval="15", limit=30))
+    assert len(client.calls) == 2
+    print("[PASS] Each scan cycle starts with fresh data.")
+
+
+def test_cancelled_waiter_does_not_cancel_fetch():
+    print("=== Testing shared fetch survives a cancelled waiter ===")
+    client = SlowClient()
+
+    async def scenario():
+        market = MarketDataContext(client)
+        first = asyncio.create_task(market.get_klines("ETHUSDT", "5m", 250, as_array=True))
+        second = asyncio.create_task(market.get_klines("ETHUSDT", "5m", 250, as_array=True))
+        await asyncio.sleep(0.01)
+        first.cancel()  # p.ej. timeout de 15s de una estrategia
+        return await second
+
+    klines = asyncio.run(scenario())
+    assert len(klines) == 250 and len(client.calls) == 1
+    print("[PASS] Other waiters still receive the data.")
+
+
+if __name__ == "__main__":
+    test_single_fetch_per_cycle()
+    test_cancelled_waiter_does_not_cancel_fetch()
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import sys
+
+sys.path.insert(0, '.')
+
+from app.exchange.market_events import TickerBook, MarkPrice, Execution, OrderUpdate, Kline
+from app.exchange.websocket_client import BybitWebSocket
+
+
+def _ticker(kind, **fields):
+    return {"topic": "tickers.BTCUSDT", "type": kind, "ts": 1700000000000,
+            "data": dict({"symbol": "BTCUSDT"}, **fields)}
+
+
+def test_ticker_delta_merge():
+    print("=== Testing TickerBook snapshot/delta merge ===")
+    book = TickerBook()
+    ev = book.apply(_ticker("snapshot", markPrice="100.5", lastPrice="100.4", fundingRate="0.0001"))
+    assert isinstance(ev, MarkPrice) and ev.mark_price == 100.5 and ev.last_price == 100.4
+
+    # Delta sin markPrice: se fusiona pero no hay evento
+    assert book.apply(_ticker("delta", lastPrice="100.6")) is None
+    assert book.get("BTCUSDT")["fundingRate"] == "0.0001"
+
+    ev = book.apply(_ticker("delta", markPrice="101", lastPrice=""))
+    assert ev.mark_price == 101.0 and ev.last_price == 100.6
+    assert book.apply(_ticker("delta", markPrice="101")) is None
+    print("[PASS] Deltas merge into the snapshot; MarkPrice only on mark changes.")
+
+
+def test_ws_emits_typed_events():
+    print("=== Testing BybitWebSocket typed event dispatch ===")
+    received = []
+
+    async def collect(event):
+        received.append(event)
+
+    async def collect_list(events):
+        received.extend(events)
+
+    ws = BybitWebSocket(fill_callback=collect, mark_price_callback=collect,
+                        kline_callback=collect, order_callback=collect_list)
+
+    async def run():
+        health = ws.shards[0].health
+        await ws._handle_public_message(json.dumps(_ticker("snapshot", markPrice="50000")).encode(), health)  # frame en bytes
+        await ws._handle_public_message(json.dumps({"topic": "kline.5.ETHUSDT", "data": [
+            {"start": 1700000000000, "open": "1", "high": "2", "low": "0.5", "close": "1.5",
+             "volume": "3", "confirm": True}]}), health)
+        await ws._handle_private_message(json.dumps({"topic": "execution", "data": [
+            {"category": "linear", "symbol": "SOLUSDT", "orderId": "abc", "side": "Buy",
+             "execQty": "2", "execPrice": "20", "leavesQty": "0", "execTime": "1700000000001"}]}))
+        await ws._handle_private_message(json.dumps({"topic": "order", "data": [
+            {"category": "linear", "symbol": "SOLUSDT", "orderId": "sl1", "orderStatus": "Untriggered"}]}))
+
+    asyncio.run(run())
+    mark, kline, fill, order = received
+    assert isinstance(mark, MarkPrice) and mark.symbol == "BTCUSDT" and mark.mark_price == 50000.0
+    assert isinstance(kline, Kline) and kline.interval == "5" and kline.confirm
+    assert kline.as_candle()["time"] == 1700000000000
+    assert isinstance(fill, Execution) and fill.filled and fill.order_id == "abc"
+    assert isinstance(order, OrderUpdate) and order.status == "Untriggered" and order.raw["orderId"] == "sl1"
+    print("[PASS] Public and private streams arrive as MarkPrice/Kline/Execution/OrderUpdate.")
+
+
+if __name__ == "__main__":
+    test_ticker_delta_merge()
+    test_ws_emits_typed_events()
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from app.backtest.data import load_symbol
+from app.backtest.runner import PreparedSymbol
+from app.exchange.bybit_client import AsyncBybitClient
+from app.exchange.candle_store import CandleStore
+from app.exchange.kline_cache import KLINE_DTYPE, KlineCache, MAX_KLINE_LIMIT
+from app.exchange.market_events import Kline
+from app.exchange.ohlcv_store import CandleColumns, OHLCVStore
+
+STEP = 300_000
+BASE = 1_699_977_600_000
+
+
+def _klines(start, n, step=STEP):
+    k = np.empty(n, dtype=KLINE_DTYPE)
+    k["time"] = start + np.arange(n, dtype=np.int64) * step
+    k["open"] = k["high"] = k["low"] = k["close"] = 100 + np.arange(n)
+    k["volume"] = 1.0
+    return k
+
+
+def test_append_read_and_recovery():
+    print("=== Testing columnar append, zero-copy reads and torn appends ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OHLCVStore(tmp)
+        data = _klines(BASE, 500)
+        assert store.append("BTC-USDT", "5m", data[:300]) == 300
+        assert store.append("BTCUSDT", "5", data[250:]) == 200  # solapadas ignoradas
+        candles = store.read("BTCUSDT", "5")
+        assert len(candles) == 500 and np.array_equal(candles.to_klines(), data)
+        assert isinstance(candles["close"], np.memmap)
+        window = store.read("BTCUSDT", "5", BASE + 10 * STEP, BASE + 19 * STEP)
+        assert len(window) == 10 and np.shares_memory(window["close"], candles["close"])
+        assert np.array_equal(store.tail("BTCUSDT", "5", 3)["time"], data["time"][-3:])
+
+        # Corte a mitad de un append: solo una columna llegó a escribirse
+        store.close()
+        with open(os.path.join(tmp, "BTCUSDT_5", "time.i64"), "ab") as f:
+            f.write(np.int64(BASE + 500 * STEP).tobytes())
+        reopened = OHLCVStore(tmp)
+        assert len(reopened.read("BTCUSDT", "5")) == 500
+        assert os.path.getsize(os.path.join(tmp, "BTCUSDT_5", "time.i64")) == 500 * 8
+        assert reopened.series() == [("BTCUSDT", "5")]
+        reopened.close()
+    print("[PASS] Appends dedup by time, reads are memmap views, torn rows are trimmed.")
+
+
+def test_gaps_and_merge():
+    print("=== Testing gap detection and gap filling ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OHLCVStore(tmp)
+        data = _klines(BASE, 100)
+        store.append("ETHUSDT", "5", np.concatenate((data[:40], data[60:])))
+        assert store.gaps("ETHUSDT", "5") == [(BASE + 40 * STEP, BASE + 59 * STEP)]
+        edges = store.gaps("ETHUSDT", "5", BASE - 10 * STEP, BASE + 120 * STEP + 7)
+        assert edges[0] == (BASE - 10 * STEP, BASE - STEP) and edges[-1] == (BASE + 100 * STEP, BASE + 120 * STEP)
+
+        before = store.read("ETHUSDT", "5")
+        assert store.append("ETHUSDT", "5", data[35:65]) == 20
+        assert store.gaps("ETHUSDT", "5") == []
+        assert np.array_equal(store.read("ETHUSDT", "5").to_klines(), data)
+        assert len(before) == 80  # las vistas ya entregadas siguen siendo válidas
+        store.close()
+    print("[PASS] Internal and edge gaps are reported and filled by a rewrite.")
+
+
+class _PagedKlines:
+    """`_request` falso de /v5/market/kline sobre un historial en memoria."""
+
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+        self.in_flight = self.peak = 0
+
+    async def __call__(self, method, endpoint, params=None, signed=True):
+        self.calls.append(params)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        t = self.history["time"]
+        rows = self.history[(t >= params["start"]) & (t <= params["end"])][-params["limit"]:][::-1]
+        return {"success": True, "data": {"list": [[str(v) for v in r] for r in rows.tolist()]}}
+
+
+def test_concurrent_backfill():
+    print("=== Testing concurrent paged backfill of missing ranges ===")
+    end = int(time.time() * 1000) // STEP * STEP
+    history = _klines(end - 2500 * STEP, 2501)  # la última vela sigue abierta
+    client = AsyncBybitClient()
+    client._request = _PagedKlines(history)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OHLCVStore(tmp)
+        store.append("SOLUSDT", "5", np.concatenate((history[1000:1100], history[1400:1500])))
+        added = asyncio.run(store.backfill(client, ["SOLUSDT"], ["5"], end - 2500 * STEP, end))
+        candles = store.read("SOLUSDT", "5")
+        assert added[("SOLUSDT", "5")] == 2300
+        assert np.array_equal(candles.to_klines(), history[:-1])
+        assert store.gaps("SOLUSDT", "5") == []
+        calls = len(client._request.calls)
+        assert client._request.peak > 1 and calls >= 3  # páginas en paralelo
+
+        # Ya completo: solo se pide el tramo nuevo (ninguno)
+        asyncio.run(store.backfill(client, ["SOLUSDT"], ["5"], end - 2500 * STEP, end))
+        assert len(client._request.calls) == calls
+        store.close()
+    assert all(p["end"] - p["start"] < MAX_KLINE_LIMIT * STEP for p in client._request.calls)
+    print(f"[PASS] {calls} pages fetched concurrently, only for the missing ranges.")
+
+
+def test_store_feeds_cache_and_backtester():
+    print("=== Testing restart seeding of the kline cache and backtest reads ===")
+    now = int(time.time() * 1000) // STEP * STEP
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OHLCVStore(tmp)
+        store.append("XRPUSDT", "5", _klines(now - 400 * STEP, 398))  # la última guardada abrió hace 3 velas
+        cache = KlineCache(store)
+        requested = []
+
+        async def fetch(n):
+            requested.append(n)
+            return _klines(now - (n - 1) * STEP, n)
+
+        got = asyncio.run(cache.get("XRPUSDT", "5", 250, fetch))
+        assert requested == [5] and cache.stats["store"] == 1 and cache.stats["full"] == 0
+        assert len(got) == 250 and got["time"][-1] == now and np.all(np.diff(got["time"]) == STEP)
+
+        rng = np.random.default_rng(1)
+        base = _klines(BASE, 3000)
+        base["close"] = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, 3000)))
+        base["open"], base["high"], base["low"] = base["close"], base["close"] * 1.001, base["close"] * 0.999
+        store.append("ADAUSDT", "5", base)
+        series = load_symbol("ADAUSDT", ("5", "15", "60"), directory=tmp, store=store)
+        assert isinstance(series["5"], CandleColumns) and len(series["15"]) == 1000
+        prepared = PreparedSymbol("ADAUSDT", series)
+        assert np.array_equal(prepared.close, base["close"])
+        store.close()
+    print("[PASS] Cache restarts fetch only the missing tail; backtests read the store.")
+
+
+class _ThreadRecordingStore(OHLCVStore):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.threads = set()
+
+    def append(self, symbol, interval, klines):
+        self.threads.add(threading.get_ident())
+        return super().append(symbol, interval, klines)
+
+
+def test_live_candles_are_stored_off_the_loop():
+    print("=== Testing that closed WS candles reach the store outside the event loop ===")
+    data = _klines(BASE, 10)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _ThreadRecordingStore(tmp)
+        candles = CandleStore(KlineCache(), history=store)
+
+        async def scenario():
+            for row in data.tolist():
+                await candles.on_kline(Kline("BTCUSDT", "5", *row, confirm=True))
+            assert not store.threads  # el callback del WS no escribe en disco
+            await candles.flush_history()
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(scenario())
+        assert store.threads and loop_thread not in store.threads
+        assert np.array_equal(store.read("BTCUSDT", "5").to_klines(), data)
+        store.close()
+    print("[PASS] Confirmed candles are appended by a worker thread, in order.")
+
+
+if __name__ == "__main__":
+    test_append_read_and_recovery()
+    test_gaps_and_merge()
+    test_concurrent_backfill()
+    test_store_feeds_cache_and_backtester()
+    test_live_candles_are_stored_off_the_loop()
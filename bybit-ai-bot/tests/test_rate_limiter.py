@@ -0,0 +1,111 @@
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from app.exchange.rate_limiter import (
+    PRIORITY_MARKET, PRIORITY_ORDER, RequestScheduler, TokenBucket, endpoint_priority,
+)
+
+
+def test_orders_jump_market_data_queue():
+    print("=== Testing RequestScheduler priorities ===")
+    assert endpoint_priority("/v5/position/trading-stop") == PRIORITY_ORDER
+    assert endpoint_priority("/v5/market/kline") == PRIORITY_MARKET
+
+    async def scenario():
+        scheduler = RequestScheduler(max_in_flight=4, reserved_for_orders=1, ip_rate=10_000)
+        order = []
+
+        async def call(endpoint, tag):
+            await scheduler.acquire(endpoint)
+            order.append(tag)
+            await asyncio.sleep(0.02)
+            scheduler.release()
+
+        # 25 símbolos de velas en cola y, detrás, una actualización de SL
+        klines = [asyncio.create_task(call("/v5/market/kline", f"kline{i}")) for i in range(25)]
+        await asyncio.sleep(0)
+        sl = asyncio.create_task(call("/v5/position/trading-stop", "sl"))
+        await asyncio.gather(sl, *klines)
+        return order
+
+    order = asyncio.run(scenario())
+    # Las velas solo usan 3 de los 4 huecos: el SL entra al instante por el reservado
+    assert order.index("sl") <= 3, order
+    print(f"[PASS] SL update started at position {order.index('sl')} of {len(order)}.")
+
+
+def test_bucket_syncs_with_bybit_headers():
+    print("=== Testing TokenBucket header sync ===")
+    bucket = TokenBucket(rate=10)
+    bucket.sync(limit=20, remaining=0, reset_ms=int(time.time() * 1000) + 200)
+    assert bucket.capacity == 20
+    wait = bucket.try_take()
+    assert 0 < wait <= 0.25, wait
+    time.sleep(wait)
+    assert bucket.try_take() == 0
+    print("[PASS] Exhausted limit blocks until the reset timestamp.")
+
+    scheduler = RequestScheduler()
+    scheduler.observe("/v5/order/create", {"X-Bapi-Limit-Status": "3", "X-Bapi-Limit": "10"})
+    assert scheduler._buckets["/v5/order/create"].tokens <= 3
+    scheduler.observe("/v5/order/create", None, ret_code=10006)
+    assert scheduler._buckets["/v5/order/create"].try_take() > 0
+    print("[PASS] Remaining quota and 10006 errors throttle the endpoint.")
+
+
+def test_signed_request_timestamp_taken_after_queue_wait():
+    print("=== Testing signed requests are stamped after the scheduler wait ===")
+    from app.exchange import bybit_client
+    sent = {}
+
+    class _Response:
+        status = 200
+        headers = {}
+
+        async def read(self):
+            return b'{"retCode": 0, "retMsg": "OK", "result": {}}'
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class _Session:
+        closed = False
+
+        def get(self, url, headers=None, **kwargs):
+            sent.update(headers, sent_ms=int(time.time() * 1000))
+            return _Response()
+
+    class _SlowScheduler:
+        async def acquire(self, endpoint):
+            await asyncio.sleep(0.3)  # cola de prioridad / bucket agotado
+
+        def release(self):
+            pass
+
+        def observe(self, *args, **kwargs):
+            pass
+
+    client = bybit_client.AsyncBybitClient()
+    client._session = _Session()
+    scheduler, bybit_client.request_scheduler = bybit_client.request_scheduler, _SlowScheduler()
+    try:
+        started = int(time.time() * 1000)
+        res = asyncio.run(client._request("GET", "/v5/position/list", {"category": "linear"}))
+    finally:
+        bybit_client.request_scheduler = scheduler
+    assert res["success"]
+    stamped = int(sent["X-BAPI-TIMESTAMP"])
+    assert stamped >= started + 300 and sent["sent_ms"] - stamped < 100
+    print(f"[PASS] Timestamp taken {stamped - started}ms after the call, once the slot was granted.")
+
+
+if __name__ == "__main__":
+    test_orders_jump_market_data_queue()
+    test_bucket_syncs_with_bybit_headers()
+    test_signed_request_timestamp_taken_after_queue_wait()
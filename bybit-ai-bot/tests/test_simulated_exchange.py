@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from app.exchange.kline_cache import KLINE_DTYPE
+from app.exchange.simulated_exchange import SimClock, SimulatedBybitClient, SimulatedExchange, \
+    SimulatedWebSocket, replay
+
+STEP = 300_000
+START = 1_700_000_000_000 // STEP * STEP
+
+
+def _candles(seed=0, before=300, after=48):
+    rng = np.random.default_rng(seed)
+    n = before + after
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    k = np.empty(n, dtype=KLINE_DTYPE)
+    k["time"] = START + (np.arange(n) - before) * STEP
+    k["open"], k["close"] = open_, close
+    k["high"] = np.maximum(open_, close) * 1.002
+    k["low"] = np.minimum(open_, close) * 0.998
+    k["volume"] = rng.lognormal(8, 0.5, n)
+    return k
+
+
+def _exchange(**kwargs):
+    return SimulatedExchange({"BTCUSDT": {"5": _candles()}}, START, spread_bps=0.0, **kwargs)
+
+
+def test_rest_client_orders_and_positions():
+    print("=== Testing the simulated exchange behind the real REST client ===")
+    ex = _exchange()
+    client = SimulatedBybitClient(ex)
+
+    async def scenario():
+        klines = await client.get_klines("BTC-USDT", "5m", 100, as_array=True)
+        assert len(klines) == 100 and klines["time"][-1] == START - STEP
+        hourly = await client.get_klines("BTCUSDT", "60m", 10, as_array=True)
+        assert np.all(np.diff(hourly["time"]) == 12 * STEP)
+
+        ex.tick("BTCUSDT", 100.0, 5.0, START)
+        live = await client.get_klines("BTCUSDT", "5m", 3, use_cache=False, as_array=True)
+        assert live["time"][-1] == START and live["close"][-1] == 100.0
+        assert (await client.get_ticker("BTCUSDT"))["lastPrice"] == 100.0
+
+        # Entrada límite, SL/TP condicionales y un trigger ya cruzado (rechazado como en Bybit)
+        entry = await client.place_order("BTCUSDT", "BUY", "LONG", "LIMIT", 2, price=99.0)
+        order_id = entry["data"]["orderId"]
+        sl = await client.place_order("BTCUSDT", "SELL", "LONG", "STOP_MARKET", 2, stop_price=97.0, reduce_only=True)
+        tp = await client.place_order("BTCUSDT", "SELL", "LONG", "TAKE_PROFIT_MARKET", 1, stop_price=102.0,
+                                      reduce_only=True)
+        bad = await client.place_order("BTCUSDT", "SELL", "LONG", "STOP_MARKET", 2, stop_price=101.0,
+                                       reduce_only=True)
+        assert sl["success"] and tp["success"] and not bad["success"] and bad["code"] == 110093
+        orders = {o["orderId"]: o for o in await client.get_open_orders("BTCUSDT")}
+        assert orders[order_id]["orderStatus"] == "New"
+        assert orders[sl["data"]["orderId"]]["stopOrderType"] == "StopLoss"
+        assert orders[sl["data"]["orderId"]]["orderStatus"] == "Untriggered"
+
+        ex.tick("BTCUSDT", 98.5, 1.0, START + 60_000)
+        pos = [p for p in await client.get_positions("BTCUSDT") if p["positionAmt"]]
+        assert pos == [dict(pos[0], positionSide="LONG", positionAmt=2.0, entryPrice=99.0)]
+
+        ex.tick("BTCUSDT", 102.5, 1.0, START + 120_000)  # TP: cierra la mitad
+        ex.tick("BTCUSDT", 96.0, 1.0, START + 180_000)   # SL: recortado a lo que queda
+        assert not any(p["positionAmt"] for p in await client.get_positions("BTCUSDT"))
+        assert await client.get_open_orders("BTCUSDT") == []
+        closed = await client.get_closed_pnl(START)
+        assert [float(r["closedSize"]) for r in closed] == [1.0, 1.0]  # más reciente primero
+        assert float(closed[1]["avgExitPrice"]) == 102.5 and float(closed[0]["closedPnl"]) < 0
+
+        # Cancelación y reduceOnly sin posición
+        resting = await client.place_order("BTCUSDT", "SELL", "SHORT", "LIMIT", 1, price=110.0)
+        assert (await client.cancel_order("BTCUSDT", resting["data"]["orderId"]))["success"]
+        assert not (await client.cancel_order("BTCUSDT", resting["data"]["orderId"]))["success"]
+        orphan = await client.place_order("BTCUSDT", "BUY", "SHORT", "LIMIT", 1, price=90.0, reduce_only=True)
+        assert orphan["code"] == 110017
+
+        # Market con stopLoss adjunto: TP/SL de posición que se dispara
+        await client.place_order("BTCUSDT", "SELL", "SHORT", "MARKET", 3, attached_sl=98.0)
+        tpsl = [o for o in ex.orders.values() if o.active and o.order_filter == "tpslOrder"]
+        assert len(tpsl) == 1 and tpsl[0].qty == 3.0 and tpsl[0].side == "Buy"
+        ex.tick("BTCUSDT", 98.2, 1.0, START + 240_000)
+        assert ex.positions[("BTCUSDT", 2)].size == 0 and ex.stats["triggered"] == 3
+        assert await client.get_balance() < 10_000.0
+
+    asyncio.run(scenario())
+    print(f"[PASS] Limit/market/conditional orders, TP/SL triggers and closed PnL: {ex.report()}")
+
+
+def test_partial_fills():
+    print("=== Testing partial fills of resting limit orders ===")
+    ex = _exchange(fill_ratio=0.25)
+    client = SimulatedBybitClient(ex)
+
+    async def scenario():
+        ex.tick("BTCUSDT", 100.0, ts_ms=START)
+        res = await client.place_order("BTCUSDT", "BUY", "LONG", "LIMIT", 1, price=99.0)
+        order = ex.orders[res["data"]["orderId"]]
+        ex.tick("BTCUSDT", 98.9, ts_ms=START + 1000)
+        assert order.status == "PartiallyFilled" and order.cum_qty == 0.25
+        listed = (await client.get_open_orders("BTCUSDT"))[0]
+        assert listed["orderStatus"] == "PartiallyFilled" and float(listed["leavesQty"]) == 0.75
+        for i in range(3):
+            ex.tick("BTCUSDT", 98.9, ts_ms=START + 2000 + i)
+        assert order.status == "Filled" and ex.positions[("BTCUSDT", 1)].size == 1.0
+        assert ex.stats["fills"] == 4
+
+    asyncio.run(scenario())
+    print("[PASS] A crossing limit fills in fill_ratio chunks per tick.")
+
+
+def test_websocket_stand_in():
+    print("=== Testing the local WebSocket stand-in ===")
+    ex = _exchange()
+    client = SimulatedBybitClient(ex)
+    events = {"fills": [], "orders": [], "marks": [], "klines": [], "positions": []}
+
+    async def collect(name, event):
+        events[name].append(event)
+
+    async def scenario():
+        ws = SimulatedWebSocket(
+            ex, fill_callback=lambda e: collect("fills", e), mark_price_callback=lambda e: collect("marks", e),
+            kline_callback=lambda e: collect("klines", e), order_callback=lambda e: collect("orders", e),
+            position_callback=lambda e: collect("positions", e),
+        )
+        with ex.clock.install():
+            await ws.connect()
+            await ws.subscribe_mark_price("BTCUSDT")
+            await ws.subscribe_klines(["BTCUSDT"], ["5"])
+            for _ in range(200):
+                if ws.private_ready and all(s.is_open for s in ws.shards):
+                    break
+                await asyncio.sleep(1)  # 1ms reales a 1000x
+            assert ws.private_ready
+
+            ex.tick("BTCUSDT", 100.0, 2.0, START)
+            await client.place_order("BTCUSDT", "BUY", "LONG", "MARKET", 1)
+            ex.tick("BTCUSDT", 101.0, 1.0, START + 60_000)
+            ex.advance_to(START + STEP)
+            await asyncio.sleep(50)
+            await ws.stop()
+
+    ex.clock.speed = 1000
+    asyncio.run(scenario())
+    assert [(f.side, f.exec_qty, f.exec_price) for f in events["fills"]] == [("Buy", 1.0, 100.0)]
+    statuses = [o.status for batch in events["orders"] for o in batch]
+    assert statuses == ["New", "Filled"]
+    assert events["positions"][0][0]["size"] == "1"
+    assert [m.last_price for m in events["marks"]][-2:] == [100.0, 101.0]
+    confirmed = [k for k in events["klines"] if k.confirm and k.interval == "5"]
+    assert len(confirmed) == 1 and confirmed[0].start == START and confirmed[0].high == 101.0
+    assert confirmed[0].volume == 3.0
+    assert ex.report()["ws_messages"] > 0
+    print(f"[PASS] Execution/order/position/ticker/kline messages reach the real callbacks "
+          f"(p99 {ex.report()['ws_delivery_p99_ms']} ms).")
+
+
+def test_replay_is_deterministic():
+    print("=== Testing deterministic candle replay ===")
+
+    async def run(speed=None):
+        ex = SimulatedExchange({"BTCUSDT": {"5": _candles(1)}, "ETHUSDT": {"5": _candles(2)}}, START)
+        client = SimulatedBybitClient(ex)
+        price = ex.last["BTCUSDT"]
+        await client.place_order("BTCUSDT", "BUY", "LONG", "MARKET", 1, attached_sl=price * 0.97)
+        await client.place_order("BTCUSDT", "SELL", "LONG", "LIMIT", 1, price=price * 1.02, reduce_only=True)
+        report = await replay(ex, speed=speed)
+        klines = await client.get_klines("ETHUSDT", "15m", 20, use_cache=False, as_array=True)
+        return report, ex, klines
+
+    first, ex, klines = asyncio.run(run())
+    second, _, _ = asyncio.run(run())
+    volatile = {"wall_s", "speed", "ws_delivery_p50_ms", "ws_delivery_p99_ms"}
+    assert {k: v for k, v in first.items() if k not in volatile} == \
+           {k: v for k, v in second.items() if k not in volatile}
+    assert first["ticks"] == 2 * 48 * 4 and first["sim_s"] == 48 * STEP / 1000
+
+    # Las velas reconstruidas tick a tick coinciden con las grabadas
+    recorded = _candles(2)
+    assert np.allclose(ex.bars[("ETHUSDT", "5")].candles()[-48:]["close"], recorded["close"][-48:])
+    assert klines["time"][-1] == (START + 47 * STEP) // (3 * STEP) * (3 * STEP) and np.all(np.diff(klines["time"]) == 3 * STEP)
+
+    fast, _, _ = asyncio.run(run(speed=200_000))
+    assert fast["sim_s"] / fast["wall_s"] > 1000
+    print(f"[PASS] Same report on every run; {fast['speed']}x achieved with pacing.")
+
+
+def test_clock_install():
+    print("=== Testing the simulation clock ===")
+    clock = SimClock(START, speed=1000)
+    real = time.time()
+
+    async def sleepy():
+        started = time.perf_counter()
+        await asyncio.sleep(1)
+        return time.perf_counter() - started
+
+    with clock.install():
+        assert time.time() == START / 1000
+        elapsed = asyncio.run(sleepy())
+        clock.advance_to(START + 5000)
+        assert time.time() == START / 1000 + 5
+    assert elapsed < 0.5 and time.time() >= real
+    print("[PASS] time.time follows the simulation and sleeps are scaled.")
+
+
+_ISOLATION_SCRIPT = """
+import asyncio, json, sys
+sys.path.insert(0, '.')
+import replay
+from app import constants
+from app.logger import logger
+from app.persistence.disk_manager import disk_manager
+logger.info("[REPLAY] %s")
+try:
+    from app.database import crud
+    asyncio.run(crud.init_db())
+except ImportError:
+    pass  # sin greenlet la base no se crea; las rutas siguen siendo las de la simulación
+print(json.dumps({"dir": replay.REPLAY_DIR, "db": constants.DB_FILE, "log": constants.BOT_LOG_FILE,
+                  "storage": disk_manager.local_fallback}))
+"""
+
+
+def _digest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_replay_leaves_live_state_untouched():
+    print("=== Testing replay.py isolation from the live DB and logs ===")
+    from app import constants
+    live_db = constants.DB_FILE
+    before = _digest(live_db)
+    marker = f"isolation-{os.getpid()}-{time.time_ns()}"
+
+    out = subprocess.run([sys.executable, "-c", _ISOLATION_SCRIPT % marker], capture_output=True, text=True,
+                         timeout=60, check=True, env={k: v for k, v in os.environ.items() if k != "DB_DIR"})
+    paths = json.loads(out.stdout.strip().splitlines()[-1])
+    try:
+        for key in ("db", "log", "storage"):
+            assert paths["dir"] in paths[key], (key, paths[key])
+        assert paths["db"] != live_db and paths["log"] != constants.BOT_LOG_FILE
+        assert _digest(live_db) == before
+        with open(paths["log"], encoding="utf-8") as f:
+            assert marker in f.read()
+        if os.path.exists(constants.BOT_LOG_FILE):
+            with open(constants.BOT_LOG_FILE, encoding="utf-8", errors="replace") as f:
+                assert marker not in f.read()
+    finally:
+        shutil.rmtree(paths["dir"], ignore_errors=True)
+    print(f"[PASS] Replay DB and logs under {paths['dir']}; live {live_db} unchanged.")
+
+
+if __name__ == "__main__":
+    test_rest_client_orders_and_positions()
+    test_partial_fills()
+    test_websocket_stand_in()
+    test_replay_is_deterministic()
+    test_clock_install()
+    test_replay_leaves_live_state_untouched()
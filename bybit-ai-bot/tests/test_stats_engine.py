@@ -0,0 +1,92 @@
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from app.core.stats_engine import StatsEngine, DAY_MS, RESET_OFFSET_MS, trading_day
+
+
+class FakeClient:
+    """closed-pnl paginado en memoria: devuelve lo posterior a start_time."""
+
+    def __init__(self):
+        self.records = []
+        self.calls = []
+
+    async def get_closed_pnl(self, start_time, end_time=None, max_pages=20):
+        self.calls.append(start_time)
+        return [r for r in self.records if int(r["createdTime"]) >= start_time]
+
+
+def _pnl(oid, symbol, pnl, ts, side="Sell"):
+    return {"orderId": oid, "symbol": symbol, "closedPnl": str(pnl), "createdTime": str(ts), "side": side}
+
+
+def test_incremental_sync_and_aggregates():
+    print("=== Testing StatsEngine incremental closed-pnl sync ===")
+    now = int(time.time() * 1000)
+    client = FakeClient()
+    stats = StatsEngine()
+    client.records = [_pnl("a", "BTCUSDT", 10.0, now - 5000), _pnl("b", "ETHUSDT", -4.0, now - 4000)]
+    assert asyncio.run(stats.sync(client)) == 2
+
+    # Segundo sync: solo desde el último visto; el solape no duplica
+    client.records.append(_pnl("c", "SOLUSDT", 6.0, now - 1000, side="Buy"))
+    assert asyncio.run(stats.sync(client)) == 1
+    assert client.calls[1] >= now - 5000 - 60_000
+    assert asyncio.run(stats.sync(client)) == 0
+
+    snap = stats.snapshot(now)
+    assert snap["pnl_total"] == 12.0 and snap["total_trades"] == 3
+    assert abs(snap["profit_factor"] - 4.0) < 1e-9
+    assert snap["mean_win"] == 8.0 and snap["mean_loss"] == 4.0
+    assert [t["symbol"] for t in snap["recent_trades"]] == ["SOLUSDT", "ETHUSDT", "BTCUSDT"]
+    assert snap["recent_trades"][0]["side"] == "SHORT"
+    print("[PASS] Only new records are applied and aggregates match a full recount.")
+
+
+def test_day_buckets_and_reset():
+    print("=== Testing StatsEngine day/week/month buckets ===")
+    stats = StatsEngine()
+    # Lunes 2024-01-15 10:00 UTC
+    monday = 1705312800000
+    stats.apply(_pnl("1", "BTCUSDT", 5.0, monday))
+    stats.apply(_pnl("2", "BTCUSDT", -2.0, monday + DAY_MS))
+    # Domingo anterior: otra semana, mismo mes
+    stats.apply(_pnl("3", "BTCUSDT", 7.0, monday - DAY_MS))
+    # Antes de las 04:00 UTC cuenta para el día de trading anterior
+    early = (monday // DAY_MS + 1) * DAY_MS + RESET_OFFSET_MS - 1000
+    assert trading_day(early) == trading_day(monday)
+
+    snap = stats.snapshot(monday + DAY_MS + 1000)
+    assert snap["pnl_today"] == -2.0 and snap["loss_today"] == 1
+    assert snap["pnl_week"] == 3.0 and snap["win_week"] == 1
+    assert snap["pnl_month"] == 10.0 and snap["pnl_total"] == 10.0
+
+    stats.reset(monday + DAY_MS + 2000)
+    assert stats.apply(_pnl("4", "BTCUSDT", 1.0, monday + DAY_MS + 1500)) is False
+    assert stats.snapshot(monday + DAY_MS + 3000)["total_trades"] == 0
+    print("[PASS] Trading-day buckets feed today/week/month; RESET drops older PnL.")
+
+
+def test_local_close_enrichment():
+    print("=== Testing StatsEngine enrichment with local closes ===")
+    now = int(time.time() * 1000)
+    stats = StatsEngine()
+    stats.apply(_pnl("x", "BTCUSDT", 3.0, now))
+    stats.on_trade_closed("BTCUSDT", strategy="V13", reason="TP2", trailing_active=True)
+    trade = stats.snapshot()["recent_trades"][0]
+    assert trade["strategy"] == "V13" and trade["reason"] == "TP2" and trade["trailing_active"]
+
+    # Cierre local antes de que Bybit publique el closed-pnl
+    stats.on_trade_closed("ETHUSDT", strategy="SUPERTREND", reason="SL")
+    stats.apply(_pnl("y", "ETHUSDT", -1.0, now + 2000))
+    assert stats.snapshot()["recent_trades"][0]["strategy"] == "SUPERTREND"
+    print("[PASS] Recent trades carry strategy/reason from the engine's close event.")
+
+
+if __name__ == "__main__":
+    test_incremental_sync_and_aggregates()
+    test_day_buckets_and_reset()
+    test_local_close_enrichment()
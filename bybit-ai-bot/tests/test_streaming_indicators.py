@@ -0,0 +1,149 @@
+import asyncio
+import json
+import sys
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from app.config import Config
+from app.exchange.kline_cache import KLINE_DTYPE, candle_row
+from app.strategy import antigravity_v13_pro as v13
+from app.strategy.v13_features import compute_v13_features
+from app.utils import indicators
+from app.utils.streaming_indicators import IndicatorRegistry, V13IndicatorSet
+
+INTERVAL_MS = 5 * 60_000
+
+
+def _candles(n, seed=3):
+    rng = np.random.default_rng(seed)
+    closes = 60000 + np.cumsum(rng.normal(0, 50, n))
+    highs = closes + rng.random(n) * 30
+    lows = closes - rng.random(n) * 30
+    vols = rng.random(n) * 100
+    # Tramo sin movimiento para cubrir DI/DX indefinidos
+    closes[100:110] = highs[100:110] = lows[100:110] = closes[99]
+    return [{"open": closes[i], "high": highs[i], "low": lows[i], "close": closes[i],
+             "volume": vols[i], "time": i * INTERVAL_MS} for i in range(n)]
+
+
+def _batch_values(candles):
+    closes = [c["close"] for c in candles]
+    highs = [c["high"] for c in candles]
+    lows = [c["low"] for c in candles]
+    vols = [c["volume"] for c in candles]
+    plus_di, minus_di, adx = indicators.calculate_dmi(highs, lows, closes, 14)
+    macd = indicators.calculate_macd(closes, 12, 26, 9)
+    bb = indicators.calculate_bollinger_bands(closes, 20, 2.0)
+    values = {f"ema{p}": indicators.calculate_ema(closes, p)[-1] for p in (9, 20, 50, 100, 200)}
+    values.update({
+        "hull20": indicators.calculate_hull_ma(closes, 20)[-1],
+        "hull50": indicators.calculate_hull_ma(closes, 50)[-1],
+        "atr14": indicators.calculate_atr(highs, lows, closes, 14)[-1],
+        "dmi14": (plus_di[-1], minus_di[-1], adx[-1]),
+        "vol_ma20": indicators.calculate_sma(vols, 20)[-1],
+        "vol_sma50": indicators.calculate_sma(vols, 50)[-1],
+        "rsi14": indicators.calculate_rsi(closes, 14)[-1],
+        "macd": (macd[0][-1], macd[1][-1], macd[2][-1]),
+        "bb": (bb[0][-1], bb[1][-1], bb[2][-1]),
+    })
+    return values
+
+
+def _stream_values(ind: V13IndicatorSet):
+    values = {f"ema{p}": ind.ema[p].value for p in (9, 20, 50, 100, 200)}
+    values.update({
+        "hull20": ind.hull[20].value, "hull50": ind.hull[50].value,
+        "atr14": ind.atr14.value, "dmi14": ind.dmi14.value,
+        "vol_ma20": ind.vol_ma20.value, "vol_sma50": ind.vol_sma50.value,
+        "rsi14": ind.rsi14.value, "macd": ind.macd.value, "bb": ind.bb.value,
+    })
+    return values
+
+
+def test_streaming_matches_batch():
+    print("=== Testing incremental indicators against the batch versions ===")
+    candles = _candles(320)
+    ind = V13IndicatorSet()
+    for i, c in enumerate(candles, start=1):
+        ind.update(c)
+        if i in (1, 14, 15, 26, 50, 105, 112, 200, 201, 320):
+            expected, got = _batch_values(candles[:i]), _stream_values(ind)
+            for key in expected:
+                assert np.allclose(np.atleast_1d(got[key]), np.atleast_1d(expected[key]), rtol=1e-7, atol=1e-6), \
+                    f"{key} differs after {i} candles: {got[key]} vs {expected[key]}"
+    print("[PASS] Streaming values match calculate_* after every warm-up stage.")
+
+
+def test_registry_snapshot_and_gap_replay():
+    print("=== Testing IndicatorRegistry snapshot/restore and gap replay ===")
+    candles = _candles(300)
+    registry = IndicatorRegistry()
+    registry.warmup("BTCUSDT", "5", candles[:250])
+
+    restored = IndicatorRegistry()
+    restored.restore(json.loads(json.dumps(registry.snapshot())))
+
+    # Tras el "reinicio" faltan 10 velas: se reaplican solo esas
+    ind = restored.on_closed_candle("BTCUSDT", "5", candles[259], INTERVAL_MS, history=lambda: candles[:260])
+    assert ind.last_time == candles[259]["time"]
+    ind = restored.on_closed_candle("BTCUSDT", "5", candles[260], INTERVAL_MS)
+    expected = _batch_values(candles[:261])
+    got = _stream_values(ind)
+    for key in expected:
+        assert np.allclose(np.atleast_1d(got[key]), np.atleast_1d(expected[key]), rtol=1e-7, atol=1e-6), key
+    print("[PASS] Restored state catches up through the gap and keeps matching batch values.")
+
+
+def test_v13_reads_registry_state():
+    print("=== Testing evaluate_antigravity_v13 on the registry state ===")
+    candles = _candles(801)
+    klines = np.array([candle_row(c) for c in candles], dtype=KLINE_DTYPE)
+    interval = Config.TIMEFRAME.replace("m", "")  # intervalo de V13
+    registry = IndicatorRegistry()
+    # Caliente desde hace 551 velas: las EMA largas del historial completo ya no son las de la ventana
+    registry.warmup("BTCUSDT", interval, candles[:249])
+    for c in candles[249:-1]:
+        ind = registry.on_closed_candle("BTCUSDT", interval, c, INTERVAL_MS)
+    window = klines[-250:-1]                       # lo que evalúa V13: 250 pedidas - la abierta
+    f = ind.features(candles[-2]["time"], window=len(window))
+    batch = compute_v13_features(window)
+    assert abs(ind.ema[200].value - batch["ema200"][-1]) > 1e-3
+    for key, values in f.items():
+        # ADX (EWM de una EWM) arrastra el inicio de la ventana ~1e-7 relativo; el resto, ruido de coma flotante
+        assert np.allclose(values, batch[key][-len(values):], rtol=1e-6, atol=1e-6), key
+    assert registry.warmup("ETHUSDT", interval, candles[:100]).features() is None
+    assert ind.features(candles[-3]["time"]) is None
+    print("[PASS] features() matches compute_v13_features on the 249-bar window and is None when cold or stale.")
+
+    class _Client:
+        async def get_klines(self, symbol, interval, limit, as_array=False):
+            return klines[-limit:]
+
+    calls = []
+    original = v13.compute_v13_features
+    v13.compute_v13_features = lambda k: calls.append(len(k)) or original(k)
+    try:
+        fresh = asyncio.run(v13.evaluate_antigravity_v13(_Client(), "BTC-USDT", registry))
+        assert calls == []
+        stale = IndicatorRegistry()
+        stale.warmup("BTCUSDT", interval, candles[:-2])
+        fallback = asyncio.run(v13.evaluate_antigravity_v13(_Client(), "BTCUSDT", stale))
+        assert calls == [249] and fallback["signal"] == fresh["signal"]
+    finally:
+        v13.compute_v13_features = original
+    snap = json.loads(json.dumps(registry.snapshot()))
+    restored = IndicatorRegistry()
+    restored.restore(snap)
+    after_restart = restored.get("BTCUSDT", interval).features(candles[-2]["time"])
+    assert all(np.allclose(after_restart[key], f[key]) for key in f)
+    fresh_restored = asyncio.run(v13.evaluate_antigravity_v13(_Client(), "BTCUSDT", restored))
+    assert fresh_restored == fresh
+    print("[PASS] Fresh registry state skips the full recompute; stale state falls back.")
+
+
+if __name__ == "__main__":
+    test_streaming_matches_batch()
+    test_registry_snapshot_and_gap_replay()
+    test_v13_reads_registry_state()
@@ -0,0 +1,77 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, '.')
+
+import app.utils.indicators as indicators
+from app.utils.indicators import calculate_supertrend, supertrend_arrays
+
+
+def reference_supertrend(highs, lows, closes, period=10, multiplier=3.0):
+    """Implementación original con df.loc (referencia de salida)."""
+    df = pd.DataFrame({'high': highs, 'low': lows, 'close': closes})
+    df['prev_close'] = df['close'].shift(1)
+    df['tr'] = pd.concat([df['high'] - df['low'], (df['high'] - df['prev_close']).abs(),
+                          (df['low'] - df['prev_close']).abs()], axis=1).max(axis=1)
+    df['atr'] = df['tr'].rolling(window=period).mean()
+    hl2 = (df['high'] + df['low']) / 2
+    df['basic_ub'] = hl2 + (multiplier * df['atr'])
+    df['basic_lb'] = hl2 - (multiplier * df['atr'])
+    df['final_ub'] = 0.00
+    df['final_lb'] = 0.00
+    for i in range(period, len(df)):
+        df.loc[i, 'final_ub'] = df.loc[i, 'basic_ub'] if df.loc[i, 'basic_ub'] < df.loc[i - 1, 'final_ub'] or df.loc[i - 1, 'close'] > df.loc[i - 1, 'final_ub'] else df.loc[i - 1, 'final_ub']
+        df.loc[i, 'final_lb'] = df.loc[i, 'basic_lb'] if df.loc[i, 'basic_lb'] > df.loc[i - 1, 'final_lb'] or df.loc[i - 1, 'close'] < df.loc[i - 1, 'final_lb'] else df.loc[i - 1, 'final_lb']
+    df['st'] = 0.00
+    df['dir'] = 1
+    for i in range(period, len(df)):
+        if df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_ub'] and df.loc[i, 'close'] <= df.loc[i, 'final_ub']:
+            df.loc[i, 'st'] = df.loc[i, 'final_ub']
+        elif df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_ub'] and df.loc[i, 'close'] > df.loc[i, 'final_ub']:
+            df.loc[i, 'st'] = df.loc[i, 'final_lb']
+        elif df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_lb'] and df.loc[i, 'close'] >= df.loc[i, 'final_lb']:
+            df.loc[i, 'st'] = df.loc[i, 'final_lb']
+        elif df.loc[i - 1, 'st'] == df.loc[i - 1, 'final_lb'] and df.loc[i, 'close'] < df.loc[i, 'final_lb']:
+            df.loc[i, 'st'] = df.loc[i, 'final_ub']
+        df.loc[i, 'dir'] = 1 if df.loc[i, 'close'] > df.loc[i, 'st'] else -1
+    return df['st'].to_numpy(), df['dir'].to_numpy()
+
+
+def _random_ohlc(n, seed):
+    rng = np.random.default_rng(seed)
+    closes = 100 + np.cumsum(rng.normal(0, 1, n))
+    return closes + rng.random(n), closes - rng.random(n), closes
+
+
+def test_supertrend_matches_reference():
+    print("=== Testing NumPy SuperTrend against the df.loc reference ===")
+    for n, seed in [(5, 0), (11, 1), (300, 2), (600, 3)]:
+        highs, lows, closes = _random_ohlc(n, seed)
+        ref_st, ref_dir = reference_supertrend(highs, lows, closes)
+        st, direction = supertrend_arrays(highs, lows, closes)
+        assert np.allclose(st, ref_st, rtol=0, atol=1e-9), f"SuperTrend values differ for n={n}"
+        assert (direction == ref_dir).all(), f"SuperTrend direction differs for n={n}"
+    print("[PASS] supertrend_arrays matches the original implementation.")
+
+
+def test_supertrend_python_fallback():
+    print("=== Testing SuperTrend pure-Python fallback ===")
+    highs, lows, closes = _random_ohlc(400, 7)
+    compiled = supertrend_arrays(highs, lows, closes)
+    kernel = indicators._supertrend_kernel
+    indicators._supertrend_kernel = None
+    try:
+        fallback = supertrend_arrays(highs, lows, closes)
+        legacy = calculate_supertrend(list(highs), list(lows), list(closes))
+    finally:
+        indicators._supertrend_kernel = kernel
+    assert np.array_equal(compiled[0], fallback[0]) and np.array_equal(compiled[1], fallback[1])
+    assert [c["dir"] for c in legacy] == fallback[1].tolist()
+    print("[PASS] Fallback and list-of-dicts wrapper agree with the array kernel.")
+
+
+if __name__ == "__main__":
+    test_supertrend_matches_reference()
+    test_supertrend_python_fallback()
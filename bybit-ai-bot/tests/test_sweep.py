@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from app.backtest import sweep
+from app.backtest.data import resample
+from app.backtest.runner import PreparedSymbol
+from app.exchange.kline_cache import KLINE_DTYPE
+
+
+def _history(symbols=2, n=12000):
+    history = {}
+    for seed in range(symbols):
+        rng = np.random.default_rng(seed)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, n) + 0.0015 * np.sin(np.arange(n) / 400)))
+        open_ = np.concatenate(([100.0], close[:-1]))
+        k = np.empty(n, dtype=KLINE_DTYPE)
+        k["time"] = 1_699_977_600_000 + np.arange(n) * 300_000
+        k["open"], k["close"] = open_, close
+        k["high"] = np.maximum(open_, close) * (1 + rng.random(n) * 0.002)
+        k["low"] = np.minimum(open_, close) * (1 - rng.random(n) * 0.002)
+        k["volume"] = rng.lognormal(10, 0.6, n)
+        history[f"S{seed}USDT"] = {"5": k, "15": resample(k, "15"), "60": resample(k, "60")}
+    return history
+
+
+def test_parameter_spaces():
+    print("=== Testing grid / random search spaces ===")
+    combos = sweep.grid({"v13.adx_min": [10, 14], "st.arm_bars": [20, 40, 60]})
+    assert len(combos) == 6 and {"v13.adx_min": 14, "st.arm_bars": 60} in combos
+    sampled = sweep.random_search({"v13.adx_min": (10, 20), "exit.sl_atr": (1.5, 3.0)}, 50, seed=1)
+    assert all(isinstance(c["v13.adx_min"], int) and 1.5 <= c["exit.sl_atr"] <= 3.0 for c in sampled)
+    assert sweep.split_params({"v13.adx_min": 9, "exit.sl_atr": 2.0}) == ({"adx_min": 9}, {}, {"sl_atr": 2.0})
+    try:
+        sweep.split_params({"v13.nope": 1})
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+    print("[PASS] Grid, random ranges and prefixed parameter routing.")
+
+
+def test_shared_history_roundtrip():
+    print("=== Testing shared-memory OHLCV publication ===")
+    history = _history(1, 500)
+    with sweep.SharedHistory(history) as shared:
+        sweep._init_worker(shared.layout)
+        name, length = shared.layout["S0USDT"]["5"]
+        view = sweep._attach(name, length)
+        assert np.array_equal(view, history["S0USDT"]["5"])
+        assert not view.flags.owndata  # vista sobre el bloque, sin copia
+        for block in sweep._worker["blocks"].values():
+            block.close()
+    print("[PASS] Workers map the candles without copying them.")
+
+
+def test_sweep_matches_single_process_backtests():
+    print("=== Testing multi-process sweep against direct backtests ===")
+    history = _history()
+    combos = sweep.grid({"v13.adx_min": [14, 25], "st.arm_bars": [20, 40], "exit.sl_atr": [2.5]})
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sweep.npz")
+        results = sweep.run_sweep(history, combos, workers=2, batch_size=3, results_path=path)
+        loaded, meta = sweep.load_results(path)
+
+    assert meta["symbols"] == ["S0USDT", "S1USDT"]
+    assert set(loaded) == set(results) and np.array_equal(loaded["pnl"], results["pnl"])
+    assert np.all(results["symbols_done"] == 2)
+
+    prepared = {s: PreparedSymbol(s, series) for s, series in history.items()}
+    for i, combo in enumerate(combos):
+        runs = [p.run(*sweep.split_params(combo)) for p in prepared.values()]
+        assert results["trades"][i] == sum(len(r) for r in runs)
+        assert abs(results["pnl"][i] - sum(r["pnl"].sum() for r in runs)) < 1e-6
+        assert results["v13.adx_min"][i] == combo["v13.adx_min"]
+    best = sweep.top(results, "pnl", 1)[0]
+    assert best["pnl"] == results["pnl"].max()
+    print(f"[PASS] {len(combos)} combinations x 2 symbols match direct runs; columnar file round-trips.")
+
+
+if __name__ == "__main__":
+    test_parameter_spaces()
+    test_shared_history_roundtrip()
+    test_sweep_matches_single_process_backtests()
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, '.')
+
+from app.persistence.disk_manager import disk_manager
+from app.persistence.trade_journal import HEADER, TradeJournal, convert_directory_layout
+from app.persistence.trade_recorder import LEGACY_IMPORT_MARKER, TradeRecorder
+from app.persistence.write_queue import WriteQueue
+
+
+def test_recorder_on_journal():
+    print("=== Testing TradeRecorder on the append-only journal ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = WriteQueue()
+        journal = TradeJournal(os.path.join(tmp, "journal"), fsync_policy="always")
+        recorder = TradeRecorder(journal, queue=queue)
+        writers, uploads = set(), []
+        append = journal.append
+        journal.append = lambda *args, **kw: writers.add(threading.current_thread().name) or append(*args, **kw)
+        upload, disk_manager.upload = disk_manager.upload, lambda remote, content: uploads.append(remote)
+        try:
+            recorder.record_open("T1", {"symbol": "BTCUSDT", "side": "LONG", "entry_price": 100.0})
+            recorder.record_open("T2", {"symbol": "ETHUSDT", "side": "SHORT", "entry_price": 10.0})
+            recorder.update_open("T1", {"precio_actual": 101.0})
+            recorder.record_close("T1", "BTCUSDT", "LONG", pnl=1.5, reason="TP1")
+            assert queue.flush(5)
+        finally:
+            disk_manager.upload = upload
+        assert writers == {"PersistenceWriter"} and queue.stats["jobs"] == 4
+        assert uploads == [f"{disk_manager.ops_open_dir}/T1.json", f"{disk_manager.ops_open_dir}/T2.json"]
+        print("[PASS] Journal appends and FTP copies run on the writer thread, in order.")
+        assert [t["trade_id"] for t in recorder.get_all_open()] == ["T2"]
+        history = recorder.get_history()
+        assert len(history) == 1 and history[0]["precio_actual"] == 101.0
+        assert history[0]["estado_final"] == "GANADA"
+        assert len(os.listdir(os.path.join(tmp, "journal"))) == 1
+        print("[PASS] Open/update/close appended to a single daily segment.")
+
+        # Reinicio: el índice se reconstruye desde el segmento
+        recorder.close()
+        reloaded = TradeJournal(os.path.join(tmp, "journal"))
+        assert [t["trade_id"] for t in reloaded.open_trades()] == ["T2"]
+        assert reloaded.history()[0]["pnl_realizado"] == 1.5
+        assert [t["trade_id"] for t in reloaded.trades_for_symbol("BTCUSDT")] == ["T1"]
+        print("[PASS] Index rebuilt after restart.")
+
+
+def test_truncated_tail_is_dropped():
+    print("=== Testing crash recovery of a torn record ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = TradeJournal(tmp)
+        segment, _ = journal.append("open", "T1", {"symbol": "BTCUSDT"})
+        journal.append("close", "T1", {"symbol": "BTCUSDT", "pnl_realizado": 1.0})
+        journal.close()
+        path = os.path.join(tmp, f"{segment}.journal")
+        size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(HEADER.pack(100, 0) + b'{"op":"op')  # escritura cortada a la mitad
+
+        reloaded = TradeJournal(tmp)
+        assert len(reloaded.history()) == 1
+        assert os.path.getsize(path) == size
+        print("[PASS] Torn tail discarded and segment truncated.")
+
+
+def test_convert_directory_layout():
+    print("=== Testing conversion from the per-file layout ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        open_dir = os.path.join(tmp, "abiertas")
+        hist_dir = os.path.join(tmp, "historial")
+        os.makedirs(open_dir)
+        for day, ts in (("2026-01-01", 100), ("2026-01-02", 200)):
+            os.makedirs(os.path.join(hist_dir, day))
+            with open(os.path.join(hist_dir, day, f"BTCUSDT_LONG_GANADA_{ts}.json"), "w") as f:
+                json.dump({"trade_id": f"C{ts}", "symbol": "BTCUSDT", "cierre_ts": ts}, f)
+        with open(os.path.join(open_dir, "O1.json"), "w") as f:
+            json.dump({"trade_id": "O1", "symbol": "SOLUSDT"}, f)
+
+        journal = TradeJournal(os.path.join(tmp, "journal"))
+        assert convert_directory_layout(journal, open_dir, hist_dir) == (1, 2)
+        assert convert_directory_layout(journal, open_dir, hist_dir) == (0, 0)
+        assert [t["trade_id"] for t in journal.history()] == ["C200", "C100"]
+        assert [t["trade_id"] for t in journal.history("2026-01-01")] == ["C100"]
+        assert [t["trade_id"] for t in journal.open_trades()] == ["O1"]
+        print("[PASS] Legacy files imported once, into their original day segments.")
+
+        # Importación interrumpida: el directorio del journal ya existe pero sin marcador
+        base = os.path.join(tmp, "base")
+        os.makedirs(os.path.join(base, "operaciones_bybit"))
+        shutil.copytree(open_dir, os.path.join(base, "operaciones_bybit", "abiertas"))
+        shutil.copytree(hist_dir, os.path.join(base, "operaciones_bybit", "historial"))
+        saved = (disk_manager._local_base, disk_manager._local_ops_open, disk_manager._local_ops_hist)
+        disk_manager._local_base = base
+        disk_manager._local_ops_open = os.path.join(base, "operaciones_bybit", "abiertas")
+        disk_manager._local_ops_hist = os.path.join(base, "operaciones_bybit", "historial")
+        try:
+            partial = TradeJournal(disk_manager.journal_dir_local)
+            partial.append("close", "C100", {"trade_id": "C100", "cierre_ts": 100}, segment="2026-01-01")
+            partial.close()
+            recorder = TradeRecorder()
+            assert sorted(t["trade_id"] for t in recorder.get_history()) == ["C100", "C200"]
+            assert [t["trade_id"] for t in recorder.get_all_open()] == ["O1"]
+            assert os.path.exists(os.path.join(disk_manager.journal_dir_local, LEGACY_IMPORT_MARKER))
+            recorder.close()
+        finally:
+            disk_manager._local_base, disk_manager._local_ops_open, disk_manager._local_ops_hist = saved
+        print("[PASS] An interrupted import is resumed on the next start and then marked complete.")
+
+
+def test_reads_while_writer_thread_appends():
+    print("=== Testing journal queries concurrent with background appends ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = TradeJournal(os.path.join(tmp, "journal"), fsync_policy="never")
+        journal.load()
+
+        def writer():
+            for i in range(3000):
+                journal.append("open", f"T{i}", {"trade_id": f"T{i}", "symbol": "BTCUSDT"})
+                if i % 2:
+                    journal.append("close", f"T{i - 1}", {"trade_id": f"T{i - 1}", "symbol": "BTCUSDT"})
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        reads = 0
+        while thread.is_alive():
+            journal.open_trades()
+            journal.trades_for_symbol("BTCUSDT", limit=5)
+            reads += 1
+        thread.join()
+        assert len(journal.open_trades()) == 1500 and "T0" in journal
+    print(f"[PASS] {reads} reads during 4500 appends without iteration errors.")
+
+
+if __name__ == "__main__":
+    test_recorder_on_journal()
+    test_truncated_tail_is_dropped()
+    test_convert_directory_layout()
+    test_reads_while_writer_thread_appends()
@@ -0,0 +1,51 @@
+import sys
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from app.utils import indicators
+from app.strategy.v13_features import compute_v13_features
+
+
+def _klines(n, seed=11):
+    rng = np.random.default_rng(seed)
+    closes = 2.5 + np.cumsum(rng.normal(0, 0.01, n))
+    highs = closes + rng.random(n) * 0.01
+    lows = closes - rng.random(n) * 0.01
+    vols = rng.random(n) * 1e6
+    if n > 70:
+        closes[60:70] = highs[60:70] = lows[60:70] = closes[59]
+    return [{"open": closes[i], "high": highs[i], "low": lows[i], "close": closes[i],
+             "volume": vols[i], "time": i * 300000} for i in range(n)]
+
+
+def test_v13_features_match_indicator_functions():
+    print("=== Testing single-pass V13 features against calculate_* ===")
+    for n in (10, 20, 30, 249):
+        klines = _klines(n)
+        closes = [c["close"] for c in klines]
+        highs = [c["high"] for c in klines]
+        lows = [c["low"] for c in klines]
+        vols = [c["volume"] for c in klines]
+        plus_di, minus_di, adx = indicators.calculate_dmi(highs, lows, closes, 14)
+        macd, signal, _ = indicators.calculate_macd(closes, 12, 26, 9)
+        bb_mid, bb_up, bb_low = indicators.calculate_bollinger_bands(closes, 20, 2.0)
+        expected = {
+            "ema9": indicators.calculate_ema(closes, 9), "ema20": indicators.calculate_ema(closes, 20),
+            "ema50": indicators.calculate_ema(closes, 50), "ema100": indicators.calculate_ema(closes, 100),
+            "hull20": indicators.calculate_hull_ma(closes, 20), "hull50": indicators.calculate_hull_ma(closes, 50),
+            "atr14": indicators.calculate_atr(highs, lows, closes, 14),
+            "plus_di": plus_di, "minus_di": minus_di, "adx14": adx,
+            "vol_ma20": indicators.calculate_sma(vols, 20), "vol_sma50": indicators.calculate_sma(vols, 50),
+            "rsi14": indicators.calculate_rsi(closes, 14), "macd": macd, "macd_signal": signal,
+            "bb_middle": bb_mid, "bb_upper": bb_up, "bb_lower": bb_low,
+        }
+        features = compute_v13_features(klines)
+        for key, values in expected.items():
+            assert np.allclose(features[key], values, rtol=1e-9, atol=1e-9), f"{key} differs for n={n}"
+    print("[PASS] compute_v13_features matches every indicator series.")
+
+
+if __name__ == "__main__":
+    test_v13_features_match_indicator_functions()
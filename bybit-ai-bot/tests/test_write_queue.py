@@ -0,0 +1,42 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+
+from app.persistence.write_queue import WriteQueue
+
+
+def test_coalesced_background_writes():
+    print("=== Testing WriteQueue coalescing and read-through ===")
+    queue = WriteQueue()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memoria", "estado.json")
+        start = time.perf_counter()
+        for i in range(50):
+            queue.write_json(path, {"version": i}, backup_path=path.replace(".json", "_backup.json"))
+        assert time.perf_counter() - start < 0.05, "Enqueue must not block on disk I/O"
+        # Antes de escribirse, la lectura ve la última versión encolada
+        assert queue.read_json(path) == {"version": 49}
+        assert queue.flush(5)
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == {"version": 49}
+        assert queue.stats["written"] < 50 and queue.stats["coalesced"] > 0
+        print(f"[PASS] 50 writes coalesced into {queue.stats['written']}.")
+
+        queue.write_json(path, {"version": 50}, backup_path=path.replace(".json", "_backup.json"))
+        assert queue.flush(5)
+        with open(path.replace(".json", "_backup.json"), encoding="utf-8") as f:
+            assert json.load(f) == {"version": 49}
+        print("[PASS] Backup of the previous file taken by the writer thread.")
+
+        queue.delete(path)
+        assert queue.read_json(path, default="gone") == "gone"
+        assert queue.flush(5) and not os.path.exists(path)
+        print("[PASS] Deletes are queued and visible immediately.")
+
+
+if __name__ == "__main__":
+    test_coalesced_background_writes()
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+import websockets
+from app.exchange.ws_health import ConnectionHealth
+from app.exchange.websocket_client import BybitWebSocket
+
+
+def test_heartbeat_and_stale_topics():
+    print("=== Testing ConnectionHealth heartbeat + staleness ===")
+    health = ConnectionHealth("public")
+    health.on_connect()
+    ping = health.ping_payload()
+    assert ping["op"] == "ping" and health.pong_overdue(-1)
+    rtt = health.on_pong(ping["req_id"])
+    assert rtt is not None and rtt >= 0 and not health.pong_overdue(-1)
+    assert health.on_pong("desconocido") is None
+    print("[PASS] Ping/pong round trip measured by req_id.")
+
+    health.on_message("kline.5.BTCUSDT")
+    health.topic_seen["tickers.ETHUSDT"] = time.monotonic() - 500
+    stale = health.stale_topics(["kline.5.BTCUSDT", "tickers.ETHUSDT"], max_age=120)
+    assert stale == ["tickers.ETHUSDT"]
+    health.touch("tickers.ETHUSDT")
+    assert health.stale_topics(["tickers.ETHUSDT"], max_age=120) == []
+
+    health.on_disconnect()
+    assert health.gap_start_ms == health.last_message_ms and health.failures == 1
+    health.on_connect()
+    assert health.reconnects == 1
+    print("[PASS] Per-topic staleness and disconnect gap tracked.")
+
+
+def test_reconnect_resubscribes_and_backfills():
+    print("=== Testing public WS reconnect: dynamic resubscription + gap backfill ===")
+    connections = []
+
+    async def server(ws):
+        subscribed = []
+        connections.append(subscribed)
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get("op") == "subscribe":
+                subscribed.extend(msg["args"])
+                if len(connections) == 1 and any(a.startswith("tickers") for a in subscribed):
+                    await ws.send(json.dumps({"topic": "tickers.SOLUSDT", "type": "snapshot",
+                                              "data": {"symbol": "SOLUSDT", "markPrice": "20"}}))
+                    await ws.close()  # Corte del servidor
+                    return
+            elif msg.get("op") == "ping":
+                await ws.send(json.dumps({"op": "ping", "ret_msg": "pong", "req_id": msg["req_id"]}))
+
+    gaps = []
+
+    async def on_gap(pairs, start_ms, end_ms):
+        gaps.append((pairs, start_ms, end_ms))
+
+    async def run():
+        async with websockets.serve(server, "127.0.0.1", 0) as srv:
+            port = srv.sockets[0].getsockname()[1]
+            ws = BybitWebSocket(kline_gap_callback=on_gap)
+            ws.ws_public_url = f"ws://127.0.0.1:{port}"
+            ws.running = True
+            await ws.subscribe_mark_price("SOLUSDT")     # Antes de conectar: se recuerda
+            await ws.subscribe_klines(["XRPUSDT"], ["60"])
+            ws._start_public()
+            for _ in range(60):
+                await asyncio.sleep(0.05)
+                if len(connections) >= 2 and gaps:
+                    break
+            await ws.stop()
+            await asyncio.wait_for(ws.shards[0].task, 5)
+            return ws
+
+    ws = asyncio.run(run())
+    assert len(connections) >= 2
+    assert "tickers.SOLUSDT" in connections[1] and "kline.60.XRPUSDT" in connections[1]
+    pairs, start_ms, end_ms = gaps[0]
+    assert ("XRPUSDT", "60") in pairs and 0 < start_ms <= end_ms
+    assert ws.shards[0].health.reconnects >= 1
+    print("[PASS] Full dynamic topic set resent after reconnect; kline gap handed to REST backfill.")
+
+
+if __name__ == "__main__":
+    test_heartbeat_and_stale_topics()
+    test_reconnect_resubscribes_and_backfills()
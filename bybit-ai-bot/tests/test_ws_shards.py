@@ -0,0 +1,110 @@
+import asyncio
+import json
+import sys
+
+sys.path.insert(0, '.')
+
+import websockets
+from app.exchange import websocket_client
+from app.exchange.websocket_client import BybitWebSocket
+
+INTERVALS = ["5", "15", "60"]
+
+
+def _symbols(n, offset=0):
+    return [f"COIN{i}USDT" for i in range(offset, offset + n)]
+
+
+def _check_partition(ws):
+    seen = set()
+    for shard in ws.shards:
+        assert not (shard.topics & seen), "topic duplicado entre shards"
+        assert len(shard.topics) <= websocket_client.MAX_TOPICS_PER_CONNECTION
+        seen |= shard.topics
+    assert seen == ws._public_topics()
+
+
+def test_shard_assignment_and_rebalance():
+    print("=== Testing public WS sharding: assignment, growth, shrink ===")
+    limit = websocket_client.MAX_TOPICS_PER_CONNECTION
+
+    async def run():
+        ws = BybitWebSocket()
+        assert len(ws.shards) == 1
+        # Universo completo: 400 símbolos x 3 intervalos + tickers de las posiciones
+        await ws.set_kline_universe(_symbols(400), INTERVALS)
+        for sym in _symbols(5):
+            await ws.subscribe_mark_price(sym)
+        _check_partition(ws)
+        total = len(ws._public_topics())
+        assert total == 1205 and len(ws.shards) == -(-total // limit)
+        loads = [len(s.topics) for s in ws.shards]
+        assert max(loads) - min(loads) <= websocket_client.REBALANCE_THRESHOLD
+        print(f"[PASS] {total} topics repartidos en {len(ws.shards)} conexiones: {loads}")
+
+        # El universo se reduce: bajas de los símbolos que salen y menos conexiones
+        await ws.set_kline_universe(_symbols(30, offset=390), INTERVALS)
+        _check_partition(ws)
+        assert not any("COIN0USDT" in t for s in ws.shards for t in s.topics if t.startswith("kline"))
+        assert len(ws.shards) == 1 and "tickers.COIN0USDT" in ws.shards[0].topics
+        print("[PASS] Símbolos retirados dados de baja y shards sobrantes cerrados.")
+
+        # Crece de nuevo: los shards nuevos se equilibran con los existentes
+        await ws.set_kline_universe(_symbols(150), INTERVALS)
+        _check_partition(ws)
+        loads = [len(s.topics) for s in ws.shards]
+        assert len(ws.shards) == 3 and max(loads) - min(loads) <= websocket_client.REBALANCE_THRESHOLD
+        print(f"[PASS] Rebalanceo tras crecer: {loads}")
+
+    asyncio.run(run())
+
+
+def test_rebalance_moves_topics_between_live_connections():
+    print("=== Testing live shard rebalance: subscribe on target, unsubscribe on source ===")
+    received = {}
+
+    async def server(conn):
+        ops = []
+        received[id(conn)] = ops
+        async for raw in conn:
+            msg = json.loads(raw)
+            if msg.get("op") in ("subscribe", "unsubscribe"):
+                ops.append((msg["op"], msg["args"]))
+
+    async def run(limit):
+        async with websockets.serve(server, "127.0.0.1", 0) as srv:
+            ws = BybitWebSocket()
+            ws.ws_public_url = f"ws://127.0.0.1:{srv.sockets[0].getsockname()[1]}"
+            ws.running = True
+            await ws.set_kline_universe(_symbols(limit // 3), INTERVALS)
+            ws._start_public()
+            for _ in range(40):
+                await asyncio.sleep(0.05)
+                if all(s.is_open for s in ws.shards) and len(received) == len(ws.shards):
+                    break
+            # Más símbolos de los que caben: se abre una segunda conexión
+            await ws.set_kline_universe(_symbols(limit // 3 + 40), INTERVALS)
+            for _ in range(40):
+                await asyncio.sleep(0.05)
+                if len(received) >= 2 and all(s.is_open for s in ws.shards):
+                    break
+            shards = list(ws.shards)
+            await ws.stop()
+            await asyncio.gather(*(s.task for s in shards), return_exceptions=True)
+            return ws, shards
+
+    limit = websocket_client.MAX_TOPICS_PER_CONNECTION
+    ws, shards = asyncio.run(run(limit))
+    assert len(shards) == 2 and len(received) == 2
+    subscribed = {t for ops in received.values() for op, args in ops if op == "subscribe" for t in args}
+    unsubscribed = {t for ops in received.values() for op, args in ops if op == "unsubscribe" for t in args}
+    assert ws._public_topics() <= subscribed
+    # Lo que se movió de la primera conexión se dio de baja allí y sigue vivo en la segunda
+    assert unsubscribed and unsubscribed <= shards[1].topics
+    assert "public-1" in ws.status()
+    print(f"[PASS] {len(unsubscribed)} topics movidos a la conexión nueva sin duplicados.")
+
+
+if __name__ == "__main__":
+    test_shard_assignment_and_rebalance()
+    test_rebalance_moves_topics_between_live_connections()